@@ -1,7 +1,6 @@
 """ Common constants for managing AppServer instances. """
 
 import os
-import urllib2
 
 from appscale.common.constants import APPSCALE_HOME
 
@@ -16,21 +15,6 @@ class BadConfigurationException(Exception):
     return repr(self.value)
 
 
-class NoRedirection(urllib2.HTTPErrorProcessor):
-  """ A url opener that does not automatically redirect. """
-  def http_response(self, request, response):
-    """ Processes HTTP responses.
-
-    Args:
-      request: An HTTP request object.
-      response: An HTTP response object.
-    Returns:
-      The HTTP response object.
-    """
-    return response
-  https_response = http_response
-
-
 # The location of the API server start script.
 API_SERVER_LOCATION = os.path.join('/', 'opt', 'appscale_api_server', 'bin',
                                    'appscale-api-server')
@@ -95,6 +79,9 @@ MAX_API_SERVER_PORT = 19999
 # The maximum number of threads to use for executing blocking tasks.
 MAX_BACKGROUND_WORKERS = 4
 
+# The default number of instances that can be started or stopped at once.
+MAX_CONCURRENT_INSTANCE_CHANGES = 4
+
 # The number of seconds an instance is allowed to finish serving requests after
 # it receives a shutdown signal.
 MAX_INSTANCE_RESPONSE_TIME = 600
@@ -1,33 +1,38 @@
 """ Fulfills AppServer instance assignments from the scheduler. """
 import logging
-import math
 import json
 import os
 import psutil
 import signal
-import urllib2
+import time
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPError
 from tornado.ioloop import IOLoop, PeriodicCallback
-from tornado.locks import Lock as AsyncLock
+from tornado.locks import Lock as AsyncLock, Semaphore
 
 from appscale.admin.constants import UNPACK_ROOT
 from appscale.admin.instance_manager.constants import (
   API_SERVER_LOCATION, API_SERVER_PREFIX, APP_LOG_SIZE, BACKOFF_TIME,
   BadConfigurationException, DASHBOARD_LOG_SIZE, DASHBOARD_PROJECT_ID,
   DEFAULT_MAX_APPSERVER_MEMORY, FETCH_PATH, GO_SDK, INSTANCE_CLASSES,
-  JAVA_APPSERVER_CLASS, MAX_API_SERVER_PORT, MAX_INSTANCE_RESPONSE_TIME,
-  MONIT_INSTANCE_PREFIX, NoRedirection, PIDFILE_TEMPLATE, PYTHON_APPSERVER,
-  START_APP_TIMEOUT, STARTING_INSTANCE_PORT, VERSION_REGISTRATION_NODE)
+  JAVA_APPSERVER_CLASS, MAX_API_SERVER_PORT, MAX_CONCURRENT_INSTANCE_CHANGES,
+  MAX_INSTANCE_RESPONSE_TIME, MONIT_INSTANCE_PREFIX, PIDFILE_TEMPLATE,
+  PYTHON_APPSERVER, START_APP_TIMEOUT, STARTING_INSTANCE_PORT,
+  VERSION_REGISTRATION_NODE)
 from appscale.admin.instance_manager.instance import (
   create_java_app_env, create_java_start_cmd, create_python_app_env,
   create_python27_start_cmd, get_login_server, Instance)
+from appscale.admin.instance_manager.startup_stats import StartupStats
 from appscale.admin.instance_manager.stop_instance import stop_instance
 from appscale.admin.instance_manager.utils import setup_logrotate
 from appscale.common import appscale_info, monit_app_configuration
 from appscale.common.async_retrying import retry_data_watch_coroutine
 from appscale.common.constants import (
-  APPS_PATH, GO, HTTPCodes, JAVA, MonitStates, PHP, PYTHON27, VAR_DIR,
+  APPS_PATH, GO, JAVA, MonitStates, PHP, PYTHON27, VAR_DIR,
   VERSION_PATH_SEPARATOR)
 from appscale.common.monit_interface import DEFAULT_RETRIES, ProcessNotFound
 from appscale.common.retrying import retry
@@ -82,7 +87,8 @@ class InstanceManager(object):
 
   def __init__(self, zk_client, monit_operator, routing_client,
                projects_manager, deployment_config, source_manager,
-               syslog_server, thread_pool, private_ip):
+               syslog_server, thread_pool, private_ip,
+               max_concurrent_changes=MAX_CONCURRENT_INSTANCE_CHANGES):
     """ Creates a new InstanceManager.
 
     Args:
@@ -96,6 +102,8 @@ class InstanceManager(object):
         that generates the combined app logs.
       thread_pool: A ThreadPoolExecutor.
       private_ip: A string specifying the current machine's private IP address.
+      max_concurrent_changes: An integer specifying the number of instances
+        that can be started or stopped at the same time.
     """
     self._monit_operator = monit_operator
     self._routing_client = routing_client
@@ -110,6 +118,25 @@ class InstanceManager(object):
     # Ensures only one process tries to make changes at a time.
     self._work_lock = AsyncLock()
 
+    # Limits the number of instances that are started or stopped at once.
+    self._change_semaphore = Semaphore(max_concurrent_changes)
+
+    # Waiting for an instance to stop can take minutes, so it's done outside
+    # of the thread pool that's shared with other tasks.
+    self._stop_pool = ThreadPoolExecutor(max_concurrent_changes)
+
+    # Monit can fail to start a process if it reloads while handling the
+    # 'start', so reloads and starts are performed one at a time.
+    self._monit_lock = AsyncLock()
+
+    # Ensures API servers are started and stopped one at a time.
+    self._api_server_lock = AsyncLock()
+
+    # The number of instances that are being started for each project.
+    self._starting_projects = Counter()
+
+    self.startup_stats = StartupStats()
+
     self._health_checker = PeriodicCallback(
       self._ensure_health, self.HEALTH_CHECK_INTERVAL * 1000)
 
@@ -142,12 +169,33 @@ class InstanceManager(object):
 
   @gen.coroutine
   def _start_instance(self, version, port):
+    """ Starts a Google App Engine application on this machine and records
+        how long it takes to become available.
+
+    Args:
+      version: A Version object.
+      port: An integer specifying a port to use.
+    """
+    start_time = time.time()
+    started = False
+    self._starting_projects[version.project_id] += 1
+    try:
+      started = yield self._launch_instance(version, port)
+    finally:
+      self._starting_projects[version.project_id] -= 1
+      self.startup_stats.record(version.version_key, time.time() - start_time,
+                                started)
+
+  @gen.coroutine
+  def _launch_instance(self, version, port):
     """ Starts a Google App Engine application on this machine. It
         will start it up and then proceed to fetch the main page.
 
     Args:
       version: A Version object.
       port: An integer specifying a port to use.
+    Returns:
+      A boolean indicating whether or not the instance came up.
     """
     version_details = version.version_details
     runtime = version_details['runtime']
@@ -211,36 +259,38 @@ class InstanceManager(object):
     logger.info("Start command: " + str(start_cmd))
     logger.info("Environment variables: " + str(env_vars))
 
-    monit_app_configuration.create_config_file(
-      watch,
-      start_cmd,
-      pidfile,
-      port,
-      env_vars,
-      max_memory,
-      self._syslog_server,
-      check_port=True,
-      kill_exceeded_memory=True)
-
     full_watch = '{}-{}'.format(watch, port)
 
-    yield self._monit_operator.reload(self._thread_pool)
-
-    # The reload command does not block, and we don't have a good way to check
-    # if Monit is ready with its new configuration yet. If the daemon begins
-    # reloading while it is handling the 'start', it can end up in a state
-    # where it never starts the process. As a temporary workaround, this
-    # small period allows it to finish reloading. This can be removed if
-    # instances are started inside a cgroup.
-    yield gen.sleep(0.5)
-    yield self._monit_operator.send_command_retry_process(full_watch, 'start')
+    with (yield self._monit_lock.acquire()):
+      monit_app_configuration.create_config_file(
+        watch,
+        start_cmd,
+        pidfile,
+        port,
+        env_vars,
+        max_memory,
+        self._syslog_server,
+        check_port=True,
+        kill_exceeded_memory=True)
+
+      yield self._monit_operator.reload(self._thread_pool)
+
+      # The reload command does not block, and we don't have a good way to
+      # check if Monit is ready with its new configuration yet. If the daemon
+      # begins reloading while it is handling the 'start', it can end up in a
+      # state where it never starts the process. As a temporary workaround,
+      # this small period allows it to finish reloading. This can be removed
+      # if instances are started inside a cgroup.
+      yield gen.sleep(0.5)
+      yield self._monit_operator.send_command_retry_process(full_watch,
+                                                            'start')
 
     # Make sure the version registration node exists.
     self._zk_client.ensure_path(
       '/'.join([VERSION_REGISTRATION_NODE, version.version_key]))
 
     instance = Instance(version.revision_key, port)
-    yield self._add_routing(instance)
+    started = yield self._add_routing(instance)
 
     if version.project_id == DASHBOARD_PROJECT_ID:
       log_size = DASHBOARD_LOG_SIZE
@@ -251,6 +301,8 @@ class InstanceManager(object):
       logger.error("Error while setting up log rotation for application: {}".
                     format(version.project_id))
 
+    raise gen.Return(started)
+
   @gen.coroutine
   def populate_api_servers(self):
     """ Find running API servers. """
@@ -314,6 +366,21 @@ class InstanceManager(object):
   def _ensure_api_server(self, project_id):
     """ Make sure there is a running API server for a project.
 
+    Args:
+      project_id: A string specifying the project ID.
+    Returns:
+      An integer specifying the API server port.
+    """
+    with (yield self._api_server_lock.acquire()):
+      server_port = yield self._start_api_server(project_id)
+
+    raise gen.Return(server_port)
+
+  @gen.coroutine
+  def _start_api_server(self, project_id):
+    """ Starts an API server for a project if one is not running. The caller
+        must hold the API server lock.
+
     Args:
       project_id: A string specifying the project ID.
     Returns:
@@ -336,16 +403,18 @@ class InstanceManager(object):
     watch = ''.join([API_SERVER_PREFIX, project_id])
     full_watch = '-'.join([watch, str(server_port)])
     pidfile = os.path.join(VAR_DIR, '{}.pid'.format(full_watch))
-    monit_app_configuration.create_config_file(
-      watch,
-      start_cmd,
-      pidfile,
-      server_port,
-      max_memory=DEFAULT_MAX_APPSERVER_MEMORY,
-      check_port=True)
+    with (yield self._monit_lock.acquire()):
+      monit_app_configuration.create_config_file(
+        watch,
+        start_cmd,
+        pidfile,
+        server_port,
+        max_memory=DEFAULT_MAX_APPSERVER_MEMORY,
+        check_port=True)
 
-    yield self._monit_operator.reload(self._thread_pool)
-    yield self._monit_operator.send_command_retry_process(full_watch, 'start')
+      yield self._monit_operator.reload(self._thread_pool)
+      yield self._monit_operator.send_command_retry_process(full_watch,
+                                                            'start')
 
     self._api_servers[project_id] = server_port
     raise gen.Return(server_port)
@@ -369,7 +438,8 @@ class InstanceManager(object):
     # monit doesn't pick it up and restart it.
     self._monit_operator.remove_configuration(watch)
 
-    stop_instance(watch, MAX_INSTANCE_RESPONSE_TIME)
+    yield self._stop_pool.submit(stop_instance, watch,
+                                 MAX_INSTANCE_RESPONSE_TIME)
 
   @gen.coroutine
   def _wait_for_app(self, port):
@@ -381,19 +451,27 @@ class InstanceManager(object):
     Returns:
       True on success, False otherwise
     """
-    retries = math.ceil(START_APP_TIMEOUT / BACKOFF_TIME)
+    deadline = time.time() + START_APP_TIMEOUT
+    http_client = AsyncHTTPClient()
 
     url = "http://" + self._private_ip + ":" + str(port) + FETCH_PATH
-    while retries > 0:
+    while True:
+      remaining = deadline - time.time()
+      if remaining <= 0:
+        break
+
       try:
-        opener = urllib2.build_opener(NoRedirection)
-        response = opener.open(url)
-        if response.code != HTTPCodes.OK:
-          logger.warning('{} returned {}. Headers: {}'.
-                          format(url, response.code, response.headers.headers))
+        yield http_client.fetch(url, follow_redirects=False,
+                                request_timeout=remaining)
         raise gen.Return(True)
+      except HTTPError as error:
+        # Connection errors and timeouts are reported with a 599.
+        if error.code != 599:
+          logger.warning('{} returned {}. Headers: {}'.format(
+            url, error.code, error.response.headers))
+          raise gen.Return(True)
       except IOError:
-        retries -= 1
+        pass
 
       yield gen.sleep(BACKOFF_TIME)
 
@@ -407,6 +485,8 @@ class InstanceManager(object):
 
     Args:
       instance: An Instance.
+    Returns:
+      A boolean indicating whether or not the instance came up.
     """
     logger.info('Waiting for {}'.format(instance))
     start_successful = yield self._wait_for_app(instance.port)
@@ -414,10 +494,11 @@ class InstanceManager(object):
       # In case the AppServer fails we let the AppController to detect it
       # and remove it if it still show in monit.
       logger.warning('{} did not come up in time'.format(instance))
-      return
+      raise gen.Return(False)
 
     self._routing_client.register_instance(instance)
     self._running_instances.add(instance)
+    raise gen.Return(True)
 
   @gen.coroutine
   def _stop_api_server(self, project_id):
@@ -426,13 +507,15 @@ class InstanceManager(object):
     Args:
       project_id: A string specifying the project ID.
     """
-    if project_id not in self._api_servers:
-      return
+    with (yield self._api_server_lock.acquire()):
+      # Instances that are starting will need the API server.
+      if (project_id not in self._api_servers or
+          self._starting_projects[project_id]):
+        return
 
-    port = self._api_servers[project_id]
-    watch = '{}{}-{}'.format(API_SERVER_PREFIX, project_id, port)
-    yield self._unmonitor_and_terminate(watch)
-    del self._api_servers[project_id]
+      port = self._api_servers.pop(project_id)
+      watch = '{}{}-{}'.format(API_SERVER_PREFIX, project_id, port)
+      yield self._unmonitor_and_terminate(watch)
 
   @gen.coroutine
   def _clean_old_sources(self):
@@ -480,16 +563,52 @@ class InstanceManager(object):
     if not project_instances:
       yield self._stop_api_server(instance.project_id)
 
-    yield self._monit_operator.reload(self._thread_pool)
+    with (yield self._monit_lock.acquire()):
+      yield self._monit_operator.reload(self._thread_pool)
+
     yield self._clean_old_sources()
 
-  def _get_lowest_port(self):
+  @gen.coroutine
+  def _restart_instance(self, instance, version):
+    """ Replaces an instance with one that uses the current configuration.
+
+    Args:
+      instance: An Instance object.
+      version: A Version object.
+    """
+    # Keep the project's API server while the instance is replaced.
+    self._starting_projects[version.project_id] += 1
+    try:
+      yield self._stop_app_instance(instance)
+    finally:
+      self._starting_projects[version.project_id] -= 1
+
+    yield self._start_instance(version, instance.port)
+
+  @gen.coroutine
+  def _run_concurrently(self, operations):
+    """ Runs operations at the same time, limiting how many run at once.
+
+    Args:
+      operations: A list of functions that return Futures.
+    """
+    @gen.coroutine
+    def run(operation):
+      with (yield self._change_semaphore.acquire()):
+        yield operation()
+
+    yield [run(operation) for operation in operations]
+
+  def _get_lowest_port(self, reserved_ports=()):
     """ Determines the lowest usuable port for a new instance.
 
+    Args:
+      reserved_ports: An iterable of ports that should not be used.
     Returns:
       An integer specifying a free port.
     """
     existing_ports = {instance.port for instance in self._running_instances}
+    existing_ports.update(reserved_ports)
     port = STARTING_INSTANCE_PORT
     while True:
       if port in existing_ports:
@@ -503,6 +622,7 @@ class InstanceManager(object):
     """ Restarts instances that the router considers offline. """
     with (yield self._work_lock.acquire()):
       failed_instances = yield self._routing_client.get_failed_instances()
+      to_restart = []
       for version_key, port in failed_instances:
         try:
           instance = next(instance for instance in self._running_instances
@@ -522,8 +642,9 @@ class InstanceManager(object):
           continue
 
         logger.warning('Restarting failed instance: {}'.format(instance))
-        yield self._stop_app_instance(instance)
-        yield self._start_instance(version, instance.port)
+        to_restart.append(partial(self._restart_instance, instance, version))
+
+      yield self._run_concurrently(to_restart)
 
   @gen.coroutine
   def _ensure_health(self):
@@ -551,9 +672,9 @@ class InstanceManager(object):
       for version_key in {instance.version_key for instance in to_stop}:
         logger.info('{} is no longer assigned'.format(version_key))
 
-      for instance in to_stop:
-        yield self._stop_app_instance(instance)
-
+      # A list of (version, port) tuples. A port of None means the instance
+      # needs a new port.
+      to_start = []
       for version_key, assigned_ports in self._assignments.items():
         try:
           version = self._projects_manager.version_from_key(version_key)
@@ -574,28 +695,39 @@ class InstanceManager(object):
         unmatched_instances = candidates[new_assignment_count:]
         for running_instance in unmatched_instances:
           logger.info('{} is no longer assigned'.format(running_instance))
-          yield self._stop_app_instance(running_instance)
+          to_stop.append(running_instance)
 
         # Start defined ports that aren't running.
         running_ports = [instance.port for instance in self._running_instances
                          if instance.version_key == version_key]
-        for port in assigned_ports:
-          if port != -1 and port not in running_ports:
-            yield self._start_instance(version, port)
+        to_start.extend((version, port) for port in assigned_ports
+                        if port != -1 and port not in running_ports)
 
         # Start new assignments that don't have a match.
-        candidates = [instance for instance in self._running_instances
-                      if instance.version_key == version_key
-                      and instance.port not in assigned_ports]
-        to_start = max(new_assignment_count - len(candidates), 0)
-        for _ in range(to_start):
-          yield self._start_instance(version, self._get_lowest_port())
+        new_instance_count = max(new_assignment_count - len(candidates), 0)
+        to_start.extend((version, None) for _ in range(new_instance_count))
+
+      yield self._run_concurrently(
+        [partial(self._stop_app_instance, instance) for instance in to_stop])
+
+      # Choose ports for new instances after stopped instances release theirs.
+      reserved_ports = {port for _, port in to_start if port is not None}
+      starts = []
+      for version, port in to_start:
+        if port is None:
+          port = self._get_lowest_port(reserved_ports)
+          reserved_ports.add(port)
+
+        starts.append(partial(self._start_instance, version, port))
+
+      yield self._run_concurrently(starts)
 
   @gen.coroutine
   def _enforce_instance_details(self):
     """ Ensures all running instances are configured correctly. """
     with (yield self._work_lock.acquire()):
       # Restart instances with an outdated revision or login server.
+      to_restart = []
       for instance in self._running_instances:
         try:
           version = self._projects_manager.version_from_key(instance.version_key)
@@ -610,8 +742,9 @@ class InstanceManager(object):
         if (instance.revision_key != version.revision_key or
             login_server_changed):
           logger.info('Configuration changed for {}'.format(instance))
-          yield self._stop_app_instance(instance)
-          yield self._start_instance(version, instance.port)
+          to_restart.append(partial(self._restart_instance, instance, version))
+
+      yield self._run_concurrently(to_restart)
 
   def _assignments_from_state(self, controller_state):
     """ Extracts the current machine's assignments from controller state.
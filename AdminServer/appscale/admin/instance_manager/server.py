@@ -1,18 +1,23 @@
 """ This service starts and stops application servers of a given application. """
 
+import argparse
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from kazoo.client import KazooClient
+from tornado import web
 from tornado.ioloop import IOLoop
 from tornado.options import options
 
 from appscale.admin.instance_manager import InstanceManager
-from appscale.admin.instance_manager.constants import MAX_BACKGROUND_WORKERS
+from appscale.admin.instance_manager.constants import (
+  MAX_BACKGROUND_WORKERS, MAX_CONCURRENT_INSTANCE_CHANGES)
 from appscale.admin.instance_manager.projects_manager import (
   GlobalProjectsManager)
 from appscale.admin.instance_manager.routing_client import RoutingClient
 from appscale.admin.instance_manager.source_manager import SourceManager
+from appscale.admin.instance_manager.startup_stats import StartupStatsHandler
 from appscale.common import appscale_info, file_io
+from appscale.common.constants import APP_MANAGER_PORT
 from appscale.common.deployment_config import DeploymentConfig
 from appscale.common.monit_interface import MonitOperator
 
@@ -20,6 +25,13 @@ logger = logging.getLogger(__name__)
 
 
 def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+    '--max-concurrent-changes', type=int,
+    default=MAX_CONCURRENT_INSTANCE_CHANGES,
+    help='The number of instances that can be started or stopped at once')
+  args = parser.parse_args()
+
   file_io.set_logging_format()
   logging.getLogger().setLevel(logging.INFO)
 
@@ -44,9 +56,15 @@ def main():
   instance_manager = InstanceManager(
     zk_client, monit_operator, routing_client, projects_manager,
     deployment_config, source_manager, options.syslog_server, thread_pool,
-    options.private_ip)
+    options.private_ip, max_concurrent_changes=args.max_concurrent_changes)
   instance_manager.start()
 
+  app = web.Application([
+    ('/service-stats', StartupStatsHandler,
+     {'startup_stats': instance_manager.startup_stats})
+  ])
+  app.listen(APP_MANAGER_PORT)
+
   logger.info('Starting AppManager')
 
   io_loop = IOLoop.current()
@@ -0,0 +1,71 @@
+""" Keeps track of how long instances take to start. """
+import json
+import time
+
+from tornado.web import RequestHandler
+
+from appscale.common.service_stats import metrics
+
+
+class StartupStats(object):
+  """ Startup latency histograms for each version. """
+  def __init__(self):
+    """ Creates a new StartupStats object. """
+    # For example, {guestbook_default_v1: {'started': 3, 'failed': 0, ...}}
+    self._versions = {}
+
+  def record(self, version_key, latency, success):
+    """ Records an instance start.
+
+    Args:
+      version_key: A string specifying the version.
+      latency: A float specifying the number of seconds the start took.
+      success: A boolean indicating whether or not the instance came up.
+    """
+    version_stats = self._versions.setdefault(
+      version_key,
+      {'started': 0, 'failed': 0, 'latency_histogram': {},
+       'last_latency': None, 'last_start': None})
+    version_stats['last_start'] = int(time.time() * 1000)
+    if not success:
+      version_stats['failed'] += 1
+      return
+
+    latency_ms = int(latency * 1000)
+    bucket = metrics.bucket_of(latency_ms)
+    histogram = version_stats['latency_histogram']
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+    version_stats['started'] += 1
+    version_stats['last_latency'] = latency_ms
+
+  def to_dict(self):
+    """ Generates a summary of instance starts.
+
+    Returns:
+      A dictionary mapping version keys to startup statistics. Latencies are
+      in milliseconds.
+    """
+    versions = {version_key: dict(version_stats)
+                for version_key, version_stats in self._versions.items()}
+    for version_stats in versions.values():
+      histogram = version_stats['latency_histogram']
+      version_stats['p50_latency'] = metrics.histogram_percentile(histogram, 50)
+      version_stats['p95_latency'] = metrics.histogram_percentile(histogram, 95)
+      version_stats['p99_latency'] = metrics.histogram_percentile(histogram, 99)
+
+    return versions
+
+
+class StartupStatsHandler(RequestHandler):
+  """ Reports instance startup latency for each version. """
+  def initialize(self, startup_stats):
+    """ Defines required resources to handle requests.
+
+    Args:
+      startup_stats: A StartupStats object.
+    """
+    self.startup_stats = startup_stats
+
+  def get(self):
+    """ Writes startup statistics as JSON. """
+    self.write(json.dumps({'versions': self.startup_stats.to_dict()}))
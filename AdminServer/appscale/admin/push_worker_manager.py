@@ -23,6 +23,9 @@ from .utils import ensure_path
 # The number of tasks the Celery worker can handle at a time.
 CELERY_CONCURRENCY = 1000
 
+# The queue settings that the Celery worker uses when delivering tasks.
+WORKER_QUEUE_FIELDS = ('rate', 'max_concurrent_requests')
+
 # The directory where Celery configuration files are stored.
 CELERY_CONFIG_DIR = os.path.join(CONFIG_DIR, 'celery', 'configuration')
 
@@ -184,17 +187,19 @@ class ProjectPushWorkerManager(object):
       queue_config: A JSON string specifying queue configuration.
     """
     if queue_config is None:
-      rates = {'default': '5/s'}
+      push_queues = {'default': {'rate': '5/s'}}
     else:
       queues = json.loads(queue_config)['queue']
-      rates = {
-        queue_name: queue['rate'] for queue_name, queue in queues.items()
+      push_queues = {
+        queue_name: {field: queue[field] for field in WORKER_QUEUE_FIELDS
+                     if field in queue}
+        for queue_name, queue in queues.items()
         if 'mode' not in queue or queue['mode'] == 'push'}
 
     config_location = os.path.join(CELERY_CONFIG_DIR,
                                    '{}.json'.format(self.project_id))
     with open(config_location, 'w') as config_file:
-      json.dump(rates, config_file)
+      json.dump(push_queues, config_file)
 
   def _update_worker(self, queue_config, _):
     """ Handles updates to a queue configuration node.
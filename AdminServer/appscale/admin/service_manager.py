@@ -173,7 +173,8 @@ class DatastoreServer(Server):
       self.state = ServerStates.STARTING
       start_cmd = ['appscale-datastore',
                    '--type', self.DATASTORE_TYPE,
-                   '--port', str(self.port)]
+                   '--port', str(self.port),
+                   '--keep-alive']
       if self._verbose:
         start_cmd.append('--verbose')
 
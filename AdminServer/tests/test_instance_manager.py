@@ -3,12 +3,11 @@
 import os
 import subprocess
 import unittest
-import urllib2
 
 from flexmock import flexmock
 from tornado import gen
 from tornado.gen import Future
-from tornado.httpclient import HTTPError
+from tornado.httpclient import AsyncHTTPClient, HTTPError
 from tornado.options import options
 from tornado.testing import AsyncTestCase
 from tornado.testing import gen_test
@@ -309,9 +308,9 @@ class TestInstanceManager(AsyncTestCase):
     port = 20000
     ip = '127.0.0.1'
     testing.disable_logging()
-    fake_opener = flexmock(
-      open=lambda opener: flexmock(code=200, headers=flexmock(headers=[])))
-    flexmock(urllib2).should_receive('build_opener').and_return(fake_opener)
+    response = Future()
+    response.set_result(flexmock(code=200, headers={}))
+    flexmock(AsyncHTTPClient).should_receive('fetch').and_return(response)
     flexmock(appscale_info).should_receive('get_private_ip').and_return(ip)
 
     instance_manager = InstanceManager(
@@ -320,12 +319,104 @@ class TestInstanceManager(AsyncTestCase):
     instance_started = yield instance_manager._wait_for_app(port)
     self.assertEqual(True, instance_started)
 
+    # Any response means the instance is up.
+    flexmock(AsyncHTTPClient).should_receive('fetch').\
+      and_raise(HTTPError(302, response=flexmock(headers={})))
+    instance_started = yield instance_manager._wait_for_app(port)
+    self.assertEqual(True, instance_started)
+
     response = Future()
     response.set_result(None)
     flexmock(gen).should_receive('sleep').and_return(response)
-    fake_opener.should_receive('open').and_raise(IOError)
+    flexmock(instance_manager_module, START_APP_TIMEOUT=0.05)
+    flexmock(AsyncHTTPClient).should_receive('fetch').\
+      and_raise(HTTPError(599))
     instance_started = yield instance_manager._wait_for_app(port)
     self.assertEqual(False, instance_started)
 
+  @gen_test
+  def test_fulfill_assignments(self):
+    version_key = 'test_default_v1'
+    revision_key = '_'.join([version_key, 'revid'])
+    running = instance.Instance(revision_key, 20000)
+    unassigned = instance.Instance(revision_key, 20001)
+
+    instance_manager = InstanceManager(
+      None, None, None, None, None, None, None, None, None,
+      max_concurrent_changes=2)
+    instance_manager._running_instances = {running, unassigned}
+    instance_manager._assignments = {version_key: [20000, 20002, -1, -1]}
+    version = flexmock(version_key=version_key, project_id='test')
+    instance_manager._projects_manager = flexmock(
+      version_from_key=lambda key: version)
+
+    stopped = []
+    started = []
+    def fake_stop(instance_):
+      stopped.append(instance_)
+      instance_manager._running_instances.remove(instance_)
+      return gen.moment
+
+    def fake_start(version_, port):
+      started.append(port)
+      return gen.moment
+
+    flexmock(instance_manager).should_receive('_stop_app_instance').\
+      replace_with(fake_stop)
+    flexmock(instance_manager).should_receive('_start_instance').\
+      replace_with(fake_start)
+
+    yield instance_manager._fulfill_assignments()
+
+    # The unassigned instance fills one of the -1 assignments.
+    self.assertEqual(stopped, [])
+    self.assertEqual(sorted(started), [20002, 20003])
+
+  @gen_test
+  def test_concurrent_changes(self):
+    version_key = 'test_default_v1'
+    instance_manager = InstanceManager(
+      None, None, None, None, None, None, None, None, None,
+      max_concurrent_changes=2)
+    instance_manager._running_instances = set()
+    instance_manager._assignments = {version_key: [-1] * 5}
+    version = flexmock(version_key=version_key, project_id='test')
+    instance_manager._projects_manager = flexmock(
+      version_from_key=lambda key: version)
+
+    pending = []
+    active = [0]
+    most_active = [0]
+    def fake_start(version_, port):
+      active[0] += 1
+      most_active[0] = max(most_active[0], active[0])
+      start = Future()
+      pending.append(start)
+      return start
+
+    def finish(start):
+      active[0] -= 1
+      start.set_result(None)
+
+    flexmock(instance_manager).should_receive('_start_instance').\
+      replace_with(fake_start)
+
+    # Each start blocks until the test finishes it.
+    fulfill = instance_manager._fulfill_assignments()
+    finished = 0
+    for _ in range(100):
+      if fulfill.done():
+        break
+
+      yield gen.moment
+      self.assertLessEqual(active[0], 2)
+      if len(pending) > finished:
+        finish(pending[finished])
+        finished += 1
+
+    yield fulfill
+    self.assertEqual(len(pending), 5)
+    self.assertEqual(most_active[0], 2)
+
 if __name__ == "__main__":
   unittest.main()
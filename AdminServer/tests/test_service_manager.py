@@ -51,7 +51,8 @@ class TestDatastoreServer(AsyncTestCase):
       yield server.start()
 
     cmd = ['cgexec', '-g', 'memory:appscale-datastore',
-           'appscale-datastore', '--type', 'cassandra', '--port', '4000']
+           'appscale-datastore', '--type', 'cassandra', '--port', '4000',
+           '--keep-alive']
     self.assertEqual(mock_popen.call_count, 1)
     self.assertEqual(mock_popen.call_args[0][0], cmd)
 
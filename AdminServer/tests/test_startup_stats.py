@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from flexmock import flexmock
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+from appscale.admin.instance_manager import startup_stats
+from appscale.admin.instance_manager.startup_stats import (
+  StartupStats, StartupStatsHandler)
+
+
+class TestStartupStats(unittest.TestCase):
+  def test_record(self):
+    flexmock(startup_stats.time).should_receive('time').and_return(1000)
+    stats = StartupStats()
+    stats.record('guestbook_default_v1', 2.5, True)
+    stats.record('guestbook_default_v1', 0.004, True)
+    stats.record('guestbook_default_v1', 180, False)
+
+    version_stats = stats.to_dict()['guestbook_default_v1']
+    self.assertEqual(version_stats['started'], 2)
+    self.assertEqual(version_stats['failed'], 1)
+    self.assertEqual(version_stats['last_start'], 1000000)
+
+    # Failed starts do not count towards the latency.
+    self.assertEqual(version_stats['last_latency'], 4)
+    self.assertEqual(sum(version_stats['latency_histogram'].values()), 2)
+
+  def test_percentiles(self):
+    stats = StartupStats()
+    for _ in range(98):
+      stats.record('guestbook_default_v1', 1, True)
+
+    stats.record('guestbook_default_v1', 30, True)
+    stats.record('guestbook_default_v1', 30, True)
+
+    version_stats = stats.to_dict()['guestbook_default_v1']
+    self.assertTrue(1000 <= version_stats['p50_latency'] < 2000)
+    self.assertTrue(1000 <= version_stats['p95_latency'] < 2000)
+    self.assertTrue(30000 <= version_stats['p99_latency'] < 60000)
+
+  def test_no_starts(self):
+    stats = StartupStats()
+    stats.record('guestbook_default_v1', 180, False)
+    version_stats = stats.to_dict()['guestbook_default_v1']
+    self.assertEqual(version_stats['started'], 0)
+    self.assertIsNone(version_stats['last_latency'])
+    self.assertIsNone(version_stats['p50_latency'])
+
+
+class TestStartupStatsHandler(AsyncHTTPTestCase):
+  def get_app(self):
+    self.stats = StartupStats()
+    return Application([('/service-stats', StartupStatsHandler,
+                         {'startup_stats': self.stats})])
+
+  def test_get(self):
+    self.stats.record('guestbook_default_v1', 2, True)
+    response = self.fetch('/service-stats')
+    self.assertEqual(response.code, 200)
+    versions = json.loads(response.body)['versions']
+    self.assertEqual(versions['guestbook_default_v1']['started'], 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -22,7 +22,7 @@ from cassandra.query import SimpleStatement
 from cassandra.query import ValueSequence
 from tornado import gen
 
-from appscale.datastore import dbconstants
+from appscale.datastore import dbconstants, statistics
 from appscale.datastore.cassandra_env.constants import (
   CURRENT_VERSION, LB_POLICY
 )
@@ -165,6 +165,7 @@ class DatastoreProxy(AppDBInterface):
     """ Close all sessions and connections to Cassandra. """
     self.cluster.shutdown()
 
+  @statistics.traced('db_time', 'db_calls', count_rows=len)
   @gen.coroutine
   def batch_get_entity(self, table_name, row_keys, column_names):
     """
@@ -186,20 +187,18 @@ class DatastoreProxy(AppDBInterface):
     if not isinstance(column_names, list): raise TypeError("Expected a list")
     if not isinstance(row_keys, list): raise TypeError("Expected a list")
 
-    row_keys_bytes = [bytearray(row_key) for row_key in row_keys]
-
-    statement = 'SELECT * FROM "{table}" '\
-                'WHERE {key} IN %s and {column} IN %s'.format(
-                  table=table_name,
-                  key=ThriftColumn.KEY,
-                  column=ThriftColumn.COLUMN_NAME,
-                )
-    query = SimpleStatement(statement, retry_policy=BASIC_RETRIES)
-    parameters = (ValueSequence(row_keys_bytes), ValueSequence(column_names))
+    # A single row can be read straight from a replica that owns it.
+    if len(row_keys) == 1:
+      statement = self.prepare_select(table_name)
+      parameters = (bytearray(row_keys[0]), column_names)
+    else:
+      statement = self.prepare_multi_select(table_name)
+      parameters = ([bytearray(row_key) for row_key in row_keys],
+                    column_names)
 
     try:
       results = yield self.tornado_cassandra.execute(
-        query, parameters=parameters)
+        statement, parameters=parameters)
 
       results_dict = {row_key: {} for row_key in row_keys}
       for (key, column, value) in results:
@@ -213,6 +212,7 @@ class DatastoreProxy(AppDBInterface):
       logger.exception(message)
       raise AppScaleDBConnectionError(message)
 
+  @statistics.traced('db_time', 'db_calls')
   @gen.coroutine
   def batch_put_entity(self, table_name, row_keys, column_names, cell_values,
                        ttl=None):
@@ -312,6 +312,82 @@ class DatastoreProxy(AppDBInterface):
 
     return self.prepared_statements[statement]
 
+  def prepare_select(self, table):
+    """ Prepare a statement that reads columns from a single row.
+
+    Args:
+      table: A string containing the table name.
+    Returns:
+      A PreparedStatement object.
+    """
+    statement = (
+      'SELECT * FROM "{table}" '
+      'WHERE {key} = ? AND {column} IN ?'
+    ).format(table=table,
+             key=ThriftColumn.KEY,
+             column=ThriftColumn.COLUMN_NAME)
+
+    if statement not in self.prepared_statements:
+      self.prepared_statements[statement] = self.session.prepare(statement)
+
+    return self.prepared_statements[statement]
+
+  def prepare_multi_select(self, table):
+    """ Prepare a statement that reads columns from several rows.
+
+    Args:
+      table: A string containing the table name.
+    Returns:
+      A PreparedStatement object.
+    """
+    statement = (
+      'SELECT * FROM "{table}" '
+      'WHERE {key} IN ? AND {column} IN ?'
+    ).format(table=table,
+             key=ThriftColumn.KEY,
+             column=ThriftColumn.COLUMN_NAME)
+
+    if statement not in self.prepared_statements:
+      self.prepared_statements[statement] = self.session.prepare(statement)
+
+    return self.prepared_statements[statement]
+
+  def prepare_range_select(self, table, start_inclusive, end_inclusive,
+                           limited):
+    """ Prepare a statement that reads a range of rows.
+
+    Args:
+      table: A string containing the table name.
+      start_inclusive: A boolean indicating that the range includes the start
+        key.
+      end_inclusive: A boolean indicating that the range includes the end key.
+      limited: A boolean indicating that the statement takes a row limit.
+    Returns:
+      A PreparedStatement object.
+    """
+    gt_compare = '>=' if start_inclusive else '>'
+    lt_compare = '<=' if end_inclusive else '<'
+    query_limit = 'LIMIT ? ' if limited else ''
+    statement = (
+      'SELECT * FROM "{table}" WHERE '
+      'token({key}) {gt_compare} ? AND '
+      'token({key}) {lt_compare} ? AND '
+      '{column} IN ? '
+      '{limit}'
+      'ALLOW FILTERING'
+    ).format(table=table,
+             key=ThriftColumn.KEY,
+             gt_compare=gt_compare,
+             lt_compare=lt_compare,
+             column=ThriftColumn.COLUMN_NAME,
+             limit=query_limit)
+
+    if statement not in self.prepared_statements:
+      self.prepared_statements[statement] = self.session.prepare(statement)
+
+    return self.prepared_statements[statement]
+
+  @statistics.traced('db_time', 'db_calls')
   @gen.coroutine
   def normal_batch(self, mutations, txid):
     """ Use Cassandra's native batch statement to apply mutations atomically.
@@ -422,6 +498,7 @@ class DatastoreProxy(AppDBInterface):
       for statement, params in statements_and_params
     ]
 
+  @statistics.traced('db_time', 'db_calls')
   @gen.coroutine
   def large_batch(self, app, mutations, entity_changes, txn):
     """ Insert or delete multiple rows across tables in an atomic statement.
@@ -510,6 +587,7 @@ class DatastoreProxy(AppDBInterface):
     except dbconstants.TRANSIENT_CASSANDRA_ERRORS:
       logger.exception('Unable to clear batch log')
 
+  @statistics.traced('db_time', 'db_calls')
   @gen.coroutine
   def batch_delete(self, table_name, row_keys, column_names=()):
     """
@@ -613,6 +691,7 @@ class DatastoreProxy(AppDBInterface):
       logger.exception(message)
       raise AppScaleDBConnectionError(message)
 
+  @statistics.traced('db_time', 'db_calls', count_rows=len)
   @gen.coroutine
   def range_query(self,
                   table_name,
@@ -659,41 +738,15 @@ class DatastoreProxy(AppDBInterface):
     if not isinstance(offset, (int, long)):
       raise TypeError('offset must be int or long')
 
-    if start_inclusive:
-      gt_compare = '>='
-    else:
-      gt_compare = '>'
-
-    if end_inclusive:
-      lt_compare = '<='
-    else:
-      lt_compare = '<'
-
-    query_limit = ''
+    statement = self.prepare_range_select(
+      table_name, start_inclusive, end_inclusive, limit is not None)
+    parameters = [bytearray(start_key), bytearray(end_key), column_names]
     if limit is not None:
-      query_limit = 'LIMIT {}'.format(len(column_names) * limit)
-
-    statement = (
-      'SELECT * FROM "{table}" WHERE '
-      'token({key}) {gt_compare} %s AND '
-      'token({key}) {lt_compare} %s AND '
-      '{column} IN %s '
-      '{limit} '
-      'ALLOW FILTERING'
-    ).format(table=table_name,
-             key=ThriftColumn.KEY,
-             gt_compare=gt_compare,
-             lt_compare=lt_compare,
-             column=ThriftColumn.COLUMN_NAME,
-             limit=query_limit)
-
-    query = SimpleStatement(statement, retry_policy=BASIC_RETRIES)
-    parameters = (bytearray(start_key), bytearray(end_key),
-                  ValueSequence(column_names))
+      parameters.append(len(column_names) * limit)
 
     try:
       results = yield self.tornado_cassandra.execute(
-        query, parameters=parameters)
+        statement, parameters=parameters)
 
       results_list = []
       current_item = {}
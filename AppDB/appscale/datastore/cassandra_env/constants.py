@@ -1,8 +1,9 @@
 """ Cassandra-specific constants. """
-from cassandra.policies import DCAwareRoundRobinPolicy
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
 
 # The current data layout version.
 CURRENT_VERSION = 2.0
 
-# The load balancing policy to use when connecting to a cluster.
-LB_POLICY = DCAwareRoundRobinPolicy()
+# The load balancing policy to use when connecting to a cluster. Statements
+# that specify a partition key are sent directly to a replica for that key.
+LB_POLICY = TokenAwarePolicy(DCAwareRoundRobinPolicy())
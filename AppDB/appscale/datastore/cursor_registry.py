@@ -0,0 +1,214 @@
+""" Keeps the positions of unread results of recent queries so that later
+batches can be served without running the query again. """
+
+import collections
+import logging
+import sys
+import time
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.utils import clean_app_id
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import datastore_pb
+
+logger = logging.getLogger(__name__)
+
+# The number of seconds to keep result keys for a query that is not resumed.
+DEFAULT_TTL = 30
+
+# The maximum number of bytes of entity keys to keep across all projects.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# The maximum number of open cursors to keep for a single project.
+DEFAULT_MAX_CURSORS_PER_PROJECT = 1000
+
+# The number of batches to fetch ahead when a query is run.
+READ_AHEAD_BATCHES = 10
+
+
+class OpenCursor(object):
+  """ The keys of results that have been found for a query but not yet
+  returned. """
+  __slots__ = ['project_id', 'rowkeys', 'exhausted', 'expiration', 'size']
+
+  def __init__(self, project_id, rowkeys, exhausted, expiration):
+    """ Creates a new OpenCursor.
+
+    Args:
+      project_id: A string specifying a project ID.
+      rowkeys: A list of entity table keys that follow the cursor position.
+      exhausted: A boolean indicating that the scan has no more results.
+      expiration: A timestamp specifying when the keys should be dropped.
+    """
+    self.project_id = project_id
+    self.rowkeys = rowkeys
+    self.exhausted = exhausted
+    self.expiration = expiration
+    self.size = sum(len(rowkey) for rowkey in rowkeys)
+
+
+class CursorRegistry(object):
+  """ Maps query positions to the keys of results that have already been
+  found.
+
+  When a query is run, more results than requested are fetched. The keys of
+  the surplus are registered under the compiled cursor that is returned to the
+  client. If the client resumes the query from that cursor, the next batch is
+  served by fetching those entities instead of rebuilding the query plan and
+  scanning the index again. Only keys are kept so that served entities are
+  never older than the batch they are returned in.
+  """
+  def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+               max_cursors_per_project=DEFAULT_MAX_CURSORS_PER_PROJECT):
+    """ Creates a new CursorRegistry.
+
+    Args:
+      ttl: An integer specifying how many seconds to keep unclaimed keys.
+      max_bytes: An integer specifying how many bytes of keys to keep.
+      max_cursors_per_project: An integer specifying how many open cursors a
+        single project can have.
+    """
+    self.ttl = ttl
+    self.max_bytes = max_bytes
+    self.max_cursors_per_project = max_cursors_per_project
+
+    # Open cursors in the order they were registered.
+    self._cursors = collections.OrderedDict()
+    self._project_counts = collections.defaultdict(int)
+    self._size = 0
+
+  @staticmethod
+  def supports(query):
+    """ Checks if a query can be served from results found earlier.
+
+    Ancestor and transactional queries need strongly consistent results, so
+    their results are never kept.
+
+    Args:
+      query: A datastore_pb.Query.
+    Returns:
+      A boolean indicating whether or not result keys can be kept for the
+      query.
+    """
+    return not (query.has_ancestor() or query.has_transaction() or
+                query.offset())
+
+  @staticmethod
+  def read_ahead_query(query, limit):
+    """ Creates a copy of a query that fetches several batches at once.
+
+    Args:
+      query: A datastore_pb.Query.
+      limit: An integer specifying the number of results requested.
+    Returns:
+      A datastore_pb.Query.
+    """
+    read_ahead = datastore_pb.Query()
+    read_ahead.CopyFrom(query)
+    read_ahead.set_count(limit * READ_AHEAD_BATCHES)
+    return read_ahead
+
+  def claim(self, query):
+    """ Removes and returns the result keys that follow a query's cursor.
+
+    Args:
+      query: A datastore_pb.Query.
+    Returns:
+      An OpenCursor or None.
+    """
+    self._evict_expired()
+    if not query.has_compiled_cursor():
+      return None
+
+    open_cursor = self._cursors.pop(self._key(query), None)
+    if open_cursor is not None:
+      self._forget(open_cursor)
+
+    return open_cursor
+
+  def register(self, query, compiled_cursor, rowkeys, exhausted):
+    """ Keeps result keys that follow a cursor so the query can be resumed.
+
+    Args:
+      query: A datastore_pb.Query.
+      compiled_cursor: The datastore_pb.CompiledCursor returned to the client.
+      rowkeys: A list of entity table keys that follow the cursor.
+      exhausted: A boolean indicating that the scan has no more results.
+    """
+    project_id = clean_app_id(query.app())
+    open_cursor = OpenCursor(project_id, rowkeys, exhausted,
+                             time.time() + self.ttl)
+    if open_cursor.size > self.max_bytes:
+      return
+
+    resumed = datastore_pb.Query()
+    resumed.CopyFrom(query)
+    resumed.mutable_compiled_cursor().CopyFrom(compiled_cursor)
+    key = self._key(resumed)
+
+    existing = self._cursors.pop(key, None)
+    if existing is not None:
+      self._forget(existing)
+
+    # Make room by dropping the oldest cursors for the project, then the
+    # oldest cursors overall.
+    if self._project_counts[project_id] >= self.max_cursors_per_project:
+      for old_key, old_cursor in self._cursors.items():
+        if old_cursor.project_id == project_id:
+          self._remove(old_key)
+          break
+
+    while self._cursors and self._size + open_cursor.size > self.max_bytes:
+      self._remove(next(iter(self._cursors)))
+
+    self._cursors[key] = open_cursor
+    self._project_counts[project_id] += 1
+    self._size += open_cursor.size
+
+  @staticmethod
+  def _key(query):
+    """ Identifies a query and the position it resumes from.
+
+    Args:
+      query: A datastore_pb.Query.
+    Returns:
+      A tuple of strings.
+    """
+    shape = datastore_pb.Query()
+    shape.CopyFrom(query)
+    shape.clear_count()
+    shape.clear_compile()
+    shape.clear_compiled_cursor()
+    return shape.Encode(), query.compiled_cursor().Encode()
+
+  def _forget(self, open_cursor):
+    """ Updates the accounting for a cursor that has been removed.
+
+    Args:
+      open_cursor: An OpenCursor.
+    """
+    self._size -= open_cursor.size
+    self._project_counts[open_cursor.project_id] -= 1
+    if not self._project_counts[open_cursor.project_id]:
+      del self._project_counts[open_cursor.project_id]
+
+  def _remove(self, key):
+    """ Drops an open cursor.
+
+    Args:
+      key: A tuple identifying the cursor.
+    """
+    self._forget(self._cursors.pop(key))
+
+  def _evict_expired(self):
+    """ Drops cursors that have not been resumed in time. """
+    now = time.time()
+    while self._cursors:
+      key, open_cursor = next(self._cursors.iteritems())
+      if open_cursor.expiration > now:
+        break
+
+      logger.debug('Dropping unclaimed result keys for {}'.format(
+        open_cursor.project_id))
+      self._remove(key)
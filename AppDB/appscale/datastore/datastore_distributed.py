@@ -1,15 +1,17 @@
 import array
+import collections
 import datetime
 import itertools
 import logging
 import md5
 import sys
+import time
 import uuid
 
 from tornado import gen
 from tornado.ioloop import IOLoop
 
-from appscale.datastore import dbconstants, helper_functions
+from appscale.datastore import dbconstants, helper_functions, statistics
 
 from appscale.common.datastore_index import DatastoreIndex, merge_indexes
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
@@ -25,6 +27,10 @@ from appscale.datastore.cassandra_env.entity_id_allocator import ScatteredAlloca
 from appscale.datastore.cassandra_env.large_batch import BatchNotApplied
 from appscale.datastore.cassandra_env.utils import deletions_for_entity
 from appscale.datastore.cassandra_env.utils import mutations_for_entity
+from appscale.datastore.cursor_registry import CursorRegistry
+from appscale.datastore.index_backfill import BackfillProgress
+from appscale.datastore.index_backfill import RateLimiter
+from appscale.datastore.index_backfill import split_kind_range
 from appscale.datastore.index_manager import IndexInaccessible
 from appscale.datastore.taskqueue_client import EnqueueError, TaskQueueClient
 from appscale.datastore.utils import clean_app_id
@@ -117,14 +123,35 @@ class DatastoreDistributed():
   # The number of entities to fetch at a time when updating indices.
   BATCH_SIZE = 100
 
+  # The number of entity references to resolve with a single batch read.
+  REFERENCE_BATCH_SIZE = 500
+
+  # The number of reference batch reads to keep in flight.
+  REFERENCE_PREFETCH_DEPTH = 4
+
+  # The number of key ranges that a composite index backfill is split into.
+  BACKFILL_RANGES = 16
+
+  # The number of key ranges to backfill at the same time.
+  BACKFILL_CONCURRENCY = 4
+
+  # The number of seconds between storing backfill checkpoints.
+  BACKFILL_CHECKPOINT_INTERVAL = 10
+
   def __init__(self, datastore_batch, transaction_manager, zookeeper=None,
-               log_level=logging.INFO, taskqueue_locations=()):
+               log_level=logging.INFO, taskqueue_locations=(),
+               put_concurrency=dbconstants.DEFAULT_PUT_CONCURRENCY,
+               backfill_rate=None):
     """
        Constructor.
 
      Args:
        datastore_batch: A reference to the batch datastore interface.
        zookeeper: A reference to the zookeeper interface.
+       put_concurrency: The maximum number of entity groups that a
+         non-transactional put commits at the same time.
+       backfill_rate: The maximum number of entities per second that
+         composite index backfills process. If None, it is not limited.
     """
     class_name = self.__class__.__name__
     self.logger = logging.getLogger(class_name)
@@ -148,6 +175,9 @@ class DatastoreDistributed():
 
     self.taskqueue_client = TaskQueueClient(taskqueue_locations)
     self.transaction_manager = transaction_manager
+    self.put_concurrency = put_concurrency
+    self.backfill_limiter = RateLimiter(backfill_rate)
+    self.cursor_registry = CursorRegistry()
     self.index_manager = None
     self.zookeeper.handle.add_listener(self._zk_state_listener)
 
@@ -424,15 +454,19 @@ class DatastoreDistributed():
     raise gen.Return(new_index.id)
 
   @gen.coroutine
-  def update_composite_index(self, app_id, index):
+  def update_composite_index(self, app_id, index, checkpoint=None):
     """ Updates an index for a given app ID.
 
+    The kind's key space is split into ranges that are backfilled
+    concurrently. Index writes are limited by the backfill rate.
+
     Args:
       app_id: A string containing the app ID.
       index: An entity_pb.CompositeIndex object.
+      checkpoint: An object with load and save methods that stores
+        BackfillProgress so that a restarted backfill can resume.
     """
     self.logger.info('Updating index: {}'.format(index))
-    entries_updated = 0
     entity_type = index.definition().entity_type()
 
     # TODO: Adjust prefix based on ancestor.
@@ -442,37 +476,111 @@ class DatastoreDistributed():
       entity_type=entity_type,
       kind_separator=dbconstants.KIND_SEPARATOR,
     )
-    start_row = prefix
     end_row = prefix + self._TERM_STRING
-    start_inclusive = True
 
-    while True:
-      # Fetch references from the kind table since entity keys can have a
-      # parent prefix.
-      references = yield self.datastore_batch.range_query(
-        table_name=dbconstants.APP_KIND_TABLE,
-        column_names=dbconstants.APP_KIND_SCHEMA,
-        start_key=start_row,
-        end_key=end_row,
-        limit=self.BATCH_SIZE,
-        offset=0,
-        start_inclusive=start_inclusive,
-      )
+    progress = None
+    if checkpoint is not None:
+      progress = checkpoint.load()
+
+    if progress is None:
+      progress = BackfillProgress(split_kind_range(
+        prefix, entity_type, end_row, self.BACKFILL_RANGES))
+    else:
+      self.logger.info('Resuming index {} at {}%'.format(
+        index.id(), progress.percent_complete))
 
+    pending = [key_range for key_range in progress.ranges
+               if not key_range.complete]
+    last_save = [time.time()]
+
+    def save_progress(force=False):
+      """ Stores the backfill progress if it hasn't been stored recently. """
+      if checkpoint is None:
+        return
+
+      if (not force and
+          time.time() < last_save[0] + self.BACKFILL_CHECKPOINT_INTERVAL):
+        return
+
+      checkpoint.save(progress)
+      last_save[0] = time.time()
+      self.logger.info(
+        'Backfilled {} entities for index {} ({}% complete)'.format(
+          progress.entities, index.id(), progress.percent_complete))
+
+    @gen.coroutine
+    def backfill_worker():
+      """ Processes key ranges until there are none left. """
+      while pending:
+        key_range = pending.pop(0)
+        yield self._backfill_range(key_range, index, progress, save_progress)
+
+    yield [backfill_worker() for _ in range(self.BACKFILL_CONCURRENCY)]
+    save_progress(force=True)
+    self.logger.info('Updated {} index entries.'.format(progress.entities))
+
+  @gen.coroutine
+  def _backfill_range(self, key_range, index, progress, batch_callback):
+    """ Adds index entries for the entities in a key range.
+
+    The next page of references is fetched while the current one is being
+    indexed.
+
+    Args:
+      key_range: A KeyRange object.
+      index: An entity_pb.CompositeIndex object.
+      progress: The BackfillProgress that the range belongs to.
+      batch_callback: A function to call after each batch.
+    """
+    start_row = key_range.position or key_range.start
+    start_inclusive = key_range.position is None
+    next_page = self._fetch_kind_references(start_row, key_range.end,
+                                            start_inclusive)
+    while next_page is not None:
+      references = yield next_page
+
+      # If we fetched fewer references than we asked for, the range is done.
+      next_page = None
+      if len(references) == self.BATCH_SIZE:
+        next_page = self._fetch_kind_references(
+          references[-1].keys()[0], key_range.end, self._DISABLE_INCLUSIVITY)
+
+      yield self.backfill_limiter.wait(len(references))
       pb_entities = yield self.__fetch_entities(references)
       entities = [entity_pb.EntityProto(entity) for entity in pb_entities]
-
       yield self.insert_composite_indexes(entities, [index])
-      entries_updated += len(entities)
 
-      # If we fetched fewer references than we asked for, we're done.
-      if len(references) < self.BATCH_SIZE:
-        break
+      progress.entities += len(entities)
+      if references:
+        key_range.position = references[-1].keys()[0]
 
-      start_row = references[-1].keys()[0]
-      start_inclusive = self._DISABLE_INCLUSIVITY
+      key_range.complete = next_page is None
+      batch_callback()
+
+  def _fetch_kind_references(self, start_row, end_row, start_inclusive):
+    """ Fetches a page of references from the kind table.
+
+    Entity keys can have a parent prefix, so the kind table is used to find
+    the entities of a kind.
 
-    self.logger.info('Updated {} index entries.'.format(entries_updated))
+    Args:
+      start_row: A string specifying the first kind table key.
+      end_row: A string specifying the key where the range ends (exclusive).
+      start_inclusive: A boolean indicating whether or not to include the
+        start row.
+    Returns:
+      A future that resolves with a list of references.
+    """
+    return self.datastore_batch.range_query(
+      table_name=dbconstants.APP_KIND_TABLE,
+      column_names=dbconstants.APP_KIND_SCHEMA,
+      start_key=start_row,
+      end_key=end_row,
+      limit=self.BATCH_SIZE,
+      offset=0,
+      start_inclusive=start_inclusive,
+      end_inclusive=False,
+    )
 
   @gen.coroutine
   def allocate_size(self, project, size):
@@ -540,6 +648,10 @@ class DatastoreDistributed():
     """ Updates indexes of existing entities, inserts new entities and
         indexes for them.
 
+    Entity groups are committed in waves of up to put_concurrency groups.
+    Each wave shares a lock and a transaction ID, but every group is still
+    written with its own batch.
+
     Args:
       app: A string containing the application ID.
       entities: List of entities.
@@ -555,31 +667,50 @@ class DatastoreDistributed():
         by_group[group_key] = []
       by_group[group_key].append(entity)
 
-    for encoded_group_key, entity_list in by_group.iteritems():
-      group_key = entity_pb.Reference(encoded_group_key)
+    encoded_groups = by_group.keys()
+    for index in range(0, len(encoded_groups), self.put_concurrency):
+      wave = {encoded_group: by_group[encoded_group] for encoded_group
+              in encoded_groups[index:index + self.put_concurrency]}
+      yield self._put_group_wave(app, wave, composite_indexes)
 
-      txid = self.transaction_manager.create_transaction_id(app, xg=False)
-      self.transaction_manager.set_groups(app, txid, [group_key])
+  @gen.coroutine
+  def _put_group_wave(self, app, by_group, composite_indexes):
+    """ Commits entities for a set of entity groups concurrently.
 
-      # Allow the lock to stick around if there is an issue applying the batch.
-      lock = entity_lock.EntityLock(self.zookeeper.handle, [group_key], txid)
-      try:
-        yield lock.acquire()
-      except entity_lock.LockTimeout:
-        raise Timeout('Unable to acquire entity group lock')
+    Args:
+      app: A string containing the application ID.
+      by_group: A dictionary mapping encoded group keys to lists of entities.
+      composite_indexes: A list or tuple of CompositeIndex objects.
+    """
+    group_keys = [entity_pb.Reference(encoded_group_key)
+                  for encoded_group_key in by_group]
 
+    txid = self.transaction_manager.create_transaction_id(app, xg=False)
+    self.transaction_manager.set_groups(app, txid, group_keys)
+
+    # Allow the lock to stick around if there is an issue applying the batch.
+    lock = entity_lock.EntityLock(self.zookeeper.handle, group_keys, txid)
+    try:
+      yield lock.acquire()
+    except entity_lock.LockTimeout:
+      raise Timeout('Unable to acquire entity group lock')
+
+    try:
+      entity_keys = [
+        get_entity_key(self.get_table_prefix(entity), entity.key().path())
+        for entity_list in by_group.itervalues() for entity in entity_list]
       try:
-        entity_keys = [
-          get_entity_key(self.get_table_prefix(entity), entity.key().path())
-          for entity in entity_list]
-        try:
-          current_values = yield self.datastore_batch.batch_get_entity(
-            dbconstants.APP_ENTITY_TABLE, entity_keys, APP_ENTITY_SCHEMA)
-        except dbconstants.AppScaleDBConnectionError:
-          lock.release()
-          self.transaction_manager.delete_transaction_id(app, txid)
-          raise
+        current_values = yield self.datastore_batch.batch_get_entity(
+          dbconstants.APP_ENTITY_TABLE, entity_keys, APP_ENTITY_SCHEMA)
+      except dbconstants.AppScaleDBConnectionError:
+        lock.release()
+        self.transaction_manager.delete_transaction_id(app, txid)
+        raise
 
+      normal_batches = []
+      large_batch = []
+      large_changes = []
+      for encoded_group_key, entity_list in by_group.iteritems():
         batch = []
         entity_changes = []
         for entity in entity_list:
@@ -601,35 +732,54 @@ class DatastoreDistributed():
           entity_changes.append(
             {'key': entity.key(), 'old': current_value, 'new': entity})
 
+        # A transaction ID can only identify one large batch, so groups that
+        # are too large for a normal batch are applied together.
         if batch_size(batch) > LARGE_BATCH_THRESHOLD:
-          try:
-            yield self.datastore_batch.large_batch(app, batch, entity_changes,
-                                                   txid)
-          except BatchNotApplied as error:
-            # If the "applied" switch has not been flipped, the lock can be
-            # released. The transaction ID is kept so that the groomer can
-            # clean up the batch tables.
-            lock.release()
-            raise dbconstants.AppScaleDBConnectionError(str(error))
+          large_batch.extend(batch)
+          large_changes.extend(entity_changes)
         else:
-          try:
-            yield self.datastore_batch.normal_batch(batch, txid)
-          except dbconstants.AppScaleDBConnectionError:
-            # Since normal batches are guaranteed to be atomic, the lock can
-            # be released.
-            lock.release()
-            self.transaction_manager.delete_transaction_id(app, txid)
-            raise
+          normal_batches.append(batch)
+
+      normal_futures = [self.datastore_batch.normal_batch(batch, txid)
+                        for batch in normal_batches]
+      large_future = None
+      if large_batch:
+        large_future = self.datastore_batch.large_batch(
+          app, large_batch, large_changes, txid)
+
+      # Wait for every group in the wave before deciding what to do with the
+      # lock. Each batch is atomic, so the groups that failed are unchanged.
+      error = None
+      for future in normal_futures:
+        try:
+          yield future
+        except dbconstants.AppScaleDBConnectionError as batch_error:
+          error = error or batch_error
 
-        lock.release()
+      keep_txid = False
+      if large_future is not None:
+        try:
+          yield large_future
+        except BatchNotApplied as batch_error:
+          # If the "applied" switch has not been flipped, the lock can be
+          # released. The transaction ID is kept so that the groomer can
+          # clean up the batch tables.
+          keep_txid = True
+          error = error or dbconstants.AppScaleDBConnectionError(
+            str(batch_error))
 
-      finally:
-        # In case of failure entity group lock should stay acquired
-        # as transaction groomer will handle it later.
-        # But tornado lock must be released.
-        lock.ensure_release_tornado_lock()
+      lock.release()
+      if not keep_txid:
+        self.transaction_manager.delete_transaction_id(app, txid)
+
+      if error is not None:
+        raise error
 
-      self.transaction_manager.delete_transaction_id(app, txid)
+    finally:
+      # In case of failure entity group lock should stay acquired
+      # as transaction groomer will handle it later.
+      # But tornado lock must be released.
+      lock.ensure_release_tornado_lock()
 
   @gen.coroutine
   def delete_entities(self, group, txid, keys, composite_indexes=()):
@@ -1080,6 +1230,33 @@ class DatastoreDistributed():
 
     return True
 
+  @gen.coroutine
+  def __batch_get_entities(self, rowkeys):
+    """ Fetches entity rows with several concurrent batch reads.
+
+    Args:
+      rowkeys: A list of strings which are keys to the entity table.
+    Returns:
+      A dictionary mapping rowkeys to entity rows.
+    """
+    chunks = [rowkeys[index:index + self.REFERENCE_BATCH_SIZE]
+              for index in range(0, len(rowkeys), self.REFERENCE_BATCH_SIZE)]
+    if len(chunks) <= 1:
+      result = yield self.datastore_batch.batch_get_entity(
+        dbconstants.APP_ENTITY_TABLE, rowkeys, APP_ENTITY_SCHEMA)
+      raise gen.Return(result)
+
+    result = {}
+    for index in range(0, len(chunks), self.REFERENCE_PREFETCH_DEPTH):
+      chunk_results = yield [
+        self.datastore_batch.batch_get_entity(
+          dbconstants.APP_ENTITY_TABLE, chunk, APP_ENTITY_SCHEMA)
+        for chunk in chunks[index:index + self.REFERENCE_PREFETCH_DEPTH]]
+      for chunk_result in chunk_results:
+        result.update(chunk_result)
+
+    raise gen.Return(result)
+
   @gen.coroutine
   def __fetch_entities_from_row_list(self, rowkeys):
     """ Given a list of keys fetch the entities from the entity table.
@@ -1089,8 +1266,7 @@ class DatastoreDistributed():
     Returns:
       A list of entities.
     """
-    result = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, rowkeys, APP_ENTITY_SCHEMA)
+    result = yield self.__batch_get_entities(rowkeys)
     entities = []
     for key in rowkeys:
       if key in result and APP_ENTITY_SCHEMA[0] in result[key]:
@@ -1106,15 +1282,13 @@ class DatastoreDistributed():
     Returns:
       A list of rowkeys.
     """
-    if len(refs) == 0:
-      return []
-    keys = [item.keys()[0] for item in refs]
     rowkeys = []
-    for index, ent in enumerate(refs):
-      key = keys[index]
-      ent = ent[key]['reference']
+    seen = set()
+    for item in refs:
+      ent = item.values()[0]['reference']
       # Make sure not to fetch the same entity more than once.
-      if ent not in rowkeys:
+      if ent not in seen:
+        seen.add(ent)
         rowkeys.append(ent)
     return rowkeys
 
@@ -1155,8 +1329,7 @@ class DatastoreDistributed():
     Returns:
       A dictionary of validated entities.
     """
-    results = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, rowkeys, APP_ENTITY_SCHEMA)
+    results = yield self.__batch_get_entities(rowkeys)
 
     clean_results = {}
     for key in rowkeys:
@@ -1185,15 +1358,22 @@ class DatastoreDistributed():
     offset = 0
     results = []
     to_fetch = limit
-    added_padding = False
+    depth = 1
+    pending = collections.deque()
     while True:
-      refs_to_fetch = references[offset:offset + to_fetch]
+      # Keep reads for the following chunks in flight while validating the
+      # current one. Since the first chunk is usually enough, only read ahead
+      # once it turns out not to be.
+      while offset < len(references) and len(pending) < depth:
+        refs_to_fetch = references[offset:offset + to_fetch]
+        pending.append(self.__fetch_entities_dict_from_row_list(refs_to_fetch))
+        offset += len(refs_to_fetch)
 
       # If we've exhausted the list of references, we can return.
-      if len(refs_to_fetch) == 0:
+      if not pending:
         raise gen.Return(results[:limit])
 
-      entities = yield self.__fetch_entities_dict_from_row_list(refs_to_fetch)
+      entities = yield pending.popleft()
 
       # Prevent duplicate entities across queries with a cursor.
       entity_keys = entities.keys()
@@ -1217,15 +1397,11 @@ class DatastoreDistributed():
           if len(results) >= limit:
             raise gen.Return(results[:limit])
 
-      offset = offset + to_fetch
-
-      to_fetch -= len(results)
-
       # Pad the number of references to fetch to increase the likelihood of
       # getting all the valid references that we need.
-      if not added_padding:
-        to_fetch += dbconstants.MAX_GROUPS_FOR_XG
-        added_padding = True
+      if depth == 1:
+        to_fetch = limit - len(results) + dbconstants.MAX_GROUPS_FOR_XG
+        depth = self.REFERENCE_PREFETCH_DEPTH
 
   def __extract_entities(self, kv):
     """ Given a result from a range query on the Entity table return a
@@ -2215,8 +2391,10 @@ class DatastoreDistributed():
         range_.set_cursor(cursor_path, inclusive=False)
 
     entities = []
+    rows_matched = 0
     while True:
       reference_hash = yield self._common_refs_from_ranges(ranges, limit)
+      rows_matched += len(reference_hash)
       new_entities = yield self.__fetch_and_validate_entity_set(
         reference_hash, limit, app_id, direction)
       entities.extend(new_entities)
@@ -2230,6 +2408,10 @@ class DatastoreDistributed():
       if len(reference_hash) < limit:
         break
 
+    rows_scanned = sum(range_.rows_scanned for range_ in ranges)
+    self.logger.debug('Merge join scanned {} index rows and matched {}'.
+                      format(rows_scanned, rows_matched))
+
     results = entities[:limit]
     self.logger.debug('Returning {} results'.format(len(results)))
     raise gen.Return(results)
@@ -2920,19 +3102,26 @@ class DatastoreDistributed():
 
     # We do the composite check first because its easy to determine if a query
     # has a composite index.
+    request_info = statistics.current_request()
     if query.composite_index_size() > 0:
+      if request_info is not None:
+        request_info.strategy = 'composite_query'
       result = yield self.__composite_query(query, filter_info, order_info)
       raise gen.Return(result)
 
     for strategy in DatastoreDistributed._QUERY_STRATEGIES:
       results = yield strategy(self, query, filter_info, order_info)
       if results or results == []:
+        if request_info is not None:
+          request_info.strategy = strategy.__name__.lstrip('_')
         raise gen.Return(results)
 
     # The client may not have given a composite index, but there may be one
     # that still works.
     index_to_use = _FindIndexToUse(query, self.get_indexes(app_id))
     if index_to_use is not None:
+      if request_info is not None:
+        request_info.strategy = 'composite_query'
       result = yield self.__composite_query(query, filter_info, order_info)
       raise gen.Return(result)
 
@@ -2943,11 +3132,95 @@ class DatastoreDistributed():
     """Populates the query result and use that query result to
        encode a cursor.
 
+    When possible, several batches are found at once. The keys of the surplus
+    are kept in the cursor registry so that the next batch can resume from
+    them. Entities are always fetched when their batch is served.
+
     Args:
       query: The query to run.
       query_result: The response given to the application server.
     """
-    result = yield self.__get_query_results(query)
+    request_info = statistics.current_request()
+    if request_info is not None:
+      request_info.query_shape = statistics.query_shape(query)
+
+    if not self.cursor_registry.supports(query):
+      result = yield self.__get_query_results(query)
+      self.__populate_query_result(query, result, query_result)
+      if request_info is not None:
+        request_info.rows_returned = len(query_result.result_list())
+      return
+
+    limit = self.get_limit(query)
+    open_cursor = self.cursor_registry.claim(query)
+    if (open_cursor is not None and
+        (len(open_cursor.rowkeys) >= limit or open_cursor.exhausted)):
+      if request_info is not None:
+        request_info.strategy = 'open_cursor'
+      result, remaining = yield self.__fetch_open_cursor_batch(
+        open_cursor.rowkeys, limit)
+      exhausted = open_cursor.exhausted
+    else:
+      read_ahead_query = self.cursor_registry.read_ahead_query(query, limit)
+      read_ahead = yield self.__get_query_results(read_ahead_query)
+      exhausted = len(read_ahead) < self.get_limit(read_ahead_query)
+      result = read_ahead[:limit]
+      remaining = [self.__rowkey_for_result(encoded_entity)
+                   for encoded_entity in read_ahead[limit:]]
+
+    self.__populate_query_result(query, result, query_result)
+    if request_info is not None:
+      request_info.rows_returned = len(query_result.result_list())
+
+    # Entities that were deleted since the scan can leave the batch short
+    # even though there are more results to return.
+    query_result.set_more_results(bool(remaining) or not exhausted)
+    if remaining:
+      self.cursor_registry.register(query, query_result.compiled_cursor(),
+                                    remaining, exhausted)
+
+  def __rowkey_for_result(self, encoded_entity):
+    """ Finds the entity table key for a query result.
+
+    Args:
+      encoded_entity: A string containing an encoded entity.
+    Returns:
+      A string specifying the entity table key.
+    """
+    entity = entity_pb.EntityProto(encoded_entity)
+    return get_entity_key(self.get_table_prefix(entity), entity.key().path())
+
+  @gen.coroutine
+  def __fetch_open_cursor_batch(self, rowkeys, limit):
+    """ Fetches the current version of the next batch of results.
+
+    Entities that have been deleted since the query was run are skipped.
+
+    Args:
+      rowkeys: A list of entity table keys that follow the cursor.
+      limit: An integer specifying the number of results requested.
+    Returns:
+      A tuple containing a list of encoded entities and a list of the keys
+      that were not fetched.
+    """
+    result = []
+    position = 0
+    while len(result) < limit and position < len(rowkeys):
+      batch = rowkeys[position:position + limit - len(result)]
+      position += len(batch)
+      entities = yield self.__fetch_entities_from_row_list(batch)
+      result.extend(entities)
+
+    raise gen.Return((result, rowkeys[position:]))
+
+  def __populate_query_result(self, query, result, query_result):
+    """ Fills in a query response from a list of results.
+
+    Args:
+      query: The query that was run.
+      result: A list of encoded entities.
+      query_result: The response given to the application server.
+    """
     last_entity = None
     count = 0
     offset = query.offset()
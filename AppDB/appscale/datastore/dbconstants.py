@@ -12,6 +12,10 @@ NONEXISTANT_TRANSACTION = "0"
 # The datastore's default HTTP port.
 DEFAULT_PORT = 4000
 
+# The default number of entity groups that a non-transactional put commits
+# concurrently.
+DEFAULT_PUT_CONCURRENCY = 25
+
 # The lowest character to separate different fields in a row key.
 KEY_DELIMITER = '\x00'
 
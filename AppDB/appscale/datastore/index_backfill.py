@@ -0,0 +1,257 @@
+""" Helpers for populating a new composite index from existing entities. """
+import base64
+import json
+import time
+
+from tornado import gen
+
+from appscale.datastore import dbconstants
+
+# The first and last IDs that the scattered allocator assigns. Scattered IDs
+# are spread uniformly across this range.
+FIRST_SCATTERED_ID = 1 << 52
+LAST_SCATTERED_ID = (1 << 53) - 1
+
+
+def split_kind_range(prefix, kind, end_row, count):
+  """ Divides the kind table rows for a kind into contiguous key ranges.
+
+  Most entities are root entities with scattered IDs, so the range is split
+  evenly across the scattered ID space. Entities with names, sequential IDs,
+  or parents of another kind end up in the first or last range.
+
+  Args:
+    prefix: A string specifying the first kind table key for the kind.
+    kind: A string specifying the kind.
+    end_row: A string specifying the last kind table key for the kind.
+    count: An integer specifying the number of ranges to create.
+  Returns:
+    A list of KeyRange objects.
+  """
+  step = (LAST_SCATTERED_ID - FIRST_SCATTERED_ID) // count
+  boundaries = [
+    '{prefix}{kind}{separator}{id}'.format(
+      prefix=prefix, kind=kind, separator=dbconstants.ID_SEPARATOR,
+      id=FIRST_SCATTERED_ID + step * index)
+    for index in range(1, count)]
+  starts = [prefix] + boundaries
+  ends = boundaries + [end_row]
+  return [KeyRange(start, end) for start, end in zip(starts, ends)]
+
+
+def _id_position(key):
+  """ Places a kind table key on the scattered ID axis.
+
+  Args:
+    key: A string specifying a kind table key.
+  Returns:
+    An integer. Root entities of the kind map to their IDs. Other keys map
+    just outside the scattered ID space, on the side that they sort on.
+  """
+  kind_prefix, _, path = key.partition(dbconstants.KIND_SEPARATOR)
+  kind = kind_prefix.split(dbconstants.KEY_DELIMITER)[-1]
+  root = path.split(dbconstants.KIND_SEPARATOR)[0]
+  root_kind, _, root_id = root.rpartition(dbconstants.ID_SEPARATOR)
+  if root_kind == kind and root_id.isdigit():
+    return int(root_id)
+
+  if root < kind + dbconstants.ID_SEPARATOR:
+    return FIRST_SCATTERED_ID - 1
+
+  return LAST_SCATTERED_ID + 1
+
+
+class KeyRange(object):
+  """ A range of kind table keys that a backfill worker processes. """
+  def __init__(self, start, end, position=None, complete=False):
+    """ Creates a new KeyRange.
+
+    Args:
+      start: A string specifying the first key (inclusive).
+      end: A string specifying the last key (exclusive).
+      position: A string specifying the last key that has been processed.
+      complete: A boolean indicating that every key has been processed.
+    """
+    self.start = start
+    self.end = end
+    self.position = position
+    self.complete = complete
+
+  @property
+  def fraction_complete(self):
+    """ Estimates how much of the range has been processed.
+
+    Returns:
+      A float between 0 and 1.
+    """
+    if self.complete:
+      return 1.0
+
+    if self.position is None:
+      return 0.0
+
+    low = max(_id_position(self.start), FIRST_SCATTERED_ID)
+    high = min(_id_position(self.end), LAST_SCATTERED_ID)
+    if high <= low:
+      return 0.0
+
+    position = min(max(_id_position(self.position), low), high)
+    return float(position - low) / (high - low)
+
+  def to_dict(self):
+    """ Generates a JSON-safe dictionary representation of the range.
+
+    Returns:
+      A dictionary containing the range details.
+    """
+    position = None
+    if self.position is not None:
+      position = base64.b64encode(self.position)
+
+    return {'start': base64.b64encode(self.start),
+            'end': base64.b64encode(self.end),
+            'position': position,
+            'complete': self.complete}
+
+  @classmethod
+  def from_dict(cls, range_dict):
+    """ Constructs a KeyRange from a JSON-derived dictionary.
+
+    Args:
+      range_dict: A dictionary containing the range details.
+    Returns:
+      A KeyRange object.
+    """
+    position = range_dict['position']
+    if position is not None:
+      position = base64.b64decode(position)
+
+    return cls(base64.b64decode(range_dict['start']),
+               base64.b64decode(range_dict['end']), position,
+               range_dict['complete'])
+
+
+class BackfillProgress(object):
+  """ Tracks which parts of an index backfill are complete. """
+  def __init__(self, ranges, entities=0):
+    """ Creates a new BackfillProgress object.
+
+    Args:
+      ranges: A list of KeyRange objects.
+      entities: An integer specifying the number of entities processed.
+    """
+    self.ranges = ranges
+    self.entities = entities
+
+  @property
+  def complete(self):
+    """ Indicates that the backfill is done. """
+    return all(key_range.complete for key_range in self.ranges)
+
+  @property
+  def fraction_complete(self):
+    """ Estimates how much of the backfill is done.
+
+    Each range covers an equal part of the scattered ID space, so the
+    estimate is accurate when most entities have scattered IDs.
+
+    Returns:
+      A float between 0 and 1.
+    """
+    if not self.ranges:
+      return 1.0
+
+    return (sum(key_range.fraction_complete for key_range in self.ranges) /
+            len(self.ranges))
+
+  @property
+  def percent_complete(self):
+    """ Estimates how much of the backfill is done.
+
+    Returns:
+      An integer between 0 and 100. It is only 100 when every range is done.
+    """
+    if self.complete:
+      return 100
+
+    return min(int(round(self.fraction_complete * 100)), 99)
+
+  @property
+  def estimated_entities(self):
+    """ Estimates the number of entities that the backfill will process.
+
+    Returns:
+      An integer or None if there is not enough progress to estimate it.
+    """
+    if self.complete:
+      return self.entities
+
+    fraction = self.fraction_complete
+    if not fraction:
+      return None
+
+    return max(int(self.entities / fraction), self.entities)
+
+  def summary(self):
+    """ Describes the progress for the index metadata.
+
+    Returns:
+      A JSON-safe dictionary containing the entities processed, the
+      estimated total, and the percent complete.
+    """
+    return {'entities': self.entities,
+            'estimated_entities': self.estimated_entities,
+            'percent_complete': self.percent_complete}
+
+  def encode(self):
+    """ Generates a JSON string that can be used as a checkpoint.
+
+    Returns:
+      A string containing the backfill progress.
+    """
+    return json.dumps({
+      'ranges': [key_range.to_dict() for key_range in self.ranges],
+      'entities': self.entities})
+
+  @classmethod
+  def decode(cls, encoded_progress):
+    """ Constructs a BackfillProgress object from a checkpoint.
+
+    Args:
+      encoded_progress: A JSON string created with encode.
+    Returns:
+      A BackfillProgress object.
+    """
+    progress = json.loads(encoded_progress)
+    ranges = [KeyRange.from_dict(range_dict)
+              for range_dict in progress['ranges']]
+    return cls(ranges, progress['entities'])
+
+
+class RateLimiter(object):
+  """ Limits the number of index writes per second. """
+  def __init__(self, rate):
+    """ Creates a new RateLimiter.
+
+    Args:
+      rate: An integer specifying the number of entities allowed per second.
+        If None, the rate is not limited.
+    """
+    self.rate = rate
+    self._next_slot = time.time()
+
+  @gen.coroutine
+  def wait(self, amount):
+    """ Waits until the given number of entities can be processed.
+
+    Args:
+      amount: An integer specifying the number of entities.
+    """
+    if not self.rate:
+      return
+
+    now = time.time()
+    start = max(now, self._next_slot)
+    self._next_slot = start + float(amount) / self.rate
+    if start > now:
+      yield gen.sleep(start - now)
@@ -3,6 +3,7 @@ import json
 import logging
 import time
 from kazoo.client import NoNodeError
+from kazoo.exceptions import BadVersionError, NodeExistsError
 from kazoo.protocol.states import KazooState
 
 from tornado import gen
@@ -11,6 +12,7 @@ from tornado.locks import Event as AsyncEvent
 
 from appscale.common.async_retrying import retry_children_watch_coroutine
 from appscale.common.datastore_index import DatastoreIndex
+from appscale.datastore.index_backfill import BackfillProgress
 from appscale.datastore.zkappscale.tornado_kazoo import AsyncKazooLock
 
 logger = logging.getLogger('appscale-admin')
@@ -21,6 +23,58 @@ class IndexInaccessible(Exception):
   pass
 
 
+class BackfillCheckpoint(object):
+  """ Stores the progress of an index backfill in ZooKeeper. """
+
+  def __init__(self, zk_client, node, save_callback=None):
+    """ Creates a new BackfillCheckpoint.
+
+    Args:
+      zk_client: A KazooClient.
+      node: A string specifying the ZooKeeper node for the checkpoint.
+      save_callback: A function that is called with the progress after it
+        is stored.
+    """
+    self._zk_client = zk_client
+    self._node = node
+    self._save_callback = save_callback
+
+  def load(self):
+    """ Fetches the stored progress.
+
+    Returns:
+      A BackfillProgress object or None if there is no checkpoint.
+    """
+    try:
+      encoded_progress = self._zk_client.get(self._node)[0]
+    except NoNodeError:
+      return None
+
+    return BackfillProgress.decode(encoded_progress)
+
+  def save(self, progress):
+    """ Stores the progress.
+
+    Args:
+      progress: A BackfillProgress object.
+    """
+    encoded_progress = progress.encode()
+    try:
+      self._zk_client.create(self._node, encoded_progress, makepath=True)
+    except NodeExistsError:
+      self._zk_client.set(self._node, encoded_progress)
+
+    if self._save_callback is not None:
+      self._save_callback(progress)
+
+  def delete(self):
+    """ Removes the checkpoint. """
+    try:
+      self._zk_client.delete(self._node)
+    except NoNodeError:
+      pass
+
+
 class ProjectIndexManager(object):
   """ Keeps track of composite index definitions for a project. """
 
@@ -37,6 +91,8 @@ class ProjectIndexManager(object):
     """
     self.project_id = project_id
     self.indexes_node = '/appscale/projects/{}/indexes'.format(self.project_id)
+    self.backfill_node = '/appscale/projects/{}/index_backfill'.format(
+      self.project_id)
     self.active = True
     self.update_event = AsyncEvent()
 
@@ -87,16 +143,30 @@ class ProjectIndexManager(object):
         consensus = creation_time + (self._zk_client._session_timeout / 1000.0)
         yield gen.sleep(max(consensus - time.time(), 0))
 
+        checkpoint = self.backfill_checkpoint(index.id)
         yield self._ds_access.update_composite_index(
-          self.project_id, index.to_pb())
+          self.project_id, index.to_pb(), checkpoint)
         logger.info('Index {} is now ready'.format(index.id))
         self._mark_index_ready(index.id)
+        checkpoint.delete()
 
       logging.info(
         'All composite indexes for {} are ready'.format(self.project_id))
     finally:
       IOLoop.current().spawn_callback(self.apply_definitions)
 
+  def backfill_checkpoint(self, index_id):
+    """ Creates a checkpoint for an index backfill.
+
+    Args:
+      index_id: An integer specifying an index ID.
+    Returns:
+      A BackfillCheckpoint object.
+    """
+    return BackfillCheckpoint(
+      self._zk_client, '{}/{}'.format(self.backfill_node, index_id),
+      lambda progress: self._update_backfill_status(index_id, progress))
+
   def delete_index_definition(self, index_id):
     """ Remove a definition from a project's list of configured indexes.
 
@@ -117,6 +187,7 @@ class ProjectIndexManager(object):
                                   if index.id != index_id])
     self._zk_client.set(self.indexes_node, encoded_indexes,
                         version=node_version)
+    self.backfill_checkpoint(index_id).delete()
 
   def _mark_index_ready(self, index_id):
     """ Updates the index metadata to reflect the new state of the index.
@@ -136,11 +207,39 @@ class ProjectIndexManager(object):
     for existing_index in existing_indexes:
       if existing_index.id == index_id:
         existing_index.ready = True
+        existing_index.backfill = None
 
     indexes_dict = [index.to_dict() for index in existing_indexes]
     self._zk_client.set(self.indexes_node, json.dumps(indexes_dict),
                         version=node_version)
 
+  def _update_backfill_status(self, index_id, progress):
+    """ Records the backfill progress in the index metadata.
+
+    Args:
+      index_id: An integer specifying an index ID.
+      progress: A BackfillProgress object.
+    """
+    try:
+      encoded_indexes, znode_stat = self._zk_client.get(self.indexes_node)
+    except NoNodeError:
+      return
+
+    existing_indexes = [DatastoreIndex.from_dict(self.project_id, index)
+                        for index in json.loads(encoded_indexes)]
+    for existing_index in existing_indexes:
+      if existing_index.id == index_id and not existing_index.ready:
+        existing_index.backfill = progress.summary()
+
+    indexes_dict = [index.to_dict() for index in existing_indexes]
+    try:
+      self._zk_client.set(self.indexes_node, json.dumps(indexes_dict),
+                          version=znode_stat.version)
+    except BadVersionError:
+      # The status is only informational, so the next checkpoint updates it.
+      logger.debug('Indexes for {} changed while recording backfill '
+                   'progress'.format(self.project_id))
+
   @gen.coroutine
   def _update_indexes(self, encoded_indexes):
     """ Handles changes to the list of a project's indexes.
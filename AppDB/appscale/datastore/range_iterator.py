@@ -43,9 +43,18 @@ class RangeIterator(object):
   """ Iterates through a range of index entries.
 
   This was designed for merge join queries. The range can only be narrowed.
+
+  The number of entries fetched at a time adapts to how the range is used.
+  When the cursor keeps jumping past most of a chunk, smaller chunks are
+  fetched. When chunks are read through, larger chunks are fetched and the
+  next one is requested before it is needed.
   """
+  # The largest number of entries to fetch at a time.
   CHUNK_SIZE = 1000
 
+  # The smallest number of entries to fetch at a time.
+  MIN_CHUNK_SIZE = 50
+
   def __init__(self, db, project_id, namespace, kind, prop_name, value):
     """ Creates a new RangeIterator.
 
@@ -71,6 +80,16 @@ class RangeIterator(object):
     self._cache = []
     self._index_exhausted = False
 
+    self._chunk_size = self.CHUNK_SIZE
+    self._entries_used = 0
+    self._sequential = False
+
+    # A tuple containing the size and the future of the next chunk.
+    self._prefetch = None
+
+    # The number of index entries that have been fetched for the range.
+    self.rows_scanned = 0
+
   @property
   def prefix(self):
     """ The encoded reference without the path element. """
@@ -87,30 +106,23 @@ class RangeIterator(object):
     Raises:
       RangeExhausted when there are no more entries in the range.
     """
-    try:
-      # First check if the request can be fulfilled with the cache.
-      entry = self._next_from_cache()
-      self._cursor = Cursor(entry.key, inclusive=False)
-      raise gen.Return(entry)
-    except ValueError:
-      # If the cache and index have been exhausted, there are no more entries.
-      if self._index_exhausted:
+    while True:
+      try:
+        # First check if the request can be fulfilled with the cache.
+        entry = self._next_from_cache()
+        self._cursor = Cursor(entry.key, inclusive=False)
+        self._entries_used += 1
+        raise gen.Return(entry)
+      except ValueError:
+        # If the cache and index have been exhausted, there are no more
+        # entries.
+        if self._index_exhausted:
+          raise RangeExhausted()
+
+      yield self._next_chunk()
+      if not self._cache:
         raise RangeExhausted()
 
-    self._cache = yield self._db.range_query(
-      ASC_PROPERTY_TABLE, PROPERTY_SCHEMA, self._cursor.key, self._range[-1],
-      self.CHUNK_SIZE, start_inclusive=self._cursor.inclusive)
-
-    if len(self._cache) < self.CHUNK_SIZE:
-      self._index_exhausted = True
-
-    if not self._cache:
-      raise RangeExhausted()
-
-    entry = self.entry_from_result(self._cache[0])
-    self._cursor = Cursor(entry.key, inclusive=False)
-    raise gen.Return(entry)
-
   @classmethod
   def from_filter(cls, db, project_id, namespace, kind, pb_filter):
     """ Creates a new RangeIterator from a filter.
@@ -209,6 +221,11 @@ class RangeIterator(object):
     self._range = (start_key, end_key)
     self._cursor.key = max(start_key, self._cursor.key)
 
+    # Entries outside of the new range might have been fetched already.
+    self._cache = []
+    self._prefetch = None
+    self._index_exhausted = False
+
   def _next_from_cache(self):
     """ Retrieves the next index entry from the cache.
 
@@ -240,3 +257,63 @@ class RangeIterator(object):
         raise ValueError
 
     return entry
+
+  @gen.coroutine
+  def _next_chunk(self):
+    """ Replaces the cache with the chunk of entries after the cursor. """
+    self._adjust_chunk_size()
+
+    chunk = None
+    if self._prefetch is not None:
+      chunk_size, future = self._prefetch
+      self._prefetch = None
+      chunk = yield future
+      self.rows_scanned += len(chunk)
+      # The prefetched chunk can only be used if the cursor did not move past
+      # it while it was being fetched.
+      if (len(chunk) == chunk_size and
+          chunk[-1].keys()[0] < self._cursor.key):
+        chunk = None
+
+    if chunk is None:
+      chunk_size = self._chunk_size
+      chunk = yield self._fetch(self._cursor.key, self._cursor.inclusive,
+                                chunk_size)
+      self.rows_scanned += len(chunk)
+
+    self._cache = chunk
+    self._entries_used = 0
+    self._index_exhausted = len(chunk) < chunk_size
+
+    # Request the following chunk while this one is being read.
+    if self._sequential and not self._index_exhausted:
+      last_key = self._cache[-1].keys()[0]
+      future = self._fetch(last_key, False, self._chunk_size)
+      self._prefetch = (self._chunk_size, future)
+
+  def _fetch(self, start_key, start_inclusive, chunk_size):
+    """ Fetches a chunk of entries from the index.
+
+    Args:
+      start_key: A string specifying the key to start from.
+      start_inclusive: A boolean indicating that the start key can be
+        included.
+      chunk_size: An integer specifying the number of entries to fetch.
+    Returns:
+      A Future that resolves to a list of index results.
+    """
+    return self._db.range_query(
+      ASC_PROPERTY_TABLE, PROPERTY_SCHEMA, start_key, self._range[-1],
+      chunk_size, start_inclusive=start_inclusive)
+
+  def _adjust_chunk_size(self):
+    """ Sizes the next chunk based on how much of the cache was skipped. """
+    if not self._cache:
+      return
+
+    skipped = len(self._cache) - self._entries_used
+    self._sequential = skipped <= self._entries_used
+    if self._sequential:
+      self._chunk_size = min(self._chunk_size * 2, self.CHUNK_SIZE)
+    else:
+      self._chunk_size = max(self._chunk_size // 2, self.MIN_CHUNK_SIZE)
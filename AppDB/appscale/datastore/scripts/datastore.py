@@ -24,7 +24,7 @@ from tornado import gen
 from tornado.httpclient import AsyncHTTPClient
 from tornado.ioloop import IOLoop
 from tornado.options import options
-from .. import dbconstants
+from .. import dbconstants, statistics
 from ..appscale_datastore_batch import DatastoreFactory
 from ..datastore_distributed import DatastoreDistributed
 from ..index_manager import IndexManager
@@ -59,9 +59,16 @@ zookeeper = None
 # datastore processes must be restarted and the groomer must be stopped.
 READ_ONLY = False
 
+# Determines whether or not to keep client connections open between
+# requests. AppServers reuse persistent connections when this is enabled.
+KEEP_ALIVE = False
+
 # Global stats.
 STATS = {}
 
+# Logs queries that are slower than the configured threshold.
+slow_query_log = statistics.SlowQueryLog(threshold=None)
+
 # The ZooKeeper path where a list of active datastore servers is stored.
 DATASTORE_SERVERS_NODE = '/appscale/datastore/servers'
 
@@ -120,14 +127,42 @@ class ReserveKeysHandler(tornado.web.RequestHandler):
     yield datastore_access.reserve_ids(project_id, ids)
 
 
+class StatsHandler(tornado.web.RequestHandler):
+  """ Reports latency histograms and other stats for recent requests. """
+  def get(self):
+    """ Writes service stats in JSON. """
+    cursor = self.get_argument('cursor', None)
+    last_milliseconds = self.get_argument('last_milliseconds', None)
+    service_stats = statistics.service_stats
+    try:
+      if cursor:
+        recent_stats = service_stats.scroll_recent(int(cursor))
+      elif last_milliseconds:
+        recent_stats = service_stats.get_recent(int(last_milliseconds))
+      else:
+        recent_stats = service_stats.get_recent()
+    except ValueError:
+      self.set_status(400, 'cursor and last_milliseconds '
+                           'arguments should be integers')
+      return
+
+    self.write(json.dumps({
+      'current_requests': service_stats.current_requests,
+      'cumulative_counters': service_stats.get_cumulative_counters(),
+      'recent_stats': recent_stats
+    }))
+
+
 class MainHandler(tornado.web.RequestHandler):
   """
   Defines what to do when the webserver receives different types of 
   HTTP requests.
   """
   def set_default_headers(self):
-    """ Instructs clients to close the connection after each response. """
-    self.set_header('Connection', 'close')
+    """ Instructs clients to close the connection after each response unless
+    the server is running in keep-alive mode. """
+    if not KEEP_ALIVE:
+      self.set_header('Connection', 'close')
 
   def unknown_request(self, app_id, http_request_data, pb_type):
     """ Function which handles unknown protocol buffers.
@@ -198,7 +233,6 @@ class MainHandler(tornado.web.RequestHandler):
     apirequest = remote_api_pb.Request()
     apirequest.ParseFromString(http_request_data)
     apiresponse = remote_api_pb.Response()
-    response = None
     if not apirequest.has_method():
       apirequest.set_method("NOT_FOUND")
     if not apirequest.has_request():
@@ -213,6 +247,56 @@ class MainHandler(tornado.web.RequestHandler):
       request_log += ': {}'.format(apirequest.request_id())
     logger.debug(request_log)
 
+    request_info = statistics.start_request(
+      app=app_id, method=method, status=datastore_pb.Error.INTERNAL_ERROR)
+    try:
+      # Lock and database calls made while handling the method add their
+      # time to request_info.
+      with statistics.request_context(request_info):
+        future = self.handle_method(app_id, method, http_request_data,
+                                    service_id, version_id)
+
+      response, errcode, errdetail = yield future
+      request_info.status = errcode
+    finally:
+      request_info.finalize()
+      slow_query_log.check(request_info)
+
+    time_taken = time.time() - start
+    if method in STATS:
+      if errcode in STATS[method]:
+        prev_req, pre_time = STATS[method][errcode]
+        STATS[method][errcode] = prev_req + 1, pre_time + time_taken
+      else:
+        STATS[method][errcode] = (1, time_taken)
+    else:
+      STATS[method] = {}
+      STATS[method][errcode] = (1, time_taken)
+
+    apiresponse.set_response(response)
+    if errcode != 0:
+      apperror_pb = apiresponse.mutable_application_error()
+      apperror_pb.set_code(errcode)
+      apperror_pb.set_detail(errdetail)
+
+    self.write(apiresponse.Encode())
+
+  @gen.coroutine
+  def handle_method(self, app_id, method, http_request_data, service_id,
+                    version_id):
+    """ Passes a request to the handler for its method.
+
+    Args:
+      app_id: The application ID that is sending this request.
+      method: A string specifying the API method.
+      http_request_data: Encoded protocol buffer for the method.
+      service_id: A string specifying the client's service ID.
+      version_id: A string specifying the client's version ID.
+    Returns:
+      A tuple containing the encoded response, an error code, and an error
+      message.
+    """
+    response = None
     if method == "Put":
       response, errcode, errdetail = yield self.put_request(
         app_id, http_request_data)
@@ -257,24 +341,7 @@ class MainHandler(tornado.web.RequestHandler):
       errcode = datastore_pb.Error.BAD_REQUEST
       errdetail = "Unknown datastore message"
 
-    time_taken = time.time() - start
-    if method in STATS:
-      if errcode in STATS[method]:
-        prev_req, pre_time = STATS[method][errcode]
-        STATS[method][errcode] = prev_req + 1, pre_time + time_taken
-      else:
-        STATS[method][errcode] = (1, time_taken)
-    else:
-      STATS[method] = {}
-      STATS[method][errcode] = (1, time_taken)
-
-    apiresponse.set_response(response)
-    if errcode != 0:
-      apperror_pb = apiresponse.mutable_application_error()
-      apperror_pb.set_code(errcode)
-      apperror_pb.set_detail(errdetail)
-
-    self.write(apiresponse.Encode())
+    raise gen.Return((response, errcode, errdetail))
 
   @gen.coroutine
   def begin_transaction_request(self, app_id, http_request_data):
@@ -839,6 +906,7 @@ pb_application = tornado.web.Application([
   ('/clear', ClearHandler),
   ('/read-only', ReadOnlyHandler),
   ('/reserve-keys', ReserveKeysHandler),
+  ('/service-stats', StatsHandler),
   (r'/*', MainHandler),
 ])
 
@@ -849,6 +917,7 @@ def main():
   global datastore_access
   global server_node
   global zookeeper
+  global KEEP_ALIVE
   zookeeper_locations = appscale_info.get_zk_locations_string()
 
   parser = argparse.ArgumentParser()
@@ -860,11 +929,27 @@ def main():
                       help='Datastore server port')
   parser.add_argument('-v', '--verbose', action='store_true',
                       help='Output debug-level logging')
+  parser.add_argument('--keep-alive', action='store_true',
+                      help='Keep client connections open between requests')
+  parser.add_argument('--put-concurrency', type=int,
+                      default=dbconstants.DEFAULT_PUT_CONCURRENCY,
+                      help='The number of entity groups that a '
+                           'non-transactional put commits at the same time')
+  parser.add_argument('--backfill-rate', type=int,
+                      help='The maximum number of entities per second that '
+                           'composite index backfills process')
+  parser.add_argument('--slow-query-ms', type=int,
+                      help='Log queries that take longer than this many '
+                           'milliseconds along with their shape, strategy '
+                           'and the number of rows scanned')
   args = parser.parse_args()
 
   if args.verbose:
     logging.getLogger('appscale').setLevel(logging.DEBUG)
 
+  KEEP_ALIVE = args.keep_alive
+  slow_query_log.threshold = args.slow_query_ms
+
   options.define('private_ip', appscale_info.get_private_ip())
   options.define('port', args.port)
   taskqueue_locations = get_load_balancer_ips()
@@ -889,7 +974,9 @@ def main():
   datastore_access = DatastoreDistributed(
     datastore_batch, transaction_manager, zookeeper=zookeeper,
     log_level=logger.getEffectiveLevel(),
-    taskqueue_locations=taskqueue_locations)
+    taskqueue_locations=taskqueue_locations,
+    put_concurrency=args.put_concurrency,
+    backfill_rate=args.backfill_rate)
   index_manager = IndexManager(zookeeper.handle, datastore_access,
                                perform_admin=True)
   datastore_access.index_manager = index_manager
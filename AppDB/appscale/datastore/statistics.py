@@ -0,0 +1,223 @@
+""" Collects per-request traces of datastore server requests. """
+import functools
+import logging
+import threading
+import time
+
+from appscale.common.service_stats import (
+  categorizers, metrics, matchers, stats_manager
+)
+from tornado.stack_context import StackContext
+
+logger = logging.getLogger(__name__)
+
+# The names of filter operators used when describing query shapes.
+FILTER_OPERATORS = {1: '<', 2: '<=', 3: '>', 4: '>=', 5: '=', 6: 'IN',
+                    7: 'EXISTS'}
+
+
+# Define matchers and categorizers for grouping requests
+class FailedRequestMatcher(matchers.RequestMatcher):
+  def matches(self, request_info):
+    return request_info.status != 0
+
+
+class QueryCategorizer(categorizers.Categorizer):
+  """ Groups queries by the strategy that was used to run them. """
+  def category_of(self, req_info):
+    if req_info.strategy is None:
+      return categorizers.HIDDEN_CATEGORY
+    return req_info.strategy
+
+
+FAILED_REQUEST = FailedRequestMatcher()
+METHOD_CATEGORIZER = categorizers.ExactValueCategorizer(
+  'by_method', field='method')
+STATUS_CATEGORIZER = categorizers.ExactValueCategorizer(
+  'by_status', field='status')
+STRATEGY_CATEGORIZER = QueryCategorizer(categorizer_name='by_strategy')
+
+
+# Configure ServiceStats. Times are in milliseconds.
+REQUEST_STATS_FIELDS = [
+  'app', 'method', 'status', 'lock_time', 'db_time', 'db_calls',
+  'rows_scanned', 'rows_returned', 'strategy', 'query_shape'
+]
+CUMULATIVE_COUNTERS = {
+  'all': matchers.ANY,
+  'failed': FAILED_REQUEST
+}
+METRICS_CONFIG = {
+  'all': metrics.CountOf(matchers.ANY),
+  'failed': metrics.CountOf(FAILED_REQUEST),
+  'avg_latency': metrics.Avg('latency'),
+  'latency_histogram': metrics.Histogram('latency'),
+  'lock_time_histogram': metrics.Histogram('lock_time'),
+  'db_time_histogram': metrics.Histogram('db_time'),
+  METHOD_CATEGORIZER: {
+    'all': metrics.CountOf(matchers.ANY),
+    'latency_histogram': metrics.Histogram('latency')
+  },
+  STATUS_CATEGORIZER: metrics.CountOf(matchers.ANY),
+  STRATEGY_CATEGORIZER: {
+    'all': metrics.CountOf(matchers.ANY),
+    'avg_rows_scanned': metrics.Avg('rows_scanned'),
+    'avg_rows_returned': metrics.Avg('rows_returned'),
+    'latency_histogram': metrics.Histogram('latency')
+  }
+}
+# Instantiate singleton ServiceStats
+service_stats = stats_manager.ServiceStats(
+  'datastore', request_fields=REQUEST_STATS_FIELDS,
+  cumulative_counters=CUMULATIVE_COUNTERS,
+  default_metrics_for_recent=METRICS_CONFIG
+)
+
+# Keeps the request whose callbacks are currently running.
+_active = threading.local()
+
+
+class _ActiveRequest(object):
+  """ Makes a request current while its callbacks run. """
+  def __init__(self, request_info):
+    self._request_info = request_info
+    self._previous = None
+
+  def __enter__(self):
+    self._previous = getattr(_active, 'request_info', None)
+    _active.request_info = self._request_info
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    _active.request_info = self._previous
+
+
+def start_request(**fields):
+  """ Starts tracing a request.
+
+  Args:
+    fields: A dictionary containing initial request info.
+  Returns:
+    A RequestInfo object.
+  """
+  return service_stats.start_request(
+    lock_time=0, db_time=0, db_calls=0, rows_scanned=0, rows_returned=0,
+    **fields)
+
+
+def request_context(request_info):
+  """ Creates a context that follows the request across callbacks.
+
+  Coroutines called within the context (and everything they yield) can
+  access the request with current_request.
+
+  Args:
+    request_info: A RequestInfo object.
+  Returns:
+    A tornado StackContext.
+  """
+  return StackContext(functools.partial(_ActiveRequest, request_info))
+
+
+def current_request():
+  """ Fetches the request being handled.
+
+  Returns:
+    A RequestInfo object or None if there is no traced request.
+  """
+  return getattr(_active, 'request_info', None)
+
+
+def traced(time_field, calls_field=None, count_rows=None):
+  """ Adds the time spent in a future-returning function to the request.
+
+  Args:
+    time_field: A string specifying the request field to add milliseconds to.
+    calls_field: A string specifying the request field that counts calls.
+    count_rows: A function that counts the rows scanned in the result.
+  Returns:
+    A decorator.
+  """
+  def decorator(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      request_info = current_request()
+      start = time.time()
+      future = func(*args, **kwargs)
+      if request_info is None:
+        return future
+
+      def record(completed):
+        elapsed = int((time.time() - start) * 1000)
+        setattr(request_info, time_field,
+                getattr(request_info, time_field) + elapsed)
+        if calls_field is not None:
+          setattr(request_info, calls_field,
+                  getattr(request_info, calls_field) + 1)
+        if count_rows is not None and completed.exception() is None:
+          request_info.rows_scanned += count_rows(completed.result())
+
+      future.add_done_callback(record)
+      return future
+    return wrapper
+  return decorator
+
+
+def query_shape(query):
+  """ Describes a query without including any property values.
+
+  Args:
+    query: A datastore_pb.Query object.
+  Returns:
+    A string describing the kind, ancestor, filters, and orders of a query.
+  """
+  shape = 'kind={}'.format(query.kind() if query.has_kind() else None)
+  if query.has_ancestor():
+    shape += ' ancestor'
+
+  filters = ['{} {}'.format(filter_.property(0).name(),
+                            FILTER_OPERATORS.get(filter_.op(), filter_.op()))
+             for filter_ in query.filter_list()]
+  if filters:
+    shape += ' filters=[{}]'.format(', '.join(filters))
+
+  orders = ['{} {}'.format(order.property(),
+                           'DESC' if order.direction() == 2 else 'ASC')
+            for order in query.order_list()]
+  if orders:
+    shape += ' orders=[{}]'.format(', '.join(orders))
+
+  return shape
+
+
+class SlowQueryLog(object):
+  """ Logs queries that take longer than a threshold. """
+  def __init__(self, threshold):
+    """ Creates a new SlowQueryLog.
+
+    Args:
+      threshold: An integer specifying the number of milliseconds a query can
+        take before it is logged. If None, no queries are logged.
+    """
+    self.threshold = threshold
+
+  def check(self, request_info):
+    """ Logs a finished request if it is a slow query.
+
+    Args:
+      request_info: A finalized RequestInfo object.
+    """
+    if (self.threshold is None or request_info.query_shape is None or
+        request_info.latency < self.threshold):
+      return
+
+    logger.warning(
+      'Slow query for {app} took {latency} ms: {shape}, strategy: {strategy}, '
+      'rows scanned: {scanned}, rows returned: {returned}, '
+      'lock time: {lock_time} ms, db time: {db_time} ms '
+      'in {db_calls} calls'.format(
+        app=request_info.app, latency=request_info.latency,
+        shape=request_info.query_shape, strategy=request_info.strategy,
+        scanned=request_info.rows_scanned,
+        returned=request_info.rows_returned,
+        lock_time=request_info.lock_time, db_time=request_info.db_time,
+        db_calls=request_info.db_calls))
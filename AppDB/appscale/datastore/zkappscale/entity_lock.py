@@ -16,6 +16,8 @@ from kazoo.retry import (
 from tornado import gen, ioloop
 from tornado.locks import Lock as TornadoLock
 
+from appscale.datastore import statistics
+
 # The ZooKeeper node that contains lock entries for an entity group.
 LOCK_PATH_TEMPLATE = u'/appscale/apps/{project}/locks/{namespace}/{group}'
 
@@ -105,6 +107,7 @@ class EntityLock(object):
     self.cancelled = True
     self.wake_event.set()
 
+  @statistics.traced('lock_time')
   @gen.coroutine
   def acquire(self):
     now = ioloop.IOLoop.current().time()
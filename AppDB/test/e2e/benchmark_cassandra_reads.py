@@ -0,0 +1,272 @@
+""" Compares the cost of Cassandra reads with and without prepared statements.
+
+The Cassandra session is replaced with a stand-in that encodes each request
+the way the driver would before sending it, so no cluster is needed. For each
+read, it reports the client processor time, the bytes sent and the number of
+CQL strings that Cassandra would have to parse. Run from the AppDB/test
+directory:
+
+  python -m e2e.benchmark_cassandra_reads
+"""
+import argparse
+import os
+import resource
+import sys
+
+from cassandra import ConsistencyLevel
+from cassandra import cqltypes
+from cassandra.encoder import Encoder
+from cassandra.protocol import ColumnMetadata
+from cassandra.protocol import ExecuteMessage
+from cassandra.protocol import ProtocolHandler
+from cassandra.protocol import QueryMessage
+from cassandra.query import PreparedStatement
+from cassandra.query import SimpleStatement
+from cassandra.query import ValueSequence
+from cassandra.query import bind_params
+from mock import mock
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+APPSCALE_PYTHON_APPSERVER = os.path.realpath(
+  os.path.join(os.path.abspath(__file__), '..', '..', '..', '..', 'AppServer'))
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+
+from appscale.datastore import statistics
+from appscale.datastore.cassandra_env import cassandra_interface
+from appscale.datastore.cassandra_env.cassandra_interface import ThriftColumn
+
+PROTOCOL_VERSION = 4
+
+KEYSPACE = 'Keyspace1'
+
+TABLE = 'entities__'
+
+COLUMNS = ['entity', 'txnID']
+
+def column(name, cql_type):
+  return ColumnMetadata(KEYSPACE, TABLE, name, cql_type)
+
+
+class StandInSession(object):
+  """ Encodes requests like a driver session without sending them. """
+  def __init__(self):
+    self.encoder = Encoder()
+    self.bytes_sent = 0
+    self.queries_parsed = 0
+
+  def prepare(self, query):
+    """ Creates a prepared statement without contacting a cluster.
+
+    Args:
+      query: A string containing a CQL statement.
+    Returns:
+      A PreparedStatement.
+    """
+    columns = cqltypes.ListType.apply_parameters([cqltypes.UTF8Type])
+    if 'token(' in query:
+      metadata = [column('partition key token', cqltypes.BytesType),
+                  column('partition key token', cqltypes.BytesType),
+                  column(ThriftColumn.COLUMN_NAME, columns)]
+      if 'LIMIT ?' in query:
+        metadata.append(column('[limit]', cqltypes.Int32Type))
+
+      routing_key_indexes = None
+    elif '{} IN ?'.format(ThriftColumn.KEY) in query:
+      keys = cqltypes.ListType.apply_parameters([cqltypes.BytesType])
+      metadata = [column(ThriftColumn.KEY, keys),
+                  column(ThriftColumn.COLUMN_NAME, columns)]
+      # Cassandra does not report a routing key for IN restrictions.
+      routing_key_indexes = None
+    else:
+      metadata = [column(ThriftColumn.KEY, cqltypes.BytesType),
+                  column(ThriftColumn.COLUMN_NAME, columns)]
+      routing_key_indexes = [0]
+
+    return PreparedStatement(metadata, b'query-id', routing_key_indexes,
+                             query, KEYSPACE, PROTOCOL_VERSION, [], None)
+
+  def encode(self, statement, parameters):
+    """ Serializes a request.
+
+    Args:
+      statement: A SimpleStatement or PreparedStatement.
+      parameters: A sequence of query parameters.
+    Returns:
+      A string containing the request frame.
+    """
+    if isinstance(statement, SimpleStatement):
+      query = bind_params(statement.query_string, parameters, self.encoder)
+      message = QueryMessage(query, ConsistencyLevel.QUORUM)
+      # Cassandra parses the query string of every simple statement.
+      self.queries_parsed += 1
+    else:
+      bound = statement
+      if isinstance(statement, PreparedStatement):
+        bound = statement.bind(parameters)
+
+      # The driver computes the routing key to pick a replica.
+      bound.routing_key
+      message = ExecuteMessage(bound.prepared_statement.query_id,
+                               bound.values, ConsistencyLevel.QUORUM)
+
+    frame = ProtocolHandler.encode_message(message, 0, PROTOCOL_VERSION, None,
+                                           False)
+    self.bytes_sent += len(frame)
+    return frame
+
+
+class StandInCluster(object):
+  """ Provides a stand-in session. """
+  def __init__(self, session):
+    self.session = session
+
+  def connect(self, keyspace):
+    return self.session
+
+
+class StandInTornadoCassandra(object):
+  """ Returns empty results after encoding each request. """
+  def __init__(self, session):
+    self.session = session
+
+  def execute(self, statement, parameters=None):
+    self.session.encode(statement, parameters)
+    response = Future()
+    response.set_result([])
+    return response
+
+
+@statistics.traced('db_time', 'db_calls', count_rows=len)
+@gen.coroutine
+def simple_batch_get(db, table_name, row_keys, column_names):
+  """ Reads rows with a single IN query the way batch_get_entity used to. """
+  if not isinstance(table_name, str): raise TypeError("Expected a str")
+  if not isinstance(column_names, list): raise TypeError("Expected a list")
+  if not isinstance(row_keys, list): raise TypeError("Expected a list")
+
+  statement = 'SELECT * FROM "{table}" '\
+              'WHERE {key} IN %s and {column} IN %s'.format(
+                table=table_name,
+                key=ThriftColumn.KEY,
+                column=ThriftColumn.COLUMN_NAME,
+              )
+  query = SimpleStatement(statement)
+  parameters = (ValueSequence([bytearray(key) for key in row_keys]),
+                ValueSequence(column_names))
+  results = yield db.tornado_cassandra.execute(query, parameters=parameters)
+
+  results_dict = {row_key: {} for row_key in row_keys}
+  for (key, column, value) in results:
+    if key not in results_dict:
+      results_dict[key] = {}
+    results_dict[key][column] = value
+
+  raise gen.Return(results_dict)
+
+
+@statistics.traced('db_time', 'db_calls')
+@gen.coroutine
+def simple_range_query(db, table_name, column_names, start_key, end_key,
+                       limit):
+  """ Reads a range with a SimpleStatement the way range_query used to. """
+  statement = (
+    'SELECT * FROM "{table}" WHERE '
+    'token({key}) >= %s AND '
+    'token({key}) <= %s AND '
+    '{column} IN %s '
+    'LIMIT {limit} '
+    'ALLOW FILTERING'
+  ).format(table=table_name,
+           key=ThriftColumn.KEY,
+           column=ThriftColumn.COLUMN_NAME,
+           limit=len(column_names) * limit)
+  query = SimpleStatement(statement)
+  parameters = (bytearray(start_key), bytearray(end_key),
+                ValueSequence(column_names))
+  yield db.tornado_cassandra.execute(query, parameters=parameters)
+
+
+def cpu_time():
+  """ Returns the user and system processor time used by this process. """
+  usage = resource.getrusage(resource.RUSAGE_SELF)
+  return usage.ru_utime + usage.ru_stime
+
+
+def cost_per_call(session, function, count, trials):
+  """ Measures the average cost of each call.
+
+  The processor time is taken from the fastest trial to leave out time lost
+  to other processes.
+
+  Args:
+    session: A StandInSession.
+    function: A function that returns a Future.
+    count: An integer specifying the number of calls to make in each trial.
+    trials: An integer specifying the number of trials.
+  Returns:
+    A tuple containing the microseconds of processor time, the bytes sent and
+    the number of query strings parsed per call.
+  """
+  io_loop = IOLoop.current()
+
+  @gen.coroutine
+  def run():
+    for _ in range(count):
+      yield function()
+
+  elapsed = []
+  for _ in range(trials):
+    session.bytes_sent = 0
+    session.queries_parsed = 0
+    start_time = cpu_time()
+    io_loop.run_sync(run)
+    elapsed.append(cpu_time() - start_time)
+
+  return (min(elapsed) / count * 1000000, float(session.bytes_sent) / count,
+          float(session.queries_parsed) / count)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--calls', type=int, default=20000,
+                      help='The number of reads to make in each trial')
+  parser.add_argument('--trials', type=int, default=5,
+                      help='The number of trials to run for each case')
+  args = parser.parse_args()
+
+  session = StandInSession()
+  with mock.patch.object(cassandra_interface, 'Cluster',
+                         lambda *args, **kwargs: StandInCluster(session)):
+    db = cassandra_interface.DatastoreProxy(hosts=['127.0.0.1'])
+
+  db.tornado_cassandra = StandInTornadoCassandra(session)
+
+  key = 'guestbook\x00\x00Greeting:0000000001\x01'
+  keys = ['guestbook\x00\x00Greeting:{:010d}\x01'.format(index)
+          for index in range(20)]
+  cases = [
+    ('get 1 row',
+     lambda: simple_batch_get(db, TABLE, [key], COLUMNS),
+     lambda: db.batch_get_entity(TABLE, [key], COLUMNS)),
+    ('get 20 rows',
+     lambda: simple_batch_get(db, TABLE, keys, COLUMNS),
+     lambda: db.batch_get_entity(TABLE, keys, COLUMNS)),
+    ('range query',
+     lambda: simple_range_query(db, TABLE, COLUMNS, keys[0], keys[-1], 20),
+     lambda: db.range_query(TABLE, COLUMNS, keys[0], keys[-1], 20)),
+  ]
+
+  print('{:<12} {:<9} {:>10} {:>8} {:>8}'.format(
+    'case', 'statement', 'cpu (us)', 'bytes', 'parsed'))
+  for name, simple, prepared in cases:
+    for statement, function in (('simple', simple), ('prepared', prepared)):
+      cpu, bytes_sent, parsed = cost_per_call(session, function, args.calls,
+                                               args.trials)
+      print('{:<12} {:<9} {:>10.1f} {:>8.0f} {:>8.1f}'.format(
+        name, statement, cpu, bytes_sent, parsed))
+
+
+if __name__ == '__main__':
+  main()
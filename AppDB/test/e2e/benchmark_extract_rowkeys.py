@@ -0,0 +1,76 @@
+""" Measures how long queries take to pick out the entities that index
+references point to.
+
+No deployment is needed. Run from the AppDB/test directory:
+
+  python -m e2e.benchmark_extract_rowkeys
+"""
+import argparse
+import os
+import sys
+import time
+
+from mock import MagicMock
+
+APPSCALE_PYTHON_APPSERVER = os.path.realpath(
+  os.path.join(os.path.abspath(__file__), '..', '..', '..', '..', 'AppServer'))
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+
+from appscale.datastore.datastore_distributed import DatastoreDistributed
+
+# The number of index entries that point to each entity.
+REFS_PER_ENTITY = 2
+
+
+def make_refs(ref_count):
+  """ Creates index references like the ones a composite index scan returns.
+
+  Args:
+    ref_count: An integer specifying the number of references to create.
+  Returns:
+    A list of dictionaries that map index keys to entity references.
+  """
+  return [
+    {'index{}'.format(index):
+       {'reference': 'key{}'.format(index / REFS_PER_ENTITY)}}
+    for index in range(ref_count)]
+
+
+def time_extraction(datastore, ref_count, trials):
+  """ Measures the average time it takes to extract row keys.
+
+  Args:
+    datastore: A DatastoreDistributed object.
+    ref_count: An integer specifying the number of references to extract.
+    trials: An integer specifying the number of extractions to make.
+  Returns:
+    A float specifying the number of milliseconds per extraction.
+  """
+  refs = make_refs(ref_count)
+  extract = datastore._DatastoreDistributed__extract_rowkeys_from_refs
+  start_time = time.time()
+  for _ in range(trials):
+    extract(refs)
+
+  return (time.time() - start_time) / trials * 1000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--ref-counts', type=int, nargs='+',
+                      default=[1000, 10000, 50000],
+                      help='The number of references in each case')
+  parser.add_argument('--trials', type=int, default=10,
+                      help='The number of extractions to make for each case')
+  args = parser.parse_args()
+
+  datastore = DatastoreDistributed(MagicMock(), MagicMock(), MagicMock())
+
+  print('{:>10} {:>10}'.format('refs', 'ms'))
+  for ref_count in args.ref_counts:
+    print('{:>10} {:>10.2f}'.format(
+      ref_count, time_extraction(datastore, ref_count, args.trials)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,96 @@
+""" Compares small-entity Get latency with and without persistent connections.
+
+Run from the AppDB/test directory against a datastore server started with
+--keep-alive:
+
+  python -m e2e.benchmark_get --location 10.10.1.20:4000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+APPSCALE_PYTHON_APPSERVER = os.path.realpath(
+  os.path.join(os.path.abspath(__file__), '..', '..', '..', '..', 'AppServer'))
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.api.appscale_connection_pool import HTTPConnectionPool
+from google.appengine.api.datastore import Entity
+from google.appengine.datastore import datastore_pb
+from google.appengine.ext.remote_api import remote_api_pb
+
+PROJECT_ID = 'guestbook'
+
+
+def make_request(method, body):
+  request = remote_api_pb.Request()
+  request.set_service_name('datastore_v3')
+  request.set_method(method)
+  request.set_request(body.Encode())
+  return request
+
+
+def percentile(latencies, fraction):
+  ordered = sorted(latencies)
+  return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def time_gets(send, request, count):
+  """ Measures the latency of repeated Get requests.
+
+  Args:
+    send: A function that sends a request and returns the response.
+    request: A remote_api_pb.Request.
+    count: An integer specifying the number of requests to make.
+  Returns:
+    A list of latencies in seconds.
+  """
+  latencies = []
+  for _ in range(count):
+    start_time = time.time()
+    send(request)
+    latencies.append(time.time() - start_time)
+
+  return latencies
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--location', required=True,
+                      help='The datastore server location')
+  parser.add_argument('--count', type=int, default=1000,
+                      help='The number of Gets for each transport')
+  args = parser.parse_args()
+
+  entity = Entity('Greeting', name=uuid.uuid4().hex, _app=PROJECT_ID)
+  entity['content'] = 'hello world'
+  put_request = datastore_pb.PutRequest()
+  put_request.add_entity().MergeFrom(entity.ToPb())
+  make_request('Put', put_request).sendCommand(
+    args.location, PROJECT_ID, remote_api_pb.Response())
+
+  get_request = datastore_pb.GetRequest()
+  get_request.add_key().MergeFrom(entity.key()._ToPb())
+  request = make_request('Get', get_request)
+
+  pool = HTTPConnectionPool(args.location)
+  transports = [
+    ('new connection', lambda request: request.sendCommand(
+      args.location, PROJECT_ID, remote_api_pb.Response())),
+    ('keep-alive pool', lambda request: request.sendPooledCommand(
+      pool, PROJECT_ID, remote_api_pb.Response()))
+  ]
+
+  print('{:>16} {:>10} {:>10} {:>10}'.format('transport', 'p50 (ms)',
+                                             'p95 (ms)', 'p99 (ms)'))
+  for name, send in transports:
+    latencies = time_gets(send, request, args.count)
+    print('{:>16} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+      name, percentile(latencies, .5) * 1000,
+      percentile(latencies, .95) * 1000, percentile(latencies, .99) * 1000))
+
+  pool.close()
+
+
+if __name__ == '__main__':
+  main()
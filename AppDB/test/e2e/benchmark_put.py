@@ -0,0 +1,86 @@
+""" Measures non-transactional Put latency against the number of groups.
+
+Run from the AppDB/test directory with a running datastore server:
+
+  python -m e2e.benchmark_put --locations 10.10.1.20:4000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from .client import Datastore
+
+APPSCALE_PYTHON_APPSERVER = os.path.realpath(
+  os.path.join(os.path.abspath(__file__), '..', '..', '..', '..', 'AppServer'))
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.api.datastore import Entity
+
+PROJECT_ID = 'guestbook'
+
+# The number of entities written by each Put.
+ENTITY_COUNT = 500
+
+
+@gen.coroutine
+def time_put(datastore, group_count, trials):
+  """ Measures Put latency when the entities are spread across groups.
+
+  Args:
+    datastore: A Datastore client.
+    group_count: An integer specifying the number of entity groups to use.
+    trials: An integer specifying the number of Puts to make.
+  Returns:
+    A list of latencies in seconds.
+  """
+  latencies = []
+  for _ in range(trials):
+    roots = [Entity('Root', name=uuid.uuid4().hex, _app=PROJECT_ID)
+             for _ in range(group_count)]
+    entities = [
+      Entity('Greeting', parent=roots[index % group_count].key(),
+             id=index + 1, _app=PROJECT_ID)
+      for index in range(ENTITY_COUNT)]
+    for entity in entities:
+      entity['content'] = 'hello world'
+
+    start_time = time.time()
+    yield datastore.put_multi(entities)
+    latencies.append(time.time() - start_time)
+
+  raise gen.Return(latencies)
+
+
+@gen.coroutine
+def run(locations, group_counts, trials):
+  datastore = Datastore(locations, PROJECT_ID)
+  print('{:>8} {:>10} {:>10} {:>10}'.format('groups', 'min (s)', 'avg (s)',
+                                            'max (s)'))
+  for group_count in group_counts:
+    latencies = yield time_put(datastore, group_count, trials)
+    print('{:>8} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+      group_count, min(latencies), sum(latencies) / len(latencies),
+      max(latencies)))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--locations', nargs='+', required=True,
+                      help='The datastore server locations')
+  parser.add_argument('--groups', type=int, nargs='+',
+                      default=[1, 10, 50, 100, 250, 500],
+                      help='The numbers of entity groups to benchmark')
+  parser.add_argument('--trials', type=int, default=5,
+                      help='The number of Puts for each group count')
+  args = parser.parse_args()
+
+  IOLoop.current().run_sync(
+    lambda: run(args.locations, args.groups, args.trials))
+
+
+if __name__ == '__main__':
+  main()
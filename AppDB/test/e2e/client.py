@@ -86,6 +86,15 @@ class Datastore(object):
 
     yield self._make_request('Put', request.Encode())
 
+  @gen.coroutine
+  def put_multi(self, entities):
+    request = datastore_pb.PutRequest()
+    for entity in entities:
+      req_entity = request.add_entity()
+      req_entity.MergeFrom(entity.ToPb())
+
+    yield self._make_request('Put', request.Encode())
+
   @gen.coroutine
   def commit(self, txid):
     request = datastore_pb.Transaction()
@@ -50,6 +50,9 @@ class TestCassandra(testing.AsyncTestCase):
       ('c', 'c1', '7'), ('c', 'c2', '8'), ('c', 'c3', '9'),
     ])
     self.execute_mock.return_value = async_response
+    # Mock prepare method of session
+    self.session_mock.prepare = mock.MagicMock(
+      side_effect=lambda query_str: mock.MagicMock(argument=query_str))
 
     # Call function under test
     keys = ['a', 'b', 'c']
@@ -57,12 +60,13 @@ class TestCassandra(testing.AsyncTestCase):
     result = yield self.db.batch_get_entity('table', keys, columns)
 
     # Make sure cassandra interface prepared good query
+    self.assertEqual(len(self.execute_mock.call_args_list), 1)
     query = self.execute_mock.call_args[0][0]
     parameters = self.execute_mock.call_args[1]["parameters"]
     self.assertEqual(
-      query.query_string,
-      'SELECT * FROM "table" WHERE key IN %s and column1 IN %s')
-    self.assertEqual(parameters, ([b'a', b'b', b'c'], ['c1', 'c2', 'c3']) )
+      query.argument,
+      'SELECT * FROM "table" WHERE key IN ? AND column1 IN ?')
+    self.assertEqual(parameters, ([b'a', b'b', b'c'], ['c1', 'c2', 'c3']))
     # And result matches expectation
     self.assertEqual(result, {
       'a': {'c1': '1', 'c2': '2', 'c3': '3'},
@@ -70,6 +74,43 @@ class TestCassandra(testing.AsyncTestCase):
       'c': {'c1': '7', 'c2': '8', 'c3': '9'}
     })
 
+  @testing.gen_test
+  def test_get_single_row(self):
+    async_response = Future()
+    async_response.set_result([('a', 'c1', '1')])
+    self.execute_mock.return_value = async_response
+    self.session_mock.prepare = mock.MagicMock(
+      side_effect=lambda query_str: mock.MagicMock(argument=query_str))
+
+    result = yield self.db.batch_get_entity('table', ['a'], ['c1'])
+
+    # A single row is read with a statement that can be routed by its key.
+    query = self.execute_mock.call_args[0][0]
+    parameters = self.execute_mock.call_args[1]["parameters"]
+    self.assertEqual(
+      query.argument,
+      'SELECT * FROM "table" WHERE key = ? AND column1 IN ?')
+    self.assertEqual(parameters, (b'a', ['c1']))
+    self.assertEqual(result, {'a': {'c1': '1'}})
+
+  @testing.gen_test
+  def test_get_reuses_prepared_statements(self):
+    async_response = Future()
+    async_response.set_result([])
+    self.execute_mock.return_value = async_response
+    self.session_mock.prepare = mock.MagicMock(
+      side_effect=lambda query_str: mock.MagicMock(argument=query_str))
+
+    yield self.db.batch_get_entity('table', ['a'], ['c1'])
+    yield self.db.batch_get_entity('table', ['b'], ['c1', 'c2'])
+    yield self.db.batch_get_entity('table', ['a', 'b'], ['c1'])
+    yield self.db.batch_get_entity('table', ['b', 'c'], ['c1'])
+    yield self.db.batch_get_entity('other', ['a'], ['c1'])
+    yield self.db.batch_get_entity('other', ['a', 'b'], ['c1'])
+
+    # Single and multi-row reads are prepared once for each table.
+    self.assertEqual(self.session_mock.prepare.call_count, 4)
+
   @testing.gen_test
   def test_put(self):
     # Mock execute function response
@@ -138,23 +179,27 @@ class TestCassandra(testing.AsyncTestCase):
       ('keyC', 'c1', '7'), ('keyC', 'c2', '8')
     ])
     self.execute_mock.return_value = async_response
+    # Mock prepare method of session
+    self.session_mock.prepare = mock.MagicMock(
+      side_effect=lambda query_str: mock.MagicMock(argument=query_str))
 
     # Call function under test
     columns = ['c1', 'c2']
     result = yield self.db.range_query("tableZ", columns, "keyA", "keyC", 5)
 
     # Make sure cassandra interface prepared good query
-    query = self.execute_mock.call_args[0][0]
+    statement = self.execute_mock.call_args[0][0]
     parameters = self.execute_mock.call_args[1]["parameters"]
     self.assertEqual(
-      query.query_string,
+      statement.argument,
       'SELECT * FROM "tableZ" WHERE '
-      'token(key) >= %s AND '
-      'token(key) <= %s AND '
-      'column1 IN %s '
-      'LIMIT 10 '    # 5 * number of columns
+      'token(key) >= ? AND '
+      'token(key) <= ? AND '
+      'column1 IN ? '
+      'LIMIT ? '
       'ALLOW FILTERING')
-    self.assertEqual(parameters, (b'keyA', b'keyC', ['c1', 'c2']) )
+    # The limit is 5 * number of columns
+    self.assertEqual(parameters, [b'keyA', b'keyC', ['c1', 'c2'], 10])
     # And result matches expectation
     self.assertEqual(result, [
       {'keyA': {'c1': '1', 'c2': '2'}},
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+""" Unit tests for cursor_registry.py """
+
+import sys
+import time
+import unittest
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.cursor_registry import CursorRegistry
+from flexmock import flexmock
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import datastore_pb
+
+
+def make_query(project_id='guestbook', kind='Greeting', position=None):
+  query = datastore_pb.Query()
+  query.set_app(project_id)
+  query.set_kind(kind)
+  query.set_count(20)
+  if position is not None:
+    query.mutable_compiled_cursor().CopyFrom(make_cursor(position))
+  return query
+
+
+def make_cursor(name):
+  cursor = datastore_pb.CompiledCursor()
+  key = cursor.add_position().mutable_key()
+  key.set_app('guestbook')
+  element = key.mutable_path().add_element()
+  element.set_type('Greeting')
+  element.set_name(name)
+  return cursor
+
+
+class TestCursorRegistry(unittest.TestCase):
+  def test_supports(self):
+    self.assertTrue(CursorRegistry.supports(make_query()))
+
+    query = make_query()
+    query.mutable_ancestor().set_app('guestbook')
+    self.assertFalse(CursorRegistry.supports(query))
+
+    query = make_query()
+    query.mutable_transaction().set_handle(1)
+    self.assertFalse(CursorRegistry.supports(query))
+
+    query = make_query()
+    query.set_offset(5)
+    self.assertFalse(CursorRegistry.supports(query))
+
+  def test_claim(self):
+    registry = CursorRegistry()
+    registry.register(make_query(), make_cursor('a'), ['1', '2'], False)
+
+    # A different position or query shape should not match.
+    self.assertIsNone(registry.claim(make_query(position='b')))
+    self.assertIsNone(registry.claim(make_query(kind='Other', position='a')))
+
+    # The batch size does not affect the match.
+    query = make_query(position='a')
+    query.set_count(50)
+    open_cursor = registry.claim(query)
+    self.assertEqual(open_cursor.rowkeys, ['1', '2'])
+    self.assertFalse(open_cursor.exhausted)
+
+    # Results can only be claimed once.
+    self.assertIsNone(registry.claim(make_query(position='a')))
+
+  def test_ttl(self):
+    registry = CursorRegistry(ttl=10)
+    registry.register(make_query(), make_cursor('a'), ['1'], True)
+    expired = time.time() + 11
+    flexmock(time).should_receive('time').and_return(expired)
+    self.assertIsNone(registry.claim(make_query(position='a')))
+
+  def test_memory_cap(self):
+    registry = CursorRegistry(max_bytes=10)
+    registry.register(make_query(), make_cursor('a'), ['12345'], False)
+    registry.register(make_query(), make_cursor('b'), ['12345'], False)
+    registry.register(make_query(), make_cursor('c'), ['12345'], False)
+
+    # The oldest cursor is dropped to make room.
+    self.assertIsNone(registry.claim(make_query(position='a')))
+    self.assertIsNotNone(registry.claim(make_query(position='b')))
+    self.assertIsNotNone(registry.claim(make_query(position='c')))
+
+    # Results that cannot fit are not kept.
+    registry.register(make_query(), make_cursor('d'), ['12345678901'], False)
+    self.assertIsNone(registry.claim(make_query(position='d')))
+
+  def test_project_limit(self):
+    registry = CursorRegistry(max_cursors_per_project=1)
+    registry.register(make_query(), make_cursor('a'), ['1'], False)
+    registry.register(make_query(project_id='other'), make_cursor('a'),
+                      ['1'], False)
+    registry.register(make_query(), make_cursor('b'), ['1'], False)
+
+    self.assertIsNone(registry.claim(make_query(position='a')))
+    self.assertIsNotNone(registry.claim(make_query(position='b')))
+    self.assertIsNotNone(
+      registry.claim(make_query(project_id='other', position='a')))
+
+
+if __name__ == '__main__':
+  unittest.main()
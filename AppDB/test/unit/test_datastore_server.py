@@ -15,6 +15,8 @@ from appscale.datastore.datastore_distributed import DatastoreDistributed
 from appscale.datastore.dbconstants import APP_ENTITY_SCHEMA
 from appscale.datastore.dbconstants import JOURNAL_SCHEMA
 from appscale.datastore.dbconstants import TOMBSTONE
+from appscale.datastore.index_backfill import BackfillProgress
+from appscale.datastore.index_backfill import KeyRange
 from appscale.datastore.cassandra_env.entity_id_allocator import\
   ScatteredAllocator
 
@@ -212,6 +214,46 @@ class TestDatastoreServer(testing.AsyncTestCase):
     index_id = yield dd.create_composite_index("appid", index)
     assert index_id > 0
 
+  @testing.gen_test
+  def test_update_composite_index_resumes(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    index = entity_pb.CompositeIndex()
+    index.set_id(1)
+    index.set_app_id('appid')
+    index.mutable_definition().set_entity_type('kind')
+
+    # Only the unfinished range should be scanned, starting after the
+    # last processed key.
+    progress = BackfillProgress([KeyRange('a', 'b', complete=True),
+                                 KeyRange('b', 'c', position='b1')],
+                                entities=5)
+    checkpoint = flexmock(load=lambda: progress)
+    checkpoint.should_receive('save').with_args(progress).once()
+
+    references = gen.Future()
+    references.set_result([{'b2': {'reference': 'appid\x00\x00kind:b2'}}])
+    db_batch.should_receive('range_query').\
+      with_args(table_name=str, column_names=list, start_key='b1',
+                end_key='c', limit=dd.BATCH_SIZE, offset=0,
+                start_inclusive=False, end_inclusive=False).\
+      and_return(references).once()
+
+    entities = gen.Future()
+    entities.set_result(['entity'])
+    flexmock(dd).should_receive('_DatastoreDistributed__fetch_entities').\
+      and_return(entities)
+    flexmock(entity_pb).should_receive('EntityProto').and_return('entity')
+    flexmock(dd).should_receive('insert_composite_indexes').\
+      with_args(['entity'], [index]).and_return(ASYNC_NONE).once()
+
+    yield dd.update_composite_index('appid', index, checkpoint)
+    self.assertTrue(progress.complete)
+    self.assertEqual(progress.entities, 6)
+    self.assertEqual(progress.ranges[1].position, 'b2')
+
   @testing.gen_test
   def test_insert_composite_indexes(self):
     composite_index = entity_pb.CompositeIndex()
@@ -424,6 +466,218 @@ class TestDatastoreServer(testing.AsyncTestCase):
 
     yield dd.put_entities(app_id, entity_list)
 
+  @testing.gen_test
+  def test_put_entities_in_waves(self):
+    app_id = 'test'
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+
+    entity_list = []
+    current_values = {}
+    for index in range(5):
+      name = 'entity{}'.format(index)
+      entity_list.append(self.get_new_entity_proto(
+        app_id, 'test_kind', name, 'prop1name', 'prop1val', ns='blah'))
+      current_values['test\x00blah\x00test_kind:{}\x01'.format(name)] = {}
+
+    async_result = gen.Future()
+    async_result.set_result(current_values)
+
+    # Each wave reads current values once and writes one batch per group.
+    db_batch.should_receive('batch_get_entity').and_return(async_result).\
+      times(3)
+    db_batch.should_receive('normal_batch').and_return(ASYNC_NONE).times(5)
+    transaction_manager = flexmock(
+      create_transaction_id=lambda project, xg: 1,
+      delete_transaction_id=lambda project, txid: None,
+      set_groups=lambda project, txid, groups: None)
+    dd = DatastoreDistributed(db_batch, transaction_manager,
+                              self.get_zookeeper(), put_concurrency=2)
+    dd.index_manager = flexmock(
+      projects={app_id: flexmock(indexes_pb=[])})
+
+    async_true = gen.Future()
+    async_true.set_result(True)
+    entity_lock = flexmock(EntityLock)
+    entity_lock.should_receive('acquire').and_return(async_true).times(3)
+    entity_lock.should_receive('release').times(3)
+
+    yield dd.put_entities(app_id, entity_list)
+
+  @testing.gen_test
+  def test_put_entities_partial_failure(self):
+    app_id = 'test'
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+
+    entity_proto1 = self.get_new_entity_proto(
+      app_id, "test_kind", "bob", "prop1name", "prop1val", ns="blah")
+    entity_key1 = 'test\x00blah\x00test_kind:bob\x01'
+    entity_proto2 = self.get_new_entity_proto(
+      app_id, "test_kind", "nancy", "prop1name", "prop2val", ns="blah")
+    entity_key2 = 'test\x00blah\x00test_kind:nancy\x01'
+    entity_list = [entity_proto1, entity_proto2]
+    async_result = gen.Future()
+    async_result.set_result({entity_key1: {}, entity_key2: {}})
+
+    async_error = gen.Future()
+    async_error.set_exception(
+      dbconstants.AppScaleDBConnectionError('Unable to apply batch'))
+    db_batch.should_receive('batch_get_entity').and_return(async_result)
+    db_batch.should_receive('normal_batch').\
+      and_return(ASYNC_NONE).and_return(async_error)
+    transaction_manager = flexmock(
+      create_transaction_id=lambda project, xg: 1,
+      set_groups=lambda project, txid, groups: None)
+    transaction_manager.should_receive('delete_transaction_id').once()
+    dd = DatastoreDistributed(db_batch, transaction_manager,
+                              self.get_zookeeper())
+    dd.index_manager = flexmock(
+      projects={app_id: flexmock(indexes_pb=[])})
+
+    async_true = gen.Future()
+    async_true.set_result(True)
+    entity_lock = flexmock(EntityLock)
+    entity_lock.should_receive('acquire').and_return(async_true)
+    entity_lock.should_receive('release').once()
+
+    with self.assertRaises(dbconstants.AppScaleDBConnectionError):
+      yield dd.put_entities(app_id, entity_list)
+
+  @testing.gen_test
+  def test_dynamic_run_query_read_ahead(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    entities = [
+      self.get_new_entity_proto('test', 'test_kind', 'entity{}'.format(index),
+                                'prop1name', 'prop1val')
+      for index in range(5)]
+    results = gen.Future()
+    results.set_result([entity.Encode() for entity in entities])
+
+    # The query should only be run once for all batches.
+    flexmock(dd).should_receive('_DatastoreDistributed__get_query_results').\
+      and_return(results).once()
+
+    stored = {
+      utils.get_entity_key(dd.get_table_prefix(entity), entity.key().path()):
+        entity.Encode()
+      for entity in entities}
+
+    def batch_get_entity(table, rowkeys, schema):
+      response = gen.Future()
+      response.set_result({rowkey: {APP_ENTITY_SCHEMA[0]: stored[rowkey]}
+                           for rowkey in rowkeys if rowkey in stored})
+      return response
+
+    db_batch.should_receive('batch_get_entity').replace_with(batch_get_entity)
+
+    query = datastore_pb.Query()
+    query.set_app('test')
+    query.set_kind('test_kind')
+    query.set_count(2)
+    query.set_compile(True)
+    first_batch = utils.UnprocessedQueryResult()
+    yield dd._dynamic_run_query(query, first_batch)
+    self.assertEqual(first_batch.result_list(),
+                     [entity.Encode() for entity in entities[:2]])
+    self.assertTrue(first_batch.more_results())
+
+    # Later batches reflect changes made after the query was run.
+    updated = self.get_new_entity_proto('test', 'test_kind', 'entity2',
+                                        'prop1name', 'prop1val2')
+    rowkeys = sorted(stored)
+    stored[rowkeys[2]] = updated.Encode()
+    del stored[rowkeys[3]]
+
+    query.mutable_compiled_cursor().CopyFrom(first_batch.compiled_cursor())
+    second_batch = utils.UnprocessedQueryResult()
+    yield dd._dynamic_run_query(query, second_batch)
+    self.assertEqual(second_batch.result_list(),
+                     [updated.Encode(), entities[4].Encode()])
+    self.assertFalse(second_batch.more_results())
+
+  def test_extract_rowkeys_from_refs(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    refs = [{'index{}'.format(index): {'reference': 'key{}'.format(index % 3)}}
+            for index in range(6)]
+    rowkeys = dd._DatastoreDistributed__extract_rowkeys_from_refs(refs)
+    self.assertEqual(rowkeys, ['key0', 'key1', 'key2'])
+
+  def test_extract_rowkeys_from_many_refs(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    # Each entity is referenced by two index entries.
+    ref_count = 1000
+    refs = [{'index{}'.format(index): {'reference': 'key{}'.format(index / 2)}}
+            for index in range(ref_count)]
+    rowkeys = dd._DatastoreDistributed__extract_rowkeys_from_refs(refs)
+    self.assertEqual(rowkeys,
+                     ['key{}'.format(index) for index in range(ref_count / 2)])
+
+  @testing.gen_test
+  def test_fetch_entities_from_row_list(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+    flexmock(dd, REFERENCE_BATCH_SIZE=2, REFERENCE_PREFETCH_DEPTH=2)
+
+    requested = []
+    def batch_get_entity(table, rowkeys, schema):
+      requested.append(rowkeys)
+      result = gen.Future()
+      result.set_result({key: {APP_ENTITY_SCHEMA[0]: 'entity-' + key}
+                         for key in rowkeys if key != 'key3'})
+      return result
+
+    db_batch.should_receive('batch_get_entity').replace_with(batch_get_entity)
+
+    rowkeys = ['key{}'.format(index) for index in range(5)]
+    entities = yield dd._DatastoreDistributed__fetch_entities_from_row_list(
+      rowkeys)
+    self.assertEqual(requested, [['key0', 'key1'], ['key2', 'key3'], ['key4']])
+    self.assertEqual(entities, ['entity-key0', 'entity-key1', 'entity-key2',
+                                'entity-key4'])
+
+  @testing.gen_test
+  def test_fetch_and_validate_entity_set(self):
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+    flexmock(dd, REFERENCE_PREFETCH_DEPTH=3)
+
+    def batch_get_entity(table, rowkeys, schema):
+      result = gen.Future()
+      result.set_result({key: {APP_ENTITY_SCHEMA[0]: 'entity-' + key}
+                         for key in rowkeys})
+      return result
+
+    db_batch.should_receive('batch_get_entity').replace_with(batch_get_entity)
+
+    # Most of the index entries in the first chunk are stale.
+    stale = ['key{:02d}'.format(index) for index in range(1, 5)]
+    def valid_index_entry(entry, entities, direction, prop_name):
+      return entry.values()[0]['reference'] not in stale
+
+    flexmock(dd).should_receive('_DatastoreDistributed__valid_index_entry').\
+      replace_with(valid_index_entry)
+
+    index_dict = {
+      'key{:02d}'.format(index): [{'index': 'index{}'.format(index),
+                                   'prop_name': 'prop'}]
+      for index in range(40)}
+    entities = yield dd._DatastoreDistributed__fetch_and_validate_entity_set(
+      index_dict, 5, 'test', datastore_pb.Query_Order.ASCENDING)
+    self.assertEqual(entities, ['entity-key00', 'entity-key05', 'entity-key06',
+                                'entity-key07', 'entity-key08'])
+
   def test_acquire_locks_for_trans(self):
     zk_client = flexmock()
     zk_client.should_receive('add_listener')
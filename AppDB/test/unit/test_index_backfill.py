@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import json
+import unittest
+
+from flexmock import flexmock
+from kazoo.exceptions import BadVersionError
+from tornado import gen, testing
+
+from appscale.datastore import index_backfill
+from appscale.datastore.index_backfill import (
+  BackfillProgress, KeyRange, RateLimiter, split_kind_range)
+from appscale.datastore.index_manager import ProjectIndexManager
+
+PREFIX = 'guestbook\x00\x00Greeting\x01'
+
+END_ROW = PREFIX + '\xff' * 10
+
+
+def scattered_key(fraction):
+  """ Creates a kind table key for a root entity with a scattered ID. """
+  scattered_id = index_backfill.FIRST_SCATTERED_ID + int(
+    (index_backfill.LAST_SCATTERED_ID - index_backfill.FIRST_SCATTERED_ID) *
+    fraction)
+  return PREFIX + 'Greeting:{}\x01'.format(scattered_id)
+
+
+class TestSplitKindRange(unittest.TestCase):
+  def test_ranges_are_contiguous(self):
+    prefix = 'guestbook\x00\x00Greeting\x01'
+    end_row = prefix + '\xff' * 10
+    ranges = split_kind_range(prefix, 'Greeting', end_row, 4)
+
+    self.assertEqual(len(ranges), 4)
+    self.assertEqual(ranges[0].start, prefix)
+    self.assertEqual(ranges[-1].end, end_row)
+    for previous, key_range in zip(ranges, ranges[1:]):
+      self.assertEqual(previous.end, key_range.start)
+      self.assertLess(key_range.start, key_range.end)
+
+    # Sequential IDs and names sort before scattered IDs.
+    sequential_key = prefix + 'Greeting:0000000005\x01'
+    self.assertTrue(ranges[0].start <= sequential_key < ranges[0].end)
+
+    scattered_id = index_backfill.LAST_SCATTERED_ID - 5
+    scattered_key = prefix + 'Greeting:{}\x01'.format(scattered_id)
+    self.assertTrue(ranges[-1].start <= scattered_key < ranges[-1].end)
+
+
+class TestBackfillProgress(unittest.TestCase):
+  def test_encode(self):
+    progress = BackfillProgress(
+      [KeyRange('a\x00', 'b\x01', complete=True),
+       KeyRange('b\x01', 'c\xff', position='b\x02')], entities=10)
+    self.assertEqual(progress.percent_complete, 50)
+    self.assertFalse(progress.complete)
+
+    decoded = BackfillProgress.decode(progress.encode())
+    self.assertEqual(decoded.entities, 10)
+    self.assertEqual(decoded.percent_complete, 50)
+    self.assertEqual(decoded.ranges[1].start, 'b\x01')
+    self.assertEqual(decoded.ranges[1].end, 'c\xff')
+    self.assertEqual(decoded.ranges[1].position, 'b\x02')
+    self.assertIsNone(decoded.ranges[0].position)
+
+  def test_progress_within_range(self):
+    ranges = split_kind_range(PREFIX, 'Greeting', END_ROW, 2)
+    progress = BackfillProgress(ranges, entities=100)
+    self.assertEqual(progress.percent_complete, 0)
+    self.assertIsNone(progress.estimated_entities)
+
+    # Sequential IDs sort before the scattered ID space.
+    ranges[0].position = PREFIX + 'Greeting:0000000005\x01'
+    self.assertEqual(ranges[0].fraction_complete, 0)
+
+    ranges[0].position = scattered_key(0.25)
+    self.assertAlmostEqual(ranges[0].fraction_complete, 0.5, places=3)
+    self.assertEqual(progress.percent_complete, 25)
+    self.assertEqual(progress.estimated_entities, 400)
+
+    # Names sort after the scattered ID space.
+    ranges[0].complete = True
+    ranges[1].position = PREFIX + 'Greeting:bob\x01'
+    self.assertEqual(ranges[1].fraction_complete, 1)
+    self.assertEqual(progress.percent_complete, 99)
+
+    ranges[1].complete = True
+    self.assertEqual(progress.summary(),
+                     {'entities': 100, 'estimated_entities': 100,
+                      'percent_complete': 100})
+
+
+class TestBackfillStatus(unittest.TestCase):
+  def setUp(self):
+    self.indexes = [
+      {'kind': 'Greeting', 'ancestor': False, 'ready': False, 'id': 1,
+       'properties': [{'name': 'content', 'direction': 'asc'}]},
+      {'kind': 'Greeting', 'ancestor': False, 'ready': True, 'id': 2,
+       'properties': [{'name': 'date', 'direction': 'asc'}]}]
+    self.zk_client = flexmock(DataWatch=lambda node, callback: None)
+    self.zk_client.should_receive('get').\
+      and_return((json.dumps(self.indexes), flexmock(version=3)))
+    self.manager = ProjectIndexManager('guestbook', self.zk_client,
+                                       flexmock(), flexmock())
+
+  def test_status_in_metadata(self):
+    progress = BackfillProgress(
+      split_kind_range(PREFIX, 'Greeting', END_ROW, 2), entities=100)
+    progress.ranges[0].complete = True
+
+    self.zk_client.should_receive('create').once()
+    updates = []
+    self.zk_client.should_receive('set').\
+      replace_with(lambda node, value, version: updates.append(value))
+    self.manager.backfill_checkpoint(1).save(progress)
+
+    # Listings of the index metadata show how far the backfill is.
+    indexes = json.loads(updates[0])
+    self.assertEqual(indexes[0]['backfill'],
+                     {'entities': 100, 'estimated_entities': 200,
+                      'percent_complete': 50})
+    self.assertNotIn('backfill', indexes[1])
+
+  def test_concurrent_index_update(self):
+    progress = BackfillProgress([KeyRange(PREFIX, END_ROW)])
+    self.zk_client.should_receive('create')
+    self.zk_client.should_receive('set').and_raise(BadVersionError)
+
+    # A stale status is not worth failing the backfill over.
+    self.manager.backfill_checkpoint(1).save(progress)
+
+
+class TestRateLimiter(testing.AsyncTestCase):
+  @testing.gen_test
+  def test_wait(self):
+    sleeps = []
+
+    def fake_sleep(duration):
+      sleeps.append(duration)
+      return gen.moment
+
+    flexmock(gen).should_receive('sleep').replace_with(fake_sleep)
+    limiter = RateLimiter(100)
+    yield limiter.wait(50)
+    yield limiter.wait(50)
+    self.assertEqual(len(sleeps), 1)
+    self.assertAlmostEqual(sleeps[0], 0.5, places=1)
+
+  @testing.gen_test
+  def test_unlimited(self):
+    flexmock(gen).should_receive('sleep').never()
+    limiter = RateLimiter(None)
+    yield limiter.wait(1000)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+""" Unit tests for range_iterator.py """
+
+import sys
+import unittest
+
+from tornado import gen, testing
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.range_iterator import RangeExhausted, RangeIterator
+from appscale.datastore.utils import encode_index_pb
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import entity_pb
+
+
+def make_path(entity_id):
+  path = entity_pb.Path()
+  element = path.add_element()
+  element.set_type('Greeting')
+  element.set_name('entity{:05d}'.format(entity_id))
+  return path
+
+
+class FakeIndex(object):
+  """ Serves range queries from a sorted list of index keys. """
+  def __init__(self, prefix, entity_ids):
+    self.keys = [prefix + str(encode_index_pb(make_path(entity_id)))
+                 for entity_id in entity_ids]
+    self.queries = []
+
+  def range_query(self, table_name, column_names, start_key, end_key, limit,
+                  start_inclusive=True):
+    self.queries.append((start_key, limit))
+    if start_inclusive:
+      keys = [key for key in self.keys if start_key <= key <= end_key]
+    else:
+      keys = [key for key in self.keys if start_key < key <= end_key]
+
+    result = gen.Future()
+    result.set_result([{key: {'reference': key}} for key in keys[:limit]])
+    return result
+
+
+class TestRangeIterator(testing.AsyncTestCase):
+  def make_range(self, entity_ids):
+    value = entity_pb.PropertyValue()
+    value.set_stringvalue('value')
+    range_ = RangeIterator(None, 'guestbook', '', 'Greeting', 'prop', value)
+    index = FakeIndex(range_.prefix, entity_ids)
+    range_._db = index
+    return range_, index
+
+  @gen.coroutine
+  def read_all(self, range_):
+    paths = []
+    while True:
+      try:
+        entry = yield range_.async_next()
+      except RangeExhausted:
+        raise gen.Return(paths)
+
+      paths.append(entry.path.element(0).name())
+
+  @testing.gen_test
+  def test_sequential_reads_grow_and_prefetch(self):
+    range_, index = self.make_range(range(300))
+    range_._chunk_size = 50
+
+    names = yield self.read_all(range_)
+    self.assertEqual(names, ['entity{:05d}'.format(entity_id)
+                             for entity_id in range(300)])
+    # After the first chunk is read through, chunks grow and the next one is
+    # requested as soon as a chunk arrives.
+    self.assertEqual([limit for _, limit in index.queries],
+                     [50, 100, 100, 200])
+    self.assertEqual(range_.rows_scanned, 300)
+
+  @testing.gen_test
+  def test_skips_shrink_chunks(self):
+    range_, index = self.make_range(range(10000))
+
+    for entity_id in range(0, 10000, 2000):
+      range_.set_cursor(make_path(entity_id), inclusive=True)
+      entry = yield range_.async_next()
+      self.assertEqual(entry.path.element(0).name(),
+                       'entity{:05d}'.format(entity_id))
+
+    self.assertEqual([limit for _, limit in index.queries],
+                     [1000, 500, 250, 125, 62])
+    self.assertEqual(range_.rows_scanned, 1937)
+
+  @testing.gen_test
+  def test_cursor_moves_within_cache(self):
+    range_, index = self.make_range(range(100))
+
+    yield range_.async_next()
+    range_.set_cursor(make_path(50), inclusive=False)
+    entry = yield range_.async_next()
+    self.assertEqual(entry.path.element(0).name(), 'entity00051')
+    self.assertEqual(len(index.queries), 1)
+
+  @testing.gen_test
+  def test_stale_prefetch_is_discarded(self):
+    range_, index = self.make_range(range(1000))
+    range_._chunk_size = 50
+    range_.MIN_CHUNK_SIZE = 10
+
+    # Read the first chunk through so that the next one is prefetched.
+    for _ in range(51):
+      yield range_.async_next()
+
+    self.assertEqual(len(index.queries), 3)
+
+    # Jump past both cached chunks.
+    range_.set_cursor(make_path(900), inclusive=True)
+    entry = yield range_.async_next()
+    self.assertEqual(entry.path.element(0).name(), 'entity00900')
+    self.assertEqual(len(index.queries), 4)
+
+
+if __name__ == "__main__":
+  unittest.main()
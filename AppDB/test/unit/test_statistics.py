@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import sys
+import unittest
+
+from flexmock import flexmock
+from tornado import gen, testing
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore import statistics
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import datastore_pb
+
+
+@statistics.traced('db_time', 'db_calls', count_rows=len)
+@gen.coroutine
+def fetch_rows(rows):
+  yield gen.moment
+  raise gen.Return(rows)
+
+
+@statistics.traced('lock_time')
+@gen.coroutine
+def acquire_lock():
+  yield gen.moment
+  raise gen.Return(True)
+
+
+class TestRequestTracing(testing.AsyncTestCase):
+  @gen.coroutine
+  def handle_request(self, rows):
+    yield acquire_lock()
+    self.assertEqual(statistics.current_request().method, 'RunQuery')
+    for batch in rows:
+      yield fetch_rows(batch)
+
+  @testing.gen_test
+  def test_traced_calls(self):
+    request_info = statistics.start_request(app='guestbook', method='RunQuery')
+    with statistics.request_context(request_info):
+      future = self.handle_request([['a', 'b'], ['c']])
+
+    self.assertIsNone(statistics.current_request())
+    yield future
+    self.assertEqual(request_info.db_calls, 2)
+    self.assertEqual(request_info.rows_scanned, 3)
+    self.assertGreaterEqual(request_info.lock_time, 0)
+    request_info.finalize(status=0)
+
+  @gen.coroutine
+  def fail_query(self):
+    statistics.current_request().strategy = 'failing_query'
+    yield fetch_rows(['a'])
+    raise ValueError('The query failed')
+
+  @testing.gen_test
+  def test_failed_query(self):
+    request_info = statistics.start_request(app='guestbook', method='RunQuery',
+                                            status=1)
+    with statistics.request_context(request_info):
+      future = self.fail_query()
+
+    with self.assertRaises(ValueError):
+      yield future
+
+    request_info.finalize()
+
+    # Queries that fail before returning rows still count towards the stats.
+    stats = statistics.service_stats.get_recent()['by_strategy']
+    self.assertEqual(stats['failing_query']['all'], 1)
+    self.assertEqual(stats['failing_query']['avg_rows_scanned'], 1)
+    self.assertEqual(stats['failing_query']['avg_rows_returned'], 0)
+
+  @testing.gen_test
+  def test_untraced_calls(self):
+    rows = yield fetch_rows(['a'])
+    self.assertEqual(rows, ['a'])
+
+
+class TestSlowQueryLog(unittest.TestCase):
+  def test_query_shape(self):
+    query = datastore_pb.Query()
+    query.set_app('guestbook')
+    query.set_kind('Greeting')
+    query.mutable_ancestor().set_app('guestbook')
+    filter_ = query.add_filter()
+    filter_.set_op(datastore_pb.Query_Filter.GREATER_THAN)
+    prop = filter_.add_property()
+    prop.set_name('date')
+    prop.set_multiple(False)
+    prop.mutable_value().set_int64value(5)
+    order = query.add_order()
+    order.set_property('date')
+    order.set_direction(datastore_pb.Query_Order.DESCENDING)
+
+    self.assertEqual(statistics.query_shape(query),
+                     'kind=Greeting ancestor filters=[date >] '
+                     'orders=[date DESC]')
+
+  def test_threshold(self):
+    request_info = flexmock(app='guestbook', latency=50, query_shape='kind=A',
+                            strategy='kind_query', rows_scanned=10,
+                            rows_returned=1, lock_time=0, db_time=40,
+                            db_calls=2)
+    logger = flexmock(statistics.logger)
+
+    logger.should_receive('warning').never()
+    statistics.SlowQueryLog(threshold=None).check(request_info)
+    statistics.SlowQueryLog(threshold=100).check(request_info)
+
+    logger.should_receive('warning').once()
+    statistics.SlowQueryLog(threshold=50).check(request_info)
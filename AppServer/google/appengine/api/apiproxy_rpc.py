@@ -27,11 +27,15 @@
 
 
 
-# AppScale: os and threading are needed to implement async-capable RPC.
+# AppScale: These are needed to implement async-capable RPC.
+import functools
 import os
+import Queue
 import sys
 import threading
 
+from google.appengine.runtime import request_environment
+
 class RPC(object):
   """Base class for implementing RPC of API proxy stubs.
 
@@ -172,11 +176,97 @@ class RPC(object):
         self._exception._appengine_apiproxy_rpc = self
         raise
 
-# AppScale: Use thread to start RPC during _MakeCallImpl instead of during
-# _WaitImpl.
+
+# AppScale: Use a bounded pool of worker threads to run RPCs instead of
+# creating a thread for each call.
+MAX_RPC_WORKERS = 20
+
+
+class _RPCExecutor(object):
+  """ Runs RPC calls on a bounded set of daemon worker threads.
+
+  Workers are started as needed up to max_workers. Calls made when every
+  worker is busy wait in the queue. Workers use the stdlib threading module
+  that was imported before the sandbox was enabled, so they are not
+  attributed to the request that happened to start them.
+  """
+  def __init__(self, max_workers):
+    """ Creates a new _RPCExecutor.
+
+    Args:
+      max_workers: An integer specifying the maximum number of threads.
+    """
+    self._max_workers = max_workers
+    self._queue = Queue.Queue()
+    self._workers = 0
+    self._idle = 0
+    self._lock = threading.Lock()
+    self._pid = os.getpid()
+
+  def Submit(self, function):
+    """ Schedules a function to run on a worker thread.
+
+    Args:
+      function: A callable that takes no arguments.
+    """
+    with self._lock:
+      # Worker threads do not survive a fork.
+      if self._pid != os.getpid():
+        self._queue = Queue.Queue()
+        self._workers = 0
+        self._idle = 0
+        self._pid = os.getpid()
+
+      self._queue.put(function)
+      if self._idle > 0:
+        self._idle -= 1
+        return
+
+      if self._workers < self._max_workers:
+        self._workers += 1
+        worker = threading.Thread(target=self._Work, args=(self._queue,),
+                                  name='RPCWorker-%d' % self._workers)
+        worker.daemon = True
+        worker.start()
+
+  def _Work(self, queue):
+    """ Runs queued functions until the process exits.
+
+    Args:
+      queue: A Queue.Queue containing the functions to run.
+    """
+    while True:
+      function = queue.get()
+      try:
+        function()
+      except Exception:
+        pass
+
+      with self._lock:
+        self._idle += 1
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _GetExecutor():
+  """ Retrieves the executor for this process, creating it if necessary.
+
+  Returns:
+    An _RPCExecutor.
+  """
+  global _executor
+  with _executor_lock:
+    if _executor is None:
+      _executor = _RPCExecutor(MAX_RPC_WORKERS)
+
+  return _executor
+
+
 class RealRPC(RPC):
-  """ Overrides the RPC class to implement real asynchronous RPC calls using 
-      Threads.
+  """ Overrides the RPC class to implement real asynchronous RPC calls using
+      a pool of worker threads.
   """
   def __init__(self, stub=None):
     """ Create a RealRPC instance.
@@ -186,34 +276,38 @@ class RealRPC(RPC):
     """
     super(RealRPC, self).__init__(stub=stub)
     self._exc_info = None
-    self._exc_info_lock = threading.Lock()
+    self._done = None
 
   def _MakeCallImpl(self):
-    """ Starts the thread which calls upon the service RPC."""
-    args = [self.package, self.call, self.request, self.response]
-
-    # If this call is made in the sandbox, pass the request ID and environment
-    # variables explicitly since they are lost in new threads.
+    """ Schedules the service RPC on a worker thread. """
+    # The request ID and request environment are stored in thread locals, so
+    # they are passed to the worker explicitly.
+    request_id = None
     if hasattr(self.stub, '_GetRequestId'):
-      args.extend([self.stub._GetRequestId(), os.environ.copy()])
+      request_id = self.stub._GetRequestId()
+
+    install_environment = (
+      request_environment.current_request.CloneRequestEnvironment())
 
-    self._thread = threading.Thread(target=self._make_sync_call, args=args)
-    self._thread.start()
+    self._done = threading.Event()
     self._state = RPC.RUNNING
+    _GetExecutor().Submit(
+      functools.partial(self._make_sync_call, self.package, self.call,
+                        self.request, self.response, request_id,
+                        install_environment))
 
   def _WaitImpl(self):
-    """ Waiting on an RPC call thread to complete """
-    self._thread.join()
-    with self._exc_info_lock:
-      if self._exc_info is not None:
-        _, self._exception, self._traceback = self._exc_info
+    """ Waiting on an RPC call to complete """
+    self._done.wait()
+    if self._exc_info is not None:
+      _, self._exception, self._traceback = self._exc_info
 
     self._state = RPC.FINISHING
     self._Callback()
     return True
 
-  def _make_sync_call(self, service, call, request, response, request_id=None,
-                      os_environ=None):
+  def _make_sync_call(self, service, call, request, response, request_id,
+                      install_environment):
     """ A wrapper for MakeSyncCall that handles exceptions.
 
     Args:
@@ -222,17 +316,21 @@ class RealRPC(RPC):
       request: A ProtocolMessage instance that specifies request properties.
       response: A ProtocolMessage instance that the response populates.
       request_id: A string specifying the request ID.
-      os_environ: A dictionary containing the parent thread's environment.
+      install_environment: A callable that installs the calling thread's
+        request environment.
     """
-    if request_id is not None and hasattr(self.stub, '_SetRequestId'):
+    if hasattr(self.stub, '_SetRequestId'):
       self.stub._SetRequestId(request_id)
 
-    if os_environ is not None:
-      os.environ.update(os_environ)
+    install_environment()
 
     try:
       self.stub.MakeSyncCall(service, call, request, response)
     except Exception:
       # Store exception info so calling thread can access it.
-      with self._exc_info_lock:
-        self._exc_info = sys.exc_info()
+      self._exc_info = sys.exc_info()
+    finally:
+      # Workers are reused, so nothing from this request should remain.
+      request_environment.current_request.Clear()
+
+      self._done.set()
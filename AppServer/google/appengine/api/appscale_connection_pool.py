@@ -0,0 +1,284 @@
+""" A thread-safe pool of persistent HTTP connections to AppScale services. """
+
+import collections
+import errno
+import httplib
+import random
+import select
+import socket
+import threading
+import time
+
+# The maximum number of idle connections to keep for each host.
+MAX_IDLE_CONNECTIONS = 10
+
+# The number of seconds an idle connection can be reused for. This should be
+# lower than the client timeout of the load balancer in front of the service.
+IDLE_TIMEOUT = 30
+
+# The number of seconds to avoid a host after it refuses a connection.
+DOWN_TIME = 5
+
+# The number of times a request can fail over to a different host.
+MAX_FAILOVERS = 5
+
+# Connection errors that indicate another host should be tried.
+FAILOVER_ERRNOS = (errno.ECONNREFUSED, errno.EHOSTUNREACH)
+
+# Errors that indicate a reused connection was closed by the server before the
+# request could be sent.
+STALE_ERRNOS = (errno.ECONNRESET, errno.EPIPE)
+
+
+def _is_open(connection):
+  """ Checks if an idle connection can still be used.
+
+  An idle connection should not have anything to read. If it does, the server
+  has either closed it or sent unexpected data.
+
+  Args:
+    connection: An httplib.HTTPConnection.
+  Returns:
+    A boolean indicating whether or not the connection can be reused.
+  """
+  if connection.sock is None:
+    return False
+
+  try:
+    readable, _, _ = select.select([connection.sock], [], [], 0)
+  except (select.error, ValueError):
+    return False
+
+  return not readable
+
+
+class HTTPConnectionPool(object):
+  """ Keeps persistent connections to a service for protocol buffer RPCs.
+
+  Idle connections are kept for each host and are checked before they are
+  reused. If the preferred host refuses connections, requests fail over to
+  the hosts returned by fallback_locations.
+  """
+  def __init__(self, location, fallback_locations=None, secure=False,
+               key_file=None, cert_file=None,
+               max_idle=MAX_IDLE_CONNECTIONS, idle_timeout=IDLE_TIMEOUT):
+    """ Creates a new HTTPConnectionPool.
+
+    Args:
+      location: A string specifying the preferred host and port.
+      fallback_locations: A function that returns a list of alternative
+        locations to use when the preferred host is down.
+      secure: A boolean indicating whether or not to use HTTPS.
+      key_file: A string specifying the location of the SSL private key.
+      cert_file: A string specifying the location of the SSL certificate.
+      max_idle: An integer specifying how many idle connections to keep for
+        each host.
+      idle_timeout: An integer specifying how many seconds an idle connection
+        can be reused for.
+    """
+    self.location = location
+    self.secure = secure
+    self.key_file = key_file
+    self.cert_file = cert_file
+    self._fallback_locations = fallback_locations
+    self._max_idle = max_idle
+    self._idle_timeout = idle_timeout
+
+    # Idle connections and the time they were last used for each location.
+    self._idle = collections.defaultdict(collections.deque)
+
+    # The time until which each location should be avoided.
+    self._down_until = {}
+
+    self._lock = threading.Lock()
+
+  def post(self, body, headers, path='/'):
+    """ Sends a POST request, failing over to another host if necessary.
+
+    Args:
+      body: A string containing the request body.
+      headers: A list of (header, value) tuples.
+      path: A string specifying the request path.
+    Returns:
+      A tuple containing the response status, the Location header, and the
+      response body.
+    Raises:
+      socket.error if no host could handle the request.
+    """
+    location = self._choose_location()
+    failovers = 0
+    while True:
+      try:
+        return self._post_to(location, body, headers, path)
+      except socket.error as error:
+        if error.errno not in FAILOVER_ERRNOS:
+          raise
+
+        self._mark_down(location)
+        failovers += 1
+        if failovers > MAX_FAILOVERS:
+          raise
+
+        location = self._choose_location()
+
+  def get_connection(self):
+    """ Retrieves a connection to the preferred host.
+
+    This can be used for requests that post does not support, such as ones
+    with streamed bodies. Connections that can be reused should be given back
+    with return_connection.
+
+    Returns:
+      A tuple containing a connection and a boolean indicating whether or not
+      it was reused.
+    """
+    return self._get_connection(self.location)
+
+  def return_connection(self, connection):
+    """ Keeps a connection to the preferred host for future requests.
+
+    Args:
+      connection: An httplib.HTTPConnection with no outstanding response.
+    """
+    self._return_connection(self.location, connection)
+
+  def close(self):
+    """ Closes all idle connections. """
+    with self._lock:
+      idle_lists = self._idle.values()
+      self._idle = collections.defaultdict(collections.deque)
+
+    for idle in idle_lists:
+      for connection, _ in idle:
+        connection.close()
+
+  def _choose_location(self):
+    """ Selects a host that is not known to be down.
+
+    Returns:
+      A string specifying a host and port.
+    """
+    now = time.time()
+    if self._down_until.get(self.location, 0) <= now:
+      return self.location
+
+    fallbacks = []
+    if self._fallback_locations is not None:
+      fallbacks = self._fallback_locations()
+
+    available = [location for location in fallbacks
+                 if self._down_until.get(location, 0) <= now]
+    if available:
+      return random.choice(available)
+
+    # If every host has failed recently, try one of them anyway.
+    return random.choice(fallbacks or [self.location])
+
+  def _mark_down(self, location):
+    """ Avoids a host for a while and discards its idle connections.
+
+    Args:
+      location: A string specifying a host and port.
+    """
+    with self._lock:
+      self._down_until[location] = time.time() + DOWN_TIME
+      idle = self._idle.pop(location, ())
+
+    for connection, _ in idle:
+      connection.close()
+
+  def _new_connection(self, location):
+    """ Creates a connection to a host.
+
+    Args:
+      location: A string specifying a host and port.
+    Returns:
+      An httplib.HTTPConnection.
+    """
+    if self.secure:
+      return httplib.HTTPSConnection(location, key_file=self.key_file,
+                                     cert_file=self.cert_file)
+
+    return httplib.HTTPConnection(location)
+
+  def _get_connection(self, location):
+    """ Retrieves a healthy idle connection or creates a new one.
+
+    Args:
+      location: A string specifying a host and port.
+    Returns:
+      A tuple containing a connection and a boolean indicating whether or not
+      it was reused.
+    """
+    oldest_allowed = time.time() - self._idle_timeout
+    while True:
+      with self._lock:
+        try:
+          connection, last_used = self._idle[location].pop()
+        except IndexError:
+          break
+
+      if last_used >= oldest_allowed and _is_open(connection):
+        return connection, True
+
+      connection.close()
+
+    return self._new_connection(location), False
+
+  def _return_connection(self, location, connection):
+    """ Keeps a connection around for future requests.
+
+    Args:
+      location: A string specifying a host and port.
+      connection: An httplib.HTTPConnection.
+    """
+    with self._lock:
+      idle = self._idle[location]
+      if len(idle) < self._max_idle:
+        idle.append((connection, time.time()))
+        return
+
+    connection.close()
+
+  def _post_to(self, location, body, headers, path):
+    """ Sends a POST request to a specific host.
+
+    Args:
+      location: A string specifying a host and port.
+      body: A string containing the request body.
+      headers: A list of (header, value) tuples.
+      path: A string specifying the request path.
+    Returns:
+      A tuple containing the response status, the Location header, and the
+      response body.
+    """
+    while True:
+      connection, reused = self._get_connection(location)
+      try:
+        connection.request('POST', path, body, dict(headers))
+      except socket.error as error:
+        connection.close()
+        # The request did not reach the server, so it can safely be sent
+        # again on a new connection.
+        if reused and error.errno in STALE_ERRNOS:
+          continue
+        raise
+      except Exception:
+        connection.close()
+        raise
+
+      # Once the request has been sent, the server might have handled it, so
+      # failures are not retried.
+      try:
+        response = connection.getresponse()
+        response_body = response.read()
+      except Exception:
+        connection.close()
+        raise
+
+      if response.will_close:
+        connection.close()
+      else:
+        self._return_connection(location, connection)
+
+      return response.status, response.getheader('Location'), response_body
@@ -0,0 +1,224 @@
+""" Lets a runtime call AppScale's datastore, memcache, and taskqueue services
+without going through the devappserver2 API server. """
+
+import errno
+import imp
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from google.appengine.api import apiproxy_rpc
+from google.appengine.api import apiproxy_stub_map
+
+# The environment variable that devappserver2 uses to pass settings for the
+# in-process stubs to runtime instances.
+SETTINGS_ENV = 'APPSCALE_DIRECT_API_CALLS'
+
+# The services that can be called directly.
+DIRECT_SERVICES = ('datastore_v3', 'memcache', 'taskqueue')
+
+# Errors that indicate a request never reached the service.
+UNREACHABLE_ERRNOS = (errno.ECONNREFUSED, errno.EHOSTUNREACH,
+                      errno.ENETUNREACH)
+
+# The number of seconds to use the API server after a service is unreachable.
+RETRY_DIRECT_INTERVAL = 30
+
+# Datastore calls that create or use state kept by the stub that handles them.
+STATEFUL_DATASTORE_CALLS = frozenset(['RunQuery', 'Next', 'BeginTransaction',
+                                      'AddActions', 'Commit', 'Rollback'])
+
+
+def datastore_can_fall_back(call, request):
+  """ Checks if a datastore call can be sent through the API server.
+
+  Args:
+    call: A string specifying the method name.
+    request: A protocol buffer request.
+  Returns:
+    A boolean indicating whether or not the call can use the API server.
+  """
+  return call not in STATEFUL_DATASTORE_CALLS
+
+
+def taskqueue_can_fall_back(call, request):
+  """ Checks if a taskqueue call can be sent through the API server.
+
+  Transactional tasks are recorded by the datastore stub that handles the
+  transaction, so they must be added by the in-process stub.
+
+  Args:
+    call: A string specifying the method name.
+    request: A protocol buffer request.
+  Returns:
+    A boolean indicating whether or not the call can use the API server.
+  """
+  if call == 'Add':
+    return not request.has_transaction()
+
+  if call == 'BulkAdd':
+    return not any(add_request.has_transaction()
+                   for add_request in request.add_request_list())
+
+  return True
+
+
+class FallbackStub(object):
+  """ Makes calls with an in-process stub and uses a remote stub when the
+  service cannot be reached directly. """
+  def __init__(self, direct_stub, fallback_stub, can_fall_back=None,
+               retry_interval=RETRY_DIRECT_INTERVAL):
+    """ Creates a new FallbackStub.
+
+    Args:
+      direct_stub: An APIProxyStub that calls the service.
+      fallback_stub: A RemoteStub that sends calls to the API server.
+      can_fall_back: A function that takes a method name and a request and
+        returns a boolean indicating whether or not the call can use the
+        fallback stub. If None, every call can.
+      retry_interval: A float specifying the number of seconds to use the
+        fallback stub after the service is unreachable.
+    """
+    self.direct_stub = direct_stub
+    self.fallback_stub = fallback_stub
+    self._can_fall_back = can_fall_back or (lambda call, request: True)
+    self._retry_interval = retry_interval
+    self._direct_down_until = 0
+    self._lock = threading.Lock()
+
+  def _GetRequestId(self):
+    """ Returns the ID of the request associated with the current thread. """
+    return self.fallback_stub._GetRequestId()
+
+  def _SetRequestId(self, request_id):
+    """ Sets the ID of the request associated with the current thread. """
+    self.fallback_stub._SetRequestId(request_id)
+
+  def MakeSyncCall(self, service, call, request, response):
+    """ Makes a call with the in-process stub when possible.
+
+    Args:
+      service: A string specifying the service name.
+      call: A string specifying the method name.
+      request: A protocol buffer request.
+      response: A protocol buffer response to fill in.
+    """
+    request_id = self._GetRequestId()
+    if not self._can_fall_back(call, request):
+      self.direct_stub.MakeSyncCall(service, call, request, response,
+                                    request_id)
+      return
+
+    if time.time() >= self._direct_down_until:
+      try:
+        self.direct_stub.MakeSyncCall(service, call, request, response,
+                                      request_id)
+        return
+      except socket.error as error:
+        if error.errno not in UNREACHABLE_ERRNOS:
+          raise
+
+        self._MarkDown(service, error)
+
+    self.fallback_stub.MakeSyncCall(service, call, request, response)
+
+  def _MarkDown(self, service, error):
+    """ Sends calls through the API server for a while.
+
+    Args:
+      service: A string specifying the service name.
+      error: The socket.error that the in-process stub raised.
+    """
+    with self._lock:
+      now = time.time()
+      if now < self._direct_down_until:
+        return
+      self._direct_down_until = now + self._retry_interval
+
+    logging.warning(
+      'Unable to reach {service} directly ({error}). Using the API server '
+      'for {interval}s'.format(service=service, error=error,
+                               interval=self._retry_interval))
+
+  def CreateRPC(self):
+    """ Creates an RPC that can be used asynchronously. """
+    # See RuntimeRemoteStub.CreateRPC.
+    if imp.lock_held():
+      return apiproxy_rpc.RPC(stub=self)
+    else:
+      return apiproxy_rpc.RealRPC(stub=self)
+
+
+def _create_datastore_stub(app_id, application_root, nginx_host, settings):
+  """ Creates a datastore stub that connects to AppScale's datastore. """
+  from google.appengine.api import datastore_distributed
+  return datastore_distributed.DatastoreDistributed(
+    app_id, settings['datastore_path'],
+    require_indexes=settings.get('require_indexes', False),
+    trusted=settings.get('trusted', False), root_path=application_root,
+    batch_window=settings.get('datastore_batch_window'),
+    load_balancers=datastore_distributed.get_load_balancers())
+
+
+def _create_memcache_stub(app_id, application_root, nginx_host, settings):
+  """ Creates a memcache stub that connects to AppScale's memcached servers. """
+  from google.appengine.api.memcache import memcache_distributed
+  return memcache_distributed.MemcacheService()
+
+
+def _create_taskqueue_stub(app_id, application_root, nginx_host, settings):
+  """ Creates a taskqueue stub that connects to AppScale's TaskQueue. """
+  from google.appengine.api.taskqueue import taskqueue_distributed
+  return taskqueue_distributed.TaskQueueServiceStub(
+    app_id, nginx_host,
+    locations=taskqueue_distributed.get_proxy_locations())
+
+
+_STUB_FACTORIES = {
+  'datastore_v3': (_create_datastore_stub, datastore_can_fall_back),
+  'memcache': (_create_memcache_stub, None),
+  'taskqueue': (_create_taskqueue_stub, taskqueue_can_fall_back)
+}
+
+
+def get_settings():
+  """ Reads the settings that devappserver2 passed to the runtime.
+
+  Returns:
+    A dictionary of settings or None if direct calls are not enabled.
+  """
+  settings = os.environ.get(SETTINGS_ENV)
+  if not settings:
+    return None
+
+  return json.loads(settings)
+
+
+def setup_direct_stubs(app_id, application_root, nginx_host, settings):
+  """ Replaces the remote stubs for DIRECT_SERVICES with in-process stubs.
+
+  This must be called before the sandbox is enabled because the stubs read
+  deployment files that the application cannot access. Services whose stubs
+  cannot be created keep using the API server.
+
+  Args:
+    app_id: A string specifying the application ID.
+    application_root: A string specifying the application's directory.
+    nginx_host: A string specifying the host that tasks are sent to.
+    settings: A dictionary of settings from get_settings.
+  """
+  for service in DIRECT_SERVICES:
+    create_stub, can_fall_back = _STUB_FACTORIES[service]
+    remote_stub = apiproxy_stub_map.apiproxy.GetStub(service)
+    try:
+      direct_stub = create_stub(app_id, application_root, nginx_host, settings)
+    except Exception:
+      logging.exception(
+        'Unable to call {} directly. Using the API server'.format(service))
+      continue
+
+    apiproxy_stub_map.apiproxy.ReplaceStub(
+      service, FallbackStub(direct_stub, remote_stub, can_fall_back))
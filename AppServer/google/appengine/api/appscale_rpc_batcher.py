@@ -0,0 +1,203 @@
+""" Coalesces concurrent API calls into fewer requests to AppScale services. """
+
+import logging
+import sys
+import threading
+import time
+
+from appscale.common.service_stats import metrics
+
+# The maximum number of items (e.g. keys) in a combined request.
+MAX_BATCH_SIZE = 500
+
+# The number of seconds between batching summaries in the log.
+STATS_LOG_INTERVAL = 60
+
+
+class BatchStats(object):
+  """ Keeps histograms of batch sizes and of the time calls spend queued. """
+  def __init__(self):
+    """ Creates a new BatchStats object. """
+    self.calls = 0
+    self.batches = 0
+    self.calls_per_batch = {}
+    self.queue_delay = {}
+    self._lock = threading.Lock()
+
+  def add_batch(self, size, delays):
+    """ Records a combined request.
+
+    Args:
+      size: An integer specifying the number of calls in the batch.
+      delays: A list of floats specifying how many seconds each call waited
+        before the batch was sent.
+    """
+    with self._lock:
+      self.batches += 1
+      self.calls += size
+      bucket = metrics.bucket_of(size)
+      self.calls_per_batch[bucket] = self.calls_per_batch.get(bucket, 0) + 1
+      for delay in delays:
+        bucket = metrics.bucket_of(delay * 1000)
+        self.queue_delay[bucket] = self.queue_delay.get(bucket, 0) + 1
+
+  def to_dict(self):
+    """ Generates a summary of the batches sent so far.
+
+    Returns:
+      A dictionary containing batching statistics. Queue delays are in
+      milliseconds.
+    """
+    with self._lock:
+      calls_per_batch = dict(self.calls_per_batch)
+      queue_delay = dict(self.queue_delay)
+      calls = self.calls
+      batches = self.batches
+
+    return {
+      'calls': calls,
+      'batches': batches,
+      'calls_per_batch': calls_per_batch,
+      'calls_per_batch_p50': metrics.histogram_percentile(calls_per_batch, 50),
+      'calls_per_batch_p99': metrics.histogram_percentile(calls_per_batch, 99),
+      'queue_delay': queue_delay,
+      'queue_delay_p50': metrics.histogram_percentile(queue_delay, 50),
+      'queue_delay_p99': metrics.histogram_percentile(queue_delay, 99)
+    }
+
+
+class _Batch(object):
+  """ Calls that will be sent together. """
+  def __init__(self):
+    self.items = []
+    self.arrivals = []
+    self.size = 0
+    self.ready = threading.Event()
+    self.done = threading.Event()
+    self.results = None
+    self.exc_info = None
+
+
+class RPCBatcher(object):
+  """ Combines calls that arrive within a short window into one request.
+
+  The first call for a group waits for the window to pass while later calls
+  for the same group join it. The first call then sends the combined request
+  on behalf of the others and every call receives its own result.
+  """
+  def __init__(self, send_batch, window, name, max_size=MAX_BATCH_SIZE):
+    """ Creates a new RPCBatcher.
+
+    Args:
+      send_batch: A function that takes a group key and a list of items and
+        returns a list with a result or an exception for each item.
+      window: A float specifying the number of seconds to wait for other calls.
+      name: A string used to identify the batcher in logs.
+      max_size: An integer specifying the maximum combined size of a batch.
+    """
+    self.stats = BatchStats()
+    self._send_batch = send_batch
+    self._window = window
+    self._name = name
+    self._max_size = max_size
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._last_log = time.time()
+
+  def call(self, group, item, size=1):
+    """ Adds an item to a batch and waits for its result.
+
+    Args:
+      group: A hashable object. Only items with the same group are combined.
+      item: An object to pass to send_batch.
+      size: An integer specifying how much the item counts towards max_size.
+    Returns:
+      The result for the item.
+    Raises:
+      The exception that send_batch raised or returned for the item.
+    """
+    with self._lock:
+      batch = self._pending.get(group)
+      if batch is not None and batch.size + size > self._max_size:
+        self._close(group, batch)
+        batch = None
+
+      leader = batch is None
+      if leader:
+        batch = _Batch()
+        self._pending[group] = batch
+
+      index = len(batch.items)
+      batch.items.append(item)
+      batch.arrivals.append(time.time())
+      batch.size += size
+      if batch.size >= self._max_size:
+        self._close(group, batch)
+
+    if leader:
+      batch.ready.wait(self._window)
+      with self._lock:
+        self._close(group, batch)
+
+      self._send(group, batch)
+    else:
+      batch.done.wait()
+
+    if batch.exc_info is not None:
+      raise batch.exc_info[0], batch.exc_info[1], batch.exc_info[2]
+
+    result = batch.results[index]
+    if isinstance(result, Exception):
+      raise result
+
+    return result
+
+  def _close(self, group, batch):
+    """ Stops a batch from accepting items. Must be called with the lock held.
+
+    Args:
+      group: The batch's group key.
+      batch: A _Batch object.
+    """
+    if self._pending.get(group) is batch:
+      del self._pending[group]
+
+    batch.ready.set()
+
+  def _send(self, group, batch):
+    """ Sends a batch and makes the results available to its calls.
+
+    Args:
+      group: The batch's group key.
+      batch: A _Batch object.
+    """
+    sent = time.time()
+    try:
+      batch.results = self._send_batch(group, batch.items)
+    except Exception:
+      batch.exc_info = sys.exc_info()
+    finally:
+      batch.done.set()
+
+    self.stats.add_batch(len(batch.items),
+                         [sent - arrival for arrival in batch.arrivals])
+    self._maybe_log_stats()
+
+  def _maybe_log_stats(self):
+    """ Logs a summary of batching statistics every STATS_LOG_INTERVAL. """
+    now = time.time()
+    with self._lock:
+      if now - self._last_log < STATS_LOG_INTERVAL:
+        return
+      self._last_log = now
+
+    stats = self.stats.to_dict()
+    logging.info(
+      '{name} batching: {calls} calls in {batches} requests, calls per '
+      'request p50={size_p50} p99={size_p99}, queue delay '
+      'p50={delay_p50}ms p99={delay_p99}ms'.format(
+        name=self._name, calls=stats['calls'], batches=stats['batches'],
+        size_p50=stats['calls_per_batch_p50'],
+        size_p99=stats['calls_per_batch_p99'],
+        delay_p50=stats['queue_delay_p50'],
+        delay_p99=stats['queue_delay_p99']))
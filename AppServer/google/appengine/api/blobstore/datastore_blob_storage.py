@@ -37,13 +37,58 @@ __all__ = ['DatastoreBlobStorage']
 # The datastore kind used for storing chunks of a blob
 _BLOB_CHUNK_KIND_ = "__BlobChunk__"
 
+# The number of blocks to write with each datastore Put.
+_BLOCKS_PER_PUT = 8
+
 
 class DatastoreBlobReader(BlobReader):
   """ A reader that fetches from the datastore instead of the blobstore. """
 
-  @staticmethod
+  # The number of blocks to fetch past the requested ones when a blob is
+  # being read sequentially.
+  _READ_AHEAD_BLOCKS = 3
+
+  def __init__(self, *args, **kwargs):
+    super(DatastoreBlobReader, self).__init__(*args, **kwargs)
+    # Blocks that have been fetched, by index. None marks a missing block.
+    self.__blocks = {}
+    self.__last_block = -1
+
+  def __get_blocks(self, blob_key, first_block, last_block):
+    """ Retrieves a range of blocks, fetching any missing ones in one Get.
+
+    Args:
+      blob_key: A BlobKey used to identify which blob to fetch data from.
+      first_block: An integer specifying the first block to retrieve.
+      last_block: An integer specifying the last block to retrieve.
+    Returns:
+      A list of raw bytes strings or None for blocks that do not exist.
+    """
+    # Blocks before the requested range are not needed anymore.
+    for index in self.__blocks.keys():
+      if index < first_block:
+        del self.__blocks[index]
+
+    wanted = range(first_block, last_block + 1)
+    if any(index not in self.__blocks for index in wanted):
+      fetch_end = last_block
+      if first_block == self.__last_block + 1:
+        fetch_end += self._READ_AHEAD_BLOCKS
+
+      indexes = [index for index in range(first_block, fetch_end + 1)
+                 if index not in self.__blocks]
+      keys = [datastore.Key.from_path(
+                _BLOB_CHUNK_KIND_, '__'.join([str(blob_key), str(index)]),
+                namespace='')
+              for index in indexes]
+      for index, entity in zip(indexes, datastore.Get(keys)):
+        self.__blocks[index] = entity['block'] if entity is not None else None
+
+    self.__last_block = last_block
+    return [self.__blocks[index] for index in wanted]
+
   @datastore.NonTransactional
-  def _fetch_data(blob_key, start_index, end_index):
+  def _fetch_data(self, blob_key, start_index, end_index):
     """ Retrieves a chunk of blob data from datastore entities.
 
     Args:
@@ -64,47 +109,26 @@ class DatastoreBlobReader(BlobReader):
     # This is the last block we'll look at for this request
     block_count_end = int(end_index / MAX_BLOB_FETCH_SIZE)
 
-    block_key = '__'.join([str(blob_key), str(block_count)])
-    block_key = datastore.Key.from_path(
-      _BLOB_CHUNK_KIND_, block_key, namespace='')
-
-    try:
-      block = datastore.Get(block_key)
-    except datastore_errors.EntityNotFoundError:
+    blocks = self.__get_blocks(blob_key, block_count, block_count_end)
+    if blocks[0] is None:
       # If this is the first block, the blob does not exist.
       if block_count == 0:
         raise apiproxy_errors.ApplicationError(
            blobstore_service_pb.BlobstoreServiceError.BLOB_NOT_FOUND)
 
       # If the first block exists, the index is just past the last block.
-      first_block_key = datastore.Key.from_path(
-        _BLOB_CHUNK_KIND_, '__'.join([str(blob_key), '0']), namespace='')
-      try:
-        datastore.Get(first_block_key)
-      except datastore_errors.EntityNotFoundError:
+      if self.__get_blocks(blob_key, 0, 0)[0] is None:
         raise apiproxy_errors.ApplicationError(
            blobstore_service_pb.BlobstoreServiceError.BLOB_NOT_FOUND)
 
       return ''
 
-    data = block['block'][block_modulo:]
-
-    # Matching boundaries, start and end are within one fetch
-    if block_count_end == block_count:
-      return data[:fetch_size]
-
-    # Must fetch the next block
-    block_key = '__'.join([str(blob_key), str(block_count + 1)])
-    block_key = datastore.Key.from_path(
-      _BLOB_CHUNK_KIND_, block_key, namespace='')
+    data = blocks[0][block_modulo:]
 
-    try:
-      block = datastore.Get(block_key)
-      data += block['block']
-    except datastore_errors.EntityNotFoundError:
-      # If the second block is not found, assume the first block was the final
-      # block.
-      pass
+    # If the second block is not found, assume the first block was the final
+    # block.
+    if block_count_end != block_count and blocks[-1] is not None:
+      data += blocks[-1]
 
     return data[:fetch_size]
 
@@ -149,25 +173,42 @@ class DatastoreBlobStorage(blobstore_stub.BlobStorage):
       return blobstore.BlobKey(unicode(blob_key))
     return blob_key
 
+  @datastore.NonTransactional
   def StoreBlob(self, blob_key, blob_stream):
     """Store blob stream to the datastore.
 
+    Each block is a separate root entity, so the blocks in a batch are
+    committed independently. A batch is written while the next one is read.
+
     Args:
       blob_key: Blob key of blob to store.
       blob_stream: Stream or stream-like object that will generate blob content.
     """
     block_count = 0
     blob_key_object = self._BlobKey(blob_key)
+    batch = []
+    pending_put = None
     while True:
       block = blob_stream.read(blobstore.MAX_BLOB_FETCH_SIZE)
+      if block:
+        entity = datastore.Entity(_BLOB_CHUNK_KIND_,
+                                  name=str(blob_key_object) + "__" + str(block_count), 
+                                  namespace='')
+        entity.update({'block': datastore_types.Blob(block)})
+        batch.append(entity)
+        block_count += 1
+
+      if batch and (not block or len(batch) == _BLOCKS_PER_PUT):
+        if pending_put is not None:
+          pending_put.get_result()
+        pending_put = datastore.PutAsync(batch)
+        batch = []
+
       if not block:
         break
-      entity = datastore.Entity(_BLOB_CHUNK_KIND_,
-                                name=str(blob_key_object) + "__" + str(block_count), 
-                                namespace='')
-      entity.update({'block': datastore_types.Blob(block)})
-      datastore.Put(entity)
-      block_count += 1
+
+    if pending_put is not None:
+      pending_put.get_result()
 
   def OpenBlob(self, blob_key):
     """Open blob file for streaming.
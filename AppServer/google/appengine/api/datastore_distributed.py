@@ -28,7 +28,6 @@ import errno
 import logging
 import os
 import time
-import random
 import socket
 import sys
 import threading
@@ -37,6 +36,8 @@ import warnings
 from google.appengine.api import api_base_pb
 from google.appengine.api import apiproxy_stub
 from google.appengine.api import apiproxy_stub_map
+from google.appengine.api.appscale_connection_pool import HTTPConnectionPool
+from google.appengine.api.appscale_rpc_batcher import RPCBatcher
 from google.appengine.api import datastore
 from google.appengine.api import datastore_errors
 from google.appengine.api import datastore_types
@@ -91,15 +92,14 @@ LOAD_BALANCERS_FILE = "/etc/appscale/load_balancer_ips"
 PROXY_PORT = 8888
 
 
-def get_random_lb():
-  """ Selects a random location from the load balancers file.
+def get_load_balancers():
+  """ Lists the datastore locations from the load balancers file.
 
   Returns:
-    A string specifying a load balancer IP.
+    A list of strings specifying load balancer locations.
   """
   with open(LOAD_BALANCERS_FILE) as lb_file:
-    return random.choice([':'.join([line.strip(), str(PROXY_PORT)])
-                          for line in lb_file])
+    return [':'.join([line.strip(), str(PROXY_PORT)]) for line in lb_file]
 
 
 class InternalCursor():
@@ -187,7 +187,9 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
                require_indexes=False,
                service_name='datastore_v3',
                trusted=False,
-               root_path=None):
+               root_path=None,
+               batch_window=None,
+               load_balancers=None):
     """Constructor.
 
     Args:
@@ -200,6 +202,12 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
       trusted: bool, default False.  If True, this stub allows an app to
         access the data of another app.
       root_path: A str, the path where index.yaml can be found.
+      batch_window: A float specifying how many seconds to wait for other
+        non-transactional Get and Put calls to combine with a call. If None,
+        calls are sent as they arrive.
+      load_balancers: A list of strings specifying datastore locations to use
+        when datastore_location is down. If None, they are read from
+        LOAD_BALANCERS_FILE when needed.
     """
     super(DatastoreDistributed, self).__init__(service_name)
 
@@ -214,8 +222,25 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
       if int(res[1]) != SSL_DEFAULT_PORT:
         self.__is_encrypted = False
 
+    fallback_locations = get_load_balancers
+    if load_balancers is not None:
+      fallback_locations = lambda: load_balancers
+
+    self.__connection_pool = HTTPConnectionPool(
+      datastore_location, fallback_locations=fallback_locations,
+      secure=self.__is_encrypted, key_file=KEY_LOCATION,
+      cert_file=CERT_LOCATION)
+
     self.SetTrusted(trusted)
 
+    self.__get_batcher = None
+    self.__put_batcher = None
+    if batch_window is not None:
+      self.__get_batcher = RPCBatcher(self._SendGetBatch, batch_window,
+                                      'Datastore Get')
+      self.__put_batcher = RPCBatcher(self._SendPutBatch, batch_window,
+                                      'Datastore Put')
+
     self.__queries = {}
 
     self.__tx_actions = {}
@@ -368,38 +393,21 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
 
     api_response = remote_api_pb.Response()
 
-    retry_count = 0
-    max_retries = 5
-    location = self.__datastore_location
-    while True:
-      try:
-        api_response = api_request.sendCommand(
-          location,
-          tag,
-          api_response,
-          1,
-          self.__is_encrypted,
-          KEY_LOCATION,
-          CERT_LOCATION)
-        break
-      except socket.error as socket_error:
-        if socket_error.errno in (errno.ECONNREFUSED, errno.EHOSTUNREACH):
-          retry_count += 1
-          if retry_count > max_retries:
-            raise
-
-          location = get_random_lb()
-          continue
-
-        if socket_error.errno == errno.ETIMEDOUT:
-          raise apiproxy_errors.ApplicationError(
-            datastore_pb.Error.TIMEOUT,
-            'Connection timed out when making datastore request')
-        raise
-      # AppScale: Interpret ProtocolBuffer.ProtocolBufferReturnError as
-      # datastore_errors.InternalError
-      except ProtocolBuffer.ProtocolBufferReturnError as e:
-        raise datastore_errors.InternalError(e)
+    # The connection pool fails over to other load balancers when the
+    # datastore location refuses connections.
+    try:
+      api_response = api_request.sendPooledCommand(
+        self.__connection_pool, tag, api_response)
+    except socket.error as socket_error:
+      if socket_error.errno == errno.ETIMEDOUT:
+        raise apiproxy_errors.ApplicationError(
+          datastore_pb.Error.TIMEOUT,
+          'Connection timed out when making datastore request')
+      raise
+    # AppScale: Interpret ProtocolBuffer.ProtocolBufferReturnError as
+    # datastore_errors.InternalError
+    except ProtocolBuffer.ProtocolBufferReturnError as e:
+      raise datastore_errors.InternalError(e)
 
     if not api_response or not api_response.has_response():
       raise datastore_errors.InternalError(
@@ -433,14 +441,161 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
           new_composite = put_request.add_composite_index()
           new_composite.CopyFrom(index)
 
+    if self.__put_batcher is not None and _CanBatchPut(put_request):
+      auto_id_policy = None
+      if put_request.has_auto_id_policy():
+        auto_id_policy = put_request.auto_id_policy()
+
+      group = (request_id, put_request.force(), auto_id_policy)
+      put_response.CopyFrom(self.__put_batcher.call(
+        group, put_request, put_request.entity_size()))
+      return put_response
+
     self._RemoteSend(put_request, put_response, "Put", request_id)
     return put_response 
 
   def _Dynamic_Get(self, get_request, get_response, request_id=None):
     """Send a get request to the datastore server. """
+    if self.__get_batcher is not None and _CanBatchGet(get_request):
+      strong = None
+      if get_request.has_strong():
+        strong = get_request.strong()
+
+      group = (request_id, strong)
+      get_response.CopyFrom(self.__get_batcher.call(
+        group, get_request, get_request.key_size()))
+      return get_response
+
     self._RemoteSend(get_request, get_response, "Get", request_id)
     return get_response
 
+  def _SendGetBatch(self, group, get_requests):
+    """ Fetches the keys for several Get calls with one request.
+
+    Args:
+      group: A tuple containing the request ID and the strong consistency
+        flag, if the requests specify one.
+      get_requests: A list of datastore_pb.GetRequest objects.
+    Returns:
+      A list containing a datastore_pb.GetResponse or an exception for each
+      request.
+    """
+    request_id, strong = group
+    combined_request = datastore_pb.GetRequest()
+    if strong is not None:
+      combined_request.set_strong(strong)
+
+    for get_request in get_requests:
+      for key in get_request.key_list():
+        combined_request.add_key().CopyFrom(key)
+
+    combined_response = datastore_pb.GetResponse()
+    try:
+      self._RemoteSend(combined_request, combined_response, "Get", request_id)
+    except apiproxy_errors.ApplicationError:
+      if len(get_requests) == 1:
+        raise
+      # Do not let one bad request fail the others.
+      return self._SendSeparately(get_requests, datastore_pb.GetResponse,
+                                  "Get", request_id)
+
+    entities = combined_response.entity_list()
+    responses = []
+    offset = 0
+    for get_request in get_requests:
+      response = datastore_pb.GetResponse()
+      for entity in entities[offset:offset + get_request.key_size()]:
+        response.add_entity().CopyFrom(entity)
+
+      offset += get_request.key_size()
+      responses.append(response)
+
+    return responses
+
+  def _SendPutBatch(self, group, put_requests):
+    """ Stores the entities for several Put calls with one request.
+
+    Args:
+      group: A tuple containing the request ID, the force flag, and the auto
+        ID policy, if the requests specify one.
+      put_requests: A list of datastore_pb.PutRequest objects.
+    Returns:
+      A list containing a datastore_pb.PutResponse or an exception for each
+      request.
+    """
+    request_id, force, auto_id_policy = group
+    combined_request = datastore_pb.PutRequest()
+    combined_request.set_trusted(self.__trusted)
+    if force:
+      combined_request.set_force(force)
+    if auto_id_policy is not None:
+      combined_request.set_auto_id_policy(auto_id_policy)
+
+    index_ids = set()
+    written_keys = set()
+    for put_request in put_requests:
+      keys = [entity.key().Encode() for entity in put_request.entity_list()]
+      # Writing the same entity twice in one request has no defined order.
+      if written_keys.intersection(keys):
+        return self._SendSeparately(put_requests, datastore_pb.PutResponse,
+                                    "Put", request_id)
+      written_keys.update(keys)
+
+      for entity in put_request.entity_list():
+        combined_request.add_entity().CopyFrom(entity)
+
+      for index in put_request.composite_index_list():
+        if index.id() not in index_ids:
+          index_ids.add(index.id())
+          combined_request.add_composite_index().CopyFrom(index)
+
+    combined_response = datastore_pb.PutResponse()
+    try:
+      self._RemoteSend(combined_request, combined_response, "Put", request_id)
+    except apiproxy_errors.ApplicationError:
+      if len(put_requests) == 1:
+        raise
+      # Only requests with complete keys are combined, so they can be
+      # retried without creating duplicate entities.
+      return self._SendSeparately(put_requests, datastore_pb.PutResponse,
+                                  "Put", request_id)
+
+    keys = combined_response.key_list()
+    responses = []
+    offset = 0
+    for put_request in put_requests:
+      response = datastore_pb.PutResponse()
+      for key in keys[offset:offset + put_request.entity_size()]:
+        response.add_key().CopyFrom(key)
+
+      offset += put_request.entity_size()
+      responses.append(response)
+
+    return responses
+
+  def _SendSeparately(self, requests, response_class, method, request_id):
+    """ Sends each request on its own.
+
+    Args:
+      requests: A list of ProtocolMessage objects.
+      response_class: The ProtocolMessage class of the responses.
+      method: A string specifying the datastore method.
+      request_id: A string specifying the request ID.
+    Returns:
+      A list containing a response or an exception for each request.
+    """
+    results = []
+    for request in requests:
+      response = response_class()
+      try:
+        self._RemoteSend(request, response, method, request_id)
+      except apiproxy_errors.ApplicationError as error:
+        results.append(error)
+      else:
+        results.append(response)
+
+    return results
+
 
   def _Dynamic_Delete(self, delete_request, delete_response, request_id=None):
     """Send a delete request to the datastore server. 
@@ -838,6 +993,42 @@ class DatastoreDistributed(apiproxy_stub.APIProxyStub):
       logging.info('Created %d and deleted %d index(es); total %d',
                     created, deleted, len(requested))
 
+def _CanBatchGet(get_request):
+  """ Checks if a Get call can be combined with others.
+
+  Args:
+    get_request: A datastore_pb.GetRequest.
+  Returns:
+    A boolean indicating whether or not the call can be combined.
+  """
+  return (not get_request.has_transaction() and
+          not get_request.allow_deferred() and
+          not get_request.has_failover_ms())
+
+
+def _CanBatchPut(put_request):
+  """ Checks if a Put call can be combined with others.
+
+  Calls that allocate IDs are not combined because retrying them separately
+  after a failure could create duplicate entities.
+
+  Args:
+    put_request: A datastore_pb.PutRequest.
+  Returns:
+    A boolean indicating whether or not the call can be combined.
+  """
+  if (put_request.has_transaction() or put_request.mark_changes() or
+      put_request.snapshot_size()):
+    return False
+
+  for entity in put_request.entity_list():
+    last_element = entity.key().path().element_list()[-1]
+    if not last_element.has_id() and not last_element.has_name():
+      return False
+
+  return True
+
+
 def _FindIndexToUse(query, indexes):
   """ Matches the query with one of the composite indexes. 
 
@@ -24,6 +24,7 @@ import logging
 import hashlib
 import memcache
 import os
+import socket
 import time
 
 from google.appengine.api import apiproxy_stub
@@ -40,6 +41,48 @@ from google.appengine.api.memcache import TYPE_INT
 from google.appengine.api.memcache import TYPE_LONG
 from google.appengine.api.memcache import MAX_KEY_SIZE
 
+
+class _MemcacheClient(memcache.Client):
+  """A python-memcached client that can fetch several CAS IDs at once."""
+
+  def gets_multi(self, keys):
+    """Retrieves values and their CAS IDs with one request to each server.
+
+    Args:
+      keys: A list of strings containing memcache keys.
+    Returns:
+      A dictionary mapping the keys that were found to (value, cas_id) tuples.
+    """
+    server_keys, prefixed_to_orig_key = self._map_and_prefix_keys(keys, '')
+
+    # Send every request before reading any responses, as get_multi does.
+    dead_servers = []
+    for server, server_key_list in server_keys.iteritems():
+      try:
+        server.send_cmd('gets ' + ' '.join(server_key_list))
+      except socket.error, error:
+        server.mark_dead(error)
+        dead_servers.append(server)
+
+    for server in dead_servers:
+      del server_keys[server]
+
+    found = {}
+    for server in server_keys:
+      try:
+        line = server.readline()
+        while line and line != 'END':
+          rkey, flags, rlen, cas_id = self._expect_cas_value(server, line)
+          if rkey is not None:
+            value = self._recv_value(server, flags, rlen)
+            found[prefixed_to_orig_key[rkey]] = (value, cas_id)
+          line = server.readline()
+      except (memcache._Error, socket.error), error:
+        server.mark_dead(error)
+
+    return found
+
+
 class MemcacheService(apiproxy_stub.APIProxyStub):
   """Python only memcache service.
 
@@ -79,7 +122,8 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
 
     memcaches = [ip + ":" + self.MEMCACHE_PORT for ip in all_ips if ip != '']
     memcaches.sort()    
-    self._memcache = memcache.Client(memcaches, debug=0)
+    # CAS IDs from gets are kept so that a CAS set can be compared natively.
+    self._memcache = _MemcacheClient(memcaches, debug=0, cache_cas=True)
 
   def _Dynamic_Get(self, request, response):
     """Implementation of gets for memcache.
@@ -88,20 +132,30 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheGetRequest protocol buffer.
       response: A MemcacheGetResponse protocol buffer.
     """
+    keys = {}
     for key in set(request.key_list()):
-      internal_key = self._GetKey(request.name_space(), key)
-      value = self._memcache.get(internal_key)
-      if value is None:
-        continue
-      flags = 0
-      stored_flags, cas_id, stored_value = cPickle.loads(value)
-      flags |= stored_flags
+      keys[self._GetKey(request.name_space(), key)] = key
+
+    cas_ids = {}
+    if request.for_cas():
+      # Values are fetched with their CAS IDs in one request to each server.
+      values = {}
+      found = self._memcache.gets_multi(keys.keys())
+      for internal_key, (value, cas_id) in found.iteritems():
+        values[internal_key] = value
+        cas_ids[internal_key] = cas_id
+    else:
+      # The client groups the keys by server and sends one request to each.
+      values = self._memcache.get_multi(keys.keys())
+
+    for internal_key, value in values.iteritems():
+      flags, _, stored_value = cPickle.loads(value)
       item = response.add_item()
-      item.set_key(key)
+      item.set_key(keys[internal_key])
       item.set_value(stored_value)
       item.set_flags(flags)
       if request.for_cas():
-        item.set_cas_id(cas_id)
+        item.set_cas_id(cas_ids[internal_key])
 
   def _Dynamic_Set(self, request, response):
     """Implementation of sets for memcache. 
@@ -110,44 +164,96 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheSetRequest.
       response: A MemcacheSetResponse.
     """
-    for item in request.item_list():
+    statuses = []
+    # Runs of consecutive plain sets with the same expiration time are sent
+    # together. Other policies are applied in order between the runs.
+    set_batches = {}
+    for index, item in enumerate(request.item_list()):
       key = self._GetKey(request.name_space(), item.key())
       set_policy = item.set_policy()
-      old_entry = self._memcache.get(key)
-      cas_id = 0
-      if old_entry:
-        _, cas_id, _ = cPickle.loads(old_entry)
+      expiration = item.expiration_time()
+      value = cPickle.dumps([item.flags(), 0, item.value()])
       set_status = MemcacheSetResponse.NOT_STORED
 
-      if ((set_policy == MemcacheSetRequest.SET) or
-        (set_policy == MemcacheSetRequest.ADD and old_entry is None) or
-        (set_policy == MemcacheSetRequest.REPLACE and
-        old_entry is not None)):
-
-        if (old_entry is None or set_policy == MemcacheSetRequest.SET):
+      if set_policy != MemcacheSetRequest.SET:
+        self._SetMulti(set_batches, statuses)
+        set_batches = {}
+
+      if set_policy == MemcacheSetRequest.SET:
+        # A key that is repeated with another expiration time has to be
+        # stored after the earlier batches.
+        if any(key in batch for batch_expiration, batch
+               in set_batches.iteritems() if batch_expiration != expiration):
+          self._SetMulti(set_batches, statuses)
+          set_batches = {}
+
+        batch = set_batches.setdefault(expiration, {})
+        # If a key is repeated, the last value is the one that is stored.
+        indexes = batch.get(key, ([], None))[0]
+        indexes.append(index)
+        batch[key] = (indexes, value)
+      elif set_policy == MemcacheSetRequest.ADD:
+        if self._memcache.add(key, value, expiration):
           set_status = MemcacheSetResponse.STORED
-
-      elif (set_policy == MemcacheSetRequest.CAS and item.for_cas() and
-        item.has_cas_id()):
-        if old_entry is None:
-          set_status = MemcacheSetResponse.NOT_STORED
-        elif cas_id != item.cas_id():
-          set_status = MemcacheSetResponse.EXISTS
-        else:
+      elif set_policy == MemcacheSetRequest.REPLACE:
+        if self._memcache.replace(key, value, expiration):
           set_status = MemcacheSetResponse.STORED
+      elif (set_policy == MemcacheSetRequest.CAS and item.for_cas() and
+            item.has_cas_id()):
+        set_status = self._CompareAndSet(key, value, expiration,
+                                         item.cas_id())
 
-      if (set_status == MemcacheSetResponse.STORED
-        or set_policy == MemcacheSetRequest.REPLACE):
+      statuses.append(set_status)
 
-        set_value = cPickle.dumps(
-          [item.flags(), cas_id + 1, item.value()])
-        if set_policy == MemcacheSetRequest.REPLACE:
-          self._memcache.replace(key, set_value)
-        else:
-          self._memcache.set(key, set_value, item.expiration_time())
+    self._SetMulti(set_batches, statuses)
 
+    for set_status in statuses:
       response.add_set_status(set_status)
 
+  def _SetMulti(self, set_batches, statuses):
+    """Stores batches of plain sets and records their statuses.
+
+    Args:
+      set_batches: A dictionary mapping expiration times to dictionaries that
+        map each key to the request indexes that set it and its value.
+      statuses: A list of MemcacheSetResponse status codes to update.
+    """
+    for expiration, batch in set_batches.iteritems():
+      failed_keys = self._memcache.set_multi(
+        dict((key, value) for key, (_, value) in batch.iteritems()),
+        expiration)
+      for key, (indexes, _) in batch.iteritems():
+        for index in indexes:
+          if key in failed_keys:
+            statuses[index] = MemcacheSetResponse.ERROR
+          else:
+            statuses[index] = MemcacheSetResponse.STORED
+
+  def _CompareAndSet(self, key, value, expiration, cas_id):
+    """Stores a value if it has not changed since it was fetched.
+
+    Args:
+      key: A string containing the memcache key.
+      value: A string containing the value to store.
+      expiration: An integer specifying when the value expires.
+      cas_id: An integer specifying the CAS ID returned with the value.
+    Returns:
+      A MemcacheSetResponse status code.
+    """
+    self._memcache.cas_ids[key] = cas_id
+    try:
+      stored = self._memcache.cas(key, value, expiration)
+    finally:
+      self._memcache.cas_ids.pop(key, None)
+
+    if stored:
+      return MemcacheSetResponse.STORED
+
+    # The client does not say whether the value changed or disappeared.
+    if self._memcache.get(key) is None:
+      return MemcacheSetResponse.NOT_STORED
+    return MemcacheSetResponse.EXISTS
+
   def _Dynamic_Delete(self, request, response):
     """Implementation of delete in memcache.
 
@@ -155,17 +261,19 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheDeleteRequest protocol buffer.
       response: A MemcacheDeleteResponse protocol buffer.
     """
-    for item in request.item_list():
-      key = self._GetKey(request.name_space(), item.key())
-      entry = self._memcache.get(key)
-      delete_status = MemcacheDeleteResponse.DELETED
+    keys = [self._GetKey(request.name_space(), item.key())
+            for item in request.item_list()]
 
-      if entry is None:
-        delete_status = MemcacheDeleteResponse.NOT_FOUND
-      else:
-        self._memcache.delete(key)
+    # Deletes do not report whether the key existed, so check first.
+    existing = self._memcache.get_multi(keys)
+    if existing:
+      self._memcache.delete_multi(existing.keys())
 
-      response.add_delete_status(delete_status)
+    for key in keys:
+      if key in existing:
+        response.add_delete_status(MemcacheDeleteResponse.DELETED)
+      else:
+        response.add_delete_status(MemcacheDeleteResponse.NOT_FOUND)
 
   def _Increment(self, namespace, request):
     """Internal function for incrementing from a MemcacheIncrementRequest.
@@ -23,7 +23,6 @@ __all__ = []
 import datetime
 import errno
 import logging
-import os.path
 import random
 import socket
 import string
@@ -80,6 +79,22 @@ KEY_LOCATION = "/etc/appscale/certs/mykey.pem"
 TASKQUEUE_PROXY_FILE = "/etc/appscale/load_balancer_ips"
 TASKQUEUE_SERVER_PORT = 17446
 
+
+def get_proxy_locations():
+  """ Lists the TaskQueue proxy locations from TASKQUEUE_PROXY_FILE.
+
+  Returns:
+    A list of strings specifying TaskQueue proxy locations.
+  Raises:
+    IOError if the file cannot be read.
+  """
+  with open(TASKQUEUE_PROXY_FILE) as tq_file:
+    ips = [ip for ip in tq_file.read().split('\n') if ip]
+
+  return ["{ip}:{port}".format(ip=ip, port=TASKQUEUE_SERVER_PORT)
+          for ip in ips]
+
+
 class TaskQueueServiceStub(apiproxy_stub.APIProxyStub):
   """Python only task queue service stub.
 
@@ -90,36 +105,33 @@ class TaskQueueServiceStub(apiproxy_stub.APIProxyStub):
 
   _ACCEPTS_REQUEST_ID = True
 
-  def __init__(self, app_id, host, service_name='taskqueue'):
+  def __init__(self, app_id, host, service_name='taskqueue', locations=None):
     """Constructor.
 
     Args:
       app_id: The application ID.
       host: The nginx host.
       service_name: Service name expected for all calls.
+      locations: A list of strings specifying TaskQueue proxy locations. If
+        None, they are read from TASKQUEUE_PROXY_FILE for each call.
     """
     super(TaskQueueServiceStub, self).__init__(
         service_name, max_request_size=MAX_REQUEST_SIZE)
     self.__app_id = app_id
     self.__nginx_host = host
+    self.__locations = locations
 
   def _GetTQLocations(self):
     """ Gets a list of TaskQueue proxies. """
-    if os.path.exists(TASKQUEUE_PROXY_FILE):
-      try:
-        with open(TASKQUEUE_PROXY_FILE) as tq_file:
-          ips = [ip for ip in tq_file.read().split('\n') if ip]
-      except IOError:
-        raise apiproxy_errors.ApplicationError(
-          taskqueue_service_pb.TaskQueueServiceError.INTERNAL_ERROR)
-    else:
+    if self.__locations is not None:
+      return self.__locations
+
+    try:
+      return get_proxy_locations()
+    except IOError:
       raise apiproxy_errors.ApplicationError(
         taskqueue_service_pb.TaskQueueServiceError.INTERNAL_ERROR)
 
-    locations = ["{ip}:{port}".format(ip=ip, port=TASKQUEUE_SERVER_PORT)
-                 for ip in ips]
-    return locations
-
   def _ChooseTaskName(self):
     """ Creates a task name that the system can use to address
         tasks from different apps and queues.
@@ -0,0 +1,145 @@
+""" Measures async API call throughput and memory under high fan-out.
+
+Starts a local API server that answers every call immediately and issues
+batches of concurrent async calls, like an ndb request that fans out many
+get_async calls. Run:
+
+  python AppServer/google/appengine/api/test/benchmark_async_rpc.py
+"""
+import argparse
+import BaseHTTPServer
+import os
+import resource
+import SocketServer
+import sys
+import threading
+import time
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import apiproxy_rpc
+from google.appengine.api.memcache import memcache_service_pb
+from google.appengine.ext.remote_api import remote_api_pb
+from google.appengine.ext.remote_api import remote_api_stub
+from google.appengine.tools import appengine_rpc
+
+
+class APIHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """ Answers every remote API call with an empty response. """
+  protocol_version = 'HTTP/1.1'
+
+  # Buffer the response so it is sent in one segment.
+  wbufsize = -1
+
+  def do_POST(self):
+    remote_api_pb.Request(
+      self.rfile.read(int(self.headers['Content-Length'])))
+    response = remote_api_pb.Response()
+    response.set_response(memcache_service_pb.MemcacheGetResponse().Encode())
+    body = response.Encode()
+    self.server.connections.add(self.client_address)
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class APIServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+  request_queue_size = 1024
+
+
+def fan_out(stub, calls, thread_counts):
+  """ Makes concurrent async calls and waits for all of them.
+
+  Args:
+    stub: A RuntimeRemoteStub.
+    calls: An integer specifying the number of concurrent calls.
+    thread_counts: A list that the number of live threads is appended to.
+  """
+  rpcs = []
+  for index in range(calls):
+    request = memcache_service_pb.MemcacheGetRequest()
+    request.add_key('key{}'.format(index))
+    rpc = stub.CreateRPC()
+    rpc.MakeCall('memcache', 'Get', request,
+                 memcache_service_pb.MemcacheGetResponse())
+    rpcs.append(rpc)
+
+  thread_counts.append(threading.active_count())
+  for rpc in rpcs:
+    rpc.Wait()
+    rpc.CheckSuccess()
+
+
+def run_case(server, rpc_server, workers, calls, duration):
+  """ Runs fan-out batches for a while.
+
+  Args:
+    server: An APIServer.
+    rpc_server: An object with a Send method.
+    workers: An integer specifying the size of the RPC worker pool.
+    calls: An integer specifying the number of calls in each batch.
+    duration: A float specifying the number of seconds to run for.
+  Returns:
+    A tuple containing calls per second, the peak number of threads, and the
+    number of connections that were opened.
+  """
+  apiproxy_rpc._executor = apiproxy_rpc._RPCExecutor(workers)
+  server.connections = set()
+  stub = remote_api_stub.RuntimeRemoteStub(rpc_server, '/')
+  thread_counts = []
+  total = 0
+  start_time = time.time()
+  while time.time() - start_time < duration:
+    fan_out(stub, calls, thread_counts)
+    total += calls
+
+  elapsed = time.time() - start_time
+  return total / elapsed, max(thread_counts), len(server.connections)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--calls', type=int, default=300,
+                      help='The number of concurrent calls in each batch')
+  parser.add_argument('--duration', type=float, default=5,
+                      help='The number of seconds to run each case for')
+  args = parser.parse_args()
+
+  server = APIServer(('127.0.0.1', 0), APIHandler)
+  server_thread = threading.Thread(target=server.serve_forever)
+  server_thread.daemon = True
+  server_thread.start()
+  location = '127.0.0.1:{}'.format(server.server_address[1])
+
+  os.environ.setdefault('AUTH_DOMAIN', 'gmail.com')
+  http_server = appengine_rpc.HttpRpcServer(
+    location, lambda: ('', ''), 'benchmark', 'benchmark', debug_data=False,
+    secure=False)
+  pooled_server = remote_api_stub.PooledRpcServer(location)
+
+  # Memory is only reported as the peak for the process, so cases run from
+  # the lightest to the heaviest.
+  cases = [
+    ('pooled, {} workers'.format(apiproxy_rpc.MAX_RPC_WORKERS),
+     pooled_server, apiproxy_rpc.MAX_RPC_WORKERS),
+    ('urllib2, {} workers'.format(apiproxy_rpc.MAX_RPC_WORKERS),
+     http_server, apiproxy_rpc.MAX_RPC_WORKERS),
+    ('urllib2, worker per call', http_server, args.calls),
+  ]
+
+  print('{} concurrent calls per batch'.format(args.calls))
+  for name, rpc_server, workers in cases:
+    rate, threads, connections = run_case(
+      server, rpc_server, workers, args.calls, args.duration)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('{:<28} {:>9.1f} calls/s {:>5} threads {:>7} connections '
+          '{:>8} KB peak RSS'.format(name, rate, threads, connections,
+                                     max_rss))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,107 @@
+""" Measures memcache API throughput against a local memcached.
+
+Start memcached on localhost:11211 and run:
+
+  python AppServer/google/appengine/api/test/benchmark_memcache_distributed.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api.memcache import memcache_distributed
+from google.appengine.api.memcache import memcache_service_pb
+
+MemcacheGetRequest = memcache_service_pb.MemcacheGetRequest
+MemcacheGetResponse = memcache_service_pb.MemcacheGetResponse
+MemcacheSetRequest = memcache_service_pb.MemcacheSetRequest
+MemcacheSetResponse = memcache_service_pb.MemcacheSetResponse
+MemcacheDeleteRequest = memcache_service_pb.MemcacheDeleteRequest
+MemcacheDeleteResponse = memcache_service_pb.MemcacheDeleteResponse
+
+
+def make_set_request(keys, policy=MemcacheSetRequest.SET):
+  request = MemcacheSetRequest()
+  for key in keys:
+    item = request.add_item()
+    item.set_key(key)
+    item.set_value('x' * 100)
+    item.set_set_policy(policy)
+  return request
+
+
+def make_get_request(keys):
+  request = MemcacheGetRequest()
+  for key in keys:
+    request.add_key(key)
+  return request
+
+
+def make_delete_request(keys):
+  request = MemcacheDeleteRequest()
+  for key in keys:
+    request.add_item().set_key(key)
+  return request
+
+
+def per_key_get(service, request):
+  """ Fetches each key separately, like the handler used to. """
+  for key in request.key_list():
+    service._memcache.get(service._GetKey(request.name_space(), key))
+
+
+def throughput(function, duration):
+  """ Calls a function repeatedly.
+
+  Args:
+    function: The function to call.
+    duration: A float specifying the number of seconds to run for.
+  Returns:
+    A float specifying the number of calls per second.
+  """
+  calls = 0
+  start_time = time.time()
+  while time.time() - start_time < duration:
+    function()
+    calls += 1
+  return calls / (time.time() - start_time)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--keys', type=int, default=200,
+                      help='The number of keys in each request')
+  parser.add_argument('--duration', type=float, default=5,
+                      help='The number of seconds to run each case for')
+  args = parser.parse_args()
+
+  os.environ['APPNAME'] = 'benchmark'
+  service = memcache_distributed.MemcacheService()
+  keys = ['key{}'.format(index) for index in range(args.keys)]
+  set_request = make_set_request(keys)
+  add_request = make_set_request(keys, MemcacheSetRequest.ADD)
+  get_request = make_get_request(keys)
+  delete_request = make_delete_request(keys)
+
+  service._Dynamic_Set(set_request, MemcacheSetResponse())
+
+  def delete_and_add():
+    service._Dynamic_Delete(delete_request, MemcacheDeleteResponse())
+    service._Dynamic_Set(add_request, MemcacheSetResponse())
+
+  cases = [
+    ('get (per key)', lambda: per_key_get(service, get_request)),
+    ('get', lambda: service._Dynamic_Get(get_request, MemcacheGetResponse())),
+    ('set', lambda: service._Dynamic_Set(set_request, MemcacheSetResponse())),
+    ('delete + add', delete_and_add),
+  ]
+
+  print('{} keys per request'.format(args.keys))
+  for name, function in cases:
+    print('{:<16} {:>10.1f} requests/s'.format(
+      name, throughput(function, args.duration)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import apiproxy_rpc
+from google.appengine.runtime import request_environment
+
+
+class Response(object):
+  value = None
+
+
+class RecordingStub(object):
+  """ Records the threads and request details that calls are made with. """
+  _local = threading.local()
+
+  def __init__(self, release=None):
+    self.release = release
+    self.threads = set()
+    self.request_ids = []
+    self.environs = []
+    self._lock = threading.Lock()
+
+  @classmethod
+  def _GetRequestId(cls):
+    return getattr(cls._local, 'request_id', None)
+
+  @classmethod
+  def _SetRequestId(cls, request_id):
+    cls._local.request_id = request_id
+
+  def MakeSyncCall(self, service, call, request, response):
+    if self.release is not None:
+      self.release.wait()
+
+    with self._lock:
+      self.threads.add(threading.current_thread().ident)
+      self.request_ids.append(self._GetRequestId())
+      self.environs.append(dict(request_environment.current_request.environ))
+
+    if call == 'Fail':
+      raise ValueError('call failed')
+
+    response.value = request
+
+
+class TestRealRPC(unittest.TestCase):
+  def setUp(self):
+    flexmock(apiproxy_rpc, _executor=apiproxy_rpc._RPCExecutor(3))
+
+  def tearDown(self):
+    RecordingStub._SetRequestId(None)
+    request_environment.current_request.Clear()
+
+  def make_call(self, stub, call='Get', request='request'):
+    rpc = apiproxy_rpc.RealRPC(stub=stub)
+    rpc.MakeCall('service', call, request, Response())
+    return rpc
+
+  def test_bounded_workers(self):
+    release = threading.Event()
+    stub = RecordingStub(release)
+    rpcs = [self.make_call(stub, request='request {}'.format(index))
+            for index in range(30)]
+    release.set()
+    for index, rpc in enumerate(rpcs):
+      rpc.Wait()
+      rpc.CheckSuccess()
+      self.assertEqual(rpc.response.value, 'request {}'.format(index))
+
+    self.assertLessEqual(len(stub.threads), 3)
+
+  def test_propagates_request(self):
+    stub = RecordingStub()
+    RecordingStub._SetRequestId('request-1')
+    request_environment.current_request.Init(sys.stderr, {'USER_ID': '1'})
+    self.make_call(stub).Wait()
+
+    RecordingStub._SetRequestId(None)
+    request_environment.current_request.Clear()
+    self.make_call(stub).Wait()
+
+    self.assertEqual(stub.request_ids, ['request-1', None])
+    self.assertEqual(stub.environs, [{'USER_ID': '1'}, {}])
+
+  def test_exception(self):
+    stub = RecordingStub()
+    rpc = self.make_call(stub, call='Fail')
+    rpc.Wait()
+    self.assertRaises(ValueError, rpc.CheckSuccess)
+
+    # The worker should still be usable after a failed call.
+    rpc = self.make_call(stub)
+    rpc.Wait()
+    rpc.CheckSuccess()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,138 @@
+import BaseHTTPServer
+import errno
+import httplib
+import os
+import socket
+import SocketServer
+import sys
+import threading
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import appscale_connection_pool
+from google.appengine.api.appscale_connection_pool import HTTPConnectionPool
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers['Content-Length']))
+    self.server.connections.add(self.client_address)
+    self.server.requests += 1
+    if self.server.drop_responses:
+      self.close_connection = 1
+      return
+
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    if self.server.close_connections:
+      self.send_header('Connection', 'close')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class KeepAliveServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class TestHTTPConnectionPool(unittest.TestCase):
+  def setUp(self):
+    self.server = KeepAliveServer(('127.0.0.1', 0), KeepAliveHandler)
+    self.server.connections = set()
+    self.server.close_connections = False
+    self.server.drop_responses = False
+    self.server.requests = 0
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.location = '127.0.0.1:{}'.format(self.server.server_address[1])
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+  def test_reuses_connections(self):
+    pool = HTTPConnectionPool(self.location)
+    for index in range(5):
+      status, _, body = pool.post('request {}'.format(index), [])
+      self.assertEqual(status, 200)
+      self.assertEqual(body, 'request {}'.format(index))
+
+    self.assertEqual(len(self.server.connections), 1)
+    pool.close()
+
+  def test_discards_closed_connections(self):
+    self.server.close_connections = True
+    pool = HTTPConnectionPool(self.location)
+    for _ in range(3):
+      status, _, _ = pool.post('request', [])
+      self.assertEqual(status, 200)
+
+    self.assertEqual(len(self.server.connections), 3)
+
+  def test_discards_expired_connections(self):
+    pool = HTTPConnectionPool(self.location, idle_timeout=-1)
+    pool.post('request', [])
+    pool.post('request', [])
+    self.assertEqual(len(self.server.connections), 2)
+
+  def test_retries_unsent_requests(self):
+    pool = HTTPConnectionPool(self.location)
+    pool.post('request', [])
+    connection, _ = pool._idle[self.location][0]
+    flexmock(connection).should_receive('request').and_raise(
+      socket.error(errno.EPIPE, 'Broken pipe'))
+
+    # The request could not be sent on the stale connection, so it should be
+    # sent on a new one.
+    status, _, body = pool.post('request', [])
+    self.assertEqual(status, 200)
+    self.assertEqual(body, 'request')
+    self.assertEqual(len(self.server.connections), 2)
+
+  def test_does_not_retry_sent_requests(self):
+    pool = HTTPConnectionPool(self.location)
+    pool.post('request', [])
+    self.server.drop_responses = True
+
+    # The server might have handled the request, so it should not be sent
+    # again.
+    self.assertRaises(httplib.BadStatusLine, pool.post, 'request', [])
+    self.assertEqual(self.server.requests, 2)
+
+  def test_fails_over(self):
+    unused_socket = socket.socket()
+    unused_socket.bind(('127.0.0.1', 0))
+    down_location = '127.0.0.1:{}'.format(unused_socket.getsockname()[1])
+    unused_socket.close()
+
+    pool = HTTPConnectionPool(down_location,
+                              fallback_locations=lambda: [self.location])
+    status, _, body = pool.post('request', [])
+    self.assertEqual(status, 200)
+    self.assertEqual(body, 'request')
+
+    # The host that refused the connection should be avoided.
+    flexmock(pool).should_receive('_new_connection').with_args(
+      down_location).never()
+    pool.post('request', [])
+
+  def test_raises_when_all_hosts_down(self):
+    flexmock(appscale_connection_pool, MAX_FAILOVERS=1)
+    unused_socket = socket.socket()
+    unused_socket.bind(('127.0.0.1', 0))
+    down_location = '127.0.0.1:{}'.format(unused_socket.getsockname()[1])
+    unused_socket.close()
+
+    pool = HTTPConnectionPool(down_location)
+    self.assertRaises(socket.error, pool.post, 'request', [])
+
+
+if __name__ == '__main__':
+  unittest.main()
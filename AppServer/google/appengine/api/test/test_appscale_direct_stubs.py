@@ -0,0 +1,128 @@
+import errno
+import json
+import os
+import socket
+import sys
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import appscale_direct_stubs
+from google.appengine.api import datastore_distributed
+from google.appengine.api.appscale_direct_stubs import FallbackStub
+from google.appengine.api.memcache import memcache_distributed
+from google.appengine.api.taskqueue import taskqueue_distributed
+from google.appengine.api.taskqueue import taskqueue_service_pb
+from google.appengine.ext.remote_api import remote_api_stub
+
+
+class RecordingStub(object):
+  """ Records calls and fails while an error is set. """
+  def __init__(self):
+    self.calls = []
+    self.error = None
+
+  def MakeSyncCall(self, service, call, request, response, request_id=None):
+    self.calls.append((call, request_id))
+    if self.error is not None:
+      raise self.error
+
+
+class TestFallbackStub(unittest.TestCase):
+  def setUp(self):
+    self.direct = RecordingStub()
+    self.remote = flexmock(remote_api_stub.RuntimeRemoteStub(None, '/'))
+    self.remote.should_receive('MakeSyncCall')
+    remote_api_stub.RemoteStub._SetRequestId('request-1')
+
+  def tearDown(self):
+    remote_api_stub.RemoteStub._SetRequestId(None)
+
+  def test_calls_directly(self):
+    stub = FallbackStub(self.direct, self.remote)
+    self.remote.should_receive('MakeSyncCall').never()
+    stub.MakeSyncCall('memcache', 'Get', None, None)
+    self.assertEqual(self.direct.calls, [('Get', 'request-1')])
+
+  def test_falls_back_when_unreachable(self):
+    stub = FallbackStub(self.direct, self.remote, retry_interval=60)
+    self.direct.error = socket.error(errno.ECONNREFUSED, 'refused')
+    self.remote.should_receive('MakeSyncCall').times(2)
+    stub.MakeSyncCall('memcache', 'Get', None, None)
+
+    # The service is not retried until the interval passes.
+    stub.MakeSyncCall('memcache', 'Get', None, None)
+    self.assertEqual(len(self.direct.calls), 1)
+
+  def test_other_errors(self):
+    stub = FallbackStub(self.direct, self.remote)
+    self.remote.should_receive('MakeSyncCall').never()
+    self.direct.error = socket.error(errno.ECONNRESET, 'reset')
+    self.assertRaises(socket.error, stub.MakeSyncCall, 'memcache', 'Get',
+                      None, None)
+
+  def test_stateful_calls(self):
+    stub = FallbackStub(self.direct, self.remote,
+                        appscale_direct_stubs.datastore_can_fall_back)
+    self.remote.should_receive('MakeSyncCall').never()
+    self.direct.error = socket.error(errno.ECONNREFUSED, 'refused')
+    self.assertRaises(socket.error, stub.MakeSyncCall, 'datastore_v3',
+                      'Commit', None, None)
+
+  def test_transactional_tasks(self):
+    request = taskqueue_service_pb.TaskQueueBulkAddRequest()
+    request.add_add_request()
+    self.assertTrue(
+      appscale_direct_stubs.taskqueue_can_fall_back('BulkAdd', request))
+    request.add_add_request().mutable_transaction().set_handle(1)
+    self.assertFalse(
+      appscale_direct_stubs.taskqueue_can_fall_back('BulkAdd', request))
+
+
+class TestSetupDirectStubs(unittest.TestCase):
+  def setUp(self):
+    self.original_apiproxy = apiproxy_stub_map.apiproxy
+    apiproxy_stub_map.apiproxy = apiproxy_stub_map.APIProxyStubMap()
+    self.remote = remote_api_stub.RuntimeRemoteStub(None, '/')
+    for service in appscale_direct_stubs.DIRECT_SERVICES:
+      apiproxy_stub_map.apiproxy.RegisterStub(service, self.remote)
+
+  def tearDown(self):
+    apiproxy_stub_map.apiproxy = self.original_apiproxy
+
+  def test_get_settings(self):
+    environ = {appscale_direct_stubs.SETTINGS_ENV: json.dumps({'a': 1})}
+    flexmock(os, environ=environ)
+    self.assertEqual(appscale_direct_stubs.get_settings(), {'a': 1})
+    flexmock(os, environ={})
+    self.assertIsNone(appscale_direct_stubs.get_settings())
+
+  def test_setup(self):
+    flexmock(datastore_distributed).should_receive('get_load_balancers').\
+      and_return(['10.0.0.1:8888'])
+    flexmock(memcache_distributed.MemcacheService).\
+      should_receive('setupMemcacheClient')
+    flexmock(taskqueue_distributed).should_receive('get_proxy_locations').\
+      and_raise(IOError)
+
+    settings = {'datastore_path': '10.0.0.2:8888'}
+    appscale_direct_stubs.setup_direct_stubs('guestbook', '/tmp', '10.0.0.3',
+                                             settings)
+
+    datastore_stub = apiproxy_stub_map.apiproxy.GetStub('datastore_v3')
+    self.assertIsInstance(datastore_stub.direct_stub,
+                          datastore_distributed.DatastoreDistributed)
+    self.assertIs(datastore_stub.fallback_stub, self.remote)
+    memcache_stub = apiproxy_stub_map.apiproxy.GetStub('memcache')
+    self.assertIsInstance(memcache_stub.direct_stub,
+                          memcache_distributed.MemcacheService)
+
+    # Services that cannot be set up keep using the API server.
+    self.assertIs(apiproxy_stub_map.apiproxy.GetStub('taskqueue'),
+                  self.remote)
+
+
+if __name__ == '__main__':
+  unittest.main()
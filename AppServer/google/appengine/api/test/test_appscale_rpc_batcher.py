@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import datastore_distributed
+from google.appengine.api.appscale_rpc_batcher import RPCBatcher
+from google.appengine.datastore import datastore_pb
+from google.appengine.datastore import entity_pb
+from google.appengine.runtime import apiproxy_errors
+
+
+def call_concurrently(functions):
+  """ Runs functions in separate threads and collects their results. """
+  results = [None] * len(functions)
+
+  def run(index, function):
+    try:
+      results[index] = function()
+    except Exception as error:
+      results[index] = error
+
+  threads = [threading.Thread(target=run, args=(index, function))
+             for index, function in enumerate(functions)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return results
+
+
+class TestRPCBatcher(unittest.TestCase):
+  def test_combines_calls(self):
+    batches = []
+
+    def send_batch(group, items):
+      batches.append((group, items))
+      return [item * 2 for item in items]
+
+    batcher = RPCBatcher(send_batch, 0.2, 'test')
+    results = call_concurrently(
+      [lambda index=index: batcher.call('group', index) for index in range(5)])
+    self.assertEqual(results, [0, 2, 4, 6, 8])
+    self.assertEqual(len(batches), 1)
+    self.assertEqual(batcher.stats.to_dict()['calls_per_batch'], {5: 1})
+
+  def test_separates_groups_and_limits_size(self):
+    batches = []
+
+    def send_batch(group, items):
+      batches.append((group, items))
+      return items
+
+    batcher = RPCBatcher(send_batch, 0.2, 'test', max_size=4)
+    calls = [lambda: batcher.call('a', 'x', 3),
+             lambda: batcher.call('a', 'y', 3),
+             lambda: batcher.call('b', 'z', 1)]
+    self.assertEqual(call_concurrently(calls), ['x', 'y', 'z'])
+    self.assertEqual(sorted(batches),
+                     [('a', ['x']), ('a', ['y']), ('b', ['z'])])
+
+  def test_errors(self):
+    def send_batch(group, items):
+      if group == 'fail':
+        raise ValueError('batch failed')
+      return [ValueError('item failed') if item == 'bad' else item
+              for item in items]
+
+    batcher = RPCBatcher(send_batch, 0, 'test')
+    self.assertRaises(ValueError, batcher.call, 'fail', 'item')
+    self.assertRaises(ValueError, batcher.call, 'ok', 'bad')
+    self.assertEqual(batcher.call('ok', 'good'), 'good')
+
+
+def make_key(name):
+  key = entity_pb.Reference()
+  key.set_app('guestbook')
+  element = key.mutable_path().add_element()
+  element.set_type('Greeting')
+  element.set_name(name)
+  return key
+
+
+class TestDatastoreBatching(unittest.TestCase):
+  def setUp(self):
+    flexmock(datastore_distributed).should_receive('get_load_balancers').\
+      and_return([])
+    self.stub = datastore_distributed.DatastoreDistributed(
+      'guestbook', 'localhost:8888', batch_window=0.2)
+
+  def test_get(self):
+    sent = []
+
+    def remote_send(request, response, method, request_id=None):
+      sent.append(request)
+      for key in request.key_list():
+        entity = response.add_entity()
+        if key.path().element(0).name() != 'missing':
+          entity.mutable_entity().mutable_key().CopyFrom(key)
+
+    flexmock(self.stub).should_receive('_RemoteSend').replace_with(remote_send)
+
+    def get(names):
+      request = datastore_pb.GetRequest()
+      for name in names:
+        request.add_key().CopyFrom(make_key(name))
+      response = datastore_pb.GetResponse()
+      self.stub._Dynamic_Get(request, response, 'request-1')
+      return response
+
+    responses = call_concurrently([lambda: get(['a', 'b']),
+                                   lambda: get(['missing']),
+                                   lambda: get(['c'])])
+    self.assertEqual(len(sent), 1)
+    self.assertEqual(sent[0].key_size(), 4)
+    self.assertEqual([response.entity_size() for response in responses],
+                     [2, 1, 1])
+    self.assertFalse(responses[1].entity(0).has_entity())
+    self.assertEqual(responses[2].entity(0).entity().key(), make_key('c'))
+
+  def test_put_retries_separately(self):
+    sent = []
+
+    def remote_send(request, response, method, request_id=None):
+      sent.append(request)
+      names = [entity.key().path().element(0).name()
+               for entity in request.entity_list()]
+      if 'bad' in names:
+        raise apiproxy_errors.ApplicationError(
+          datastore_pb.Error.BAD_REQUEST, 'bad entity')
+      for entity in request.entity_list():
+        response.add_key().CopyFrom(entity.key())
+
+    flexmock(self.stub).should_receive('_RemoteSend').replace_with(remote_send)
+
+    def put(name):
+      request = datastore_pb.PutRequest()
+      request.add_entity().mutable_key().CopyFrom(make_key(name))
+      response = datastore_pb.PutResponse()
+      self.stub._Dynamic_Put(request, response, 'request-1')
+      return response
+
+    responses = call_concurrently([lambda: put('a'), lambda: put('bad')])
+    self.assertEqual(len(sent), 3)
+    self.assertEqual(responses[0].key_list(), [make_key('a')])
+    self.assertIsInstance(responses[1], apiproxy_errors.ApplicationError)
+
+  def test_transactional_get_is_not_batched(self):
+    request = datastore_pb.GetRequest()
+    request.add_key().CopyFrom(make_key('a'))
+    request.mutable_transaction().set_handle(1)
+    request.mutable_transaction().set_app('guestbook')
+    flexmock(self.stub).should_receive('_RemoteSend').once()
+    self.stub._Dynamic_Get(request, datastore_pb.GetResponse(), 'request-1')
+    self.assertEqual(self.stub._DatastoreDistributed__get_batcher.stats.calls,
+                     0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,106 @@
+import cStringIO
+import os
+import sys
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api import blobstore
+from google.appengine.api import datastore
+from google.appengine.api.blobstore import blobstore_service_pb
+from google.appengine.api.blobstore import datastore_blob_storage
+from google.appengine.api.blobstore.datastore_blob_storage import (
+  DatastoreBlobReader, DatastoreBlobStorage)
+from google.appengine.runtime import apiproxy_errors
+
+# A small block size keeps the blobs in these tests short.
+BLOCK_SIZE = 4
+
+
+class FakeDatastore(object):
+  """ Keeps blob chunks by key name and records each Get. """
+  def __init__(self, blocks=()):
+    self.blocks = {}
+    for index, block in enumerate(blocks):
+      self.blocks['blob1__{}'.format(index)] = block
+    self.gets = []
+    self.puts = []
+
+  def get(self, keys):
+    self.gets.append([int(key.name().split('__')[-1]) for key in keys])
+    return [{'block': self.blocks[key.name()]}
+            if key.name() in self.blocks else None
+            for key in keys]
+
+  def put_async(self, entities):
+    self.puts.append([entity.key().name() for entity in entities])
+    for entity in entities:
+      self.blocks[entity.key().name()] = str(entity['block'])
+    return flexmock(get_result=lambda: None)
+
+
+class TestDatastoreBlobStorage(unittest.TestCase):
+  def setUp(self):
+    flexmock(os, environ={'APPLICATION_ID': 'guestbook'})
+    flexmock(datastore_blob_storage, MAX_BLOB_FETCH_SIZE=BLOCK_SIZE)
+    flexmock(blobstore, MAX_BLOB_FETCH_SIZE=BLOCK_SIZE)
+    self.datastore = FakeDatastore(['0123', '4567', '89ab', 'cdef', 'gh'])
+    flexmock(datastore).should_receive('Get').replace_with(self.datastore.get)
+    flexmock(datastore).should_receive('PutAsync').\
+      replace_with(self.datastore.put_async)
+
+  def test_read_across_blocks(self):
+    reader = DatastoreBlobReader('blob1', BLOCK_SIZE, 2)
+    self.assertEqual(reader._fetch_data('blob1', 2, 5), '2345')
+
+    # Both blocks are fetched in one Get, along with read-ahead blocks.
+    self.assertEqual(self.datastore.gets, [[0, 1, 2, 3, 4]])
+
+  def test_sequential_reads(self):
+    reader = DatastoreBlobReader('blob1', BLOCK_SIZE, 0)
+    self.assertEqual(reader.read(), '0123456789abcdefgh')
+
+    # Read-ahead blocks are served from the cache.
+    self.assertEqual(self.datastore.gets, [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+  def test_eviction(self):
+    reader = DatastoreBlobReader('blob1', BLOCK_SIZE, 0)
+    reader._fetch_data('blob1', 8, 11)
+    self.assertEqual(self.datastore.gets, [[2]])
+
+    # Blocks behind the read position are dropped, so earlier blocks are
+    # fetched again.
+    self.assertEqual(reader._fetch_data('blob1', 12, 15), 'cdef')
+    self.assertEqual(reader._fetch_data('blob1', 8, 11), '89ab')
+    self.assertEqual(self.datastore.gets, [[2], [3, 4, 5, 6], [2]])
+
+  def test_end_of_blob(self):
+    reader = DatastoreBlobReader('blob1', BLOCK_SIZE, 0)
+    self.assertEqual(reader._fetch_data('blob1', 20, 23), '')
+
+    reader = DatastoreBlobReader('blob2', BLOCK_SIZE, 0)
+    with self.assertRaises(apiproxy_errors.ApplicationError) as context:
+      reader._fetch_data('blob2', 0, 3)
+
+    self.assertEqual(context.exception.application_error,
+                     blobstore_service_pb.BlobstoreServiceError.BLOB_NOT_FOUND)
+
+  def test_store_large_blob(self):
+    block_count = datastore_blob_storage._BLOCKS_PER_PUT * 2 + 3
+    data = ''.join(str(index % 10) * BLOCK_SIZE
+                   for index in range(block_count))
+    storage = DatastoreBlobStorage('guestbook')
+    storage.StoreBlob('blob2', cStringIO.StringIO(data))
+
+    self.assertEqual([len(put) for put in self.datastore.puts],
+                     [datastore_blob_storage._BLOCKS_PER_PUT,
+                      datastore_blob_storage._BLOCKS_PER_PUT, 3])
+    self.assertEqual(
+      ''.join(self.datastore.blocks['blob2__{}'.format(index)]
+              for index in range(block_count)),
+      data)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,247 @@
+import os
+import sys
+import unittest
+
+from flexmock import flexmock
+
+sys.path.append("{0}/../../../..".format(os.path.dirname(__file__)))
+from google.appengine.api.memcache import memcache_distributed
+from google.appengine.api.memcache import memcache_service_pb
+
+MemcacheDeleteRequest = memcache_service_pb.MemcacheDeleteRequest
+MemcacheDeleteResponse = memcache_service_pb.MemcacheDeleteResponse
+MemcacheGetRequest = memcache_service_pb.MemcacheGetRequest
+MemcacheGetResponse = memcache_service_pb.MemcacheGetResponse
+MemcacheSetRequest = memcache_service_pb.MemcacheSetRequest
+MemcacheSetResponse = memcache_service_pb.MemcacheSetResponse
+
+
+class FakeMemcacheClient(object):
+  """ Keeps values in a dictionary and counts round trips. """
+  def __init__(self):
+    self.data = {}
+    self.next_cas_id = 1
+    self.cas_ids = {}
+    self.calls = []
+
+  def _store(self, key, value):
+    self.data[key] = (value, self.next_cas_id)
+    self.next_cas_id += 1
+
+  def get(self, key):
+    self.calls.append('get')
+    return self.data.get(key, (None, None))[0]
+
+  def get_multi(self, keys):
+    self.calls.append('get_multi')
+    return dict((key, self.data[key][0]) for key in keys if key in self.data)
+
+  def gets_multi(self, keys):
+    self.calls.append('gets_multi')
+    return dict((key, self.data[key]) for key in keys if key in self.data)
+
+  def set_multi(self, mapping, time=0):
+    self.calls.append('set_multi')
+    for key, value in mapping.iteritems():
+      self._store(key, value)
+    return []
+
+  def add(self, key, value, time=0):
+    self.calls.append('add')
+    if key in self.data:
+      return False
+    self._store(key, value)
+    return True
+
+  def replace(self, key, value, time=0):
+    self.calls.append('replace')
+    if key not in self.data:
+      return False
+    self._store(key, value)
+    return True
+
+  def cas(self, key, value, time=0):
+    self.calls.append('cas')
+    if key not in self.data or self.data[key][1] != self.cas_ids[key]:
+      return False
+    self._store(key, value)
+    return True
+
+  def delete_multi(self, keys):
+    self.calls.append('delete_multi')
+    for key in keys:
+      self.data.pop(key, None)
+    return True
+
+
+class TestMemcacheService(unittest.TestCase):
+  def setUp(self):
+    flexmock(os, environ={'APPNAME': 'guestbook'})
+    flexmock(memcache_distributed.MemcacheService).\
+      should_receive('setupMemcacheClient')
+    self.service = memcache_distributed.MemcacheService()
+    self.client = FakeMemcacheClient()
+    self.service._memcache = self.client
+
+  def set(self, items, policy=MemcacheSetRequest.SET):
+    request = MemcacheSetRequest()
+    for key, value, cas_id in items:
+      item = request.add_item()
+      item.set_key(key)
+      item.set_value(value)
+      item.set_flags(0)
+      item.set_set_policy(policy)
+      if cas_id is not None:
+        item.set_for_cas(True)
+        item.set_cas_id(cas_id)
+
+    response = MemcacheSetResponse()
+    self.service._Dynamic_Set(request, response)
+    return response.set_status_list()
+
+  def get(self, keys, for_cas=False):
+    request = MemcacheGetRequest()
+    for key in keys:
+      request.add_key(key)
+    request.set_for_cas(for_cas)
+    response = MemcacheGetResponse()
+    self.service._Dynamic_Get(request, response)
+    return dict((item.key(), (item.value(), item.cas_id()))
+                for item in response.item_list())
+
+  def test_set(self):
+    self.assertEqual(self.set([('a', '1', None), ('b', '2', None)]),
+                     [MemcacheSetResponse.STORED] * 2)
+    self.assertEqual(self.client.calls, ['set_multi'])
+    self.assertEqual(self.get(['a', 'b', 'c']), {'a': ('1', 0), 'b': ('2', 0)})
+    self.assertEqual(self.client.calls[-1], 'get_multi')
+
+  def test_mixed_policies(self):
+    request = MemcacheSetRequest()
+    for key, value, policy, expiration in [
+        ('a', '1', MemcacheSetRequest.SET, 0),
+        ('b', '1', MemcacheSetRequest.SET, 0),
+        ('a', '2', MemcacheSetRequest.ADD, 0),
+        ('b', '2', MemcacheSetRequest.REPLACE, 0),
+        ('c', '1', MemcacheSetRequest.SET, 0),
+        ('c', '2', MemcacheSetRequest.SET, 60),
+        ('d', '1', MemcacheSetRequest.SET, 60)]:
+      item = request.add_item()
+      item.set_key(key)
+      item.set_value(value)
+      item.set_flags(0)
+      item.set_set_policy(policy)
+      item.set_expiration_time(expiration)
+
+    response = MemcacheSetResponse()
+    self.service._Dynamic_Set(request, response)
+
+    # Each item sees the items that came before it.
+    self.assertEqual(response.set_status_list(),
+                     [MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.NOT_STORED,
+                      MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.STORED])
+    self.assertEqual(self.client.calls, ['set_multi', 'add', 'replace',
+                                         'set_multi', 'set_multi'])
+    self.assertEqual(self.get(['a', 'b', 'c', 'd']),
+                     {'a': ('1', 0), 'b': ('2', 0), 'c': ('2', 0),
+                      'd': ('1', 0)})
+
+  def test_add(self):
+    self.set([('a', '1', None)])
+    self.assertEqual(self.set([('a', '2', None), ('b', '2', None)],
+                              MemcacheSetRequest.ADD),
+                     [MemcacheSetResponse.NOT_STORED,
+                      MemcacheSetResponse.STORED])
+    self.assertEqual(self.get(['a', 'b']), {'a': ('1', 0), 'b': ('2', 0)})
+
+  def test_replace(self):
+    self.set([('a', '1', None)])
+    self.assertEqual(self.set([('a', '2', None), ('b', '2', None)],
+                              MemcacheSetRequest.REPLACE),
+                     [MemcacheSetResponse.STORED,
+                      MemcacheSetResponse.NOT_STORED])
+    self.assertEqual(self.get(['a', 'b']), {'a': ('2', 0)})
+
+  def test_cas(self):
+    self.set([('a', '1', None), ('b', '1', None), ('c', '1', None)])
+    del self.client.calls[:]
+    cas_ids = dict((key, cas_id) for key, (_, cas_id)
+                   in self.get(['a', 'b', 'c'], for_cas=True).iteritems())
+
+    # CAS IDs for every key are fetched at once.
+    self.assertEqual(self.client.calls, ['gets_multi'])
+
+    self.set([('b', '2', None)])
+    self.set([('c', '2', None)])
+    self.service._Dynamic_Delete(self.delete_request(['c']),
+                                 MemcacheDeleteResponse())
+    statuses = self.set([(key, '3', cas_ids[key]) for key in ('a', 'b', 'c')],
+                        MemcacheSetRequest.CAS)
+    self.assertEqual(statuses, [MemcacheSetResponse.STORED,
+                                MemcacheSetResponse.EXISTS,
+                                MemcacheSetResponse.NOT_STORED])
+    self.assertEqual(self.get(['a', 'b', 'c']), {'a': ('3', 0), 'b': ('2', 0)})
+
+  def test_cas_without_id(self):
+    self.set([('a', '1', None)])
+    self.assertEqual(self.set([('a', '2', None)], MemcacheSetRequest.CAS),
+                     [MemcacheSetResponse.NOT_STORED])
+
+  @staticmethod
+  def delete_request(keys):
+    request = MemcacheDeleteRequest()
+    for key in keys:
+      request.add_item().set_key(key)
+    return request
+
+  def test_delete(self):
+    self.set([('a', '1', None)])
+    del self.client.calls[:]
+    response = MemcacheDeleteResponse()
+    self.service._Dynamic_Delete(self.delete_request(['a', 'b']), response)
+    self.assertEqual(response.delete_status_list(),
+                     [MemcacheDeleteResponse.DELETED,
+                      MemcacheDeleteResponse.NOT_FOUND])
+    self.assertEqual(self.client.calls, ['get_multi', 'delete_multi'])
+
+
+class FakeServer(object):
+  """ Replays memcached responses. """
+  def __init__(self, lines, values):
+    self.lines = list(lines)
+    self.values = list(values)
+    self.commands = []
+
+  def send_cmd(self, command):
+    self.commands.append(command)
+
+  def readline(self, raise_exception=False):
+    return self.lines.pop(0)
+
+  def recv(self, length):
+    return self.values.pop(0)
+
+  def mark_dead(self, reason):
+    raise AssertionError(reason)
+
+
+class TestMemcacheClient(unittest.TestCase):
+  def test_gets_multi(self):
+    client = memcache_distributed._MemcacheClient([])
+    server = FakeServer(['VALUE a 0 1 7', 'VALUE b 0 2 8', 'END'],
+                        ['1\r\n', '22\r\n'])
+    flexmock(client).should_receive('_map_and_prefix_keys').\
+      and_return(({server: ['a', 'b', 'c']}, {'a': 'a', 'b': 'b', 'c': 'c'}))
+
+    self.assertEqual(client.gets_multi(['a', 'b', 'c']),
+                     {'a': ('1', 7), 'b': ('22', 8)})
+    self.assertEqual(server.commands, ['gets a b c'])
+
+
+if __name__ == '__main__':
+  unittest.main()
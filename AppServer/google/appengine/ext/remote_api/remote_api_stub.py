@@ -73,6 +73,8 @@ import random
 import sys
 import thread
 import threading
+import urllib
+import urllib2
 import yaml
 import hashlib
 
@@ -92,6 +94,7 @@ else:
   from google.appengine.ext.remote_api import remote_api_services
   from google.appengine.runtime import apiproxy_errors
 
+from google.appengine.api.appscale_connection_pool import HTTPConnectionPool
 from google.appengine.tools import appengine_rpc
 
 
@@ -220,7 +223,7 @@ class RemoteStub(object):
     request_pb.set_service_name(service)
     request_pb.set_method(call)
     request_pb.set_request(request.Encode())
-    if hasattr(self._local, 'request_id'):
+    if getattr(self._local, 'request_id', None) is not None:
 
 
       request_pb.set_request_id(self._local.request_id)
@@ -259,6 +262,68 @@ class RuntimeRemoteStub(RemoteStub):
       return apiproxy_rpc.RealRPC(stub=self)
 
 
+# AppScale: The runtime sends every API call to a local API server, so calls
+# share a few persistent connections instead of opening one for each call.
+class PooledRpcServer(object):
+  """ Sends remote API calls over persistent connections to an API server.
+
+  This can be used as the rpc_server_factory for ConfigureRemoteApi when no
+  authentication is needed.
+  """
+  def __init__(self, host, auth_function=None, user_agent=None, source=None,
+               save_cookies=False, debug_data=False, secure=False,
+               max_connections=apiproxy_rpc.MAX_RPC_WORKERS):
+    """ Creates a new PooledRpcServer.
+
+    Args:
+      host: A string specifying the host and port of the API server.
+      auth_function: Ignored. Accepted for compatibility with HttpRpcServer.
+      user_agent: A string specifying the User-Agent header.
+      source: Ignored. Accepted for compatibility with HttpRpcServer.
+      save_cookies: Ignored. Accepted for compatibility with HttpRpcServer.
+      debug_data: Ignored. Accepted for compatibility with HttpRpcServer.
+      secure: A boolean indicating whether or not to use HTTPS.
+      max_connections: An integer specifying how many idle connections to
+        keep. Each in-flight call uses one connection, so this should match
+        the number of threads that make calls.
+    """
+    self.host = host
+    self.scheme = 'https' if secure else 'http'
+    self._user_agent = user_agent
+    self._pool = HTTPConnectionPool(host, secure=secure,
+                                    max_idle=max_connections)
+
+  def Send(self, request_path, payload='',
+           content_type='application/octet-stream', timeout=None, **kwargs):
+    """ Sends an RPC and returns the response.
+
+    Args:
+      request_path: The path to send the request to.
+      payload: The body of the request, or None to send an empty request.
+      content_type: The Content-Type header to use.
+      timeout: Ignored. Accepted for compatibility with HttpRpcServer.
+      kwargs: Any keyword arguments are converted into query string parameters.
+    Returns:
+      The response body, as a string.
+    Raises:
+      urllib2.HTTPError if the server does not handle the request.
+    """
+    if kwargs:
+      request_path += '?' + urllib.urlencode(sorted(kwargs.items()))
+
+    headers = [('Content-Type', content_type),
+               ('X-appcfg-api-version', '1')]
+    if self._user_agent is not None:
+      headers.append(('User-Agent', self._user_agent))
+
+    status, _, body = self._pool.post(payload or '', headers, request_path)
+    if status != 200:
+      url = '%s://%s%s' % (self.scheme, self.host, request_path)
+      raise urllib2.HTTPError(url, status, body, None, None)
+
+    return body
+
+
 class RemoteDatastoreStub(RemoteStub):
   """A specialised stub for accessing the App Engine datastore remotely.
 
@@ -235,7 +235,8 @@ def setup_stubs(
     user_logout_url,
     default_gcs_bucket_name,
     uaserver_path,
-    xmpp_path):
+    xmpp_path,
+    datastore_batch_window=None):
   """Configures the APIs hosted by this server.
 
   Args:
@@ -292,6 +293,9 @@ def setup_stubs(
         of the machine that runs a UserAppServer.
     xmpp_path: (AppScale-specific) A str containing the FQDN or IP address of
         the machine that runs ejabberd, where XMPP clients should connect to.
+    datastore_batch_window: (AppScale-specific) A float specifying how many
+        seconds non-transactional datastore Gets and Puts wait to be combined
+        with other calls, or None to send each call separately.
   """
 
   identity_stub = app_identity_stub.AppIdentityServiceStub()
@@ -315,7 +319,8 @@ def setup_stubs(
 
   datastore = datastore_distributed.DatastoreDistributed(
       app_id, datastore_path, require_indexes=datastore_require_indexes,
-      trusted=trusted, root_path=application_root)
+      trusted=trusted, root_path=application_root,
+      batch_window=datastore_batch_window)
 
   apiproxy_stub_map.apiproxy.ReplaceStub(
       'datastore_v3', datastore)
@@ -21,12 +21,14 @@ import argparse
 import errno
 import getpass
 import itertools
+import json
 import logging
 import os
 import sys
 import tempfile
 import time
 
+from google.appengine.api import appscale_direct_stubs
 from google.appengine.datastore import datastore_stub_util
 from google.appengine.tools import boolean_action
 from google.appengine.tools.devappserver2.admin import admin_server
@@ -493,6 +495,18 @@ def create_command_line_parser():
   appscale_group.add_argument(
     '--uaserver_path',
     help='the FQDN or IP address where the UserAppServer runs.')
+  appscale_group.add_argument(
+    '--datastore_batch_window_ms', type=float,
+    help='the number of milliseconds that non-transactional datastore Gets '
+    'and Puts wait to be combined into one request (disabled by default)')
+  appscale_group.add_argument(
+    '--direct_api_calls',
+    action=boolean_action.BooleanAction,
+    const=True,
+    default=False,
+    help='create the datastore, memcache, and taskqueue stubs in Python '
+    'runtime instances so that their API calls go straight to AppScale '
+    'services instead of through the API server.')
   appscale_group.add_argument(
     '--trusted',
     action=boolean_action.BooleanAction,
@@ -702,6 +716,20 @@ class DevelopmentServer(object):
 
     api_server.maybe_convert_datastore_file_stub_data_to_sqlite(
         configuration.app_id, datastore_path)
+
+    datastore_batch_window = None
+    if options.datastore_batch_window_ms is not None:
+      datastore_batch_window = options.datastore_batch_window_ms / 1000.0
+
+    # Runtime instances inherit the environment when they are started.
+    if options.direct_api_calls:
+      os.environ[appscale_direct_stubs.SETTINGS_ENV] = json.dumps({
+        'datastore_path': datastore_path,
+        'datastore_batch_window': datastore_batch_window,
+        'require_indexes': options.require_indexes,
+        'trusted': getattr(options, 'trusted', False)
+      })
+
     api_server.setup_stubs(
         request_data=request_data,
         app_id=configuration.app_id,
@@ -730,7 +758,8 @@ class DevelopmentServer(object):
         user_logout_url=user_logout_url,
         default_gcs_bucket_name=options.default_gcs_bucket_name,
         uaserver_path=options.uaserver_path,
-        xmpp_path=options.xmpp_path)
+        xmpp_path=options.xmpp_path,
+        datastore_batch_window=datastore_batch_window)
 
     # The APIServer must bind to localhost because that is what the runtime
     # instances talk to.
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""Compares datastore call latency through the API server and in-process.
+
+Starts a fake datastore server that answers Gets and Puts immediately and an
+API server that forwards calls to it. Each case makes calls one at a time so
+the results show the cost of the extra hop for a single call. Run:
+
+  python AppServer/google/appengine/tools/devappserver2/direct_api_benchmark.py
+"""
+
+
+import argparse
+import BaseHTTPServer
+import os
+import SocketServer
+import sys
+import threading
+import time
+
+sys.path.append('{0}/../../../..'.format(os.path.dirname(__file__)))
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import appscale_direct_stubs
+from google.appengine.api import datastore_distributed
+from google.appengine.datastore import datastore_pb
+from google.appengine.datastore import entity_pb
+from google.appengine.ext.remote_api import remote_api_pb
+from google.appengine.ext.remote_api import remote_api_stub
+from google.appengine.tools.devappserver2 import api_server
+
+APP_ID = 'benchmark'
+
+
+class DatastoreHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Answers datastore Gets and Puts like the datastore server."""
+  protocol_version = 'HTTP/1.1'
+
+  # Buffer the response so it is sent in one segment.
+  wbufsize = -1
+
+  def do_POST(self):
+    request = remote_api_pb.Request(
+        self.rfile.read(int(self.headers['Content-Length'])))
+    if request.method() == 'Get':
+      get_request = datastore_pb.GetRequest(request.request())
+      call_response = datastore_pb.GetResponse()
+      for key in get_request.key_list():
+        entity = call_response.add_entity().mutable_entity()
+        entity.mutable_key().CopyFrom(key)
+        entity.mutable_entity_group()
+    else:
+      put_request = datastore_pb.PutRequest(request.request())
+      call_response = datastore_pb.PutResponse()
+      for entity in put_request.entity_list():
+        call_response.add_key().CopyFrom(entity.key())
+
+    response = remote_api_pb.Response()
+    response.set_response(call_response.Encode())
+    body = response.Encode()
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class DatastoreServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+def make_key(name):
+  """Creates a datastore key."""
+  key = entity_pb.Reference()
+  key.set_app(APP_ID)
+  element = key.mutable_path().add_element()
+  element.set_type('Greeting')
+  element.set_name(name)
+  return key
+
+
+def make_requests():
+  """Creates a Get request and a Put request for one entity each."""
+  get_request = datastore_pb.GetRequest()
+  get_request.add_key().CopyFrom(make_key('greeting'))
+
+  put_request = datastore_pb.PutRequest()
+  entity = put_request.add_entity()
+  entity.mutable_key().CopyFrom(make_key('greeting'))
+  entity.mutable_entity_group()
+  prop = entity.add_property()
+  prop.set_name('content')
+  prop.set_multiple(False)
+  prop.mutable_value().set_stringvalue('Hello, World!')
+  return [('Get', get_request, datastore_pb.GetResponse),
+          ('Put', put_request, datastore_pb.PutResponse)]
+
+
+def measure(stub, method, request, response_class, calls):
+  """Makes calls one at a time.
+
+  Args:
+    stub: A stub for the datastore_v3 service.
+    method: A string specifying the method name.
+    request: A protocol buffer request.
+    response_class: The protocol buffer response class.
+    calls: An integer specifying the number of calls to make.
+
+  Returns:
+    A sorted list of floats specifying each call's latency in milliseconds.
+  """
+  latencies = []
+  for _ in range(calls):
+    start_time = time.time()
+    stub.MakeSyncCall('datastore_v3', method, request, response_class())
+    latencies.append((time.time() - start_time) * 1000)
+
+  return sorted(latencies)
+
+
+def percentile(latencies, percent):
+  """Returns a percentile from a sorted list."""
+  return latencies[min(len(latencies) - 1, len(latencies) * percent // 100)]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--calls', type=int, default=2000,
+                      help='The number of calls to make for each case')
+  args = parser.parse_args()
+
+  os.environ.setdefault('AUTH_DOMAIN', 'gmail.com')
+  datastore_server = DatastoreServer(('127.0.0.1', 0), DatastoreHandler)
+  server_thread = threading.Thread(target=datastore_server.serve_forever)
+  server_thread.daemon = True
+  server_thread.start()
+  datastore_location = '127.0.0.1:{}'.format(
+      datastore_server.server_address[1])
+  datastore_distributed.get_load_balancers = lambda: []
+
+  # The API server handles calls with the stubs in the global stub map.
+  apiproxy_stub_map.apiproxy.RegisterStub(
+      'datastore_v3',
+      datastore_distributed.DatastoreDistributed(APP_ID, datastore_location))
+  apis = api_server.APIServer('localhost', 0, APP_ID)
+  apis.start()
+
+  try:
+    remote_stub = remote_api_stub.RuntimeRemoteStub(
+        remote_api_stub.PooledRpcServer('localhost:{}'.format(apis.port)),
+        '/')
+    remote_stub._SetRequestId('benchmark')
+    direct_stub = appscale_direct_stubs.FallbackStub(
+        datastore_distributed.DatastoreDistributed(
+            APP_ID, datastore_location, load_balancers=[]),
+        remote_stub)
+
+    print '%-24s %10s %10s %10s' % ('case', 'mean ms', 'p50 ms', 'p99 ms')
+    for method, request, response_class in make_requests():
+      for name, stub in [('API server', remote_stub),
+                         ('in-process', direct_stub)]:
+        # Open connections before measuring.
+        measure(stub, method, request, response_class, 10)
+        latencies = measure(stub, method, request, response_class, args.calls)
+        print '%-24s %10.3f %10.3f %10.3f' % (
+            '%s, %s' % (method, name), sum(latencies) / len(latencies),
+            percentile(latencies, 50), percentile(latencies, 99))
+  finally:
+    apis.quit()
+    datastore_server.shutdown()
+
+
+if __name__ == '__main__':
+  main()
@@ -47,6 +47,8 @@ import threading
 import urllib
 import wsgiref.headers
 
+from google.appengine.api import appscale_connection_pool
+from google.appengine.api.appscale_connection_pool import HTTPConnectionPool
 from google.appengine.tools.devappserver2 import http_runtime_constants
 from google.appengine.tools.devappserver2 import instance
 from google.appengine.tools.devappserver2 import login
@@ -57,6 +59,20 @@ from google.appengine.tools.devappserver2 import util
 START_PROCESS = -1
 START_PROCESS_FILE = -2
 
+# AppScale: Request bodies larger than this are streamed to the runtime
+# instead of being read into memory first.
+_MAX_BUFFERED_BODY = 64 * 1024
+
+# The number of bytes to read at a time when streaming bodies.
+_BLOCK_SIZE = 64 * 1024
+
+# The maximum number of idle connections to keep to each runtime process.
+_MAX_IDLE_CONNECTIONS = 10
+
+# The number of seconds an idle connection to a runtime process is reused for.
+# This should be lower than the keep-alive timeout of the runtime's server.
+_IDLE_TIMEOUT = 5
+
 
 def _sleep_between_retries(attempt, max_attempts, sleep_base):
   """Sleep between retry attempts.
@@ -80,6 +96,34 @@ def _sleep_between_retries(attempt, max_attempts, sleep_base):
     time.sleep((2 ** attempt) * sleep_base)
 
 
+class _RequestBody(object):
+  """ Reads a request body from a WSGI input stream as it is sent. """
+  def __init__(self, wsgi_input, length):
+    """ Creates a new _RequestBody.
+
+    Args:
+      wsgi_input: A file-like object containing the request body.
+      length: An integer specifying the length of the body.
+    """
+    self._wsgi_input = wsgi_input
+    self._remaining = length
+
+  def read(self, size=_BLOCK_SIZE):
+    """ Reads the next block of the body.
+
+    Args:
+      size: The maximum number of bytes to read.
+    Returns:
+      A string containing the next block or an empty string at the end.
+    """
+    if self._remaining <= 0:
+      return ''
+
+    block = self._wsgi_input.read(min(size, self._remaining))
+    self._remaining -= len(block)
+    return block
+
+
 def _remove_retry_sharing_violation(path, max_attempts=10, sleep_base=.125):
   """Removes a file (with retries on Windows for sharing violations).
 
@@ -153,6 +197,57 @@ class HttpRuntimeProxy(instance.RuntimeProxy):
     if start_process_flavor not in self._VALID_START_PROCESS_FLAVORS:
       raise ValueError('Invalid start_process_flavor.')
     self._start_process_flavor = start_process_flavor
+    self._connection_pool = None
+    self._connection_pool_lock = threading.Lock()
+
+  def _get_connection_pool(self):
+    """ Retrieves the pool of connections to the runtime process.
+
+    Returns:
+      An HTTPConnectionPool.
+    """
+    location = '%s:%d' % (self._host, self._port)
+    with self._connection_pool_lock:
+      if (self._connection_pool is None or
+          self._connection_pool.location != location):
+        if self._connection_pool is not None:
+          self._connection_pool.close()
+        self._connection_pool = HTTPConnectionPool(
+            location, max_idle=_MAX_IDLE_CONNECTIONS,
+            idle_timeout=_IDLE_TIMEOUT)
+      return self._connection_pool
+
+  def _send_request(self, method, url, body, headers):
+    """ Sends a request to the runtime process over a pooled connection.
+
+    Args:
+      method: A string specifying the HTTP method.
+      url: A string specifying the URL path and query.
+      body: A string or a _RequestBody object.
+      headers: A dictionary containing the request headers.
+    Returns:
+      A tuple containing the connection and the httplib.HTTPResponse.
+    """
+    pool = self._get_connection_pool()
+    while True:
+      connection, reused = pool.get_connection()
+      try:
+        if not reused:
+          connection.connect()
+        connection.request(method, url, body, headers)
+        return connection, connection.getresponse()
+      except (httplib.BadStatusLine, socket.error) as error:
+        connection.close()
+        # The runtime may have closed a reused connection while it was idle.
+        # Only buffered bodies can be sent again.
+        stale = (isinstance(error, httplib.BadStatusLine) or
+                 error.errno in appscale_connection_pool.STALE_ERRNOS)
+        if reused and stale and isinstance(body, str):
+          continue
+        raise
+      except Exception:
+        connection.close()
+        raise
 
   def _get_error_file(self):
     for error_handler in self._module_configuration.error_handlers or []:
@@ -205,7 +300,11 @@ class HttpRuntimeProxy(instance.RuntimeProxy):
       url = urllib.quote(environ['PATH_INFO'])
     if 'CONTENT_LENGTH' in environ:
       headers['CONTENT-LENGTH'] = environ['CONTENT_LENGTH']
-      data = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+      content_length = int(environ['CONTENT_LENGTH'])
+      if content_length > _MAX_BUFFERED_BODY:
+        data = _RequestBody(environ['wsgi.input'], content_length)
+      else:
+        data = environ['wsgi.input'].read(content_length)
     else:
       data = ''
 
@@ -231,80 +330,84 @@ class HttpRuntimeProxy(instance.RuntimeProxy):
     headers[prefix + 'User-Nickname'] = (nickname)
     headers[prefix + 'User-Organization'] = (organization)
     headers['X-AppEngine-Country'] = 'ZZ'
-    connection = httplib.HTTPConnection(self._host, self._port)
-    with contextlib.closing(connection):
+    connection = None
+    reusable = False
+    try:
       try:
-        connection.connect()
-        connection.request(environ.get('REQUEST_METHOD', 'GET'),
-                           url,
-                           data,
-                           dict(headers.items()))
-
+        connection, response = self._send_request(
+            environ.get('REQUEST_METHOD', 'GET'), url, data,
+            dict(headers.items()))
+      except httplib.HTTPException as e:
+        # The runtime process has written a bad HTTP response. For example,
+        # a Go runtime process may have crashed in app-specific code.
+        yield self._handle_error(
+            'the runtime process gave a bad HTTP response: %s' % e,
+            start_response)
+        return
+
+      # Ensures that we avoid merging repeat headers into a single header,
+      # allowing use of multiple Set-Cookie headers.
+      headers = []
+      for name in response.msg:
+        for value in response.msg.getheaders(name):
+          headers.append((name, value))
+
+      response_headers = wsgiref.headers.Headers(headers)
+
+      error_file = self._get_error_file()
+      if (error_file and
+          http_runtime_constants.ERROR_CODE_HEADER in response_headers):
         try:
-          response = connection.getresponse()
-        except httplib.HTTPException as e:
-          # The runtime process has written a bad HTTP response. For example,
-          # a Go runtime process may have crashed in app-specific code.
-          yield self._handle_error(
-              'the runtime process gave a bad HTTP response: %s' % e,
-              start_response)
-          return
-
-        # Ensures that we avoid merging repeat headers into a single header,
-        # allowing use of multiple Set-Cookie headers.
-        headers = []
-        for name in response.msg:
-          for value in response.msg.getheaders(name):
-            headers.append((name, value))
-
-        response_headers = wsgiref.headers.Headers(headers)
-
-        error_file = self._get_error_file()
-        if (error_file and
-            http_runtime_constants.ERROR_CODE_HEADER in response_headers):
-          try:
-            with open(error_file) as f:
-              content = f.read()
-          except IOError:
-            content = 'Failed to load error handler'
-            logging.exception('failed to load error file: %s', error_file)
-          start_response('500 Internal Server Error',
-                         [('Content-Type', 'text/html'),
-                          ('Content-Length', str(len(content)))])
-          yield content
-          return
-        del response_headers[http_runtime_constants.ERROR_CODE_HEADER]
-        start_response('%s %s' % (response.status, response.reason),
-                       response_headers.items())
-
-        # Yield the response body in small blocks.
-        while True:
-          try:
-            block = response.read(512)
-            if not block:
-              break
-            yield block
-          except httplib.HTTPException:
-            # The runtime process has encountered a problem, but has not
-            # necessarily crashed. For example, a Go runtime process' HTTP
-            # handler may have panicked in app-specific code (which the http
-            # package will recover from, so the process as a whole doesn't
-            # crash). At this point, we have already proxied onwards the HTTP
-            # header, so we cannot retroactively serve a 500 Internal Server
-            # Error. We silently break here; the runtime process has presumably
-            # already written to stderr (via the Tee).
+          with open(error_file) as f:
+            content = f.read()
+        except IOError:
+          content = 'Failed to load error handler'
+          logging.exception('failed to load error file: %s', error_file)
+        start_response('500 Internal Server Error',
+                       [('Content-Type', 'text/html'),
+                        ('Content-Length', str(len(content)))])
+        yield content
+        return
+      del response_headers[http_runtime_constants.ERROR_CODE_HEADER]
+      start_response('%s %s' % (response.status, response.reason),
+                     response_headers.items())
+
+      # Yield the response body in blocks.
+      while True:
+        try:
+          block = response.read(_BLOCK_SIZE)
+          if not block:
+            # The connection can be reused once the whole response is read.
+            reusable = not response.will_close
             break
-      except Exception:
-        with self._process_lock:
-          if self._process and self._process.poll() is not None:
-            # The development server is in a bad state. Log and return an error
-            # message.
-            self._prior_error = ('the runtime process for the instance running '
-                                 'on port %d has unexpectedly quit' % (
-                                     self._port))
-            yield self._handle_error(self._prior_error, start_response)
-          else:
-            raise
+          yield block
+        except httplib.HTTPException:
+          # The runtime process has encountered a problem, but has not
+          # necessarily crashed. For example, a Go runtime process' HTTP
+          # handler may have panicked in app-specific code (which the http
+          # package will recover from, so the process as a whole doesn't
+          # crash). At this point, we have already proxied onwards the HTTP
+          # header, so we cannot retroactively serve a 500 Internal Server
+          # Error. We silently break here; the runtime process has presumably
+          # already written to stderr (via the Tee).
+          break
+    except Exception:
+      with self._process_lock:
+        if self._process and self._process.poll() is not None:
+          # The development server is in a bad state. Log and return an error
+          # message.
+          self._prior_error = ('the runtime process for the instance running '
+                               'on port %d has unexpectedly quit' % (
+                                   self._port))
+          yield self._handle_error(self._prior_error, start_response)
+        else:
+          raise
+    finally:
+      if connection is not None:
+        if reusable:
+          self._get_connection_pool().return_connection(connection)
+        else:
+          connection.close()
 
   def _handle_error(self, message, start_response):
     # Give the runtime process a bit of time to write to stderr.
@@ -432,3 +535,8 @@ class HttpRuntimeProxy(instance.RuntimeProxy):
       # as the thread hasn't returned from the readline call.
       self._stderr_tee.join(5)
       self._process = None
+
+    with self._connection_pool_lock:
+      if self._connection_pool is not None:
+        self._connection_pool.close()
+        self._connection_pool = None
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""Measures HttpRuntimeProxy throughput against a hello-world runtime.
+
+The runtime is a hello-world WSGI app served by the same wsgi_server that the
+Python runtime uses. Run:
+
+  python AppServer/google/appengine/tools/devappserver2/http_runtime_benchmark.py
+"""
+
+
+import argparse
+import cStringIO
+import os
+import re
+import resource
+import sys
+import threading
+import time
+
+sys.path.append('{0}/../../../..'.format(os.path.dirname(__file__)))
+
+from google.appengine.api import appinfo
+from google.appengine.tools.devappserver2 import http_runtime
+from google.appengine.tools.devappserver2 import instance
+from google.appengine.tools.devappserver2 import login
+from google.appengine.tools.devappserver2 import wsgi_server
+
+
+def hello_world_app(environ, start_response):
+  """Reads the request body and says hello."""
+  wsgi_input = environ['wsgi.input']
+  remaining = int(environ.get('CONTENT_LENGTH') or 0)
+  while remaining > 0:
+    remaining -= len(wsgi_input.read(min(remaining, 64 * 1024)))
+
+  body = 'Hello, World!'
+  start_response('200 OK', [('Content-Type', 'text/plain'),
+                            ('Content-Length', str(len(body)))])
+  return [body]
+
+
+class ModuleConfiguration(object):
+  application_root = '/tmp'
+  error_handlers = None
+  runtime = 'python27'
+
+
+def make_proxy(port):
+  """Creates a proxy for a runtime that is already listening.
+
+  Args:
+    port: An integer specifying the runtime's port.
+
+  Returns:
+    An HttpRuntimeProxy.
+  """
+  proxy = http_runtime.HttpRuntimeProxy(['runtime'], None,
+                                        ModuleConfiguration())
+  proxy._port = port
+  return proxy
+
+
+def send(proxy, url_map, method='GET', body=''):
+  """Sends a request through the proxy and reads the response."""
+  environ = {'PATH_INFO': '/', 'REQUEST_METHOD': method,
+             'SERVER_NAME': 'localhost', 'SERVER_PORT': '8080',
+             'SERVER_PROTOCOL': 'HTTP/1.1'}
+  if body:
+    environ['wsgi.input'] = cStringIO.StringIO(body)
+    environ['CONTENT_LENGTH'] = str(len(body))
+
+  response = proxy.handle(environ, lambda status, headers: None, url_map,
+                          re.match(url_map.url, '/'), 'request id',
+                          instance.NORMAL_REQUEST)
+  for _ in response:
+    pass
+
+
+def throughput(proxy, url_map, threads, duration):
+  """Sends requests from several threads for a while.
+
+  Args:
+    proxy: An HttpRuntimeProxy.
+    url_map: An appinfo.URLMap for the request.
+    threads: An integer specifying the number of concurrent clients.
+    duration: A float specifying the number of seconds to run for.
+
+  Returns:
+    A float specifying the number of requests per second.
+  """
+  counts = [0] * threads
+  deadline = time.time() + duration
+
+  def client(index):
+    while time.time() < deadline:
+      send(proxy, url_map)
+      counts[index] += 1
+
+  workers = [threading.Thread(target=client, args=(index,))
+             for index in range(threads)]
+  start_time = time.time()
+  for worker in workers:
+    worker.start()
+  for worker in workers:
+    worker.join()
+  return sum(counts) / (time.time() - start_time)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--threads', type=int, default=4,
+                      help='The number of concurrent clients')
+  parser.add_argument('--duration', type=float, default=5,
+                      help='The number of seconds to run each case for')
+  parser.add_argument('--upload-mb', type=int, default=50,
+                      help='The size of the upload in megabytes')
+  args = parser.parse_args()
+
+  login.get_user_info = lambda cookies: ('', False, '')
+  server = wsgi_server.WsgiServer(('localhost', 0), hello_world_app)
+  server.start()
+  url_map = appinfo.URLMap(url='/.*', script='main.app')
+
+  try:
+    pooled = http_runtime._MAX_IDLE_CONNECTIONS
+    for name, max_idle in [('new connection per request', 0),
+                           ('pooled connections', pooled)]:
+      http_runtime._MAX_IDLE_CONNECTIONS = max_idle
+      proxy = make_proxy(server.port)
+      rate = throughput(proxy, url_map, args.threads, args.duration)
+      print '%-28s %10.1f requests/s' % (name, rate)
+
+    # Peak memory only grows, so the streamed upload runs first.
+    body = 'x' * (args.upload_mb * 1024 * 1024)
+    buffered = sys.maxint
+    for name, max_buffered in [('streamed upload', 64 * 1024),
+                               ('buffered upload', buffered)]:
+      http_runtime._MAX_BUFFERED_BODY = max_buffered
+      proxy = make_proxy(server.port)
+      start_time = time.time()
+      send(proxy, url_map, 'POST', body)
+      elapsed = time.time() - start_time
+      max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      print '%-28s %10.3f s %10d KB peak RSS' % (name, elapsed, max_rss)
+  finally:
+    server.quit()
+
+
+if __name__ == '__main__':
+  main()
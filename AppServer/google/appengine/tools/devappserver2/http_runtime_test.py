@@ -34,6 +34,7 @@ import google
 import mox
 
 from google.appengine.api import appinfo
+from google.appengine.api import appscale_connection_pool
 from google.appengine.tools.devappserver2 import http_runtime
 from google.appengine.tools.devappserver2 import http_runtime_constants
 from google.appengine.tools.devappserver2 import instance
@@ -59,6 +60,7 @@ class FakeHttpResponse(object):
     self.body = body
     self.has_read = False
     self.partial_read_error = None
+    self.will_close = True
     self.status = status
     self.reason = reason
     self.headers = headers
@@ -92,9 +94,11 @@ class FakeTee(object):
 
 
 class ModuleConfigurationStub(object):
-  def __init__(self, application_root='/tmp', error_handlers=None):
+  def __init__(self, application_root='/tmp', error_handlers=None,
+               runtime='python27'):
     self.application_root = application_root
     self.error_handlers = error_handlers
+    self.runtime = runtime
 
 
 class HttpRuntimeProxyTest(wsgi_test_utils.WSGITestCase):
@@ -225,6 +229,63 @@ class HttpRuntimeProxyTest(wsgi_test_utils.WSGITestCase):
                         request_type=instance.NORMAL_REQUEST)
     self.mox.VerifyAll()
 
+  def test_handle_reuses_connection(self):
+    self.mox.StubOutWithMock(appscale_connection_pool, '_is_open')
+    appscale_connection_pool._is_open(mox.IsA(httplib.HTTPConnection)).\
+        AndReturn(True)
+    httplib.HTTPConnection.connect()
+    for _ in range(2):
+      response = FakeHttpResponse(200, 'OK', [], 'response')
+      response.will_close = False
+      login.get_user_info(None).AndReturn(('', False, ''))
+      httplib.HTTPConnection.request('GET', '/get', '', mox.IgnoreArg())
+      httplib.HTTPConnection.getresponse().AndReturn(response)
+
+    self.mox.ReplayAll()
+    for _ in range(2):
+      self.assertResponse('200 OK', [], 'response',
+                          self.proxy.handle, {'PATH_INFO': '/get'},
+                          url_map=self.url_map,
+                          match=re.match(self.url_map.url, '/get'),
+                          request_id='request id',
+                          request_type=instance.NORMAL_REQUEST)
+    self.mox.VerifyAll()
+
+  def test_handle_streams_large_post(self):
+    body = 'x' * (http_runtime._MAX_BUFFERED_BODY + 1)
+    sent = []
+
+    def read_body(method, url, data, headers):
+      while True:
+        block = data.read()
+        if not block:
+          break
+        sent.append(block)
+      return True
+
+    response = FakeHttpResponse(200, 'OK', [], 'response')
+    login.get_user_info(None).AndReturn(('', False, ''))
+    httplib.HTTPConnection.connect()
+    httplib.HTTPConnection.request(
+        'POST', '/post', mox.Func(lambda data: not isinstance(data, str)),
+        mox.IgnoreArg()).WithSideEffects(read_body)
+    httplib.HTTPConnection.getresponse().AndReturn(response)
+    httplib.HTTPConnection.close()
+    environ = {'PATH_INFO': '/post',
+               'wsgi.input': cStringIO.StringIO(body + 'trailing data'),
+               'CONTENT_LENGTH': str(len(body)),
+               'REQUEST_METHOD': 'POST'}
+    self.mox.ReplayAll()
+    self.assertResponse('200 OK', [], 'response',
+                        self.proxy.handle, environ,
+                        url_map=self.url_map,
+                        match=re.match(self.url_map.url, '/post'),
+                        request_id='request id',
+                        request_type=instance.NORMAL_REQUEST)
+    self.mox.VerifyAll()
+    self.assertGreater(len(sent), 1)
+    self.assertEqual(''.join(sent), body)
+
   def test_handle_with_error(self):
     with open(os.path.join(self.tmpdir, 'error.html'), 'w') as f:
       f.write('error')
@@ -25,6 +25,7 @@ import traceback
 
 import google
 
+from google.appengine.api import appscale_direct_stubs
 from google.appengine.api import rdbms_mysqldb
 from google.appengine.ext.remote_api import remote_api_stub
 from google.appengine.tools.devappserver2 import request_rewriter
@@ -54,8 +55,8 @@ _STARTUP_FAILURE_TEMPLATE = """
 </html>"""
 
 
-# AppScale: Support using an external API server.
-def setup_stubs(config, external_api_port=None):
+# AppScale: Support using an external API server and calling services directly.
+def setup_stubs(config, external_api_port=None, nginx_host=None):
   """Sets up API stubs using remote API."""
   if external_api_port is None:
     external_api_server = None
@@ -64,10 +65,17 @@ def setup_stubs(config, external_api_port=None):
 
   remote_api_stub.ConfigureRemoteApi(config.app_id, '/', lambda: ('', ''),
                                      'localhost:%d' % config.api_port,
+                                     rpc_server_factory=(
+                                       remote_api_stub.PooledRpcServer),
                                      use_remote_datastore=False,
                                      use_async_rpc=True,
                                      external_api_server=external_api_server)
 
+  direct_settings = appscale_direct_stubs.get_settings()
+  if direct_settings is not None:
+    appscale_direct_stubs.setup_direct_stubs(
+        config.app_id, config.application_root, nginx_host, direct_settings)
+
   if config.HasField('cloud_sql_config'):
     # Connect the RDBMS API to MySQL.
     sys.modules['google.appengine.api.rdbms'] = rdbms_mysqldb
@@ -179,7 +187,7 @@ def main():
         ('localhost', 0),
         debugging_app)
   else:
-    setup_stubs(config, external_api_port)
+    setup_stubs(config, external_api_port, nginx_host)
     sandbox.enable_sandbox(config)
     os.path.expanduser = expand_user
     # This import needs to be after enabling the sandbox so the runtime
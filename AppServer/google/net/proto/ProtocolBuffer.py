@@ -107,6 +107,24 @@ class ProtocolMessage:
   def __setstate__(self, contents_):
     self.__init__(contents=contents_)
 
+  def commandHeaders(self, url):
+    """ Returns the AppScale headers that accompany a command request. """
+    # AppScale:
+    # We add additional headers for the datastore server to reason 
+    # about what request it is getting.
+    pb_type = str(self.__class__).split('.')[-1]
+
+    # AppScale: Set Version and Module headers to current version & module.
+    service_id = os.environ.get('CURRENT_MODULE_ID', 'default')
+
+    # CURRENT_VERSION_ID is formatted major_version.minor_version.
+    version_id = os.environ.get('CURRENT_VERSION_ID', 'v1').split('.')[0]
+
+    return [("ProtocolBufferType", pb_type),
+            ("AppData", url), # app id, user email, nick name, auth domain
+            ('Module', service_id),
+            ('Version', version_id)]
+
   def sendCommand(self, server, url, response, follow_redirects=1,
                   secure=0, keyfile=None, certfile=None, service_id=None,
                   version_id=None):
@@ -121,21 +139,8 @@ class ProtocolMessage:
       conn = httplib.HTTPConnection(server)
     conn.putrequest("POST", '/')
     conn.putheader("Content-Length", "%d" %len(data))
-    # AppScale:
-    # We add additional headers for the datastore server to reason 
-    # about what request it is getting.
-    pb_type = str(self.__class__).split('.')[-1]
-    conn.putheader("ProtocolBufferType" , pb_type)
-    conn.putheader("AppData", url) # app id, user email, nick name, auth domain
-
-    # AppScale: Set Version and Module headers to current version & module.
-    service_id = os.environ.get('CURRENT_MODULE_ID', 'default')
-
-    # CURRENT_VERSION_ID is formatted major_version.minor_version.
-    version_id = os.environ.get('CURRENT_VERSION_ID', 'v1').split('.')[0]
-
-    conn.putheader('Module', service_id)
-    conn.putheader('Version', version_id)
+    for header, value in self.commandHeaders(url):
+      conn.putheader(header, value)
 
     conn.endheaders()
     conn.send(data)
@@ -157,6 +162,26 @@ class ProtocolMessage:
     conn.close()
     return response
 
+  def sendPooledCommand(self, pool, url, response, follow_redirects=1):
+    """ Sends the command over a persistent connection from an AppScale
+    HTTPConnectionPool instead of opening a new connection. """
+    data = self.Encode()
+    status, location, body = pool.post(data, self.commandHeaders(url))
+    if follow_redirects > 0 and status == 302:
+      m = URL_RE.match(location or '')
+      if m:
+        protocol, server, url = m.groups()
+        return self.sendCommand(server, url, response,
+                                follow_redirects=follow_redirects - 1,
+                                secure=(protocol == 'https'),
+                                keyfile=pool.key_file,
+                                certfile=pool.cert_file)
+    if status != 200:
+      raise ProtocolBufferReturnError(status)
+    if response is not None:
+      response.ParseFromString(body)
+    return response
+
   def sendSecureCommand(self, server, keyfile, certfile, url, response,
                         follow_redirects=1):
     return self.sendCommand(server, url, response,
@@ -8,6 +8,7 @@ import signal
 import sys
 import time
 
+from concurrent.futures import ThreadPoolExecutor
 from kazoo.client import KazooClient
 from tornado import gen, httpserver, ioloop
 from tornado.web import Application, RequestHandler
@@ -18,7 +19,9 @@ from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
 from appscale.datastore.cassandra_env.cassandra_interface import DatastoreProxy
 
 from appscale.taskqueue import distributed_tq
-from appscale.taskqueue.constants import SHUTTING_DOWN_TIMEOUT
+from appscale.taskqueue.constants import (
+  MAX_WORKER_THREADS, SHUTTING_DOWN_TIMEOUT
+)
 from appscale.taskqueue.rest_api import (
   RESTLease, RESTQueue, RESTTask, RESTTasks
 )
@@ -36,9 +39,15 @@ class ProtobufferHandler(RequestHandler):
   """ Defines what to do when the webserver receives different types of HTTP
   requests. """
 
-  def initialize(self, queue_handler):
-    """ Provide access to the queue handler. """
+  def initialize(self, queue_handler, thread_pool):
+    """ Provide access to the queue handler.
+
+    Args:
+      queue_handler: A DistributedTaskQueue.
+      thread_pool: A ThreadPoolExecutor.
+    """
     self.queue_handler = queue_handler
+    self.thread_pool = thread_pool
 
   def unknown_request(self, app_id, http_request_data, pb_type):
     """ Function which handles unknown protocol buffers.
@@ -77,7 +86,7 @@ class ProtobufferHandler(RequestHandler):
     module = request.headers['Module']
     app_info = {'app_id': app_id, 'version_id': version, 'module_id': module}
     if pb_type == "Request":
-      method, status = self.remote_request(app_info, http_request_data)
+      method, status = yield self.remote_request(app_info, http_request_data)
       # Fill request stats info
       self.stats_info.pb_method = method
       self.stats_info.pb_status = status
@@ -86,6 +95,7 @@ class ProtobufferHandler(RequestHandler):
       # Fill request stats info
       self.stats_info.pb_status = "NOT_A_PROTOBUFFER_REQUEST"
 
+  @gen.coroutine
   def remote_request(self, app_info, http_request_data):
     """ Receives a remote request to which it should give the correct
     response. The http_request_data holds an encoded protocol buffer of a
@@ -104,7 +114,6 @@ class ProtobufferHandler(RequestHandler):
     errdetail = ""
     method = ""
     http_request_data = ""
-    app_id = app_info['app_id']
     if not apirequest.has_method():
       errcode = taskqueue_service_pb.TaskQueueServiceError.INVALID_REQUEST
       errdetail = "Method was not set in request"
@@ -127,6 +136,45 @@ class ProtobufferHandler(RequestHandler):
       request_log += ': {}'.format(apirequest.request_id())
     logger.debug(request_log)
 
+    # The queue operations block, so they run in the thread pool.
+    result = yield self.thread_pool.submit(
+      self.call_method, method, app_info, http_request_data)
+
+    if result:
+      response, errcode, errdetail = result
+
+    elapsed_time = round(time.time() - start_time, 3)
+    timing_log = 'Elapsed: {}'.format(elapsed_time)
+    if apirequest.has_request_id():
+      timing_log += ' ({})'.format(apirequest.request_id())
+    logger.debug(timing_log)
+
+    if response is not None:
+      apiresponse.set_response(response)
+
+    # If there was an error add it to the response.
+    if errcode != 0:
+      apperror_pb = apiresponse.mutable_application_error()
+      apperror_pb.set_code(errcode)
+      apperror_pb.set_detail(errdetail)
+
+    self.write(apiresponse.Encode())
+    status = taskqueue_service_pb.TaskQueueServiceError.ErrorCode_Name(errcode)
+    raise gen.Return((method, status))
+
+  def call_method(self, method, app_info, http_request_data):
+    """ Passes a request to the queue handler.
+
+    Args:
+      method: A string specifying the API method.
+      app_info: A dictionary containing the application, module, and version ID
+        of the app that is sending this request.
+      http_request_data: Encoded protocol buffer.
+    Returns:
+      A tuple of a encoded response, error code, and error detail or None if
+      the method is not handled.
+    """
+    app_id = app_info['app_id']
     result = None
     if method == "FetchQueueStats":
       result = self.queue_handler.fetch_queue_stats(app_id, http_request_data)
@@ -143,7 +191,6 @@ class ProtobufferHandler(RequestHandler):
     elif method == "ModifyTaskLease":
       result = self.queue_handler.modify_task_lease(app_id, http_request_data)
     elif method == "UpdateQueue":
-      response = taskqueue_service_pb.TaskQueueUpdateQueueResponse()
       result = self.queue_handler.Encode(), 0, ""
     elif method == "FetchQueues":
       result = self.queue_handler.fetch_queue(app_id, http_request_data)
@@ -154,7 +201,6 @@ class ProtobufferHandler(RequestHandler):
     elif method == "ForceRun":
       result = self.queue_handler.force_run(app_id, http_request_data)
     elif method == "DeleteQueue":
-      response = taskqueue_service_pb.TaskQueueDeleteQueueResponse()
       result = self.queue_handler.Encode(), 0, ""
     elif method == "PauseQueue":
       result = self.queue_handler.pause_queue(app_id, http_request_data)
@@ -164,27 +210,7 @@ class ProtobufferHandler(RequestHandler):
       result = self.queue_handler.update_storage_limit(
         app_id, http_request_data)
 
-    if result:
-      response, errcode, errdetail = result
-
-    elapsed_time = round(time.time() - start_time, 3)
-    timing_log = 'Elapsed: {}'.format(elapsed_time)
-    if apirequest.has_request_id():
-      timing_log += ' ({})'.format(apirequest.request_id())
-    logger.debug(timing_log)
-
-    if response is not None:
-      apiresponse.set_response(response)
-
-    # If there was an error add it to the response.
-    if errcode != 0:
-      apperror_pb = apiresponse.mutable_application_error()
-      apperror_pb.set_code(errcode)
-      apperror_pb.set_detail(errdetail)
-
-    self.write(apiresponse.Encode())
-    status = taskqueue_service_pb.TaskQueueServiceError.ErrorCode_Name(errcode)
-    return method, status
+    return result
 
 
 class StatsHandler(RequestHandler):
@@ -219,17 +245,18 @@ class StatsHandler(RequestHandler):
     self.write(json.dumps(tq_stats))
 
 
-def prepare_taskqueue_application(task_queue):
+def prepare_taskqueue_application(task_queue, thread_pool):
+  handler_args = {'queue_handler': task_queue, 'thread_pool': thread_pool}
   handlers = [
     # Provides compatibility with the v1beta2 REST API.
-    (RESTQueue.PATH, RESTQueue, {'queue_handler': task_queue}),
-    (RESTTasks.PATH, RESTTasks, {'queue_handler': task_queue}),
-    (RESTLease.PATH, RESTLease, {'queue_handler': task_queue}),
-    (RESTTask.PATH, RESTTask, {'queue_handler': task_queue}),
+    (RESTQueue.PATH, RESTQueue, handler_args),
+    (RESTTasks.PATH, RESTTasks, handler_args),
+    (RESTLease.PATH, RESTLease, handler_args),
+    (RESTTask.PATH, RESTTask, handler_args),
     # Responds with service statistic
     ("/service-stats", StatsHandler),
     # Takes protocol buffers from the AppServers.
-    (r"/.*", ProtobufferHandler, {'queue_handler': task_queue})
+    (r"/.*", ProtobufferHandler, handler_args)
   ]
 
   return Application(handlers)
@@ -294,7 +321,8 @@ def main():
 
   # Initialize tornado server
   task_queue = distributed_tq.DistributedTaskQueue(db_access, zk_client)
-  tq_application = prepare_taskqueue_application(task_queue)
+  thread_pool = ThreadPoolExecutor(MAX_WORKER_THREADS)
+  tq_application = prepare_taskqueue_application(task_queue, thread_pool)
   # Automatically decompress incoming requests.
   server = httpserver.HTTPServer(tq_application, decompress_request=True)
   server.listen(args.port)
@@ -52,6 +52,8 @@ SUPPORTED_PULL_QUEUE_FIELDS = {
 
 # The supported push queue attributes and the rules they must follow.
 SUPPORTED_PUSH_QUEUE_FIELDS = {
+  'max_concurrent_requests': lambda value: (isinstance(value, int) and
+                                            value > 0),
   'mode': lambda mode: mode == 'push',
   'name': QUEUE_NAME_RE.match,
   'rate': RATE_REGEX.match,
@@ -66,3 +68,7 @@ SUPPORTED_PUSH_QUEUE_FIELDS = {
 }
 
 SHUTTING_DOWN_TIMEOUT = 10  # Limit time for finishing request
+
+# The number of threads that each server process uses to run queue
+# operations, which block on Cassandra or Postgres.
+MAX_WORKER_THREADS = 16
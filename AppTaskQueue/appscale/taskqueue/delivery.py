@@ -0,0 +1,144 @@
+""" Keeps connections and latency stats for push task delivery. """
+import json
+import time
+
+from appscale.common.service_stats import metrics
+from collections import defaultdict
+from eventlet.green import httplib
+from eventlet.semaphore import Semaphore
+
+
+class ConnectionPool(object):
+  """ Persistent HTTP connections to push task targets.
+
+  Connections are kept per scheme, host and port. Callers acquire a
+  connection, make one request with it, and then release it so that the next
+  delivery to the same target can skip connection setup.
+  """
+
+  # The maximum number of idle connections to keep for each target.
+  MAX_IDLE = 20
+
+  # The maximum number of requests in flight to each target.
+  MAX_ACTIVE = 100
+
+  CONNECTION_CLASSES = {'http': httplib.HTTPConnection,
+                        'https': httplib.HTTPSConnection}
+
+  def __init__(self, max_concurrent_requests=None):
+    """ Creates a new ConnectionPool.
+
+    Args:
+      max_concurrent_requests: A dictionary mapping queue names to the
+        maximum number of requests each queue can have in flight.
+    """
+    self._idle = defaultdict(list)
+    self._active = defaultdict(lambda: Semaphore(self.MAX_ACTIVE))
+    self._queue_active = {
+      queue_name: Semaphore(limit)
+      for queue_name, limit in (max_concurrent_requests or {}).items()}
+
+  def acquire(self, scheme, host, port, queue_name=None):
+    """ Checks out a connection.
+
+    This waits if the queue is at its max_concurrent_requests or if the
+    target is at MAX_ACTIVE.
+
+    Args:
+      scheme: A string specifying the URL scheme.
+      host: A string specifying the target host.
+      port: An integer specifying the target port.
+      queue_name: A string specifying the queue that the request is for.
+    Returns:
+      A tuple containing an httplib connection and a boolean indicating that
+      the connection was used before.
+    Raises:
+      ValueError if the scheme is not supported.
+    """
+    try:
+      connection_class = self.CONNECTION_CLASSES[scheme]
+    except KeyError:
+      raise ValueError('Unsupported URL scheme: {}'.format(scheme))
+
+    queue_active = self._queue_active.get(queue_name)
+    if queue_active is not None:
+      queue_active.acquire()
+
+    key = (scheme, host, port)
+    self._active[key].acquire()
+    try:
+      connection, reused = self._idle[key].pop(), True
+    except IndexError:
+      connection, reused = connection_class(host, port), False
+      connection.pool_key = key
+
+    connection.queue_active = queue_active
+    return connection, reused
+
+  def release(self, connection, reusable):
+    """ Returns a connection to the pool.
+
+    Args:
+      connection: A connection from acquire.
+      reusable: A boolean indicating that the connection can make another
+        request. If False, the connection is closed.
+    """
+    key = connection.pool_key
+    idle = self._idle[key]
+    if reusable and len(idle) < self.MAX_IDLE:
+      idle.append(connection)
+    else:
+      connection.close()
+
+    self._active[key].release()
+    if connection.queue_active is not None:
+      connection.queue_active.release()
+
+
+class DeliveryStats(object):
+  """ Tracks delivery latency for each queue. """
+
+  # The number of seconds between logging summaries.
+  LOG_INTERVAL = 60
+
+  def __init__(self, logger):
+    """ Creates a new DeliveryStats object.
+
+    Args:
+      logger: A logger to write summaries to.
+    """
+    self._logger = logger
+    self._histograms = defaultdict(dict)
+    self._last_log = time.time()
+
+  def record(self, queue_name, latency):
+    """ Records the latency of one delivery attempt.
+
+    Args:
+      queue_name: A string specifying the queue name.
+      latency: A number specifying the latency in milliseconds.
+    """
+    histogram = self._histograms[queue_name]
+    bucket = metrics.bucket_of(latency)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+    if time.time() - self._last_log >= self.LOG_INTERVAL:
+      self.log_summary()
+
+  def log_summary(self):
+    """ Logs the latency percentiles for each queue and starts over.
+
+    The buckets are the same as the ones in service_stats histograms, so
+    summaries from different workers can be combined with merge_histograms.
+    """
+    self._last_log = time.time()
+    histograms = self._histograms
+    self._histograms = defaultdict(dict)
+    for queue_name, histogram in sorted(histograms.items()):
+      self._logger.info(
+        'Delivery latency for {queue}: {total} requests, p50 <= {p50} ms, '
+        'p90 <= {p90} ms, p99 <= {p99} ms, buckets: {buckets}'.format(
+          queue=queue_name, total=sum(histogram.values()),
+          p50=metrics.histogram_percentile(histogram, 50),
+          p90=metrics.histogram_percentile(histogram, 90),
+          p99=metrics.histogram_percentile(histogram, 99),
+          buckets=json.dumps(histogram, sort_keys=True)))
@@ -41,6 +41,8 @@ from .queue import (
   TransientError
 )
 from .task import Task
+from .task_name import MAX_PENDING_TASK_NAMES
+from .task_name import RecentTaskNames
 from .task_name import TaskName
 from .tq_lib import TASK_STATES
 from .utils import (
@@ -286,6 +288,7 @@ class DistributedTaskQueue():
     self.load_balancers = appscale_info.get_load_balancer_ips()
     self.queue_manager = GlobalQueueManager(zk_client, db_access)
     self.service_manager = GlobalServiceManager(zk_client)
+    self.recent_task_names = RecentTaskNames()
 
   def get_queue(self, app, queue):
     """ Fetches a Queue object.
@@ -350,13 +353,7 @@ class DistributedTaskQueue():
         num_tasks = queue.total_tasks()
         oldest_eta = queue.oldest_eta()
       else:
-        num_tasks = TaskName.all().\
-          filter("state =", tq_lib.TASK_STATES.QUEUED).\
-          filter("queue =", queue_name).\
-          filter("app_id =", app_id).count()
-
-        # This is not supported for push queues yet.
-        oldest_eta = None
+        num_tasks, oldest_eta = self.__push_queue_stats(app_id, queue_name)
 
       # -1 is used to indicate an absence of a value.
       oldest_eta_usec = (int((oldest_eta - epoch).total_seconds() * 1000000)
@@ -367,6 +364,32 @@ class DistributedTaskQueue():
 
     return response.Encode(), 0, ""
 
+  @staticmethod
+  def __push_queue_stats(app_id, queue_name):
+    """ Counts the tasks that are waiting to run in a push queue.
+
+    Push workers do not update task names, so a task is considered to be in
+    the queue until its ETA.
+
+    Args:
+      app_id: The application ID.
+      queue_name: A string specifying the queue name.
+    Returns:
+      A tuple containing the number of pending tasks and the earliest ETA
+      (or None if there are no pending tasks).
+    """
+    now = datetime.datetime.utcnow()
+    # Only names whose ETA has not passed are read. Filtering on the queue as
+    # well would require a composite index, so the other queues' pending
+    # names are skipped here. At most MAX_PENDING_TASK_NAMES are read.
+    query = TaskName.all().filter("eta >", now).order("eta")
+    pending_etas = [
+      item.eta for item in query.run(batch_size=1000,
+                                     limit=MAX_PENDING_TASK_NAMES)
+      if item.app_id == app_id and item.queue == queue_name]
+    oldest_eta = pending_etas[0] if pending_etas else None
+    return len(pending_etas), oldest_eta
+
   def purge_queue(self, app_id, http_data):
     """
 
@@ -523,6 +546,8 @@ class DistributedTaskQueue():
 
     # Assign names if needed and validate tasks.
     error_found = False
+    # Pull tasks are grouped by queue so that each queue can add them at once.
+    pull_tasks = {}
     for add_request in request.add_request_list():
       task_result = response.add_taskresult()
 
@@ -542,10 +567,9 @@ class DistributedTaskQueue():
         if add_request.has_tag():
           task_info['tag'] = add_request.tag()
 
-        new_task = Task(task_info)
-        queue.add_task(new_task)
-        task_result.set_result(TaskQueueServiceError.OK)
-        task_result.set_chosen_task_name(new_task.id)
+        queue_tasks = pull_tasks.setdefault(queue.name, (queue, [], []))
+        queue_tasks[1].append(Task(task_info))
+        queue_tasks[2].append(task_result)
         continue
 
       result = tq_lib.verify_task_queue_add_request(add_request.app_id(),
@@ -566,15 +590,53 @@ class DistributedTaskQueue():
       else:
         error_found = True
         task_result.set_result(result)
+
+    for queue, tasks, task_results in pull_tasks.values():
+      errors = queue.add_tasks(tasks)
+      for task, task_result, error in zip(tasks, task_results, errors):
+        if isinstance(error, TransientError):
+          task_result.set_result(TaskQueueServiceError.TRANSIENT_ERROR)
+          continue
+
+        if error is not None:
+          task_result.set_result(TaskQueueServiceError.TASK_ALREADY_EXISTS)
+          continue
+
+        task_result.set_result(TaskQueueServiceError.OK)
+        task_result.set_chosen_task_name(task.id)
+
     if error_found:
       return
 
+    push_requests = []
     for add_request, task_result in zip(request.add_request_list(),
                                         response.taskresult_list()):
       if (add_request.has_mode() and
           add_request.mode() == taskqueue_service_pb.TaskQueueMode.PULL):
         continue
 
+      try:
+        self.__validate_push_task(add_request)
+      except apiproxy_errors.ApplicationError as error:
+        task_result.set_result(error.application_error)
+        continue
+
+      push_requests.append((add_request, task_result))
+
+    try:
+      name_errors = self.__check_and_store_task_names(
+        [add_request for add_request, _ in push_requests])
+    except apiproxy_errors.ApplicationError as error:
+      for _, task_result in push_requests:
+        task_result.set_result(error.application_error)
+      return
+
+    for (add_request, task_result), name_error in zip(push_requests,
+                                                      name_errors):
+      if name_error is not None:
+        task_result.set_result(name_error)
+        continue
+
       try:
         self.__enqueue_push_task(source_info, add_request)
       except apiproxy_errors.ApplicationError as error:
@@ -604,55 +666,106 @@ class DistributedTaskQueue():
     elif method == taskqueue_service_pb.TaskQueueQueryTasksResponse_Task.DELETE:
       return 'DELETE'
 
-  def __check_and_store_task_names(self, request):
-    """ Tries to fetch the taskqueue name, if it exists it will raise an
-    exception.
+  def __check_and_store_task_names(self, requests):
+    """ Reserves the names of push tasks.
 
-    We store a receipt of each enqueued task in the datastore. If we find that
-    task in the datastore, we will raise an exception. If the task is not
-    in the datastore, then it is assumed this is the first time seeing the
-    tasks and we create a receipt of the task in the datastore to prevent
-    a duplicate task from being enqueued.
+    We store a receipt of each enqueued task in the datastore. If a task's
+    name is already taken, the task is rejected. Otherwise, a receipt is
+    created to prevent a duplicate task from being enqueued. Names that were
+    taken recently are rejected without a datastore lookup, and all of the
+    remaining names are fetched and stored in one batch each.
 
     Args:
-      request: A taskqueue_service_pb.TaskQueueAddRequest.
+      requests: A list of taskqueue_service_pb.TaskQueueAddRequest objects.
+    Returns:
+      A list containing None for each task name that was reserved and a
+      TaskQueueServiceError code for each name that was already taken.
     Raises:
-      A apiproxy_errors.ApplicationError of TASK_ALREADY_EXISTS.
+      A apiproxy_errors.ApplicationError of DATASTORE_ERROR.
     """
-    task_name = request.task_name()
-    item = TaskName.get_by_key_name(task_name)
-    logger.debug("Task name {0}".format(task_name))
-    if item:
-      if item.state == TASK_STATES.QUEUED:
-        logger.warning("Task already exists")
-        raise apiproxy_errors.ApplicationError(
-          TaskQueueServiceError.TASK_ALREADY_EXISTS)
+    now = datetime.datetime.utcnow()
+    errors = [None for _ in requests]
+    unknown = {}
+    for index, request in enumerate(requests):
+      task_name = request.task_name()
+      item = self.recent_task_names.get(task_name, now)
+      if item is not None:
+        errors[index] = self.__task_name_error(item, now)
+      elif task_name in unknown:
+        # Only the first task in the batch gets to use the name.
+        errors[index] = TaskQueueServiceError.TASK_ALREADY_EXISTS
       else:
-        # If a task with the same name has already been processed, it should
-        # be tombstoned for some time to prevent a duplicate task.
-        raise apiproxy_errors.ApplicationError(
-          TaskQueueServiceError.TOMBSTONED_TASK)
+        unknown[task_name] = index
 
-    new_name = TaskName(key_name=task_name, state=tq_lib.TASK_STATES.QUEUED,
-      queue=request.queue_name(), app_id=request.app_id())
-    logger.debug("Creating entity {0}".format(str(new_name)))
+    if not unknown:
+      return errors
+
+    task_names = list(unknown)
     try:
-      db.put(new_name)
-    except datastore_errors.InternalError as internal_error:
-      logger.error(str(internal_error))
+      items = TaskName.get_by_key_name(task_names)
+    except datastore_errors.Error as error:
+      logger.error(str(error))
       raise apiproxy_errors.ApplicationError(
         TaskQueueServiceError.DATASTORE_ERROR)
 
+    taken = []
+    new_names = []
+    for task_name, item in zip(task_names, items):
+      index = unknown[task_name]
+      if item is not None and not item.expired(now):
+        logger.warning('Task name {} is already taken'.format(task_name))
+        errors[index] = self.__task_name_error(item, now)
+        taken.append(item)
+        continue
+
+      request = requests[index]
+      new_names.append(
+        TaskName(key_name=task_name, state=tq_lib.TASK_STATES.QUEUED,
+                 queue=request.queue_name(), app_id=request.app_id(),
+                 eta=self.__when_to_run_utc(request)))
+
+    if new_names:
+      logger.debug('Creating {} task name entities'.format(len(new_names)))
+      try:
+        db.put(new_names)
+      except datastore_errors.Error as error:
+        logger.error(str(error))
+        raise apiproxy_errors.ApplicationError(
+          TaskQueueServiceError.DATASTORE_ERROR)
+
+    self.recent_task_names.add(taken + new_names)
+    return errors
+
+  @staticmethod
+  def __task_name_error(item, now):
+    """ Determines why a task name cannot be used.
+
+    Push workers do not update task names, so a task is considered to be
+    in the queue until its ETA. After that, its name is tombstoned.
+
+    Args:
+      item: A TaskName object.
+      now: A datetime object specifying the current UTC time.
+    Returns:
+      A TaskQueueServiceError code.
+    """
+    if item.state != TASK_STATES.QUEUED:
+      return TaskQueueServiceError.TOMBSTONED_TASK
+
+    if item.eta is None or item.eta > now:
+      return TaskQueueServiceError.TASK_ALREADY_EXISTS
+
+    return TaskQueueServiceError.TOMBSTONED_TASK
+
   def __enqueue_push_task(self, source_info, request):
-    """ Enqueues a batch of push tasks.
+    """ Enqueues a push task that has been validated and whose name has been
+    reserved.
 
     Args:
       source_info: A dictionary containing the application, module, and version
        ID that is sending this request.
       request: A taskqueue_service_pb.TaskQueueAddRequest.
     """
-    self.__validate_push_task(request)
-    self.__check_and_store_task_names(request)
     headers = self.get_task_headers(request)
     args = self.get_task_args(source_info, headers, request)
     countdown = int(headers['X-AppEngine-TaskETA']) - \
@@ -841,6 +954,19 @@ class DistributedTaskQueue():
     else:
       return datetime.datetime.now()
 
+  def __when_to_run_utc(self, request):
+    """ Returns a UTC datetime object of when a task should execute.
+
+    Args:
+      request: A taskqueue_service_pb.TaskQueueAddRequest.
+    Returns:
+      A datetime object for when the nearest time to run the task is.
+    """
+    if request.has_eta_usec():
+      return datetime.datetime.utcfromtimestamp(request.eta_usec() / 1000000.0)
+    else:
+      return datetime.datetime.utcnow()
+
   def __when_to_expire(self, request):
     """ Returns a datetime object of when a task should expire.
 
@@ -0,0 +1,314 @@
+""" An in-memory view of the pull queue index tables used to serve leases. """
+import heapq
+import threading
+import time
+
+from collections import Counter
+from collections import namedtuple
+
+from .utils import logger
+
+# An entry from pull_queue_eta_index or pull_queue_tags_index. Entries sort
+# by ETA.
+IndexEntry = namedtuple('IndexEntry', ['eta', 'id', 'tag'])
+
+
+class LeaseIndexStats(object):
+  """ Counts how well the lease indexes for a queue are doing. """
+
+  # The number of seconds between logging summaries.
+  LOG_INTERVAL = 60
+
+  def __init__(self, queue_name):
+    """ Creates a new LeaseIndexStats object.
+
+    Args:
+      queue_name: A string specifying the queue name.
+    """
+    self.queue_name = queue_name
+    self._counts = Counter()
+    self._lock = threading.Lock()
+    self._last_log = time.time()
+
+  def record(self, **counts):
+    """ Adds to the counters.
+
+    Args:
+      counts: A dictionary mapping counter names to amounts. The counters are
+        'hits' and 'misses' for claims that were or were not fully served from
+        memory, 'attempts' for the number of lease attempts on claimed
+        entries, 'stale' for entries that no longer referred to an available
+        task, and 'contended' for entries leased by another worker first.
+    """
+    with self._lock:
+      self._counts.update(counts)
+
+  def summary(self):
+    """ Computes rates from the counters.
+
+    Returns:
+      A dictionary containing the counters and the hit, stale and contention
+      rates.
+    """
+    with self._lock:
+      counts = dict(self._counts)
+
+    claims = counts.get('hits', 0) + counts.get('misses', 0)
+    attempts = counts.get('attempts', 0)
+    summary = {name: counts.get(name, 0)
+               for name in ('hits', 'misses', 'attempts', 'stale', 'contended')}
+    summary['hit_rate'] = float(summary['hits']) / claims if claims else 0.0
+    summary['stale_rate'] = (float(summary['stale']) / attempts
+                             if attempts else 0.0)
+    summary['contention_rate'] = (float(summary['contended']) / attempts
+                                  if attempts else 0.0)
+    return summary
+
+  def maybe_log(self):
+    """ Logs a summary if one has not been logged recently. """
+    with self._lock:
+      if time.time() - self._last_log < self.LOG_INTERVAL:
+        return
+      self._last_log = time.time()
+
+    summary = self.summary()
+    logger.info(
+      'Lease index for {queue}: hit rate {hit_rate:.2f}, '
+      'stale rate {stale_rate:.2f}, contention rate {contention_rate:.2f} '
+      '({hits} hits, {misses} misses, {attempts} lease attempts)'.format(
+        queue=self.queue_name, **summary))
+
+
+class _Scan(object):
+  """ A scan of an index table that is in progress. """
+  def __init__(self):
+    self.done = threading.Event()
+    self.error = None
+
+
+class LeaseIndex(object):
+  """ Available tasks for one queue and tag, ordered by ETA.
+
+  Entries are fetched from the index table ahead of time and claimed from
+  memory. A claim is optimistic: it only means this LeaseIndex will not hand
+  the entry out again. The lease itself still decides which worker gets the
+  task.
+  """
+
+  # The maximum number of entries to hold.
+  MAX_SIZE = 500
+
+  # A background scan starts when fewer than this number of entries remain.
+  LOW_WATER_MARK = 125
+
+  # Scans usually continue from the last entry seen. Entries written before
+  # that point (e.g. tasks added with an ETA in the past) are picked up by
+  # scanning the whole range at least this often (in seconds).
+  FULL_SCAN_INTERVAL = 30
+
+  # The seconds to wait after finding no entries before scanning again.
+  EMPTY_RESULTS_COOLDOWN = 5
+
+  def __init__(self, session, app, queue_name, stats, tag=None):
+    """ Creates a new LeaseIndex.
+
+    Args:
+      session: A cassandra-driver session.
+      app: A string containing the application ID.
+      queue_name: A string specifying the queue name.
+      stats: A LeaseIndexStats object.
+      tag: A string specifying the tag to index. If None, all of the queue's
+        tasks are indexed.
+    """
+    self._session = session
+    self._app = app
+    self._queue_name = queue_name
+    self._stats = stats
+    self._tag = tag
+
+    # A heap of IndexEntries. heappush and heappop are atomic under the GIL,
+    # so claims do not need a lock.
+    self._entries = []
+    self._entry_ids = set()
+
+    # The last entry seen by a scan.
+    self._position = None
+    self._last_full_scan = 0
+    self._last_empty_scan = 0
+
+    # Only one scan is in progress at a time.
+    self._scan = None
+    self._scan_lock = threading.Lock()
+
+    # The last time entries were requested from this index.
+    self.last_claim = time.time()
+
+  def claim(self, num_tasks):
+    """ Takes index entries for available tasks.
+
+    Args:
+      num_tasks: An integer specifying the number of entries to take.
+    Returns:
+      A list of IndexEntry objects.
+    """
+    self.last_claim = time.time()
+    claimed = self._pop(num_tasks)
+    if len(claimed) == num_tasks:
+      self._stats.record(hits=1)
+    else:
+      self._stats.record(misses=1)
+      if not self._cooling_down():
+        self._wait_for_scan()
+        claimed.extend(self._pop(num_tasks - len(claimed)))
+
+    if len(self._entries) < self.LOW_WATER_MARK and not self._cooling_down():
+      self._start_scan()
+
+    return claimed
+
+  def _cooling_down(self):
+    """ Checks if a recent scan found nothing to hand out.
+
+    Returns:
+      A boolean indicating that scans should be skipped for now.
+    """
+    return time.time() - self._last_empty_scan < self.EMPTY_RESULTS_COOLDOWN
+
+  def _pop(self, num_tasks):
+    """ Removes the entries with the earliest ETAs.
+
+    Args:
+      num_tasks: An integer specifying the number of entries to remove.
+    Returns:
+      A list of IndexEntry objects.
+    """
+    popped = []
+    while len(popped) < num_tasks:
+      try:
+        entry = heapq.heappop(self._entries)
+      except IndexError:
+        break
+
+      self._entry_ids.discard(entry.id)
+      popped.append(entry)
+
+    return popped
+
+  def _wait_for_scan(self):
+    """ Starts a scan if needed and waits for it to finish. """
+    scan = self._start_scan()
+    scan.done.wait()
+    if scan.error is not None:
+      raise scan.error
+
+  def _start_scan(self):
+    """ Starts fetching entries from the index table.
+
+    Returns:
+      A _Scan object.
+    """
+    with self._scan_lock:
+      if self._scan is not None:
+        return self._scan
+
+      scan = self._scan = _Scan()
+
+    full_scan = (self._position is None or
+                 time.time() - self._last_full_scan > self.FULL_SCAN_INTERVAL)
+    limit = max(self.MAX_SIZE - len(self._entries), 1)
+    try:
+      future = self._query(limit, full_scan)
+    except Exception as error:
+      self._finish_scan(scan, error=error)
+      return scan
+
+    future.add_callbacks(
+      callback=self._merge, callback_args=(scan, full_scan, limit),
+      errback=lambda error: self._finish_scan(scan, error=error))
+    return scan
+
+  def _query(self, limit, full_scan):
+    """ Queries the index table for entries with an ETA in the past.
+
+    Args:
+      limit: An integer specifying the maximum number of entries to fetch.
+      full_scan: A boolean indicating that the scan should start from the
+        beginning of the range rather than from the last entry seen.
+    Returns:
+      A cassandra-driver future.
+    """
+    parameters = {'app': self._app, 'queue': self._queue_name}
+    if full_scan:
+      parameters.update({'start_eta': 0, 'start_id': ''})
+      start_operator = '>='
+    else:
+      parameters.update({'start_eta': self._position.eta,
+                         'start_id': self._position.id})
+      start_operator = '>'
+
+    if self._tag is None:
+      query_tasks = """
+        SELECT eta, id, tag FROM pull_queue_eta_index
+        WHERE token(app, queue, eta, id) {start_operator}
+              token(%(app)s, %(queue)s, %(start_eta)s, %(start_id)s)
+        AND token(app, queue, eta, id) <=
+            token(%(app)s, %(queue)s, dateof(now()), '')
+        LIMIT {limit}
+      """
+    else:
+      query_tasks = """
+        SELECT eta, id, tag FROM pull_queue_tags_index
+        WHERE token(app, queue, tag, eta, id) {start_operator}
+              token(%(app)s, %(queue)s, %(tag)s, %(start_eta)s, %(start_id)s)
+        AND token(app, queue, tag, eta, id) <=
+            token(%(app)s, %(queue)s, %(tag)s, dateof(now()), '')
+        LIMIT {limit}
+      """
+      parameters['tag'] = self._tag
+
+    query_tasks = query_tasks.format(start_operator=start_operator,
+                                     limit=limit)
+    return self._session.execute_async(query_tasks, parameters)
+
+  def _merge(self, rows, scan, full_scan, limit):
+    """ Adds the results of a scan to the index.
+
+    Args:
+      rows: A list of rows from the index table.
+      scan: The _Scan object that fetched the rows.
+      full_scan: A boolean indicating that the scan covered the whole range.
+      limit: An integer specifying the maximum number of rows fetched.
+    """
+    try:
+      for row in rows:
+        if row.id in self._entry_ids:
+          continue
+
+        self._entry_ids.add(row.id)
+        heapq.heappush(self._entries, IndexEntry(row.eta, row.id, row.tag))
+
+      if full_scan:
+        self._last_full_scan = time.time()
+
+      if rows:
+        self._position = IndexEntry(rows[-1].eta, rows[-1].id, rows[-1].tag)
+
+      # If the scan reached the end of the range without finding anything to
+      # hand out, avoid scanning again for a little while.
+      if len(rows) < limit and not self._entries:
+        self._last_empty_scan = time.time()
+    finally:
+      self._finish_scan(scan)
+
+  def _finish_scan(self, scan, error=None):
+    """ Marks a scan as finished.
+
+    Args:
+      scan: A _Scan object.
+      error: An exception raised by the scan.
+    """
+    scan.error = error
+    with self._scan_lock:
+      self._scan = None
+
+    scan.done.set()
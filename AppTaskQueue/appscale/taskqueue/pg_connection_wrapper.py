@@ -1,25 +1,180 @@
 """
-Postgres connection wrapper with autoreconnect functionality.
+Postgres connection pool with autoreconnect functionality.
 """
-import functools
+import contextlib
+import hashlib
+import threading
+import time
+
 import psycopg2
-from psycopg2 import errorcodes
 
 from appscale.taskqueue.utils import logger
 
 
+class PreparedStatement(object):
+  """ A statement that is prepared once on each connection that runs it. """
+
+  def __init__(self, sql, types=()):
+    """ Creates a new PreparedStatement.
+
+    Args:
+      sql: A string containing a statement with $1, $2, ... placeholders.
+      types: A tuple of strings specifying the Postgres type of each
+        placeholder.
+    """
+    self.name = 'tq_{}'.format(hashlib.sha1(sql).hexdigest())
+    self.prepare_sql = 'PREPARE {name}{types} AS {sql}'.format(
+      name=self.name, types=' ({})'.format(', '.join(types)) if types else '',
+      sql=sql)
+    # Values are cast explicitly because psycopg2 adapts values such as empty
+    # lists and lists of NULLs without a usable type.
+    self.execute_sql = 'EXECUTE {name}{args}'.format(
+      name=self.name,
+      args='({})'.format(', '.join('%s::{}'.format(type_) for type_ in types))
+           if types else '')
+
+
 class PostgresConnectionWrapper(object):
+  """ A bounded pool of connections to a Postgres server. """
+
+  # Connections that have been idle for longer than this number of seconds
+  # are checked before they are reused.
+  IDLE_CHECK_INTERVAL = 30
 
   def __init__(self, *args, **kwargs):
+    """ Creates a new PostgresConnectionWrapper.
+
+    Args:
+      max_connections: An integer specifying the size of the pool.
+      args, kwargs: Arguments to pass to psycopg2.connect.
+    """
+    self._max_connections = kwargs.pop('max_connections')
     self._args = args
     self._kwargs = kwargs
-    self._connection = None
+    self._lock = threading.Lock()
+    self._slots = threading.BoundedSemaphore(self._max_connections)
+    # Connections that are not in use, along with the time they were released.
+    self._idle = []
+    # The names of the statements prepared on each open connection.
+    self._prepared = {}
+    # Once the pool is closed, connections are discarded when checked in.
+    self._closed = False
 
+  @contextlib.contextmanager
   def get_connection(self):
-    if not self._connection or self._connection.closed:
-      logger.info('Establishing new connection to Postgres server')
-      self._connection = psycopg2.connect(*self._args, **self._kwargs)
-    return self._connection
+    """ Checks out a connection and runs a transaction on it. The caller waits
+    if all of the connections are in use.
+
+    Yields:
+      A psycopg2 connection.
+    """
+    with self._slots:
+      connection = self._checkout()
+      try:
+        with connection:
+          yield connection
+      finally:
+        self._checkin(connection)
+
+  def execute(self, pg_cursor, statement, parameters=()):
+    """ Runs a prepared statement, preparing it on the connection if needed.
+
+    Args:
+      pg_cursor: A psycopg2 cursor.
+      statement: A PreparedStatement.
+      parameters: A tuple of values for the statement's placeholders.
+    """
+    with self._lock:
+      prepared = self._prepared.setdefault(pg_cursor.connection, set())
+
+    if statement.name not in prepared:
+      # Prepared statements outlive the transaction even if it is rolled back.
+      pg_cursor.execute(statement.prepare_sql)
+      prepared.add(statement.name)
+
+    pg_cursor.execute(statement.execute_sql, parameters or None)
 
   def close(self):
-    return self._connection.close()
+    """ Closes idle connections. Connections that are in use are closed when
+    they are checked in. """
+    with self._lock:
+      self._closed = True
+      idle = [connection for connection, _ in self._idle]
+      self._idle = []
+
+    for connection in idle:
+      self._discard(connection)
+
+  def _checkout(self):
+    """ Takes a healthy connection from the pool or opens a new one.
+
+    Returns:
+      A psycopg2 connection.
+    """
+    while True:
+      with self._lock:
+        if not self._idle:
+          break
+        connection, released = self._idle.pop()
+
+      if connection.closed:
+        self._discard(connection)
+        continue
+
+      if (time.time() - released > self.IDLE_CHECK_INTERVAL and
+          not self._is_healthy(connection)):
+        logger.info('Discarding broken connection to Postgres server')
+        self._discard(connection)
+        continue
+
+      return connection
+
+    logger.info('Establishing new connection to Postgres server')
+    connection = psycopg2.connect(*self._args, **self._kwargs)
+    with self._lock:
+      self._prepared[connection] = set()
+
+    return connection
+
+  def _checkin(self, connection):
+    """ Returns a connection to the pool.
+
+    Args:
+      connection: A psycopg2 connection.
+    """
+    with self._lock:
+      if not self._closed and not connection.closed:
+        self._idle.append((connection, time.time()))
+        return
+
+    self._discard(connection)
+
+  def _discard(self, connection):
+    """ Closes a connection and forgets its prepared statements.
+
+    Args:
+      connection: A psycopg2 connection.
+    """
+    with self._lock:
+      self._prepared.pop(connection, None)
+
+    if not connection.closed:
+      connection.close()
+
+  @staticmethod
+  def _is_healthy(connection):
+    """ Checks that the server still accepts queries on a connection.
+
+    Args:
+      connection: A psycopg2 connection.
+    Returns:
+      A boolean indicating whether or not the connection can be used.
+    """
+    try:
+      with connection.cursor() as pg_cursor:
+        pg_cursor.execute('SELECT 1')
+      connection.rollback()
+    except psycopg2.Error:
+      return False
+
+    return True
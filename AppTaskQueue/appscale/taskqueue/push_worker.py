@@ -3,30 +3,21 @@ import datetime
 import json
 import logging
 import os
-import sys
+import time
 
-from appscale.common import appscale_info
-from appscale.common import constants
-from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
 from celery.utils.log import get_task_logger
-from eventlet.green import httplib
 from eventlet.green.httplib import BadStatusLine
 from eventlet.timeout import Timeout as EventletTimeout
 from socket import error as SocketError
 from urlparse import urlparse
-from .task_name import TaskName
-from .tq_lib import TASK_STATES
+from .delivery import ConnectionPool
+from .delivery import DeliveryStats
 from .utils import (
   create_celery_for_app,
   get_celery_configuration_path,
   get_queue_function_name
 )
 
-sys.path.append(APPSCALE_PYTHON_APPSERVER)
-from google.appengine.api import apiproxy_stub_map
-from google.appengine.api import datastore_distributed
-from google.appengine.ext import db
-
 
 # The maximum number of seconds a task is permitted to take.
 MAX_TASK_DURATION = 13 * 60
@@ -35,19 +26,26 @@ app_id = os.environ['APP_ID']
 remote_host = os.environ['HOST']
 
 with open(get_celery_configuration_path(app_id)) as config_file:
-  rates = json.load(config_file)
+  push_queues = json.load(config_file)
+
+rates = {}
+max_concurrent_requests = {}
+for queue_name, queue in push_queues.items():
+  # Older configuration files only contain the rate of each queue.
+  if not isinstance(queue, dict):
+    queue = {'rate': queue}
+
+  rates[queue_name] = queue['rate']
+  if 'max_concurrent_requests' in queue:
+    max_concurrent_requests[queue_name] = queue['max_concurrent_requests']
 
 celery = create_celery_for_app(app_id, rates)
 
 logger = get_task_logger(__name__)
 logger.setLevel(logging.INFO)
 
-db_proxy = appscale_info.get_db_proxy()
-connection_str = '{}:{}'.format(db_proxy, str(constants.DB_SERVER_PORT))
-ds_distrib = datastore_distributed.DatastoreDistributed(
-  'appscaledashboard', connection_str, require_indexes=False)
-apiproxy_stub_map.apiproxy.RegisterStub('datastore_v3', ds_distrib)
-os.environ['APPLICATION_ID'] = 'appscaledashboard'
+connection_pool = ConnectionPool(max_concurrent_requests)
+delivery_stats = DeliveryStats(logger)
 
 
 def get_wait_time(retries, args):
@@ -71,6 +69,95 @@ def get_wait_time(retries, args):
   return wait_time
 
 
+def send_request(connection, urlpath, method, headers, body, has_query):
+  """ Makes a request and reads the whole response.
+
+  Args:
+    connection: An httplib connection.
+    urlpath: A string specifying the path and query of the URL.
+    method: A string specifying the HTTP method.
+    headers: A dictionary of headers for the task.
+    body: A string containing the task body.
+    has_query: A boolean indicating that the URL has a query string.
+  Returns:
+    An httplib response.
+  """
+  skip_host = False
+  if 'host' in headers or 'Host' in headers:
+    skip_host = True
+
+  skip_accept_encoding = False
+  if 'accept-encoding' in headers or 'Accept-Encoding' in headers:
+    skip_accept_encoding = True
+
+  connection.putrequest(method,
+                        urlpath,
+                        skip_host=skip_host,
+                        skip_accept_encoding=skip_accept_encoding)
+
+  for header in headers:
+    connection.putheader(header, headers[header])
+
+  if 'content-type' not in headers or 'Content-Type' not in headers:
+    if has_query:
+      connection.putheader('content-type', 'application/octet-stream')
+    else:
+      connection.putheader('content-type',
+                           'application/x-www-form-urlencoded')
+
+  connection.putheader("Content-Length", str(len(body)))
+
+  connection.endheaders()
+  if body:
+    connection.send(body)
+
+  response = connection.getresponse()
+  response.read()
+  response.close()
+  return response
+
+
+def deliver(url, urlpath, method, headers, body, queue_name):
+  """ Sends a task to its target over a pooled connection.
+
+  A connection that was idle in the pool may have been closed by the target.
+  If using one fails before a response arrives, the request is retried with
+  another connection.
+
+  Args:
+    url: A ParseResult specifying the task URL.
+    urlpath: A string specifying the path and query of the URL.
+    method: A string specifying the HTTP method.
+    headers: A dictionary of headers for the task.
+    body: A string containing the task body.
+    queue_name: A string specifying the queue name.
+  Returns:
+    An httplib response.
+  Raises:
+    ValueError if the URL scheme is not supported.
+    BadStatusLine or SocketError if the request failed.
+  """
+  while True:
+    connection, reused = connection_pool.acquire(
+      url.scheme, remote_host, url.port, queue_name)
+    start_time = time.time()
+    reusable = False
+    try:
+      response = send_request(connection, urlpath, method, headers, body,
+                              bool(url.query))
+      reusable = not response.will_close
+    except (BadStatusLine, SocketError):
+      if reused:
+        continue
+
+      raise
+    finally:
+      connection_pool.release(connection, reusable)
+
+    delivery_stats.record(queue_name, (time.time() - start_time) * 1000)
+    return response
+
+
 def execute_task(task, headers, args):
   """ Executes a task to a url with the given args.
 
@@ -113,13 +200,6 @@ def execute_task(task, headers, args):
           "Task %s with id %s has expired with expiration date %s" % (
            args['task_name'], task.request.id, args['expires']))
         celery.control.revoke(task.request.id)
-
-        item = TaskName.get_by_key_name(args['task_name'])
-        if item is not None:
-          item.state = TASK_STATES.EXPIRED
-          item.endtime = datetime.datetime.now()
-          db.put(item)
-
         return
 
       if (args['max_retries'] != 0 and
@@ -128,66 +208,27 @@ def execute_task(task, headers, args):
           args['task_name'], task.request.id,
           args['max_retries']))
         celery.control.revoke(task.request.id)
-
-        item = TaskName.get_by_key_name(args['task_name'])
-        if item is not None:
-          item.state = TASK_STATES.FAILED
-          item.endtime = datetime.datetime.now()
-          db.put(item)
-
         return
 
       # Targets do not get X-Forwarded-Proto from nginx, they use haproxy port.
       headers['X-Forwarded-Proto'] = url.scheme
-      if url.scheme == 'http':
-        connection = httplib.HTTPConnection(remote_host, url.port)
-      elif url.scheme == 'https':
-        connection = httplib.HTTPSConnection(remote_host, url.port)
-      else:
-        logger.error("Task %s tried to use url scheme %s, "
-                     "which is not supported." % (
-                     args['task_name'], url.scheme))
-
-      skip_host = False
-      if 'host' in headers or 'Host' in headers:
-        skip_host = True
-
-      skip_accept_encoding = False
-      if 'accept-encoding' in headers or 'Accept-Encoding' in headers:
-        skip_accept_encoding = True
-
-      connection.putrequest(method,
-                            urlpath,
-                            skip_host=skip_host,
-                            skip_accept_encoding=skip_accept_encoding)
 
       # Update the task headers
       headers['X-AppEngine-TaskRetryCount'] = str(task.request.retries)
       headers['X-AppEngine-TaskExecutionCount'] = str(task.request.retries)
 
-      for header in headers:
-        connection.putheader(header, headers[header])
-
-      if 'content-type' not in headers or 'Content-Type' not in headers:
-        if url.query:
-          connection.putheader('content-type', 'application/octet-stream')
-        else:
-          connection.putheader('content-type',
-                               'application/x-www-form-urlencoded')
-
-      connection.putheader("Content-Length", str(content_length))
-
       retries = int(task.request.retries) + 1
       wait_time = get_wait_time(retries, args)
 
       try:
-        connection.endheaders()
-        if args["body"]:
-          connection.send(args['body'])
-
-        response = connection.getresponse()
-        response.read()
-        response.close()
+        response = deliver(url, urlpath, method, headers, args['body'],
+                           args['queue_name'])
+      except ValueError:
+        logger.error("Task %s tried to use url scheme %s, "
+                     "which is not supported." % (
+                     args['task_name'], url.scheme))
+        celery.control.revoke(task.request.id)
+        return
       except (BadStatusLine, SocketError):
         logger.warning(
           '{task} failed before receiving response. It will retry in {wait} '
@@ -196,12 +237,6 @@ def execute_task(task, headers, args):
 
       if 200 <= response.status < 300:
         # Task successful.
-        item = TaskName.get_by_key_name(args['task_name'])
-        if item is not None:
-          item.state = TASK_STATES.SUCCESS
-          item.endtime = datetime.datetime.now()
-          db.put(item)
-
         time_elapsed = datetime.datetime.utcnow() - start_time
         logger.info(
           '{task} received status {status} from {url} [time elapsed: {te}]'. \
@@ -4,6 +4,7 @@ import base64
 import json
 import re
 import sys
+import time
 import uuid
 
 from appscale.common import retrying
@@ -14,16 +15,18 @@ from appscale.datastore.cassandra_env.retry_policies import (
 )
 from appscale.datastore.dbconstants import TRANSIENT_CASSANDRA_ERRORS
 from cassandra import DriverException
+from cassandra.concurrent import execute_concurrent
+from cassandra.concurrent import execute_concurrent_with_args
 from cassandra.query import BatchStatement
 from cassandra.query import ConsistencyLevel
 from cassandra.query import SimpleStatement
-from collections import deque
-from threading import Lock
 from .constants import AGE_LIMIT_REGEX
 from .constants import EmptyQueue
 from .constants import InvalidQueueConfiguration
 from .constants import RATE_REGEX
 from .constants import TaskNotFound
+from .lease_index import LeaseIndex
+from .lease_index import LeaseIndexStats
 from .task import InvalidTaskInfo
 from .task import Task
 from .utils import logger
@@ -272,7 +275,7 @@ class PostgresPullQueue(Queue):
     Args:
       queue_info: A dictionary containing queue info.
       app: A string containing the application ID.
-      pg_connection_wrapper: A psycopg2 connection wrapper.
+      pg_connection_wrapper: A PostgresConnectionWrapper.
     """
     from psycopg2 import IntegrityError  # Import psycopg2 lazily
     super(PostgresPullQueue, self).__init__(queue_info, app)
@@ -283,8 +286,7 @@ class PostgresPullQueue(Queue):
     # they sometimes get IntegrityError despite 'IF NOT EXISTS'
     @retrying.retry(max_retries=5, retry_on_exception=IntegrityError)
     def ensure_tables_created():
-      pg_connection = self.pg_connection_wrapper.get_connection()
-      with pg_connection:
+      with self.pg_connection_wrapper.get_connection() as pg_connection:
         with pg_connection.cursor() as pg_cursor:
           pg_cursor.execute(
             'CREATE TABLE IF NOT EXISTS "{table_name}" ('
@@ -307,12 +309,121 @@ class PostgresPullQueue(Queue):
           )
 
     ensure_tables_created()
+    self._statements = self._build_statements()
 
   @property
   def tasks_table_name(self):
     return 'pullqueue-{}'.format(self.name)
 
-  @retry_pg_connection
+  def _build_statements(self):
+    """ Creates the statements used for accessing the queue's table.
+
+    Returns:
+      A dictionary mapping operations to PreparedStatements.
+    """
+    # Import pg_connection_wrapper (and psycopg2) lazily
+    from appscale.taskqueue.pg_connection_wrapper import PreparedStatement
+
+    table = self.tasks_table_name
+    lease_columns = ', '.join(
+      '"{table}".{col}'.format(table=table, col=column)
+      for column in self.LEASE_COLUMNS)
+
+    # Determine max retries condition for lease queries
+    retry_limit = ''
+    if self.task_retry_limit:
+      retry_limit = 'AND lease_count < {}'.format(int(self.task_retry_limit))
+
+    lease = (
+      'UPDATE "{table}" '
+      'SET lease_expires = current_timestamp + $1 * interval \'1 second\', '
+      '    lease_count = lease_count + 1 '
+      'FROM ( '
+      '  SELECT task_name FROM "{table}" '
+      '  WHERE time_deleted IS NULL '        # Tell PG to use partial index
+      '        AND lease_expires < current_timestamp '
+      '        {retry_limit} '
+      '        {tag_filter} '
+      '  ORDER BY lease_expires '
+      '  FOR UPDATE SKIP LOCKED '
+      '  LIMIT $2 '
+      ') as tasks_to_update '
+      'WHERE "{table}".task_name = tasks_to_update.task_name '
+      'RETURNING {columns}'
+    )
+    update_lease = (
+      'UPDATE "{table}" '
+      'SET lease_expires = current_timestamp + $2 * interval \'1 second\' '
+      'WHERE task_name = $1 '
+      '  AND lease_expires > current_timestamp '
+      '  {old_eta_verification} '
+      '  AND time_deleted IS NULL '
+      'RETURNING lease_expires'
+    )
+    get_task = (
+      'SELECT {columns} FROM "{table}" '
+      'WHERE task_name = $1 AND time_deleted IS NULL'
+    )
+    return {
+      'add': PreparedStatement(
+        'INSERT INTO "{table}" ( '
+        '  task_name, payload, time_enqueued, '
+        '  lease_expires, lease_count, tag '
+        ') '
+        'SELECT task_name, payload, current_timestamp, '
+        '       COALESCE(lease_expires, current_timestamp), 0, tag '
+        'FROM unnest($1, $2, $3, $4) '
+        '  AS tasks (task_name, payload, lease_expires, tag) '
+        'ON CONFLICT (task_name) DO NOTHING '
+        'RETURNING task_name, time_enqueued, lease_expires'.format(table=table),
+        ('varchar[]', 'bytea[]', 'timestamp[]', 'varchar[]')),
+      'get': PreparedStatement(
+        get_task.format(table=table,
+                        columns=', '.join(self.TASK_COLUMNS)),
+        ('varchar',)),
+      'get_without_payload': PreparedStatement(
+        get_task.format(table=table,
+                        columns=', '.join(self.LIST_COLUMNS)),
+        ('varchar',)),
+      'delete': PreparedStatement(
+        'UPDATE "{table}" '
+        'SET time_deleted = current_timestamp '
+        'WHERE "{table}".task_name = $1'.format(table=table),
+        ('varchar',)),
+      'update_lease': PreparedStatement(
+        update_lease.format(
+          table=table, old_eta_verification='AND lease_expires = $3'),
+        ('varchar', 'integer', 'timestamp')),
+      'update_lease_any_eta': PreparedStatement(
+        update_lease.format(table=table, old_eta_verification=''),
+        ('varchar', 'integer')),
+      'list': PreparedStatement(
+        'SELECT {columns} FROM "{table}" '
+        'WHERE time_deleted IS NULL '
+        'ORDER BY lease_expires '
+        'LIMIT $1'.format(table=table, columns=', '.join(self.LIST_COLUMNS)),
+        ('integer',)),
+      'lease': PreparedStatement(
+        lease.format(table=table, columns=lease_columns,
+                     retry_limit=retry_limit, tag_filter=''),
+        ('integer', 'integer')),
+      'lease_by_tag': PreparedStatement(
+        lease.format(table=table, columns=lease_columns,
+                     retry_limit=retry_limit, tag_filter='AND tag = $3'),
+        ('integer', 'integer', 'varchar')),
+      'total_tasks': PreparedStatement(
+        'SELECT count(*) FROM "{table}" '
+        'WHERE time_deleted IS NULL'.format(table=table)),
+      'oldest_eta': PreparedStatement(
+        'SELECT min(lease_expires) FROM "{table}" '
+        'WHERE time_deleted IS NULL'.format(table=table)),
+      'earliest_tag': PreparedStatement(
+        'SELECT tag FROM "{table}" '
+        'WHERE time_deleted IS NULL '
+        'ORDER BY lease_expires '
+        'LIMIT 1'.format(table=table)),
+    }
+
   def add_task(self, task):
     """ Adds a task to the queue.
 
@@ -322,52 +433,64 @@ class PostgresPullQueue(Queue):
       InvalidTaskInfo if the task ID already exists in the queue
         or it doesn't have payloadBase64 attribute.
     """
-    import psycopg2  # Import psycopg2 lazily
-    if not hasattr(task, 'payloadBase64'):
-      raise InvalidTaskInfo('{} is missing a payload.'.format(task))
+    error = self.add_tasks([task])[0]
+    if error is not None:
+      raise error
+
+  @retry_pg_connection
+  def add_tasks(self, tasks):
+    """ Adds tasks to the queue with a single multi-row insert.
+
+    Args:
+      tasks: A list of Task objects.
+    Returns:
+      A list containing None for each task that was added and an
+      InvalidTaskInfo for each task whose ID already exists in the queue.
+    Raises:
+      InvalidTaskInfo if a task doesn't have payloadBase64 attribute.
+    """
+    for task in tasks:
+      if not hasattr(task, 'payloadBase64'):
+        raise InvalidTaskInfo('{} is missing a payload.'.format(task))
+
+    if not tasks:
+      return []
 
     # TODO: remove decoding when task.payloadBase64
     #       is replaced with task.payload
-    params = {
-      'task_name': task.id,
-      'payload': bytearray(base64.urlsafe_b64decode(task.payloadBase64)),
-      'lease_count': 0,
-      'tag': getattr(task, 'tag', None)
-    }
+    parameters = (
+      [task.id for task in tasks],
+      [bytearray(base64.urlsafe_b64decode(task.payloadBase64))
+       for task in tasks],
+      # Tasks without a lease timestamp are available immediately.
+      [getattr(task, 'leaseTimestamp', None) for task in tasks],
+      [getattr(task, 'tag', None) for task in tasks]
+    )
 
-    try:
-      lease_expires = '%(lease_expires_val)s'
-      params['lease_expires_val'] = task.leaseTimestamp
-    except AttributeError:
-      lease_expires = 'current_timestamp'
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
+      with pg_connection.cursor() as pg_cursor:
+        # Rows whose task name is already taken are not inserted or returned.
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['add'], parameters)
+        inserted = {row[0]: row[1:] for row in pg_cursor.fetchall()}
 
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    try:
-      with pg_connection:
-        with pg_connection.cursor() as pg_cursor:
-          pg_cursor.execute(
-            'INSERT INTO "{table}" ( '
-            '  task_name, payload, time_enqueued, '
-            '  lease_expires, lease_count, tag '
-            ')'
-            'VALUES ( '
-            '  %(task_name)s, %(payload)s, current_timestamp, '
-            '  {lease_expires}, %(lease_count)s, %(tag)s '
-            ') '
-            'RETURNING time_enqueued, lease_expires'
-            .format(table=self.tasks_table_name, lease_expires=lease_expires),
-            vars=params
-          )
-          row = pg_cursor.fetchone()
-    except psycopg2.IntegrityError:
-      name_taken_msg = 'Task name already taken: {}'.format(task.id)
-      raise InvalidTaskInfo(name_taken_msg)
+    errors = []
+    for task in tasks:
+      try:
+        # time_enqueued and lease_expires are generated on PG side
+        enqueue_timestamp, lease_timestamp = inserted.pop(task.id)
+      except KeyError:
+        name_taken_msg = 'Task name already taken: {}'.format(task.id)
+        errors.append(InvalidTaskInfo(name_taken_msg))
+        continue
 
-    logger.debug('Added task: {}'.format(task))
+      logger.debug('Added task: {}'.format(task))
+      task.queueName = self.name
+      task.enqueueTimestamp = enqueue_timestamp
+      task.leaseTimestamp = lease_timestamp
+      errors.append(None)
 
-    task.queueName = self.name
-    task.enqueueTimestamp = row[0]  # time_enqueued is generated on PG side
-    task.leaseTimestamp = row[1]    # lease_expires is generated on PG side
+    return errors
 
   @retry_pg_connection
   def get_task(self, task, omit_payload=False):
@@ -381,23 +504,15 @@ class PostgresPullQueue(Queue):
       A task object or None.
     """
     if omit_payload:
-      columns = ['task_name', 'time_enqueued',
-                 'lease_expires', 'lease_count', 'tag']
+      columns = self.LIST_COLUMNS
+      statement = self._statements['get_without_payload']
     else:
-      columns = ['payload', 'task_name', 'time_enqueued',
-                 'lease_expires', 'lease_count', 'tag']
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+      columns = self.TASK_COLUMNS
+      statement = self._statements['get']
+
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'SELECT {columns} FROM "{tasks_table}" '
-          'WHERE task_name = %(task_name)s AND time_deleted IS NULL'
-          .format(columns=', '.join(columns),
-                  tasks_table=self.tasks_table_name),
-          vars={
-            'task_name': task.id,
-          }
-        )
+        self.pg_connection_wrapper.execute(pg_cursor, statement, (task.id,))
         row = pg_cursor.fetchone()
 
     if not row:
@@ -412,20 +527,11 @@ class PostgresPullQueue(Queue):
     Args:
       task: A Task object.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'UPDATE "{tasks_table}" '
-          'SET time_deleted = current_timestamp '
-          'WHERE "{tasks_table}".task_name = %(task_name)s'
-          .format(tasks_table=self.tasks_table_name),
-          vars={
-            'task_name': task.id,
-          }
-        )
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['delete'], (task.id,))
 
-  @retry_pg_connection
   def update_lease(self, task, new_lease_seconds):
     """ Updates the duration of a task lease.
 
@@ -436,36 +542,8 @@ class PostgresPullQueue(Queue):
     Returns:
       A Task object.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
-      with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'UPDATE "{tasks_table}" '
-          'SET lease_expires = '
-          '  current_timestamp + interval \'%(lease_seconds)s seconds\' '
-          'WHERE task_name = %(task_name)s '
-          '  AND lease_expires > current_timestamp '
-          '  AND lease_expires = %(old_eta)s '
-          '  AND time_deleted IS NULL '
-          'RETURNING lease_expires'
-          .format(tasks_table=self.tasks_table_name),
-          vars={
-            'task_name': task.id,
-            'old_eta': task.get_eta(),
-            'lease_seconds': new_lease_seconds
-          }
-        )
-        if pg_cursor.statusmessage != 'UPDATE 1':
-          logger.info('Expected to get status "UPDATE 1", got: "{}"'
-                      .format(pg_cursor.statusmessage))
-          raise InvalidLeaseRequest('The task lease has expired')
-
-        row = pg_cursor.fetchone()
-
-    task.leaseTimestamp = row[0]
-    return task
+    return self._update_lease(task, new_lease_seconds, task.get_eta())
 
-  @retry_pg_connection
   def update_task(self, task, new_lease_seconds):
     """ Updates leased tasks.
 
@@ -474,50 +552,13 @@ class PostgresPullQueue(Queue):
       new_lease_seconds: An integer specifying when to set the new ETA. It
         represents the number of seconds from now.
     """
-    statement = (
-      'UPDATE "{tasks_table}" '
-      'SET lease_expires = '
-      '  current_timestamp + interval \'%(lease_seconds)s seconds\' '
-      'WHERE task_name = %(task_name)s '
-      '  AND lease_expires > current_timestamp '
-      '  {old_eta_verification} '
-      '  AND time_deleted IS NULL '
-      'RETURNING lease_expires'
-    )
-    parameters = {
-      'task_name': task.id,
-      'lease_seconds': new_lease_seconds
-    }
-
     # Make sure we don't override concurrent lease
     try:
       old_eta = task.leaseTimestamp
     except AttributeError:
       old_eta = None
 
-    if old_eta is not None:
-      old_eta_verification = 'AND lease_expires = %(old_eta)s'
-      parameters['old_eta'] = old_eta
-    else:
-      old_eta_verification = ''
-
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
-      with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          statement.format(tasks_table=self.tasks_table_name,
-                           old_eta_verification=old_eta_verification),
-          vars=parameters
-        )
-        if pg_cursor.statusmessage != 'UPDATE 1':
-          logger.info('Expected to get status "UPDATE 1", got: "{}"'
-                      .format(pg_cursor.statusmessage))
-          raise InvalidLeaseRequest('The task lease has expired')
-
-        row = pg_cursor.fetchone()
-
-    task.leaseTimestamp = row[0]
-    return task
+    return self._update_lease(task, new_lease_seconds, old_eta)
 
   @retry_pg_connection
   def list_tasks(self, limit=100):
@@ -528,20 +569,12 @@ class PostgresPullQueue(Queue):
     Returns:
       A list of Task objects.
     """
-    columns = ['task_name', 'time_enqueued',
-               'lease_expires', 'lease_count', 'tag']
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'SELECT {columns} FROM "{tasks_table}" '
-          'WHERE time_deleted IS NULL '
-          'ORDER BY lease_expires'
-          .format(columns=', '.join(columns),
-                  tasks_table=self.tasks_table_name)
-        )
-        rows = pg_cursor.fetchmany(size=limit)
-        tasks = [self._task_from_row(columns, row) for row in rows]
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['list'], (limit,))
+        rows = pg_cursor.fetchall()
+        tasks = [self._task_from_row(self.LIST_COLUMNS, row) for row in rows]
 
     return tasks
 
@@ -576,53 +609,19 @@ class PostgresPullQueue(Queue):
       if tag is None:
         return []
 
-    # Determine tag condition for the query
-    tag_condition = ''
     if group_by_tag:
-      tag_condition = ' AND tag = %(tag)s'
+      statement = self._statements['lease_by_tag']
+      parameters = (lease_seconds, num_tasks, tag)
+    else:
+      statement = self._statements['lease']
+      parameters = (lease_seconds, num_tasks)
 
-    # Determine max retries condition for the query
-    max_retries_condition = ''
-    if self.task_retry_limit:
-      max_retries_condition = ' AND lease_count < %(max_retries)s'
-
-    columns = ['task_name', 'payload', 'time_enqueued',
-               'lease_expires', 'lease_count', 'tag']
-    full_column_names = [
-      '"{table}".{col}'.format(table=self.tasks_table_name, col=column)
-      for column in columns
-    ]
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'UPDATE "{tasks_table}" '
-          'SET lease_expires = '
-          '      current_timestamp + interval \'%(lease_seconds)s seconds\', '
-          '    lease_count = lease_count + 1 '
-          'FROM ( '
-          '  SELECT task_name FROM "{tasks_table}" '
-          '  WHERE time_deleted IS NULL '        # Tell PG to use partial index
-          '        AND lease_expires < current_timestamp '
-          '        {retry_limit} '
-          '        {tag_filter} '
-          '  ORDER BY lease_expires '
-          '  FOR UPDATE SKIP LOCKED '
-          '  LIMIT {num_tasks} '
-          ') as tasks_to_update '
-          'WHERE "{tasks_table}".task_name = tasks_to_update.task_name '
-          'RETURNING {columns}'
-          .format(columns=', '.join(full_column_names),
-                  retry_limit=max_retries_condition, tag_filter=tag_condition,
-                  num_tasks=num_tasks, tasks_table=self.tasks_table_name),
-          vars={
-            'lease_seconds': lease_seconds,
-            'max_retries': self.task_retry_limit,
-            'tag': tag
-          }
-        )
+        self.pg_connection_wrapper.execute(pg_cursor, statement, parameters)
         rows = pg_cursor.fetchall()
-        leased = [self._task_from_row(columns, row) for row in rows]
+        leased = [self._task_from_row(self.LEASE_COLUMNS, row)
+                  for row in rows]
 
     time_elapsed = datetime.datetime.utcnow() - start_time
     logger.debug('Leased {} tasks [time elapsed: {}]'
@@ -633,8 +632,7 @@ class PostgresPullQueue(Queue):
   def purge(self):
     """ Remove all tasks from queue.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'TRUNCATE TABLE "{tasks_table}"'
@@ -681,13 +679,10 @@ class PostgresPullQueue(Queue):
     Returns:
       An integer specifying the number of tasks in the queue.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'SELECT count(*) FROM "{tasks_table}" WHERE time_deleted IS NULL'
-          .format(tasks_table=self.tasks_table_name)
-        )
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['total_tasks'])
         tasks_count = pg_cursor.fetchone()[0]
     return tasks_count
 
@@ -699,14 +694,10 @@ class PostgresPullQueue(Queue):
       A datetime object specifying the oldest ETA or None if there are no
       tasks.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'SELECT min(lease_expires) FROM "{tasks_table}" '
-          'WHERE time_deleted IS NULL'
-          .format(tasks_table=self.tasks_table_name)
-        )
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['oldest_eta'])
         oldest_eta = pg_cursor.fetchone()[0]
     return oldest_eta
 
@@ -714,8 +705,7 @@ class PostgresPullQueue(Queue):
   def flush_deleted(self):
     """ Removes all tasks which were deleted more than week ago.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'DELETE FROM "{tasks_table}" '
@@ -726,6 +716,18 @@ class PostgresPullQueue(Queue):
         logger.info('Flushed deleted tasks from {} with status: {}'
                     .format(self.tasks_table_name, pg_cursor.statusmessage))
 
+  # The columns to fetch when reading whole tasks.
+  TASK_COLUMNS = ('payload', 'task_name', 'time_enqueued',
+                  'lease_expires', 'lease_count', 'tag')
+
+  # The columns to fetch when listing tasks.
+  LIST_COLUMNS = ('task_name', 'time_enqueued',
+                  'lease_expires', 'lease_count', 'tag')
+
+  # The columns returned for leased tasks.
+  LEASE_COLUMNS = ('task_name', 'payload', 'time_enqueued',
+                   'lease_expires', 'lease_count', 'tag')
+
   COLUMN_ATTR_MAPPING = {
     'task_name': 'id',
     'payload': 'payload',  # it's converted to payloadBase64 in _task_from_row
@@ -759,6 +761,41 @@ class PostgresPullQueue(Queue):
 
     return Task(task_info)
 
+  @retry_pg_connection
+  def _update_lease(self, task, new_lease_seconds, old_eta):
+    """ Sets a new ETA on a leased task.
+
+    Args:
+      task: A Task object.
+      new_lease_seconds: An integer specifying when to set the new ETA. It
+        represents the number of seconds from now.
+      old_eta: A datetime object specifying the ETA the task must have, or
+        None to update the task regardless of its current ETA.
+    Returns:
+      A Task object.
+    Raises:
+      InvalidLeaseRequest if the lease has expired.
+    """
+    if old_eta is not None:
+      statement = self._statements['update_lease']
+      parameters = (task.id, new_lease_seconds, old_eta)
+    else:
+      statement = self._statements['update_lease_any_eta']
+      parameters = (task.id, new_lease_seconds)
+
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
+      with pg_connection.cursor() as pg_cursor:
+        self.pg_connection_wrapper.execute(pg_cursor, statement, parameters)
+        if pg_cursor.statusmessage != 'UPDATE 1':
+          logger.info('Expected to get status "UPDATE 1", got: "{}"'
+                      .format(pg_cursor.statusmessage))
+          raise InvalidLeaseRequest('The task lease has expired')
+
+        row = pg_cursor.fetchone()
+
+    task.leaseTimestamp = row[0]
+    return task
+
   @retry_pg_connection
   def _get_earliest_tag(self):
     """ Get the tag with the earliest ETA.
@@ -766,15 +803,10 @@ class PostgresPullQueue(Queue):
     Returns:
       A string containing a tag or None.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.get_connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
-        pg_cursor.execute(
-          'SELECT tag FROM "{tasks_table}" '
-          'WHERE time_deleted IS NULL '
-          'ORDER BY lease_expires'
-          .format(tasks_table=self.tasks_table_name)
-        )
+        self.pg_connection_wrapper.execute(
+          pg_cursor, self._statements['earliest_tag'])
         row = pg_cursor.fetchone()
         tag = row[0] if row else None
         return tag
@@ -823,18 +855,12 @@ class PullQueue(Queue):
   # The maximum number of tasks that can be leased at a time.
   MAX_LEASE_AMOUNT = 1000
 
+  # The maximum number of tags to keep lease indexes for.
+  MAX_LEASE_INDEXES = 100
+
   # Tasks can be leased for up to a week.
   MAX_LEASE_TIME = 60 * 60 * 24 * 7
 
-  # The maximum number of index entries to cache.
-  MAX_CACHE_SIZE = 500
-
-  # The number of seconds to keep the index cache.
-  MAX_CACHE_DURATION = 30
-
-  # The seconds to wait after fetching 0 index results before retrying.
-  EMPTY_RESULTS_COOLDOWN = 5
-
   def __init__(self, queue_info, app, db_access=None):
     """ Create a PullQueue object.
 
@@ -844,10 +870,12 @@ class PullQueue(Queue):
       db_access: A DatastoreProxy object.
     """
     self.db_access = db_access
-    self.index_cache = {'global': {}, 'by_tag': {}}
-    self.index_cache_lock = Lock()
     super(PullQueue, self).__init__(queue_info, app)
 
+    # Lease indexes by tag. The index for None covers the whole queue.
+    self.lease_indexes = {}
+    self.lease_stats = LeaseIndexStats(self.name)
+
   def add_task(self, task, retries=5):
     """ Adds a task to the queue.
 
@@ -856,67 +884,143 @@ class PullQueue(Queue):
       retries: The number of times to retry adding the task.
     Raises:
       InvalidTaskInfo if the task ID already exists in the queue.
+      TransientError if the task could not be stored or indexed.
+    """
+    error = self.add_tasks([task], retries)[0]
+    if error is not None:
+      raise error
+
+  def add_tasks(self, tasks, retries=5):
+    """ Adds tasks to the queue, inserting them concurrently.
+
+    Args:
+      tasks: A list of Task objects.
+      retries: The number of times to retry adding each task.
+    Returns:
+      A list containing None for each task that was added, an InvalidTaskInfo
+      for each task whose ID already exists in the queue and a TransientError
+      for each task that could not be stored or indexed.
+    Raises:
+      InvalidTaskInfo if a task doesn't have a payload.
     """
-    if not hasattr(task, 'payloadBase64'):
-      raise InvalidTaskInfo('{} is missing a payload.'.format(task))
+    for task in tasks:
+      if not hasattr(task, 'payloadBase64'):
+        raise InvalidTaskInfo('{} is missing a payload.'.format(task))
 
     enqueue_time = datetime.datetime.utcnow()
-    try:
-      lease_expires = task.leaseTimestamp
-    except AttributeError:
-      lease_expires = datetime.datetime.utcfromtimestamp(0)
+    task_parameters = []
+    for task in tasks:
+      try:
+        lease_expires = task.leaseTimestamp
+      except AttributeError:
+        lease_expires = datetime.datetime.utcfromtimestamp(0)
+
+      parameters = {
+        'app': self.app,
+        'queue': self.name,
+        'id': task.id,
+        'payload': task.payloadBase64,
+        'enqueued': enqueue_time,
+        'retry_count': 0,
+        'lease_expires': lease_expires,
+        'op_id': uuid.uuid4()
+      }
 
-    parameters = {
-      'app': self.app,
-      'queue': self.name,
-      'id': task.id,
-      'payload': task.payloadBase64,
-      'enqueued': enqueue_time,
-      'retry_count': 0,
-      'lease_expires': lease_expires,
-      'op_id': uuid.uuid4()
-    }
+      try:
+        parameters['tag'] = task.tag
+      except AttributeError:
+        parameters['tag'] = None
 
-    try:
-      parameters['tag'] = task.tag
-    except AttributeError:
-      parameters['tag'] = None
+      task_parameters.append(parameters)
 
-    self._insert_task(parameters, retries)
+    insert_results = execute_concurrent_with_args(
+      self.db_access.session, self._insert_statement(), task_parameters,
+      raise_on_first_error=False)
 
-    task.queueName = self.name
-    task.enqueueTimestamp = enqueue_time
-    task.leaseTimestamp = lease_expires
+    errors = []
+    for parameters, (success, result) in zip(task_parameters, insert_results):
+      try:
+        if not success:
+          if (not isinstance(result, TRANSIENT_CASSANDRA_ERRORS) or
+              retries <= 1):
+            raise result
+
+          logger.warning('Encountered error while inserting task: {}. '
+                         'Retrying.'.format(result))
+          self._insert_task(parameters, retries - 1)
+        elif not result.was_applied:
+          self._check_insert(parameters)
+      except (InvalidTaskInfo, TransientError) as error:
+        errors.append(error)
+      except Exception as error:
+        logger.exception('Unable to insert task {}'.format(parameters['id']))
+        errors.append(TransientError(str(error)))
+      else:
+        errors.append(None)
 
-    # Create index entries so the task can be queried by ETA and (tag, ETA).
+    # Create index entries so the tasks can be queried by ETA and (tag, ETA).
     # This can't be done in a batch because the payload from the previous
     # insert can be up to 1MB, and Cassandra does not approve of large batches.
-    try:
-      tag = task.tag
-    except AttributeError:
-      # The API does not differentiate between empty and unspecified tags.
-      tag = ''
-
     insert_eta_index = SimpleStatement("""
       INSERT INTO pull_queue_eta_index (app, queue, eta, id, tag)
       VALUES (%(app)s, %(queue)s, %(eta)s, %(id)s, %(tag)s)
     """, retry_policy=BASIC_RETRIES)
-    parameters = {
-      'app': self.app,
-      'queue': self.name,
-      'eta': task.get_eta(),
-      'id': task.id,
-      'tag': tag
-    }
-    self.db_access.session.execute(insert_eta_index, parameters)
-
     insert_tag_index = SimpleStatement("""
       INSERT INTO pull_queue_tags_index (app, queue, tag, eta, id)
       VALUES (%(app)s, %(queue)s, %(tag)s, %(eta)s, %(id)s)
     """, retry_policy=BASIC_RETRIES)
-    self.db_access.session.execute(insert_tag_index, parameters)
+    index_statements = []
+    indexed_tasks = []
+    for task_index, (task, parameters, error) in enumerate(
+        zip(tasks, task_parameters, errors)):
+      if error is not None:
+        continue
 
-    logger.debug('Added task: {}'.format(task))
+      task.queueName = self.name
+      task.enqueueTimestamp = enqueue_time
+      task.leaseTimestamp = parameters['lease_expires']
+
+      parameters = {
+        'app': self.app,
+        'queue': self.name,
+        'eta': task.get_eta(),
+        'id': task.id,
+        # The API does not differentiate between empty and unspecified tags.
+        'tag': getattr(task, 'tag', '')
+      }
+      index_statements.append((insert_eta_index, parameters))
+      index_statements.append((insert_tag_index, parameters))
+      indexed_tasks.extend([task_index, task_index])
+
+    # Every task that was inserted gets its index entries, even when other
+    # tasks in the request failed.
+    index_results = execute_concurrent(
+      self.db_access.session, index_statements, raise_on_first_error=False)
+    for (statement, parameters), task_index, (success, result) in zip(
+        index_statements, indexed_tasks, index_results):
+      if success:
+        continue
+
+      try:
+        if (not isinstance(result, TRANSIENT_CASSANDRA_ERRORS) or
+            retries <= 1):
+          raise result
+
+        logger.warning('Encountered error while indexing task: {}. '
+                       'Retrying.'.format(result))
+        self._insert_index_entry(statement, parameters, retries - 1)
+      except Exception as error:
+        # The task can't be leased until it is indexed, so the client has to
+        # try again.
+        logger.error('Unable to index task {}: {}'.format(
+          parameters['id'], error))
+        errors[task_index] = TransientError(str(error))
+
+    for task, error in zip(tasks, errors):
+      if error is None:
+        logger.debug('Added task: {}'.format(task))
+
+    return errors
 
   def get_task(self, task, omit_payload=False):
     """ Gets a task from the queue.
@@ -1279,16 +1383,14 @@ class PullQueue(Queue):
 
     return result.op_id == op_id
 
-  def _insert_task(self, parameters, retries):
-    """ Insert task entry into pull_queue_tasks.
+  @staticmethod
+  def _insert_statement():
+    """ Creates a statement for inserting a task entry into pull_queue_tasks.
 
-    Args:
-      parameters: A dictionary specifying the task parameters.
-      retries: The number of times to try the insert.
-    Raises:
-      InvalidTaskInfo if the task ID already exists in the queue.
+    Returns:
+      A SimpleStatement that only applies if the task ID is not taken.
     """
-    insert_statement = SimpleStatement("""
+    return SimpleStatement("""
       INSERT INTO pull_queue_tasks (
         app, queue, id, payload,
         enqueued, lease_expires, retry_count, tag, op_id
@@ -1299,8 +1401,19 @@ class PullQueue(Queue):
       )
       IF NOT EXISTS
     """, retry_policy=NO_RETRIES)
+
+  def _insert_task(self, parameters, retries):
+    """ Insert task entry into pull_queue_tasks.
+
+    Args:
+      parameters: A dictionary specifying the task parameters.
+      retries: The number of times to try the insert.
+    Raises:
+      InvalidTaskInfo if the task ID already exists in the queue.
+    """
     try:
-      result = self.db_access.session.execute(insert_statement, parameters)
+      result = self.db_access.session.execute(self._insert_statement(),
+                                              parameters)
     except TRANSIENT_CASSANDRA_ERRORS as error:
       retries_left = retries - 1
       if retries_left <= 0:
@@ -1312,6 +1425,34 @@ class PullQueue(Queue):
     if result.was_applied:
       return
 
+    self._check_insert(parameters)
+
+  def _insert_index_entry(self, statement, parameters, retries):
+    """ Insert an entry into one of the pull queue index tables.
+
+    Args:
+      statement: A SimpleStatement that inserts the entry.
+      parameters: A dictionary specifying the entry parameters.
+      retries: The number of times to try the insert.
+    """
+    try:
+      self.db_access.session.execute(statement, parameters)
+    except TRANSIENT_CASSANDRA_ERRORS as error:
+      retries_left = retries - 1
+      if retries_left <= 0:
+        raise
+      logger.warning(
+        'Encountered error while indexing task: {}. Retrying.'.format(error))
+      self._insert_index_entry(statement, parameters, retries_left)
+
+  def _check_insert(self, parameters):
+    """ Checks whether an unapplied insert was made by an earlier attempt.
+
+    Args:
+      parameters: A dictionary specifying the task parameters.
+    Raises:
+      InvalidTaskInfo if the task ID is taken by a different task.
+    """
     try:
       success = self._task_mutated_by_id(parameters['id'], parameters['op_id'])
     except TaskNotFound:
@@ -1395,7 +1536,7 @@ class PullQueue(Queue):
     return results
 
   def _query_available_tasks(self, num_tasks, group_by_tag, tag):
-    """ Query the cache or index table for available tasks.
+    """ Query the lease index or index table for available tasks.
 
     Args:
       num_tasks: An integer specifying the number of tasks to lease.
@@ -1406,51 +1547,40 @@ class PullQueue(Queue):
     Returns:
       A list of index results.
     """
-    # If the request is larger than the max cache size, don't use the cache.
-    if num_tasks > self.MAX_CACHE_SIZE:
-      return self._query_index(num_tasks, group_by_tag, tag)
+    # If the request is larger than the lease index, query the table directly.
+    if num_tasks > LeaseIndex.MAX_SIZE:
+      return list(self._query_index(num_tasks, group_by_tag, tag))
 
-    with self.index_cache_lock:
-      if group_by_tag:
-        if tag not in self.index_cache['by_tag']:
-          self.index_cache['by_tag'][tag] = {}
-        tag_cache = self.index_cache['by_tag'][tag]
-      else:
-        tag_cache = self.index_cache['global']
-
-      # If results have never been fetched, populate the cache.
-      if not tag_cache:
-        results = self._query_index(self.MAX_CACHE_SIZE, group_by_tag, tag)
-        tag_cache['queue'] = deque(results)
-        tag_cache['last_fetch'] = datetime.datetime.now()
-        tag_cache['last_results'] = len(tag_cache['queue'])
-
-      # If 0 results were fetched recently, don't try fetching again.
-      recently = datetime.datetime.now() - datetime.timedelta(
-        seconds=self.EMPTY_RESULTS_COOLDOWN)
-      if (not tag_cache['queue'] and tag_cache['last_results'] == 0 and
-          tag_cache['last_fetch'] > recently):
-        return []
+    if not group_by_tag:
+      tag = None
 
-      # If the cache is outdated or insufficient, update it.
-      outdated = datetime.datetime.now() - datetime.timedelta(
-        seconds=self.MAX_CACHE_DURATION)
-      if (num_tasks > len(tag_cache['queue']) or
-          tag_cache['last_fetch'] < outdated):
-        results = self._query_index(self.MAX_CACHE_SIZE, group_by_tag, tag)
-        tag_cache['queue'] = deque(results)
-        tag_cache['last_fetch'] = datetime.datetime.now()
-        tag_cache['last_results'] = len(tag_cache['queue'])
-
-      results = []
-      for _ in range(num_tasks):
-        try:
-          results.append(tag_cache['queue'].popleft())
-        except IndexError:
-          # The queue is empty.
-          break
+    try:
+      lease_index = self.lease_indexes[tag]
+    except KeyError:
+      self._evict_lease_indexes()
+      lease_index = self.lease_indexes.setdefault(
+        tag, LeaseIndex(self.db_access.session, self.app, self.name,
+                        self.lease_stats, tag))
+
+    results = lease_index.claim(num_tasks)
+    self.lease_stats.maybe_log()
+    return results
 
-      return results
+  def _evict_lease_indexes(self):
+    """ Makes room for a new lease index.
+
+    Indexes that have not been used since their entries would have been
+    rescanned are dropped, as are the least recently used indexes when
+    there are too many tags.
+    """
+    now = time.time()
+    by_last_claim = sorted(self.lease_indexes.items(),
+                           key=lambda item: item[1].last_claim)
+    for position, (tag, lease_index) in enumerate(by_last_claim):
+      idle = now - lease_index.last_claim > LeaseIndex.FULL_SCAN_INTERVAL
+      remaining = len(by_last_claim) - position
+      if idle or remaining >= self.MAX_LEASE_INDEXES:
+        self.lease_indexes.pop(tag, None)
 
   def _get_earliest_tag(self):
     """ Get the tag with the earliest ETA.
@@ -1539,6 +1669,8 @@ class PullQueue(Queue):
     select = self.prepared_statements[statement]
 
     futures = {}
+    stale = 0
+    contended = 0
     for result_num, update_future in enumerate(update_futures):
       try:
         result = update_future.result()
@@ -1548,7 +1680,14 @@ class PullQueue(Queue):
         success = False
 
       if success and not result.was_applied:
-        # The lease operation failed, so keep this index as None.
+        # The lease operation failed, so keep this index as None. If the task
+        # is currently leased, another worker got to it first. Otherwise, the
+        # index entry no longer refers to a task that can be leased.
+        lease_expires = getattr(result.one(), 'lease_expires', None)
+        if lease_expires is not None and lease_expires >= current_time:
+          contended += 1
+        else:
+          stale += 1
         continue
 
       index = indexes[result_num]
@@ -1567,6 +1706,7 @@ class PullQueue(Queue):
 
       # If the operation IDs do not match, the lease was not successful.
       if lease_timed_out and read_result.op_id != op_id:
+        contended += 1
         continue
 
       task_info = {
@@ -1586,6 +1726,9 @@ class PullQueue(Queue):
       index_update_futures.append(self._update_index_async(index, task))
       self._update_stats()
 
+    self.lease_stats.record(attempts=len(indexes), stale=stale,
+                            contended=contended)
+
     # Make sure all of the index updates complete successfully.
     for index_update in index_update_futures:
       index_update.result()
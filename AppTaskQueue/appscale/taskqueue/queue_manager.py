@@ -5,6 +5,7 @@ import json
 from kazoo.exceptions import ZookeeperError, NoNodeError
 from tornado.ioloop import IOLoop, PeriodicCallback
 
+from appscale.taskqueue.constants import MAX_WORKER_THREADS
 from appscale.taskqueue.queue import PostgresPullQueue
 from appscale.taskqueue.utils import create_celery_for_app
 from .queue import PullQueue
@@ -37,10 +38,9 @@ class ProjectQueueManager(dict):
                   .format(project_id))
       # Import pg_connection_wrapper (and psycopg2) lazily
       from appscale.taskqueue import pg_connection_wrapper
-      # TODO: PostgresConnectionWrapper may need an update when
-      #       TaskQueue becomes concurrent
       self.pg_connection_wrapper = (
-        pg_connection_wrapper.PostgresConnectionWrapper(dsn=pg_dsn[0])
+        pg_connection_wrapper.PostgresConnectionWrapper(
+          dsn=pg_dsn[0], max_connections=MAX_WORKER_THREADS)
       )
       self._configure_periodical_flush()
     except NoNodeError:
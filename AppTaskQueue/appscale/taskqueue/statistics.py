@@ -81,6 +81,7 @@ METRICS_CONFIG = {
   "all": metrics.CountOf(matchers.ANY),
   "failed": metrics.CountOf(FAILED_REQUEST),
   "avg_latency": metrics.Avg("latency"),
+  "latency_histogram": metrics.Histogram("latency"),
   "pb_reqs": metrics.CountOf(PROTOBUFF_REQUEST),
   "rest_reqs": metrics.CountOf(REST_REQUEST),
   PB_METHOD_CATEGORIZER: metrics.CountOf(matchers.ANY),
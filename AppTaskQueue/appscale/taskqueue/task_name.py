@@ -1,17 +1,30 @@
 """ Stores push task metadata. """
+import datetime
 import sys
+import threading
 
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from collections import OrderedDict
 
 sys.path.append(APPSCALE_PYTHON_APPSERVER)
 from google.appengine.ext import db
 
+# The amount of time a task name stays reserved after it is enqueued. The
+# groomer deletes task names once they are this old.
+TOMBSTONE_DURATION = datetime.timedelta(days=1)
+
+# The maximum number of pending task names to read when counting the tasks in
+# a push queue.
+MAX_PENDING_TASK_NAMES = 1000
+
+
 class TaskName(db.Model):
   """ A datastore model for tracking task names in order to prevent
   tasks with the same name from being enqueued repeatedly.
 
   Attributes:
     timestamp: The time the task was enqueued.
+    eta: The time the task is scheduled to run.
   """
   STORED_KIND_NAME = "__task_name__"
   timestamp = db.DateTimeProperty(auto_now_add=True)
@@ -19,8 +32,62 @@ class TaskName(db.Model):
   state = db.StringProperty(required=True)
   endtime = db.DateTimeProperty()
   app_id = db.StringProperty(required=True)
+  eta = db.DateTimeProperty()
 
   @classmethod
   def kind(cls):
     """ Kind name override. """
     return cls.STORED_KIND_NAME
+
+  def expired(self, now):
+    """ Checks if the task name can be used again.
+
+    Args:
+      now: A datetime object specifying the current UTC time.
+    Returns:
+      A boolean indicating whether or not the tombstone has expired.
+    """
+    return self.timestamp + TOMBSTONE_DURATION <= now
+
+
+class RecentTaskNames(object):
+  """ A bounded cache of task names that are known to be taken. """
+
+  # The maximum number of task names to keep.
+  MAX_SIZE = 10000
+
+  def __init__(self):
+    """ Creates a new RecentTaskNames object. """
+    self._names = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, task_name, now):
+    """ Fetches a cached task name.
+
+    Args:
+      task_name: A string specifying the task name.
+      now: A datetime object specifying the current UTC time.
+    Returns:
+      A TaskName object or None if the name is not cached.
+    """
+    with self._lock:
+      item = self._names.get(task_name)
+      if item is not None and item.expired(now):
+        del self._names[task_name]
+        return None
+
+      return item
+
+  def add(self, items):
+    """ Caches task names.
+
+    Args:
+      items: A list of TaskName objects.
+    """
+    with self._lock:
+      for item in items:
+        self._names.pop(item.key().name(), None)
+        self._names[item.key().name()] = item
+
+      while len(self._names) > self.MAX_SIZE:
+        self._names.popitem(last=False)
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import uuid
+
+from conftest import async_test, TEST_PROJECT
+from helpers import taskqueue_service_pb2
+
+# The number of tasks in each BulkAdd request.
+BATCH_SIZE = 100
+
+# The number of BulkAdd requests to have in flight.
+CONCURRENCY = 5
+
+# The number of tasks to add in each case.
+TASK_COUNT = 2000
+
+
+def make_add_requests(queue_name, count):
+  prefix = uuid.uuid4().hex
+  add_tasks = []
+  for n in range(count):
+    add_task = taskqueue_service_pb2.TaskQueueAddRequest()
+    add_task.app_id = bytes(TEST_PROJECT, 'utf8')
+    add_task.queue_name = bytes(queue_name, 'utf8')
+    add_task.mode = taskqueue_service_pb2.TaskQueueMode.PULL
+    add_task.task_name = bytes(f'{prefix}-{n}', 'utf8')
+    add_task.body = b'x' * 1000
+    add_task.eta_usec = 0
+    add_tasks.append(add_task)
+  return add_tasks
+
+
+async def add_in_batches(taskqueue, add_tasks, batch_size):
+  """ Adds tasks with BulkAdd requests, keeping CONCURRENCY of them in flight.
+
+  Args:
+    taskqueue: A TaskQueue helper.
+    add_tasks: A list of TaskQueueAddRequests.
+    batch_size: The number of tasks in each BulkAdd request.
+  Returns:
+    A float specifying the number of tasks added per second.
+  """
+  batches = [add_tasks[index:index + batch_size]
+             for index in range(0, len(add_tasks), batch_size)]
+  semaphore = asyncio.Semaphore(CONCURRENCY)
+
+  async def bulk_add(batch):
+    bulk_add = taskqueue_service_pb2.TaskQueueBulkAddRequest()
+    bulk_add.add_request.extend(batch)
+    async with semaphore:
+      response = await taskqueue.protobuf('BulkAdd', bulk_add)
+
+    ok = taskqueue_service_pb2.TaskQueueServiceError.OK
+    assert all(result.result == ok for result in response.taskresult)
+
+  start_time = time.time()
+  await asyncio.wait([bulk_add(batch) for batch in batches])
+  return len(add_tasks) / (time.time() - start_time)
+
+
+@async_test
+async def test_bulk_add_throughput(taskqueue):
+  queue_str = 'pull-queue-a'
+
+  single = await add_in_batches(
+    taskqueue, make_add_requests(queue_str, TASK_COUNT // 10), 1)
+  bulk = await add_in_batches(
+    taskqueue, make_add_requests(queue_str, TASK_COUNT), BATCH_SIZE)
+  print(f'\n1 task per BulkAdd: {single:.1f} tasks/s\n'
+        f'{BATCH_SIZE} tasks per BulkAdd: {bulk:.1f} tasks/s')
+
+  # Batching should never make adding tasks slower
+  assert bulk > single
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import uuid
+
+from conftest import async_test, TEST_PROJECT
+from helpers import taskqueue_service_pb2
+
+# The number of clients adding and leasing tasks at the same time.
+CONCURRENCY = 20
+
+# The number of latency samples to take in each case.
+SAMPLES = 50
+
+# How much slower requests may get while the server is busy with other
+# clients. Operations that block on the database run in worker threads, so
+# they should not hold up requests that are waiting for the IOLoop.
+MAX_SLOWDOWN = 5
+
+# Latencies below this many seconds are treated as the same.
+LATENCY_FLOOR = 0.05
+
+
+def percentile(latencies, fraction):
+  ordered = sorted(latencies)
+  return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def make_add_request(queue_str):
+  add_task = taskqueue_service_pb2.TaskQueueAddRequest()
+  add_task.app_id = bytes(TEST_PROJECT, 'utf8')
+  add_task.queue_name = bytes(queue_str, 'utf8')
+  add_task.mode = taskqueue_service_pb2.TaskQueueMode.PULL
+  add_task.task_name = bytes(uuid.uuid4().hex, 'utf8')
+  add_task.body = b'x' * 1000
+  add_task.eta_usec = 0
+  return add_task
+
+
+def make_lease_request(queue_str):
+  lease_req = taskqueue_service_pb2.TaskQueueQueryAndOwnTasksRequest()
+  lease_req.queue_name = bytes(queue_str, 'utf8')
+  lease_req.lease_seconds = 60
+  lease_req.max_tasks = 10
+  return lease_req
+
+
+async def sample_latencies(taskqueue, queue_str):
+  """ Times requests that are sent one after another.
+
+  Args:
+    taskqueue: A TaskQueue helper.
+    queue_str: A string specifying the queue to add tasks to.
+  Returns:
+    A tuple containing lists of service stats and Add latencies in seconds.
+  """
+  stats_latencies = []
+  add_latencies = []
+  for _ in range(SAMPLES):
+    start_time = time.time()
+    await taskqueue.remote_time_usec()
+    stats_latencies.append(time.time() - start_time)
+
+    start_time = time.time()
+    await taskqueue.protobuf('Add', make_add_request(queue_str))
+    add_latencies.append(time.time() - start_time)
+
+  return stats_latencies, add_latencies
+
+
+async def generate_load(taskqueue, queue_str, stop):
+  """ Adds and leases tasks until stop is set. """
+  while not stop.is_set():
+    await taskqueue.protobuf('Add', make_add_request(queue_str))
+    await taskqueue.protobuf('QueryAndOwnTasks', make_lease_request(queue_str))
+
+
+@async_test
+async def test_latency_under_concurrent_load(taskqueue):
+  probe_queue = 'pull-queue-a'
+  load_queue = 'pull-queue-b'
+
+  idle_stats, idle_adds = await sample_latencies(taskqueue, probe_queue)
+
+  stop = asyncio.Event()
+  clients = [asyncio.ensure_future(generate_load(taskqueue, load_queue, stop))
+             for _ in range(CONCURRENCY)]
+  try:
+    busy_stats, busy_adds = await sample_latencies(taskqueue, probe_queue)
+  finally:
+    stop.set()
+    await asyncio.wait(clients)
+
+  for client in clients:
+    # Make sure the load was not cut short by an error.
+    client.result()
+
+  cases = [('service stats', idle_stats, busy_stats),
+           ('add', idle_adds, busy_adds)]
+  for name, idle, busy in cases:
+    print(f'\n{name}: p50 {percentile(idle, 0.5) * 1000:.1f} ms idle, '
+          f'{percentile(busy, 0.5) * 1000:.1f} ms with {CONCURRENCY} clients; '
+          f'p95 {percentile(idle, 0.95) * 1000:.1f} ms idle, '
+          f'{percentile(busy, 0.95) * 1000:.1f} ms with {CONCURRENCY} clients')
+
+  for name, idle, busy in cases:
+    allowed = max(percentile(idle, 0.95), LATENCY_FLOOR) * MAX_SLOWDOWN
+    assert percentile(busy, 0.95) < allowed, name
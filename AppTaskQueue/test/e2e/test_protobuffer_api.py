@@ -1,5 +1,6 @@
 import asyncio
 import time
+import uuid
 
 import pytest
 
@@ -266,3 +267,42 @@ async def test_add_lease_retry_retry_delete_cassandra(taskqueue, pull_queues_bac
   # Verify that queue is empty
   listed = await taskqueue.rest('GET', path_suffix=f'/{queue_str}/tasks')
   assert listed.json == {'kind': 'taskqueues#tasks'}  # items should be missing
+
+
+@async_test
+async def test_bulk_add_duplicate_names(taskqueue):
+  queue_bytes = b'pull-queue-a'
+  prefix = uuid.uuid4().hex
+  add_tasks = []
+  for name in ['taken', 'new-1', 'new-1', 'new-2']:
+    add_task = taskqueue_service_pb2.TaskQueueAddRequest()
+    add_task.app_id = bytes(TEST_PROJECT, 'utf8')
+    add_task.queue_name = queue_bytes
+    add_task.mode = taskqueue_service_pb2.TaskQueueMode.PULL
+    add_task.task_name = bytes(f'{prefix}-{name}', 'utf8')
+    add_task.body = b'some-payload'
+    add_task.eta_usec = 0
+    add_tasks.append(add_task)
+
+  await taskqueue.protobuf('Add', add_tasks[0])
+
+  bulk_add = taskqueue_service_pb2.TaskQueueBulkAddRequest()
+  bulk_add.add_request.extend(add_tasks)
+  response = await taskqueue.protobuf('BulkAdd', bulk_add)
+
+  # Each task whose name is taken gets its own error
+  ok = taskqueue_service_pb2.TaskQueueServiceError.OK
+  exists = taskqueue_service_pb2.TaskQueueServiceError.TASK_ALREADY_EXISTS
+  assert [result.result for result in response.taskresult] == [
+    exists, ok, exists, ok
+  ]
+  assert [result.chosen_task_name for result in response.taskresult
+          if result.result == ok] == [add_tasks[1].task_name,
+                                      add_tasks[3].task_name]
+
+  # Verify listed tasks
+  listed = await taskqueue.rest('GET', path_suffix='/pull-queue-a/tasks')
+  assert (
+    set(task['id'] for task in listed.json['items'])
+    == {f'{prefix}-taken', f'{prefix}-new-1', f'{prefix}-new-2'}
+  )
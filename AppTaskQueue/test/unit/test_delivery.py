@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+import json
+import unittest
+
+from mock import MagicMock, patch
+
+from appscale.common.service_stats import metrics
+from appscale.taskqueue.delivery import ConnectionPool
+from appscale.taskqueue.delivery import DeliveryStats
+
+
+class TestConnectionPool(unittest.TestCase):
+  def setUp(self):
+    connection_class = MagicMock(side_effect=lambda host, port: MagicMock())
+    self._classes_patcher = patch.dict(
+      ConnectionPool.CONNECTION_CLASSES, {'http': connection_class})
+    self._classes_patcher.start()
+
+  def tearDown(self):
+    self._classes_patcher.stop()
+
+  def test_reuses_released_connections(self):
+    pool = ConnectionPool()
+    connection, reused = pool.acquire('http', 'host1', 8080)
+    self.assertFalse(reused)
+    pool.release(connection, reusable=True)
+
+    second, reused = pool.acquire('http', 'host1', 8080)
+    self.assertIs(second, connection)
+    self.assertTrue(reused)
+
+    # Connections are not shared between targets.
+    other, reused = pool.acquire('http', 'host1', 8081)
+    self.assertIsNot(other, connection)
+    self.assertFalse(reused)
+
+  def test_closes_unusable_connections(self):
+    pool = ConnectionPool()
+    connection, _ = pool.acquire('http', 'host1', 8080)
+    pool.release(connection, reusable=False)
+    connection.close.assert_called_once_with()
+
+    second, reused = pool.acquire('http', 'host1', 8080)
+    self.assertIsNot(second, connection)
+    self.assertFalse(reused)
+
+  def test_limits_concurrent_requests_per_queue(self):
+    pool = ConnectionPool({'queue1': 2})
+    first, _ = pool.acquire('http', 'host1', 8080, 'queue1')
+    second, _ = pool.acquire('http', 'host2', 8080, 'queue1')
+    queue_active = pool._queue_active['queue1']
+    self.assertTrue(queue_active.locked())
+
+    # Queues without a limit are only limited by MAX_ACTIVE.
+    for _ in range(3):
+      pool.acquire('http', 'host1', 8080, 'queue2')
+
+    pool.release(first, reusable=True)
+    self.assertFalse(queue_active.locked())
+
+    # A reused connection counts against the queue it is acquired for.
+    connection, reused = pool.acquire('http', 'host1', 8080, 'queue2')
+    self.assertTrue(reused)
+    pool.release(connection, reusable=True)
+    self.assertFalse(queue_active.locked())
+    pool.release(second, reusable=True)
+
+  def test_unsupported_scheme(self):
+    pool = ConnectionPool()
+    self.assertRaises(ValueError, pool.acquire, 'ftp', 'host1', 21)
+
+
+class TestDeliveryStats(unittest.TestCase):
+  def test_summary(self):
+    logger = MagicMock()
+    stats = DeliveryStats(logger)
+    for latency in [1, 2, 3, 4, 20, 20, 20, 20, 20, 40000]:
+      stats.record('queue1', latency)
+
+    stats.log_summary()
+    message = logger.info.call_args[0][0]
+    self.assertIn('queue1: 10 requests', message)
+    self.assertIn('p50 <= 21 ms', message)
+
+    # The buckets can be merged with other service_stats histograms.
+    buckets = json.loads(message.split('buckets: ', 1)[1])
+    merged = metrics.merge_histograms([buckets, {'20': 1}])
+    self.assertEqual(merged[metrics.bucket_of(20)], 6)
+    self.assertEqual(sum(merged.values()), 11)
+
+    # Each summary starts over.
+    stats.log_summary()
+    self.assertEqual(logger.info.call_count, 1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+import unittest
+
+from collections import namedtuple
+
+from mock import MagicMock, patch
+
+from appscale.taskqueue import lease_index as lease_index_module
+from appscale.taskqueue import queue as queue_module
+from appscale.taskqueue.lease_index import LeaseIndex
+from appscale.taskqueue.lease_index import LeaseIndexStats
+from appscale.taskqueue.queue import PullQueue
+
+Row = namedtuple('Row', ['eta', 'id', 'tag'])
+
+
+def fake_query(rows, query, parameters):
+  """ Returns the rows a scan would find, as the index table would. """
+  start = (parameters['start_eta'], parameters['start_id'])
+  if ') >=' in query:
+    found = [row for row in sorted(rows) if (row.eta, row.id) >= start]
+  else:
+    found = [row for row in sorted(rows) if (row.eta, row.id) > start]
+
+  return FakeFuture(found)
+
+
+class FakeFuture(object):
+  """ A future that has already completed. """
+  def __init__(self, rows):
+    self.rows = rows
+
+  def add_callbacks(self, callback, callback_args=(), errback=None):
+    callback(self.rows, *callback_args)
+
+
+class TestLeaseIndex(unittest.TestCase):
+  def setUp(self):
+    self.rows = []
+    self.session = MagicMock()
+    self.session.execute_async.side_effect = \
+      lambda query, parameters: fake_query(self.rows, query, parameters)
+    self.stats = LeaseIndexStats('queue1')
+
+  def test_claims_in_eta_order(self):
+    self.rows = [Row(3, 'task3', None), Row(1, 'task1', None),
+                 Row(2, 'task2', None)]
+    lease_index = LeaseIndex(self.session, 'app1', 'queue1', self.stats)
+
+    claimed = lease_index.claim(2)
+    self.assertListEqual([entry.id for entry in claimed], ['task1', 'task2'])
+    self.assertEqual(self.stats.summary()['misses'], 1)
+
+  def test_entries_are_claimed_once(self):
+    self.rows = [Row(1, 'task1', None), Row(2, 'task2', None)]
+    lease_index = LeaseIndex(self.session, 'app1', 'queue1', self.stats)
+
+    first = lease_index.claim(1)
+    second = lease_index.claim(1)
+    self.assertEqual(first[0].id, 'task1')
+    self.assertEqual(second[0].id, 'task2')
+    self.assertEqual(self.stats.summary()['hits'], 1)
+
+  def test_empty_results_cooldown(self):
+    lease_index = LeaseIndex(self.session, 'app1', 'queue1', self.stats)
+
+    self.assertListEqual(lease_index.claim(1), [])
+    self.assertEqual(self.session.execute_async.call_count, 1)
+
+    # Claims right after an empty scan should not scan again.
+    self.rows = [Row(1, 'task1', None)]
+    self.assertListEqual(lease_index.claim(1), [])
+    self.assertEqual(self.session.execute_async.call_count, 1)
+
+  def test_tag_index_query(self):
+    lease_index = LeaseIndex(self.session, 'app1', 'queue1', self.stats,
+                             tag='tag1')
+    lease_index.claim(1)
+
+    query, parameters = self.session.execute_async.call_args[0]
+    self.assertIn('pull_queue_tags_index', query)
+    self.assertEqual(parameters['tag'], 'tag1')
+
+
+class TestLeaseIndexEviction(unittest.TestCase):
+  def setUp(self):
+    session = MagicMock()
+    session.execute_async.side_effect = \
+      lambda query, parameters: fake_query([], query, parameters)
+    self.queue = PullQueue({'name': 'queue1', 'mode': 'pull'}, 'app1',
+                           MagicMock(session=session))
+    self._time_patcher = patch.object(queue_module, 'time')
+    self.time_mock = self._time_patcher.start()
+    self._index_time_patcher = patch.object(lease_index_module, 'time',
+                                            self.time_mock)
+    self._index_time_patcher.start()
+    self.time_mock.time.return_value = 1000
+
+  def tearDown(self):
+    self._index_time_patcher.stop()
+    self._time_patcher.stop()
+
+  def claim(self, tag):
+    self.queue._query_available_tasks(1, True, tag)
+
+  def test_idle_tags(self):
+    self.claim('tag1')
+    self.claim('tag2')
+    self.time_mock.time.return_value += LeaseIndex.FULL_SCAN_INTERVAL
+    self.claim('tag2')
+    self.time_mock.time.return_value += 1
+
+    # Creating an index drops the ones that have been idle too long.
+    self.claim('tag3')
+    self.assertEqual(sorted(self.queue.lease_indexes), ['tag2', 'tag3'])
+
+  @patch.object(PullQueue, 'MAX_LEASE_INDEXES', 2)
+  def test_tag_limit(self):
+    for tag in ('tag1', 'tag2'):
+      self.claim(tag)
+      self.time_mock.time.return_value += 1
+
+    self.claim('tag1')
+    self.time_mock.time.return_value += 1
+
+    # The least recently used index makes room for the new one.
+    self.claim('tag3')
+    self.assertEqual(sorted(self.queue.lease_indexes), ['tag1', 'tag3'])
+
+
+class TestLeaseIndexStats(unittest.TestCase):
+  def test_rates(self):
+    stats = LeaseIndexStats('queue1')
+    stats.record(hits=3, misses=1)
+    stats.record(attempts=10, stale=2, contended=1)
+
+    summary = stats.summary()
+    self.assertEqual(summary['hit_rate'], 0.75)
+    self.assertEqual(summary['stale_rate'], 0.2)
+    self.assertEqual(summary['contention_rate'], 0.1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+import threading
+import unittest
+
+import psycopg2
+from mock import MagicMock, patch
+
+from appscale.taskqueue import pg_connection_wrapper
+from appscale.taskqueue.pg_connection_wrapper import (
+  PostgresConnectionWrapper, PreparedStatement)
+
+
+def make_connection():
+  """ Creates a fake psycopg2 connection. """
+  connection = MagicMock(closed=False)
+
+  def close():
+    connection.closed = True
+
+  connection.close.side_effect = close
+  return connection
+
+
+class TestPostgresConnectionWrapper(unittest.TestCase):
+  def setUp(self):
+    self.connections = []
+
+    def connect(*args, **kwargs):
+      connection = make_connection()
+      self.connections.append(connection)
+      return connection
+
+    self._connect_patcher = patch.object(psycopg2, 'connect',
+                                         side_effect=connect)
+    self._connect_patcher.start()
+    self._time_patcher = patch.object(pg_connection_wrapper, 'time')
+    self.time_mock = self._time_patcher.start()
+    self.time_mock.time.return_value = 1000
+
+  def tearDown(self):
+    self._time_patcher.stop()
+    self._connect_patcher.stop()
+
+  def test_reuse(self):
+    wrapper = PostgresConnectionWrapper(dsn='', max_connections=2)
+    with wrapper.get_connection() as connection:
+      first = connection
+
+    with wrapper.get_connection() as connection:
+      self.assertIs(connection, first)
+
+    self.assertEqual(len(self.connections), 1)
+
+  def test_exhaustion(self):
+    wrapper = PostgresConnectionWrapper(dsn='', max_connections=1)
+    checked_out = threading.Event()
+    release = threading.Event()
+
+    def hold_connection():
+      with wrapper.get_connection():
+        checked_out.set()
+        release.wait()
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    checked_out.wait()
+
+    acquired = threading.Event()
+
+    def get_connection():
+      with wrapper.get_connection():
+        acquired.set()
+
+    waiter = threading.Thread(target=get_connection)
+    waiter.start()
+
+    # The second caller waits until the only connection is returned.
+    self.assertFalse(acquired.wait(0.1))
+    release.set()
+    self.assertTrue(acquired.wait(5))
+    holder.join()
+    waiter.join()
+    self.assertEqual(len(self.connections), 1)
+
+  def test_reconnect_after_failed_health_check(self):
+    wrapper = PostgresConnectionWrapper(dsn='', max_connections=1)
+    with wrapper.get_connection():
+      pass
+
+    # Recently used connections are not checked.
+    with wrapper.get_connection():
+      pass
+
+    self.assertEqual(len(self.connections), 1)
+    broken = self.connections[0]
+    broken.cursor.return_value.__enter__.return_value.execute.side_effect = \
+      psycopg2.OperationalError()
+
+    self.time_mock.time.return_value += \
+      PostgresConnectionWrapper.IDLE_CHECK_INTERVAL + 1
+    with wrapper.get_connection() as connection:
+      self.assertIsNot(connection, broken)
+
+    self.assertTrue(broken.closed)
+    self.assertEqual(len(self.connections), 2)
+
+  def test_prepare_on_each_connection(self):
+    wrapper = PostgresConnectionWrapper(dsn='', max_connections=1)
+    statement = PreparedStatement('SELECT $1', ('int',))
+    with wrapper.get_connection() as connection:
+      pg_cursor = MagicMock(connection=connection)
+      wrapper.execute(pg_cursor, statement, (1,))
+      wrapper.execute(pg_cursor, statement, (2,))
+
+    self.assertEqual(
+      [call[0][0] for call in pg_cursor.execute.call_args_list],
+      [statement.prepare_sql, statement.execute_sql, statement.execute_sql])
+
+    # A new connection does not have the statement yet.
+    connection.closed = True
+    with wrapper.get_connection() as new_connection:
+      self.assertIsNot(new_connection, connection)
+      pg_cursor = MagicMock(connection=new_connection)
+      wrapper.execute(pg_cursor, statement, (3,))
+
+    self.assertEqual(
+      [call[0][0] for call in pg_cursor.execute.call_args_list],
+      [statement.prepare_sql, statement.execute_sql])
+
+  def test_close(self):
+    wrapper = PostgresConnectionWrapper(dsn='', max_connections=2)
+    statement = PreparedStatement('SELECT 1')
+    with wrapper.get_connection() as in_use:
+      with wrapper.get_connection() as idle:
+        pass
+
+      wrapper.close()
+      self.assertTrue(idle.closed)
+      self.assertFalse(in_use.closed)
+
+      # Connections that are in use can still run statements.
+      wrapper.execute(MagicMock(connection=in_use), statement)
+
+    self.assertTrue(in_use.closed)
+
+
+if __name__ == "__main__":
+  unittest.main()
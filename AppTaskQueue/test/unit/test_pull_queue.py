@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+import unittest
+
+from cassandra import OperationTimedOut
+from mock import MagicMock, patch
+
+from appscale.taskqueue import queue as queue_module
+from appscale.taskqueue.queue import PullQueue
+from appscale.taskqueue.queue import TransientError
+from appscale.taskqueue.task import InvalidTaskInfo
+from appscale.taskqueue.task import Task
+
+
+class TestPullQueueAddTasks(unittest.TestCase):
+  def setUp(self):
+    self.session = MagicMock()
+    db_access = MagicMock(session=self.session)
+    self.queue = PullQueue({'name': 'queue1', 'mode': 'pull'}, 'app1',
+                           db_access)
+    self.tasks = [Task({'id': 'task{}'.format(index), 'payloadBase64': 'MQ=='})
+                  for index in range(3)]
+
+  @staticmethod
+  def indexed_ids(index_statements):
+    return [parameters['id'] for _, parameters in index_statements]
+
+  def test_add_tasks(self):
+    inserted = MagicMock(was_applied=True)
+    with patch.object(queue_module, 'execute_concurrent_with_args',
+                      return_value=[(True, inserted)] * 3), \
+         patch.object(queue_module, 'execute_concurrent',
+                      return_value=[(True, None)] * 6) as index_mock:
+      errors = self.queue.add_tasks(self.tasks)
+
+    self.assertEqual(errors, [None, None, None])
+    index_statements = index_mock.call_args[0][1]
+    self.assertEqual(self.indexed_ids(index_statements),
+                     ['task0', 'task0', 'task1', 'task1', 'task2', 'task2'])
+    self.assertEqual(index_mock.call_args[1], {'raise_on_first_error': False})
+
+  def test_insert_errors(self):
+    inserted = MagicMock(was_applied=True)
+    insert_results = [(False, ValueError('bad row')),
+                      (True, inserted),
+                      (False, OperationTimedOut())]
+    with patch.object(queue_module, 'execute_concurrent_with_args',
+                      return_value=insert_results), \
+         patch.object(queue_module, 'execute_concurrent',
+                      return_value=[(True, None)] * 2) as index_mock, \
+         patch.object(PullQueue, '_check_insert'):
+      errors = self.queue.add_tasks(self.tasks, retries=1)
+
+    # Failed inserts are reported for each task instead of raised.
+    self.assertIsInstance(errors[0], TransientError)
+    self.assertIsNone(errors[1])
+    self.assertIsInstance(errors[2], TransientError)
+
+    # The task that was inserted is still indexed.
+    index_statements = index_mock.call_args[0][1]
+    self.assertEqual(self.indexed_ids(index_statements), ['task1', 'task1'])
+
+  def test_existing_task(self):
+    inserted = MagicMock(was_applied=True)
+    not_applied = MagicMock(was_applied=False)
+    insert_results = [(True, inserted), (True, not_applied), (True, inserted)]
+    with patch.object(queue_module, 'execute_concurrent_with_args',
+                      return_value=insert_results), \
+         patch.object(queue_module, 'execute_concurrent',
+                      return_value=[(True, None)] * 4) as index_mock, \
+         patch.object(PullQueue, '_check_insert',
+                      side_effect=InvalidTaskInfo('Task name already taken')):
+      errors = self.queue.add_tasks(self.tasks)
+
+    self.assertIsNone(errors[0])
+    self.assertIsInstance(errors[1], InvalidTaskInfo)
+    self.assertIsNone(errors[2])
+    index_statements = index_mock.call_args[0][1]
+    self.assertEqual(self.indexed_ids(index_statements),
+                     ['task0', 'task0', 'task2', 'task2'])
+
+  def test_index_errors(self):
+    inserted = MagicMock(was_applied=True)
+    index_results = [(True, None), (True, None),
+                     (False, OperationTimedOut()), (True, None),
+                     (True, None), (False, OperationTimedOut())]
+    # The retried index entry for task1 fails again, and the one for task2
+    # is written.
+    self.session.execute.side_effect = [OperationTimedOut(), None]
+    with patch.object(queue_module, 'execute_concurrent_with_args',
+                      return_value=[(True, inserted)] * 3), \
+         patch.object(queue_module, 'execute_concurrent',
+                      return_value=index_results):
+      errors = self.queue.add_tasks(self.tasks, retries=2)
+
+    self.assertIsNone(errors[0])
+    self.assertIsInstance(errors[1], TransientError)
+    self.assertIsNone(errors[2])
+    self.assertEqual(self.session.execute.call_count, 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -4,6 +4,7 @@ import json
 
 from appscale.common.service_stats import stats_manager
 from mock import mock, patch
+from tornado import gen
 from tornado.testing import AsyncHTTPTestCase
 
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
@@ -23,7 +24,7 @@ class TestServiceStatistics(AsyncHTTPTestCase):
     # We mock functionality which uses distributed taskqueue so can omit it
     distributed_taskqueue = None
     return appscale_taskqueue.prepare_taskqueue_application(
-      task_queue=distributed_taskqueue
+      task_queue=distributed_taskqueue, thread_pool=None
     )
 
   def setUp(self):
@@ -51,10 +52,12 @@ class TestServiceStatistics(AsyncHTTPTestCase):
         self.patchers.append(patcher)
 
     # Patch remote_request method of protobuffer handler
+    self.pb_remote_request_mock = mock.MagicMock()
     remote_request_patcher = patch.object(
-      appscale_taskqueue.ProtobufferHandler, 'remote_request'
+      appscale_taskqueue.ProtobufferHandler, 'remote_request',
+      lambda *args: gen.maybe_future(self.pb_remote_request_mock(*args))
     )
-    self.pb_remote_request_mock = remote_request_patcher.start()
+    remote_request_patcher.start()
     self.patchers.append(remote_request_patcher)
 
     time_patcher = patch.object(stats_manager.time, 'time')
@@ -153,6 +156,8 @@ class TestServiceStatistics(AsyncHTTPTestCase):
        'failed': 5,
        'pb_reqs': 6,
        'rest_reqs': 9,
+       # Time is mocked, so every request falls into the first bucket.
+       'latency_histogram': {'0': 15},
        'by_rest_method': {
          'get_task': 2,
          'get_tasks': 1,
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+import calendar
+import datetime
+import os
+import unittest
+
+from mock import MagicMock, patch
+from appscale.common import file_io
+
+from appscale.taskqueue import distributed_tq
+from appscale.taskqueue.task_name import (MAX_PENDING_TASK_NAMES,
+                                          RecentTaskNames, TaskName,
+                                          TOMBSTONE_DURATION)
+from appscale.taskqueue.tq_lib import TASK_STATES
+
+from google.appengine.api import datastore_errors
+from google.appengine.api.taskqueue import taskqueue_service_pb
+from google.appengine.runtime import apiproxy_errors
+
+TaskQueueServiceError = taskqueue_service_pb.TaskQueueServiceError
+
+NOW = datetime.datetime(2018, 1, 1)
+
+
+def make_item(task_name, timestamp=NOW, eta=NOW, state=TASK_STATES.QUEUED):
+  """ Creates a TaskName without storing it. """
+  return TaskName(key_name=task_name, state=state, queue='queue1',
+                  app_id='app1', timestamp=timestamp, eta=eta)
+
+
+def make_request(task_name, eta):
+  """ Creates a push task request. """
+  request = taskqueue_service_pb.TaskQueueAddRequest()
+  request.set_app_id('app1')
+  request.set_queue_name('queue1')
+  request.set_task_name(task_name)
+  request.set_eta_usec(calendar.timegm(eta.timetuple()) * 1000000)
+  return request
+
+
+class TestRecentTaskNames(unittest.TestCase):
+  def setUp(self):
+    self._environ_patcher = patch.dict(os.environ, {'APPLICATION_ID': 'app1'})
+    self._environ_patcher.start()
+
+  def tearDown(self):
+    self._environ_patcher.stop()
+
+  def test_get(self):
+    recent_names = RecentTaskNames()
+    item = make_item('task1')
+    recent_names.add([item])
+    self.assertIs(recent_names.get('task1', NOW), item)
+    self.assertIsNone(recent_names.get('task2', NOW))
+
+  def test_tombstone_expiry(self):
+    recent_names = RecentTaskNames()
+    recent_names.add([make_item('task1')])
+    almost_expired = NOW + TOMBSTONE_DURATION - datetime.timedelta(seconds=1)
+    self.assertIsNotNone(recent_names.get('task1', almost_expired))
+    self.assertIsNone(recent_names.get('task1', NOW + TOMBSTONE_DURATION))
+
+    # Expired names are removed from the cache.
+    self.assertIsNone(recent_names.get('task1', NOW))
+
+  @patch.object(RecentTaskNames, 'MAX_SIZE', 2)
+  def test_eviction(self):
+    recent_names = RecentTaskNames()
+    recent_names.add([make_item('task1'), make_item('task2')])
+
+    # Adding a name again makes it the most recent one.
+    recent_names.add([make_item('task1')])
+    recent_names.add([make_item('task3')])
+    self.assertIsNotNone(recent_names.get('task1', NOW))
+    self.assertIsNone(recent_names.get('task2', NOW))
+    self.assertIsNotNone(recent_names.get('task3', NOW))
+
+
+class TestCheckAndStoreTaskNames(unittest.TestCase):
+  def setUp(self):
+    self._environ_patcher = patch.dict(os.environ, {'APPLICATION_ID': 'app1'})
+    self._environ_patcher.start()
+    self._get_patcher = patch.object(TaskName, 'get_by_key_name')
+    self.get_mock = self._get_patcher.start()
+    self._put_patcher = patch.object(distributed_tq.db, 'put')
+    self.put_mock = self._put_patcher.start()
+    self._datetime_patcher = patch.object(distributed_tq, 'datetime')
+    datetime_mock = self._datetime_patcher.start()
+    datetime_mock.datetime.utcnow.return_value = NOW
+    datetime_mock.datetime.utcfromtimestamp = \
+      datetime.datetime.utcfromtimestamp
+    self._read_patcher = patch.object(
+      file_io, 'read', return_value='192.168.0.1')
+    self._read_patcher.start()
+
+    self.tq = distributed_tq.DistributedTaskQueue(MagicMock(), MagicMock())
+    self.check_and_store = \
+      self.tq._DistributedTaskQueue__check_and_store_task_names
+
+  def tearDown(self):
+    self._read_patcher.stop()
+    self._datetime_patcher.stop()
+    self._put_patcher.stop()
+    self._get_patcher.stop()
+    self._environ_patcher.stop()
+
+  def test_new_names(self):
+    self.get_mock.return_value = [None, None]
+    eta = NOW + datetime.timedelta(hours=1)
+    requests = [make_request('task1', eta), make_request('task2', eta)]
+    self.assertEqual(self.check_and_store(requests), [None, None])
+
+    # The names are fetched and stored in one batch each.
+    self.assertEqual(sorted(self.get_mock.call_args[0][0]), ['task1', 'task2'])
+    stored = self.put_mock.call_args[0][0]
+    self.assertEqual(sorted(item.key().name() for item in stored),
+                     ['task1', 'task2'])
+
+    # Stored names are rejected without another datastore lookup.
+    self.assertEqual(self.check_and_store([make_request('task1', eta)]),
+                     [TaskQueueServiceError.TASK_ALREADY_EXISTS])
+    self.assertEqual(self.get_mock.call_count, 1)
+
+  def test_duplicates_in_batch(self):
+    self.get_mock.return_value = [None]
+    requests = [make_request('task1', NOW), make_request('task1', NOW)]
+    self.assertEqual(self.check_and_store(requests),
+                     [None, TaskQueueServiceError.TASK_ALREADY_EXISTS])
+    self.get_mock.assert_called_once_with(['task1'])
+    self.assertEqual(len(self.put_mock.call_args[0][0]), 1)
+
+  def test_taken_names(self):
+    future = NOW + datetime.timedelta(hours=1)
+    past = NOW - datetime.timedelta(hours=1)
+    expired = NOW - TOMBSTONE_DURATION
+    items = {
+      'pending': make_item('pending', eta=future),
+      'ran': make_item('ran', timestamp=past, eta=past),
+      'finished': make_item('finished', eta=future, state=TASK_STATES.SUCCESS),
+      'expired': make_item('expired', timestamp=expired, eta=expired)}
+    self.get_mock.side_effect = \
+      lambda task_names: [items[task_name] for task_name in task_names]
+    requests = [make_request(task_name, NOW)
+                for task_name in ('pending', 'ran', 'finished', 'expired')]
+    self.assertEqual(self.check_and_store(requests),
+                     [TaskQueueServiceError.TASK_ALREADY_EXISTS,
+                      TaskQueueServiceError.TOMBSTONED_TASK,
+                      TaskQueueServiceError.TOMBSTONED_TASK,
+                      None])
+
+    # Only the expired name is stored again.
+    stored = self.put_mock.call_args[0][0]
+    self.assertEqual([item.key().name() for item in stored], ['expired'])
+
+  def test_datastore_errors(self):
+    requests = [make_request('task1', NOW)]
+    self.get_mock.side_effect = datastore_errors.Timeout()
+    with self.assertRaises(apiproxy_errors.ApplicationError) as context:
+      self.check_and_store(requests)
+
+    self.assertEqual(context.exception.application_error,
+                     TaskQueueServiceError.DATASTORE_ERROR)
+
+    self.get_mock.side_effect = None
+    self.get_mock.return_value = [None]
+    self.put_mock.side_effect = datastore_errors.Timeout()
+    with self.assertRaises(apiproxy_errors.ApplicationError) as context:
+      self.check_and_store(requests)
+
+    self.assertEqual(context.exception.application_error,
+                     TaskQueueServiceError.DATASTORE_ERROR)
+
+  def test_push_queue_stats(self):
+    future = NOW + datetime.timedelta(hours=1)
+    later = NOW + datetime.timedelta(hours=2)
+    other_queue = make_item('other', eta=future)
+    other_queue.queue = 'queue2'
+    query = MagicMock()
+    query.filter.return_value = query
+    query.order.return_value = query
+    # The datastore returns pending names in ETA order.
+    query.run.return_value = [make_item('pending', eta=future), other_queue,
+                              make_item('later', eta=later)]
+    with patch.object(TaskName, 'all', return_value=query):
+      stats = self.tq._DistributedTaskQueue__push_queue_stats(
+        'app1', 'queue1')
+
+    # Names whose ETA has passed are filtered out by the datastore.
+    query.filter.assert_called_once_with('eta >', NOW)
+    query.order.assert_called_once_with('eta')
+    self.assertEqual(query.run.call_args[1]['limit'], MAX_PENDING_TASK_NAMES)
+    self.assertEqual(stats, (2, future))
+
+
+if __name__ == "__main__":
+  unittest.main()
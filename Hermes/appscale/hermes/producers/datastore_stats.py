@@ -0,0 +1,329 @@
+""" Fetches datastore service statistics. """
+import collections
+import json
+import logging
+import socket
+import sys
+import time
+
+import attr
+from tornado import gen, httpclient
+
+from appscale.common.service_stats import metrics
+from appscale.hermes.converter import include_list_name, Meta
+from appscale.hermes.producers import proxy_stats
+
+# The endpoint used for retrieving datastore server stats.
+STATS_ENDPOINT = '/service-stats'
+
+# The HAProxy proxy that routes requests to datastore servers.
+DATASTORE_PROXY = 'appscale-datastore_server'
+
+logger = logging.getLogger(__name__)
+
+
+class BadDatastoreStatsFormat(ValueError):
+  pass
+
+
+@include_list_name('datastore.cumulative')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class CumulativeStatsSnapshot(object):
+  """ Cumulative counters reported for each datastore server. """
+  total = attr.ib()
+  failed = attr.ib()
+
+
+@include_list_name('datastore.strategy')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class StrategyStatsSnapshot(object):
+  """ Recent stats of queries that were run with the same strategy. """
+  total = attr.ib()
+  avg_rows_scanned = attr.ib()
+  avg_rows_returned = attr.ib()
+  latency_histogram = attr.ib()
+  p95_latency = attr.ib()
+
+
+@include_list_name('datastore.recent')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class RecentStatsSnapshot(object):
+  """ Recent stats reported for each datastore server. """
+  total = attr.ib()
+  failed = attr.ib()
+  avg_latency = attr.ib()
+  by_method = attr.ib()
+  by_status = attr.ib()
+  by_strategy = attr.ib(metadata={Meta.ENTITY_DICT: StrategyStatsSnapshot})
+  latency_histogram = attr.ib()
+  p50_latency = attr.ib()
+  p95_latency = attr.ib()
+  p99_latency = attr.ib()
+  lock_time_histogram = attr.ib()
+  p95_lock_time = attr.ib()
+  db_time_histogram = attr.ib()
+  p95_db_time = attr.ib()
+
+
+@include_list_name('datastore.instance')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class InstanceStatsSnapshot(object):
+  """ Stats reported for each datastore server. """
+  ip_port = attr.ib()
+  start_timestamp_ms = attr.ib()
+  current_requests = attr.ib()
+  cumulative = attr.ib(metadata={Meta.ENTITY: CumulativeStatsSnapshot})
+  recent = attr.ib(metadata={Meta.ENTITY: RecentStatsSnapshot})
+
+
+@include_list_name('datastore.failure')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class FailureSnapshot(object):
+  """ Failure reported for a datastore server. """
+  ip_port = attr.ib()
+  error = attr.ib()
+
+
+@include_list_name('datastore')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class DatastoreServiceStatsSnapshot(object):
+  """ Stats reported for datastore service. """
+  utc_timestamp = attr.ib()
+  current_requests = attr.ib()
+  cumulative = attr.ib(metadata={Meta.ENTITY: CumulativeStatsSnapshot})
+  recent = attr.ib(metadata={Meta.ENTITY: RecentStatsSnapshot})
+  instances = attr.ib(metadata={Meta.ENTITY_LIST: InstanceStatsSnapshot})
+  instances_count = attr.ib()
+  failures = attr.ib(metadata={Meta.ENTITY_LIST: FailureSnapshot})
+
+
+def _merge(histograms):
+  """ Merges histograms, skipping the ones that are missing.
+
+  Args:
+    histograms: a list of dicts mapping histogram bucket to count or None.
+  Returns:
+    a dict mapping integer bucket to count.
+  """
+  return metrics.merge_histograms(
+    [histogram for histogram in histograms if histogram is not None])
+
+
+def _strategy_stats(total, rows_scanned, rows_returned, latency_histogram):
+  """ Prepares StrategyStatsSnapshot from totals.
+
+  Args:
+    total: an integer specifying the number of queries.
+    rows_scanned: an integer specifying the rows scanned by all queries.
+    rows_returned: an integer specifying the rows returned by all queries.
+    latency_histogram: a dict mapping histogram bucket to count.
+  Returns:
+    a StrategyStatsSnapshot.
+  """
+  return StrategyStatsSnapshot(
+    total=total,
+    avg_rows_scanned=rows_scanned / total if total else None,
+    avg_rows_returned=rows_returned / total if total else None,
+    latency_histogram=latency_histogram,
+    p95_latency=metrics.histogram_percentile(latency_histogram, 95)
+  )
+
+
+def _recent_stats(total, failed, avg_latency, by_method, by_status,
+                  by_strategy, latency_histogram, lock_time_histogram,
+                  db_time_histogram):
+  """ Prepares RecentStatsSnapshot and computes its percentiles.
+
+  Args:
+    The fields of RecentStatsSnapshot that are not percentiles.
+  Returns:
+    a RecentStatsSnapshot.
+  """
+  return RecentStatsSnapshot(
+    total=total,
+    failed=failed,
+    avg_latency=avg_latency,
+    by_method=by_method,
+    by_status=by_status,
+    by_strategy=by_strategy,
+    latency_histogram=latency_histogram,
+    p50_latency=metrics.histogram_percentile(latency_histogram, 50),
+    p95_latency=metrics.histogram_percentile(latency_histogram, 95),
+    p99_latency=metrics.histogram_percentile(latency_histogram, 99),
+    lock_time_histogram=lock_time_histogram,
+    p95_lock_time=metrics.histogram_percentile(lock_time_histogram, 95),
+    db_time_histogram=db_time_histogram,
+    p95_db_time=metrics.histogram_percentile(db_time_histogram, 95)
+  )
+
+
+class DatastoreStatsSource(object):
+
+  IGNORE_RECENT_OLDER_THAN = 5*60*1000  # 5 minutes
+  REQUEST_TIMEOUT = 10  # Wait up to 10 seconds
+
+  @gen.coroutine
+  def fetch_stats_from_instance(self, ip_port):
+    url = "http://{ip_port}{path}?last_milliseconds={max_age}".format(
+      ip_port=ip_port, path=STATS_ENDPOINT,
+      max_age=self.IGNORE_RECENT_OLDER_THAN
+    )
+    request = httpclient.HTTPRequest(
+      url=url, method='GET', request_timeout=self.REQUEST_TIMEOUT
+    )
+    async_client = httpclient.AsyncHTTPClient()
+
+    try:
+      response = yield async_client.fetch(request)
+    except (socket.error, httpclient.HTTPError) as err:
+      msg = u"Failed to get stats from {url} ({err})".format(url=url, err=err)
+      if hasattr(err, 'response') and err.response and err.response.body:
+        msg += u"\nBODY: {body}".format(body=err.response.body)
+      logger.error(msg)
+      failure = FailureSnapshot(ip_port=ip_port, error=unicode(err))
+      raise gen.Return(failure)
+
+    try:
+      stats_body = json.loads(response.body)
+      cumulative_dict = stats_body["cumulative_counters"]
+      recent_dict = stats_body["recent_stats"]
+      cumulative = CumulativeStatsSnapshot(
+        total=cumulative_dict["all"],
+        failed=cumulative_dict["failed"]
+      )
+      # Servers omit categories that have no requests yet.
+      by_method = {
+        method: method_stats["all"]
+        for method, method_stats in recent_dict.get("by_method", {}).items()
+      }
+      by_strategy = {
+        strategy: StrategyStatsSnapshot(
+          total=strategy_stats["all"],
+          avg_rows_scanned=strategy_stats["avg_rows_scanned"],
+          avg_rows_returned=strategy_stats["avg_rows_returned"],
+          latency_histogram=_merge([strategy_stats["latency_histogram"]]),
+          p95_latency=metrics.histogram_percentile(
+            strategy_stats["latency_histogram"], 95)
+        )
+        for strategy, strategy_stats
+        in recent_dict.get("by_strategy", {}).items()
+      }
+      recent = _recent_stats(
+        total=recent_dict["all"],
+        failed=recent_dict["failed"],
+        avg_latency=recent_dict["avg_latency"],
+        by_method=by_method,
+        by_status=recent_dict.get("by_status", {}),
+        by_strategy=by_strategy,
+        latency_histogram=_merge([recent_dict["latency_histogram"]]),
+        lock_time_histogram=_merge([recent_dict["lock_time_histogram"]]),
+        db_time_histogram=_merge([recent_dict["db_time_histogram"]])
+      )
+      instance_stats_snapshot = InstanceStatsSnapshot(
+        ip_port=ip_port,
+        start_timestamp_ms=cumulative_dict["from"],
+        current_requests=stats_body["current_requests"],
+        cumulative=cumulative,
+        recent=recent,
+      )
+      raise gen.Return(instance_stats_snapshot)
+    except (TypeError, KeyError) as err:
+      msg = u"Can't parse datastore stats ({})".format(err)
+      raise BadDatastoreStatsFormat(msg), None, sys.exc_info()[2]
+
+  @staticmethod
+  def summarise_cumulative(instances_stats):
+    cumulative_stats = [server.cumulative for server in instances_stats]
+    return CumulativeStatsSnapshot(
+      total=sum(cumulative.total for cumulative in cumulative_stats),
+      failed=sum(cumulative.failed for cumulative in cumulative_stats),
+    )
+
+  @staticmethod
+  def summarise_recent(instances_stats):
+    recent_stats = [server.recent for server in instances_stats]
+    weighted_avg_latency_sum = sum(
+      recent.avg_latency * recent.total for recent in recent_stats
+      if recent.avg_latency is not None
+    )
+    total_recent_reqs = sum(recent.total for recent in recent_stats)
+    by_method_sum = collections.defaultdict(int)
+    by_status_sum = collections.defaultdict(int)
+    strategy_stats = collections.defaultdict(list)
+    for recent in recent_stats:
+      for method, calls in recent.by_method.iteritems():
+        by_method_sum[method] += calls
+      for status, calls in recent.by_status.iteritems():
+        by_status_sum[status] += calls
+      for strategy, stats in recent.by_strategy.iteritems():
+        strategy_stats[strategy].append(stats)
+
+    # Averages are weighted by the number of queries each server ran.
+    by_strategy = {
+      strategy: _strategy_stats(
+        total=sum(stats.total for stats in stats_list),
+        rows_scanned=sum(stats.avg_rows_scanned * stats.total
+                         for stats in stats_list
+                         if stats.avg_rows_scanned is not None),
+        rows_returned=sum(stats.avg_rows_returned * stats.total
+                          for stats in stats_list
+                          if stats.avg_rows_returned is not None),
+        latency_histogram=_merge(
+          [stats.latency_histogram for stats in stats_list])
+      )
+      for strategy, stats_list in strategy_stats.iteritems()
+    }
+    # Histograms are mergeable, so percentiles are cluster-wide
+    return _recent_stats(
+      total=total_recent_reqs,
+      failed=sum(recent.failed for recent in recent_stats),
+      avg_latency=(weighted_avg_latency_sum / total_recent_reqs)
+                  if total_recent_reqs else None,
+      by_method=by_method_sum,
+      by_status=by_status_sum,
+      by_strategy=by_strategy,
+      latency_histogram=_merge(
+        [recent.latency_histogram for recent in recent_stats]),
+      lock_time_histogram=_merge(
+        [recent.lock_time_histogram for recent in recent_stats]),
+      db_time_histogram=_merge(
+        [recent.db_time_histogram for recent in recent_stats])
+    )
+
+  @gen.coroutine
+  def get_current(self):
+    start_time = time.time()
+    # Find all datastore servers
+    datastore_instances = proxy_stats.get_service_instances(
+      proxy_stats.HAPROXY_SERVICES_STATS_SOCKET_PATH, DATASTORE_PROXY
+    )
+    instances_responses = yield [
+      self.fetch_stats_from_instance(ip_port)
+      for ip_port in datastore_instances
+    ]
+    instances_stats = [
+      stats_or_err for stats_or_err in instances_responses
+      if isinstance(stats_or_err, InstanceStatsSnapshot)
+    ]
+    failures = [
+      stats_or_err for stats_or_err in instances_responses
+      if isinstance(stats_or_err, FailureSnapshot)
+    ]
+    stats = DatastoreServiceStatsSnapshot(
+      utc_timestamp=int(time.time()),
+      current_requests=sum(server.current_requests
+                           for server in instances_stats),
+      cumulative=self.summarise_cumulative(instances_stats),
+      recent=self.summarise_recent(instances_stats),
+      instances=instances_stats,
+      instances_count=len(instances_stats),
+      failures=failures
+    )
+    logger.info(
+      "Fetched datastore server stats from {nodes} instances in {elapsed:.1f}s."
+      .format(nodes=len(instances_stats), elapsed=time.time() - start_time)
+    )
+    raise gen.Return(stats)
+
+
+datastore_stats_source = DatastoreStatsSource()
@@ -0,0 +1,102 @@
+""" Fetches instance startup statistics from the AppManager. """
+import errno
+import json
+import logging
+import socket
+import sys
+import time
+
+import attr
+from tornado import gen, httpclient
+
+from appscale.common.constants import APP_MANAGER_PORT
+from appscale.common.service_stats import metrics
+from appscale.hermes.converter import include_list_name, Meta
+
+# The endpoint used for retrieving instance startup stats.
+STATS_ENDPOINT = '/service-stats'
+
+logger = logging.getLogger(__name__)
+
+
+class BadStartupStatsFormat(ValueError):
+  pass
+
+
+@include_list_name('instance_startup.version')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class VersionStartupStatsSnapshot(object):
+  """ Startup stats of the instances of a version on a single node. """
+  version_key = attr.ib()
+  started = attr.ib()
+  failed = attr.ib()
+  last_latency = attr.ib()
+  last_start = attr.ib()
+  latency_histogram = attr.ib()
+  p50_latency = attr.ib()
+  p95_latency = attr.ib()
+  p99_latency = attr.ib()
+
+
+@include_list_name('instance_startup')
+@attr.s(cmp=False, hash=False, slots=True, frozen=True)
+class InstanceStartupStatsSnapshot(object):
+  """ Startup stats of the instances that the AppManager started. """
+  utc_timestamp = attr.ib()
+  versions = attr.ib(metadata={Meta.ENTITY_LIST: VersionStartupStatsSnapshot})
+
+
+class InstanceStartupStatsSource(object):
+  """ Fetches the startup stats that the local AppManager keeps. """
+
+  REQUEST_TIMEOUT = 10  # Wait up to 10 seconds
+
+  @gen.coroutine
+  def get_current(self):
+    """ Fetches startup stats for each version from the AppManager.
+
+    Returns:
+      A Future object which wraps an InstanceStartupStatsSnapshot.
+    """
+    url = "http://127.0.0.1:{port}{path}".format(
+      port=APP_MANAGER_PORT, path=STATS_ENDPOINT)
+    request = httpclient.HTTPRequest(
+      url=url, method='GET', request_timeout=self.REQUEST_TIMEOUT)
+    async_client = httpclient.AsyncHTTPClient()
+
+    try:
+      response = yield async_client.fetch(request)
+    except socket.error as err:
+      if err.errno != errno.ECONNREFUSED:
+        raise
+      # Only compute nodes run the AppManager.
+      logger.debug(u"AppManager is not running at {url}".format(url=url))
+      raise gen.Return(InstanceStartupStatsSnapshot(
+        utc_timestamp=int(time.time()), versions=[]))
+
+    try:
+      versions = json.loads(response.body)['versions']
+      versions_stats = [
+        VersionStartupStatsSnapshot(
+          version_key=version_key,
+          started=version_stats['started'],
+          failed=version_stats['failed'],
+          last_latency=version_stats['last_latency'],
+          last_start=version_stats['last_start'],
+          latency_histogram=metrics.merge_histograms(
+            [version_stats['latency_histogram']]),
+          p50_latency=version_stats['p50_latency'],
+          p95_latency=version_stats['p95_latency'],
+          p99_latency=version_stats['p99_latency']
+        )
+        for version_key, version_stats in versions.iteritems()
+      ]
+    except (TypeError, KeyError, ValueError) as err:
+      msg = u"Can't parse instance startup stats ({})".format(err)
+      raise BadStartupStatsFormat(msg), None, sys.exc_info()[2]
+
+    raise gen.Return(InstanceStartupStatsSnapshot(
+      utc_timestamp=int(time.time()), versions=versions_stats))
+
+
+instance_startup_stats_source = InstanceStartupStatsSource()
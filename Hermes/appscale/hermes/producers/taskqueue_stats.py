@@ -12,6 +12,7 @@ import time
 import socket
 from tornado import gen, httpclient
 
+from appscale.common.service_stats import metrics
 from appscale.hermes.converter import include_list_name, Meta
 
 # The endpoint used for retrieving node stats.
@@ -49,6 +50,11 @@ class RecentStatsSnapshot(object):
   by_rest_method = attr.ib()
   by_pb_status = attr.ib()
   by_rest_status = attr.ib()
+  # Older TaskQueue servers don't report latency histogram
+  latency_histogram = attr.ib(default=None)
+  p50_latency = attr.ib(default=None)
+  p95_latency = attr.ib(default=None)
+  p99_latency = attr.ib(default=None)
 
 
 @include_list_name('taskqueue.instance')
@@ -83,6 +89,24 @@ class TaskqueueServiceStatsSnapshot(object):
   failures = attr.ib(metadata={Meta.ENTITY_LIST: FailureSnapshot})
 
 
+def _latency_percentiles(latency_histogram):
+  """ Prepares latency fields of RecentStatsSnapshot.
+
+  Args:
+    latency_histogram: a dict mapping histogram bucket to count or None.
+  Returns:
+    a dict containing latency histogram and its percentiles.
+  """
+  if latency_histogram is None:
+    return {}
+  return {
+    "latency_histogram": latency_histogram,
+    "p50_latency": metrics.histogram_percentile(latency_histogram, 50),
+    "p95_latency": metrics.histogram_percentile(latency_histogram, 95),
+    "p99_latency": metrics.histogram_percentile(latency_histogram, 99),
+  }
+
+
 class TaskqueueStatsSource(object):
 
   IGNORE_RECENT_OLDER_THAN = 5*60*1000  # 5 minutes
@@ -120,6 +144,9 @@ class TaskqueueStatsSource(object):
         pb_reqs=cumulative_dict["pb_reqs"],
         rest_reqs=cumulative_dict["rest_reqs"]
       )
+      latency_histogram = recent_dict.get("latency_histogram")
+      if latency_histogram is not None:
+        latency_histogram = metrics.merge_histograms([latency_histogram])
       recent = RecentStatsSnapshot(
         total=recent_dict["all"],
         failed=recent_dict["failed"],
@@ -129,7 +156,8 @@ class TaskqueueStatsSource(object):
         by_pb_method=recent_dict["by_pb_method"],
         by_rest_method=recent_dict["by_rest_method"],
         by_pb_status=recent_dict["by_pb_status"],
-        by_rest_status=recent_dict["by_rest_status"]
+        by_rest_status=recent_dict["by_rest_status"],
+        **_latency_percentiles(latency_histogram)
       )
       instance_stats_snapshot = InstanceStatsSnapshot(
         ip_port=ip_port,
@@ -175,6 +203,11 @@ class TaskqueueStatsSource(object):
         by_pb_status_sum[pb_status] += calls
       for rest_status, calls in recent.by_rest_status.iteritems():
         by_rest_status_sum[rest_status] += calls
+    # Histograms are mergeable, so percentiles are cluster-wide
+    histograms = [recent.latency_histogram for recent in recent_stats
+                  if recent.latency_histogram is not None]
+    latency_histogram = (metrics.merge_histograms(histograms)
+                         if histograms else None)
     # Return snapshot
     return RecentStatsSnapshot(
       total=total_recent_reqs,
@@ -186,7 +219,8 @@ class TaskqueueStatsSource(object):
       by_pb_method=by_pb_method_sum,
       by_rest_method=by_rest_method_sum,
       by_pb_status=by_pb_status_sum,
-      by_rest_status=by_rest_status_sum
+      by_rest_status=by_rest_status_sum,
+      **_latency_percentiles(latency_histogram)
     )
 
   @gen.coroutine
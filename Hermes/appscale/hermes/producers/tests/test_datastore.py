@@ -0,0 +1,131 @@
+import json
+import os
+import socket
+
+from mock import patch, mock
+from tornado import testing, gen, httpclient
+
+from appscale.hermes import converter
+from appscale.hermes.producers import datastore_stats, proxy_stats
+
+CUR_DIR = os.path.dirname(os.path.realpath(__file__))
+TEST_DATA_DIR = os.path.join(CUR_DIR, 'test-data')
+
+
+class TestDatastoreStatsSource(testing.AsyncTestCase):
+
+  @patch.object(proxy_stats, 'get_service_instances')
+  @patch.object(datastore_stats.httpclient.AsyncHTTPClient, 'fetch')
+  @testing.gen_test
+  def test_datastore_stats(self, mock_fetch, mock_get_instances):
+    # Read test data from json file
+    test_data_path = os.path.join(TEST_DATA_DIR, 'datastore-stats.json')
+    with open(test_data_path) as json_file:
+      datastore_stats_dict = json.load(json_file)
+
+    # Tell that we have 2 working datastore servers
+    responses = {
+      '10.10.2.5:4000': mock.MagicMock(
+        code=200, reason='OK',
+        body=json.dumps(datastore_stats_dict['10.10.2.5:4000'])
+      ),
+      '10.10.2.6:4000': mock.MagicMock(
+        code=200, reason='OK',
+        body=json.dumps(datastore_stats_dict['10.10.2.6:4000'])
+      ),
+      '10.10.2.7:4000': socket.error("Connection refused")
+    }
+    mock_get_instances.return_value = responses.keys()
+
+    def fetch(request, **kwargs):
+      ip_port = request.url.split('://')[1].split('/')[0]
+      result = responses[ip_port]
+      future_response = gen.Future()
+      if isinstance(result, Exception):
+        future_response.set_exception(result)
+      else:
+        future_response.set_result(result)
+      return future_response
+
+    mock_fetch.side_effect = fetch
+
+    stats_source = datastore_stats.DatastoreStatsSource()
+    stats_snapshot = yield stats_source.get_current()
+
+    mock_get_instances.assert_called_once_with(
+      proxy_stats.HAPROXY_SERVICES_STATS_SOCKET_PATH,
+      'appscale-datastore_server')
+    self.assertIsInstance(stats_snapshot.utc_timestamp, int)
+    self.assertEqual(stats_snapshot.current_requests, 3)
+    self.assertEqual(stats_snapshot.cumulative.total, 50)
+    self.assertEqual(stats_snapshot.cumulative.failed, 5)
+
+    # Check summarised recent stats
+    recent = stats_snapshot.recent
+    self.assertEqual(recent.total, 15)
+    self.assertEqual(recent.failed, 3)
+    self.assertEqual(recent.avg_latency, 26)
+    self.assertEqual(recent.by_method, {'RunQuery': 8, 'Get': 4, 'Put': 3})
+    self.assertEqual(recent.by_status, {'0': 12, '1': 1, '4': 2})
+    self.assertEqual(recent.latency_histogram, {3: 4, 16: 7, 64: 4})
+    self.assertEqual(recent.p50_latency, 17)
+    self.assertEqual(recent.p95_latency, 71)
+    self.assertEqual(recent.p95_lock_time, 17)
+    self.assertEqual(recent.db_time_histogram, {3: 6, 16: 9})
+
+    # Row counts are averaged over the queries of both servers
+    kind_query = recent.by_strategy['kind_query']
+    self.assertEqual(kind_query.total, 6)
+    self.assertEqual(kind_query.avg_rows_scanned, 8)
+    self.assertEqual(kind_query.avg_rows_returned, 4)
+    self.assertEqual(kind_query.latency_histogram, {16: 4, 64: 2})
+    self.assertEqual(kind_query.p95_latency, 71)
+    composite_query = recent.by_strategy['composite_query']
+    self.assertEqual(composite_query.total, 2)
+    self.assertEqual(composite_query.avg_rows_scanned, 40)
+
+    # Check instances
+    self.assertEqual(stats_snapshot.instances_count, 2)
+    server = next(instance for instance in stats_snapshot.instances
+                  if instance.ip_port == '10.10.2.6:4000')
+    self.assertEqual(server.start_timestamp_ms, 1494240000250)
+    self.assertEqual(server.current_requests, 1)
+    self.assertEqual(server.recent.by_method, {'RunQuery': 2, 'Put': 3})
+    self.assertEqual(server.recent.by_strategy['kind_query'].total, 2)
+
+    # Check failures
+    self.assertEqual(len(stats_snapshot.failures), 1)
+    self.assertEqual(stats_snapshot.failures[0].ip_port, '10.10.2.7:4000')
+    self.assertEqual(stats_snapshot.failures[0].error, 'Connection refused')
+
+    # Stats survive the round trip between the cluster and local sources
+    stats_dict = json.loads(json.dumps(
+      converter.stats_to_dict(stats_snapshot)))
+    restored = converter.stats_from_dict(
+      datastore_stats.DatastoreServiceStatsSnapshot, stats_dict)
+    self.assertEqual(restored.recent.by_strategy['kind_query'].total, 6)
+
+  @patch.object(proxy_stats, 'get_service_instances')
+  @patch.object(datastore_stats.httpclient.AsyncHTTPClient, 'fetch')
+  @testing.gen_test
+  def test_idle_server(self, mock_fetch, mock_get_instances):
+    # Servers without recent requests omit categories and histogram buckets
+    body = {
+      'current_requests': 0,
+      'cumulative_counters': {'from': 1494240000000, 'to': 1494260000000,
+                              'all': 0, 'failed': 0},
+      'recent_stats': {'from': 1494260000000, 'to': 1494260000000,
+                       'all': 0, 'failed': 0, 'avg_latency': None,
+                       'latency_histogram': {}, 'lock_time_histogram': {},
+                       'db_time_histogram': {}}
+    }
+    mock_get_instances.return_value = ['10.10.2.5:4000']
+    response = gen.Future()
+    response.set_result(mock.MagicMock(body=json.dumps(body)))
+    mock_fetch.return_value = response
+
+    stats_snapshot = yield datastore_stats.DatastoreStatsSource().get_current()
+    self.assertEqual(stats_snapshot.recent.total, 0)
+    self.assertIsNone(stats_snapshot.recent.avg_latency)
+    self.assertIsNone(stats_snapshot.recent.p50_latency)
+    self.assertEqual(stats_snapshot.recent.by_strategy, {})
@@ -0,0 +1,70 @@
+import errno
+import json
+import socket
+
+from mock import patch, mock
+from tornado import testing, gen
+
+from appscale.hermes import converter
+from appscale.hermes.producers import instance_startup_stats
+
+
+class TestInstanceStartupStatsSource(testing.AsyncTestCase):
+
+  @patch.object(instance_startup_stats.httpclient.AsyncHTTPClient, 'fetch')
+  @testing.gen_test
+  def test_startup_stats(self, mock_fetch):
+    body = {
+      'versions': {
+        'guestbook_default_v1': {
+          'started': 3, 'failed': 1, 'last_latency': 4000,
+          'last_start': 1494240000000,
+          'latency_histogram': {'2048': 2, '4096': 1},
+          'p50_latency': 2559, 'p95_latency': 5119, 'p99_latency': 5119
+        }
+      }
+    }
+    response = gen.Future()
+    response.set_result(mock.MagicMock(body=json.dumps(body)))
+    mock_fetch.return_value = response
+
+    source = instance_startup_stats.InstanceStartupStatsSource()
+    stats_snapshot = yield source.get_current()
+
+    request = mock_fetch.call_args[0][0]
+    self.assertEqual(request.url, 'http://127.0.0.1:17445/service-stats')
+    self.assertIsInstance(stats_snapshot.utc_timestamp, int)
+    self.assertEqual(len(stats_snapshot.versions), 1)
+    version = stats_snapshot.versions[0]
+    self.assertEqual(version.version_key, 'guestbook_default_v1')
+    self.assertEqual(version.started, 3)
+    self.assertEqual(version.failed, 1)
+    self.assertEqual(version.last_latency, 4000)
+    self.assertEqual(version.latency_histogram, {2048: 2, 4096: 1})
+    self.assertEqual(version.p95_latency, 5119)
+
+    # Stats survive the round trip between the cluster and local sources
+    stats_dict = json.loads(json.dumps(
+      converter.stats_to_dict(stats_snapshot)))
+    restored = converter.stats_from_dict(
+      instance_startup_stats.InstanceStartupStatsSnapshot, stats_dict)
+    self.assertEqual(restored.versions[0].started, 3)
+
+  @patch.object(instance_startup_stats.httpclient.AsyncHTTPClient, 'fetch')
+  @testing.gen_test
+  def test_no_app_manager(self, mock_fetch):
+    # Nodes without the compute role don't run the AppManager
+    response = gen.Future()
+    response.set_exception(
+      socket.error(errno.ECONNREFUSED, 'Connection refused'))
+    mock_fetch.return_value = response
+
+    source = instance_startup_stats.InstanceStartupStatsSource()
+    stats_snapshot = yield source.get_current()
+    self.assertEqual(stats_snapshot.versions, [])
+
+    response = gen.Future()
+    response.set_exception(socket.error(errno.ETIMEDOUT, 'Timed out'))
+    mock_fetch.return_value = response
+    with self.assertRaises(socket.error):
+      yield source.get_current()
@@ -152,3 +152,22 @@ class TestTaskqueueStatsSource(testing.AsyncTestCase):
                     if instance.ip_port == '10.10.7.86:17450')
     self.assertEqual(tq_17449.error, 'HTTP 504: Gateway Timeout')
     self.assertEqual(tq_17450.error, 'Connection refused')
+
+  def test_summarise_latency_histograms(self):
+    def recent(total, latency_histogram):
+      return taskqueue_stats.RecentStatsSnapshot(
+        total=total, failed=0, avg_latency=10, pb_reqs=total, rest_reqs=0,
+        by_pb_method={}, by_rest_method={}, by_pb_status={},
+        by_rest_status={}, latency_histogram=latency_histogram
+      )
+
+    instances = [
+      mock.MagicMock(recent=recent(3, {"3": 2, "16": 1})),
+      mock.MagicMock(recent=recent(5, {"16": 4, "960": 1})),
+      # Older TaskQueue servers don't report latency histogram
+      mock.MagicMock(recent=recent(4, None)),
+    ]
+    summary = taskqueue_stats.TaskqueueStatsSource.summarise_recent(instances)
+    self.assertEqual(summary.latency_histogram, {3: 2, 16: 5, 960: 1})
+    self.assertEqual(summary.p50_latency, 17)
+    self.assertEqual(summary.p99_latency, 1023)
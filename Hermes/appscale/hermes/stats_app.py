@@ -12,6 +12,10 @@ from appscale.hermes.constants import (
   PROCESSES_STATS_CONFIGS_NODE,
   PROXIES_STATS_CONFIGS_NODE
 )
+from appscale.hermes.producers.datastore_stats import DatastoreStatsSource
+from appscale.hermes.producers.instance_startup_stats import (
+  InstanceStartupStatsSource
+)
 from appscale.hermes.producers.taskqueue_stats import TaskqueueStatsSource
 from appscale.hermes.profile import (
   NodesProfileLog, ProcessesProfileLog, ProxiesProfileLog
@@ -23,8 +27,8 @@ from appscale.hermes.handlers import (
 from appscale.hermes.producers.cluster_stats import (
   cluster_nodes_stats, cluster_processes_stats, cluster_proxies_stats,
   cluster_rabbitmq_stats, cluster_push_queues_stats,
-  cluster_taskqueue_stats,
-  cluster_cassandra_stats
+  cluster_taskqueue_stats, cluster_datastore_stats,
+  cluster_cassandra_stats, cluster_instance_startup_stats
 )
 from appscale.hermes.producers.cassandra_stats import CassandraStatsSource
 from appscale.hermes.producers.node_stats import NodeStatsSource
@@ -62,8 +66,24 @@ DEFAULT_INCLUDE_LISTS = IncludeLists({
   'taskqueue.instance': ['start_timestamp_ms', 'current_requests',
                          'cumulative', 'recent'],
   'taskqueue.cumulative': ['total', 'failed', 'pb_reqs', 'rest_reqs'],
-  'taskqueue.recent': ['total', 'failed', 'avg_latency',
-                       'pb_reqs', 'rest_reqs'],
+  'taskqueue.recent': ['total', 'failed', 'avg_latency', 'p50_latency',
+                       'p95_latency', 'p99_latency', 'pb_reqs', 'rest_reqs'],
+  # Datastore service stats
+  'datastore': ['utc_timestamp', 'current_requests', 'cumulative', 'recent',
+                'instances_count', 'failures'],
+  'datastore.instance': ['start_timestamp_ms', 'current_requests',
+                         'cumulative', 'recent'],
+  'datastore.cumulative': ['total', 'failed'],
+  'datastore.recent': ['total', 'failed', 'avg_latency', 'p50_latency',
+                       'p95_latency', 'p99_latency', 'p95_lock_time',
+                       'p95_db_time', 'by_strategy'],
+  'datastore.strategy': ['total', 'avg_rows_scanned', 'avg_rows_returned',
+                         'p95_latency'],
+  # Instance startup stats
+  'instance_startup': ['utc_timestamp', 'versions'],
+  'instance_startup.version': ['version_key', 'started', 'failed',
+                               'last_latency', 'last_start', 'p50_latency',
+                               'p95_latency', 'p99_latency'],
   # RabbitMQ stats
   'rabbitmq': ['utc_timestamp', 'disk_free_alarm', 'mem_alarm', 'name'],
   # Push queue stats
@@ -95,7 +115,7 @@ def get_local_stats_api_routes(is_lb_node, is_tq_node, is_db_node):
     A list of route-handler tuples.
   """
 
-  # Any node provides its node and processes stats
+  # Any node provides its node, processes and instance startup stats
   local_node_stats_handler =  HandlerInfo(
     handler_class=CurrentStatsHandler,
     init_kwargs={'source': NodeStatsSource,
@@ -106,6 +126,11 @@ def get_local_stats_api_routes(is_lb_node, is_tq_node, is_db_node):
     init_kwargs={'source': ProcessesStatsSource,
                  'default_include_lists': DEFAULT_INCLUDE_LISTS,
                  'cache_container': [None]})
+  local_instance_startup_stats_handler = HandlerInfo(
+    handler_class=CurrentStatsHandler,
+    init_kwargs={'source': InstanceStartupStatsSource(),
+                 'default_include_lists': DEFAULT_INCLUDE_LISTS,
+                 'cache_container': [None]})
 
   if is_lb_node:
     # Only LB nodes provide proxies and service stats
@@ -121,6 +146,12 @@ def get_local_stats_api_routes(is_lb_node, is_tq_node, is_db_node):
                    'default_include_lists': DEFAULT_INCLUDE_LISTS,
                    'cache_container': [None]}
     )
+    local_datastore_stats_handler = HandlerInfo(
+      handler_class=CurrentStatsHandler,
+      init_kwargs={'source': DatastoreStatsSource(),
+                   'default_include_lists': DEFAULT_INCLUDE_LISTS,
+                   'cache_container': [None]}
+    )
   else:
     # Stub handler for non-LB nodes
     local_proxies_stats_handler = HandlerInfo(
@@ -131,6 +162,10 @@ def get_local_stats_api_routes(is_lb_node, is_tq_node, is_db_node):
       handler_class=Respond404Handler,
       init_kwargs={'reason': 'Only LB nodes provide taskqueue service stats'}
     )
+    local_datastore_stats_handler = HandlerInfo(
+      handler_class=Respond404Handler,
+      init_kwargs={'reason': 'Only LB nodes provide datastore service stats'}
+    )
 
   if is_tq_node:
     # Only TQ nodes provide RabbitMQ stats.
@@ -178,7 +213,9 @@ def get_local_stats_api_routes(is_lb_node, is_tq_node, is_db_node):
     '/stats/local/rabbitmq': local_rabbitmq_stats_handler,
     '/stats/local/push_queues': local_push_queue_stats_handler,
     '/stats/local/taskqueue': local_taskqueue_stats_handler,
+    '/stats/local/datastore': local_datastore_stats_handler,
     '/stats/local/cassandra': local_cassandra_stats_handler,
+    '/stats/local/instance_startup': local_instance_startup_stats_handler,
   }
   return [
     (route, handler.handler_class, handler.init_kwargs)
@@ -222,6 +259,12 @@ def get_cluster_stats_api_routes(is_lb):
                    'default_include_lists': DEFAULT_INCLUDE_LISTS,
                    'cache_container': {}}
     )
+    cluster_datastore_stats_handler = HandlerInfo(
+      handler_class=CurrentClusterStatsHandler,
+      init_kwargs={'source': cluster_datastore_stats,
+                   'default_include_lists': DEFAULT_INCLUDE_LISTS,
+                   'cache_container': {}}
+    )
     cluster_rabbitmq_stats_handler = HandlerInfo(
       handler_class=CurrentClusterStatsHandler,
       init_kwargs={'source': cluster_rabbitmq_stats,
@@ -239,6 +282,12 @@ def get_cluster_stats_api_routes(is_lb):
       init_kwargs={'source': cluster_cassandra_stats,
                    'default_include_lists': DEFAULT_INCLUDE_LISTS}
     )
+    cluster_instance_startup_stats_handler = HandlerInfo(
+      handler_class=CurrentClusterStatsHandler,
+      init_kwargs={'source': cluster_instance_startup_stats,
+                   'default_include_lists': DEFAULT_INCLUDE_LISTS,
+                   'cache_container': {}}
+    )
   else:
     # Stub handler for slave nodes
     cluster_stub_handler = HandlerInfo(
@@ -249,18 +298,22 @@ def get_cluster_stats_api_routes(is_lb):
     cluster_processes_stats_handler = cluster_stub_handler
     cluster_proxies_stats_handler = cluster_stub_handler
     cluster_taskqueue_stats_handler = cluster_stub_handler
+    cluster_datastore_stats_handler = cluster_stub_handler
     cluster_rabbitmq_stats_handler = cluster_stub_handler
     cluster_push_queue_stats_handler = cluster_stub_handler
     cluster_cassandra_stats_handler = cluster_stub_handler
+    cluster_instance_startup_stats_handler = cluster_stub_handler
 
   routes = {
     '/stats/cluster/nodes': cluster_node_stats_handler,
     '/stats/cluster/processes': cluster_processes_stats_handler,
     '/stats/cluster/proxies': cluster_proxies_stats_handler,
     '/stats/cluster/taskqueue': cluster_taskqueue_stats_handler,
+    '/stats/cluster/datastore': cluster_datastore_stats_handler,
     '/stats/cluster/rabbitmq': cluster_rabbitmq_stats_handler,
     '/stats/cluster/push_queues': cluster_push_queue_stats_handler,
     '/stats/cluster/cassandra': cluster_cassandra_stats_handler,
+    '/stats/cluster/instance_startup': cluster_instance_startup_stats_handler,
   }
   return [
     (route, handler.handler_class, handler.init_kwargs)
@@ -1,6 +1,7 @@
 
 import capnp  # pylint: disable=unused-import
 import logging_capnp
+import mmap
 import os
 import re
 import struct
@@ -8,14 +9,23 @@ import time
 
 from cStringIO import StringIO
 from twisted.internet import protocol
+from twisted.internet import threads
 from twisted.python import log
 
 MAX_LOG_FILE_SIZE = 1024 * 1024 * 1024
 
 _I_SIZE = struct.calcsize('I')
 _qI_SIZE = struct.calcsize('qI')
+_PAGE_SUMMARY_FORMAT = 'qqqbH'
+_PAGE_SUMMARY_SIZE = struct.calcsize(_PAGE_SUMMARY_FORMAT)
+_H_SIZE = struct.calcsize('H')
 _PAGE_SIZE = 1000
 _ONE_BINARY = struct.pack('I', 1)
+_REQUEST_ID_SIZE = 10
+_RIDX_ENTRY_SIZE = _REQUEST_ID_SIZE + _I_SIZE
+# Number of request IDs the writer keeps in memory before writing them to a
+# sorted index segment.
+_RIDX_FLUSH_INTERVAL = 100000
 
 def readLogRecord(handle, parse=False):
   buf = handle.read(_I_SIZE)
@@ -31,6 +41,212 @@ def calculateOffset(log_file_id, position):
 def parseOffset(offset):
   return struct.unpack('HI', offset)
 
+class PageSummary(object):
+  """What a page of records contains, so searches can skip the page."""
+
+  __slots__ = ['minStartTime', 'maxStartTime', 'maxEndTime', 'maxLevel',
+               'versions']
+
+  def __init__(self, minStartTime=None, maxStartTime=None, maxEndTime=None,
+               maxLevel=-1, versions=None):
+    self.minStartTime = minStartTime
+    self.maxStartTime = maxStartTime
+    self.maxEndTime = maxEndTime
+    self.maxLevel = maxLevel
+    self.versions = versions if versions is not None else set()
+
+  def add(self, record):
+    if self.minStartTime is None or record.startTime < self.minStartTime:
+      self.minStartTime = record.startTime
+    if self.maxStartTime is None or record.startTime > self.maxStartTime:
+      self.maxStartTime = record.startTime
+    if self.maxEndTime is None or record.endTime > self.maxEndTime:
+      self.maxEndTime = record.endTime
+    for appLog in record.appLogs:
+      if appLog.level > self.maxLevel:
+        self.maxLevel = appLog.level
+    self.versions.add(record.versionId.split('.', 1)[0])
+
+  def mayMatch(self, query, versionIds):
+    if query.minimumLogLevel and self.maxLevel < query.minimumLogLevel:
+      return False
+    if query.startTime and self.maxStartTime < query.startTime:
+      return False
+    # Records without a version always match.
+    if '' not in self.versions and self.versions.isdisjoint(versionIds):
+      return False
+    return True
+
+  def pack(self):
+    versions = sorted(self.versions)
+    parts = [struct.pack(_PAGE_SUMMARY_FORMAT, self.minStartTime,
+                         self.maxStartTime, self.maxEndTime, self.maxLevel,
+                         len(versions))]
+    for version in versions:
+      parts.append(struct.pack('H', len(version)))
+      parts.append(version)
+    return ''.join(parts)
+
+  @classmethod
+  def load(cls, filename):
+    if not os.path.exists(filename):
+      return []
+    with open(filename, 'rb') as handle:
+      buf = handle.read()
+    summaries = []
+    pos = 0
+    while pos + _PAGE_SUMMARY_SIZE <= len(buf):
+      minStartTime, maxStartTime, maxEndTime, maxLevel, versionCount = \
+        struct.unpack_from(_PAGE_SUMMARY_FORMAT, buf, pos)
+      pos += _PAGE_SUMMARY_SIZE
+      versions = set()
+      for _ in xrange(versionCount):
+        length, = struct.unpack_from('H', buf, pos)
+        pos += _H_SIZE
+        versions.add(buf[pos:pos + length])
+        pos += length
+      if pos > len(buf):
+        # The last summary was not completely written.
+        break
+      summaries.append(cls(minStartTime, maxStartTime, maxEndTime, maxLevel,
+                           versions))
+    return summaries
+
+def writeRequestIdSegment(filename, requestIds):
+  """Writes request IDs and record positions to a sorted segment file."""
+  entries = sorted('%s%s' % (requestId, struct.pack('I', position))
+                   for requestId, position in requestIds.iteritems())
+  tmpFilename = '%s.tmp' % filename
+  with open(tmpFilename, 'wb') as handle:
+    handle.write(''.join(entries))
+  os.rename(tmpFilename, filename)
+
+class RequestIdSegment(object):
+  """Memory-mapped run of request ID index entries sorted by request ID.
+
+  Each entry is a request ID followed by the position of its record in the
+  log file, so entries can be binary searched in place.
+  """
+
+  def __init__(self, filename, number):
+    self.filename = filename
+    self.number = number
+    self._map = None
+    self._size = 0
+    with open(filename, 'rb') as handle:
+      length = os.fstat(handle.fileno()).st_size
+      if length:
+        self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._size = length // _RIDX_ENTRY_SIZE
+
+  def __len__(self):
+    return self._size
+
+  def close(self):
+    if self._map is not None:
+      self._map.close()
+      self._map = None
+
+  def find(self, requestId):
+    lo = 0
+    hi = self._size
+    while lo < hi:
+      mid = (lo + hi) // 2
+      start = mid * _RIDX_ENTRY_SIZE
+      if self._map[start:start + _REQUEST_ID_SIZE] < requestId:
+        lo = mid + 1
+      else:
+        hi = mid
+    if lo == self._size:
+      return None
+    start = lo * _RIDX_ENTRY_SIZE
+    if self._map[start:start + _REQUEST_ID_SIZE] != requestId:
+      return None
+    position, = struct.unpack(
+      'I', self._map[start + _REQUEST_ID_SIZE:start + _RIDX_ENTRY_SIZE])
+    return position
+
+class SortedRequestIdIndex(object):
+  """Request ID index made of sorted, memory-mapped segment files.
+
+  Each batch of request IDs is written to a new segment, so adding IDs never
+  rewrites the entries that are already indexed.
+  """
+
+  def __init__(self, filename):
+    self._filename = filename
+    self._segments = []
+    self._nextSegment = 0
+    self._closed = False
+    for number, segmentFilename in self._segmentFiles():
+      self._segments.append(RequestIdSegment(segmentFilename, number))
+      self._nextSegment = number + 1
+
+  def __len__(self):
+    return sum(len(segment) for segment in self._segments)
+
+  def _segmentFiles(self):
+    directory, prefix = os.path.split(self._filename)
+    pattern = '^%s\\.(\\d+)$' % re.escape(prefix)
+    segmentFiles = []
+    for f in os.listdir(directory or '.'):
+      m = re.match(pattern, f)
+      if m:
+        segmentFiles.append((int(m.groups()[0]), os.path.join(directory, f)))
+    segmentFiles.sort()
+    return segmentFiles
+
+  def find(self, requestId):
+    for segment in self._segments:
+      position = segment.find(requestId)
+      if position is not None:
+        return position
+    return None
+
+  def reserveSegment(self):
+    """Returns the filename to write the next segment to."""
+    filename = '%s.%d' % (self._filename, self._nextSegment)
+    self._nextSegment += 1
+    return filename
+
+  def addSegment(self, filename):
+    """Starts using a segment written with writeRequestIdSegment.
+
+    Segments that finish after the index was closed are removed, since the
+    writer indexes every remaining request ID when it closes.
+    """
+    if self._closed:
+      os.unlink(filename)
+      return
+    number = int(filename.rsplit('.', 1)[1])
+    self._segments.append(RequestIdSegment(filename, number))
+    self._segments.sort(key=lambda segment: segment.number)
+
+  def rebuild(self, unsortedFilename):
+    """Replaces the index with the entries of an unsorted index file."""
+    with open(unsortedFilename, 'rb') as handle:
+      buf = handle.read()
+    requestIds = dict()
+    for i in xrange(0, len(buf) - _RIDX_ENTRY_SIZE + 1, _RIDX_ENTRY_SIZE):
+      position, = struct.unpack_from('I', buf, i + _REQUEST_ID_SIZE)
+      requestIds.setdefault(buf[i:i + _REQUEST_ID_SIZE], position)
+    self.delete()
+    self._closed = False
+    filename = self.reserveSegment()
+    writeRequestIdSegment(filename, requestIds)
+    self.addSegment(filename)
+
+  def close(self):
+    self._closed = True
+    for segment in self._segments:
+      segment.close()
+    self._segments = []
+
+  def delete(self):
+    self.close()
+    for _, filename in self._segmentFiles():
+      os.unlink(filename)
+
 class AppLogFile(object):
   MODE_SEARCH = 1
   MODE_WRITE = 2
@@ -40,26 +256,130 @@ class AppLogFile(object):
     self.log_file_id = log_file_id
     self._filename = os.path.join(root_path, 'logservice_%s.%s.log' % (app_id, log_file_id))
     self._requestIdIndexFilename = '%s.ridx' % self._filename
+    self._sortedRequestIdIndexFilename = '%s.sridx' % self._filename
     self._pageIndexFilename = '%s.pidx' % self._filename
+    self._pageSummaryFilename = '%s.psidx' % self._filename
+    # Summaries of completed pages, in the same order as the page index.
+    # Pages written before summaries existed do not have one.
+    self._pageSummaries = PageSummary.load(self._pageSummaryFilename)
+    self._pageSummary = None
+    self._dataMap = None
+    # The .ridx file is an append-only log of request IDs. Lookups use the
+    # sorted index, plus the IDs that are not in one of its segments yet.
+    self._sortedRequestIdIndex = SortedRequestIdIndex(
+      self._sortedRequestIdIndexFilename)
+    self._pendingRequestIds = dict()
+    # IDs that are being written to a segment in another thread.
+    self._flushingRequestIds = []
+    self._readHandle = None
     if mode == AppLogFile.MODE_WRITE:
       self._handle = open(self._filename, 'ab')
       self._pageIndexHandle = open(self._pageIndexFilename, 'ab')
       self._requestIdIndexHandle = open(self._requestIdIndexFilename, 'ab')
+      self._indexSize = self._requestIdIndexHandle.tell() / _RIDX_ENTRY_SIZE
     else:
       self._handle = open(self._filename, 'rb')
       self._pageIndexHandle = open(self._pageIndexFilename, 'rb')
-      self._requestIdIndexHandle = open(self._requestIdIndexFilename, 'rb')
-    self._indexSize = self._requestIdIndexHandle.tell() / 14
+      self._requestIdIndexHandle = None
+      self._indexSize = 0
+      # Index files from before the sorted index existed, or from a writer
+      # that did not shut down cleanly, are sorted once when opened.
+      ridxSize = os.path.getsize(self._requestIdIndexFilename)
+      if len(self._sortedRequestIdIndex) < ridxSize / _RIDX_ENTRY_SIZE:
+        self._sortedRequestIdIndex.rebuild(self._requestIdIndexFilename)
 
   def close(self):
+    if self.mode == AppLogFile.MODE_WRITE:
+      self._writeRemainingRequestIds()
+      self._finishPage()
+      self._requestIdIndexHandle.close()
+    self._sortedRequestIdIndex.close()
+    if self._dataMap is not None:
+      self._dataMap.close()
+    if self._readHandle:
+      self._readHandle.close()
     self._handle.close()
     self._pageIndexHandle.close()
-    self._requestIdIndexHandle.close()
 
   def delete(self):
     os.unlink(self._filename)
     os.unlink(self._requestIdIndexFilename)
     os.unlink(self._pageIndexFilename)
+    if os.path.exists(self._pageSummaryFilename):
+      os.unlink(self._pageSummaryFilename)
+    self._sortedRequestIdIndex.delete()
+
+  def _finishPage(self):
+    if self._pageSummary is None:
+      return
+    self._pageSummaries.append(self._pageSummary)
+    with open(self._pageSummaryFilename, 'ab') as handle:
+      handle.write(self._pageSummary.pack())
+    self._pageSummary = None
+
+  def _map(self):
+    # The writer's handle is append-only and can't be mapped for reading.
+    handle = self._reader()
+    size = os.fstat(handle.fileno()).st_size
+    if self._dataMap is not None and len(self._dataMap) == size:
+      return self._dataMap
+    if self._dataMap is not None:
+      self._dataMap.close()
+      self._dataMap = None
+    if size:
+      self._dataMap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return self._dataMap
+
+  def _flushPendingRequestIds(self):
+    """Writes the pending request IDs to a new segment in another thread."""
+    requestIds = self._pendingRequestIds
+    self._pendingRequestIds = dict()
+    self._requestIdIndexHandle.flush()
+    self._flushingRequestIds.append(requestIds)
+    filename = self._sortedRequestIdIndex.reserveSegment()
+
+    def flushed(_):
+      self._flushingRequestIds.remove(requestIds)
+      self._sortedRequestIdIndex.addSegment(filename)
+
+    def failed(failure):
+      self._flushingRequestIds.remove(requestIds)
+      log.err(failure, 'Failed to write {}'.format(filename))
+      # Keep the IDs available for lookups until the next flush.
+      for requestId, position in requestIds.iteritems():
+        self._pendingRequestIds.setdefault(requestId, position)
+
+    d = threads.deferToThread(writeRequestIdSegment, filename, requestIds)
+    d.addCallbacks(flushed, failed)
+    return d
+
+  def _writeRemainingRequestIds(self):
+    """Writes every request ID that is not in a segment yet.
+
+    IDs that are still being written in another thread are included, so the
+    index is complete as soon as the log file is closed.
+    """
+    requestIds = dict()
+    for flushing in self._flushingRequestIds:
+      for requestId, position in flushing.iteritems():
+        requestIds.setdefault(requestId, position)
+    for requestId, position in self._pendingRequestIds.iteritems():
+      requestIds.setdefault(requestId, position)
+    self._pendingRequestIds = dict()
+    if not requestIds:
+      return
+    self._requestIdIndexHandle.flush()
+    filename = self._sortedRequestIdIndex.reserveSegment()
+    writeRequestIdSegment(filename, requestIds)
+    self._sortedRequestIdIndex.addSegment(filename)
+
+  def _reader(self):
+    if self.mode != AppLogFile.MODE_WRITE:
+      return self._handle
+    self._handle.flush()
+    if self._readHandle is None:
+      self._readHandle = open(self._filename, 'rb')
+    return self._readHandle
 
   def write(self, buf):
     if self.mode != AppLogFile.MODE_WRITE:
@@ -73,49 +393,36 @@ class AppLogFile(object):
     # Index the new logline
     if requestLog.requestId:
       self._requestIdIndexHandle.write('%s%s' % (requestLog.requestId, struct.pack('I', position)))
+      self._pendingRequestIds.setdefault(requestLog.requestId, position)
+      if len(self._pendingRequestIds) >= _RIDX_FLUSH_INTERVAL:
+        self._flushPendingRequestIds()
     if self._indexSize % _PAGE_SIZE == 0:
+      self._finishPage()
+      self._pageSummary = PageSummary()
       self._pageIndexHandle.write(struct.pack('qI', requestLog.endTime, position))
       self._pageIndexHandle.flush()
       self._handle.flush()
       self._requestIdIndexHandle.flush()
+    self._pageSummary.add(requestLog)
     self._indexSize += 1
     return position, requestLog
 
+  def _findRequestId(self, requestId):
+    for requestIdMap in [self._pendingRequestIds] + self._flushingRequestIds:
+      position = requestIdMap.get(requestId)
+      if position is not None:
+        return position
+    return self._sortedRequestIdIndex.find(requestId)
+
   def get(self, requestIds):
-    if self.mode == AppLogFile.MODE_WRITE:
-      self._requestIdIndexHandle.flush()
-      self._handle.flush()
-      index_handle = open(self._requestIdIndexFilename, 'rb')
-      handle = open(self._filename, 'rb')
-    else:
-      index_handle = self._requestIdIndexHandle
-      handle = self._handle
-    try:
-      index_handle.seek(0)
-      while True:
-        buf = index_handle.read(14000)
-        if not buf:
-          break
-        i = 0
-        while True:
-          key = buf[i:i+10]
-          if not key:
-            break
-          if key in requestIds:
-            requestIds.remove(key)
-            position, = struct.unpack('I', buf[i+10:i+14])
-            handle.seek(position)
-            record = readLogRecord(handle, False)
-            yield key, record
-            if not requestIds:
-              break
-          i += 14
-          if not requestIds:
-            break
-    finally:
-      if self.mode == AppLogFile.MODE_WRITE:
-        handle.close()
-        index_handle.close()
+    handle = self._reader()
+    for requestId in list(requestIds):
+      position = self._findRequestId(requestId)
+      if position is None:
+        continue
+      requestIds.remove(requestId)
+      handle.seek(position)
+      yield requestId, readLogRecord(handle, False)
 
   def iterpages(self):
     if self.mode == AppLogFile.MODE_WRITE:
@@ -126,33 +433,29 @@ class AppLogFile(object):
       self._pageIndexHandle.seek(0)
       pages = self._pageIndexHandle.read()
     for pos in xrange(len(pages)-_qI_SIZE, -1, -_qI_SIZE):
-      yield struct.unpack('qI', pages[pos:pos+_qI_SIZE])
+      endTime, position = struct.unpack('qI', pages[pos:pos+_qI_SIZE])
+      page = pos / _qI_SIZE
+      if page < len(self._pageSummaries):
+        summary = self._pageSummaries[page]
+      elif page == len(self._pageSummaries):
+        summary = self._pageSummary
+      else:
+        summary = None
+      yield endTime, position, summary
 
   def iterrecords(self, start_position, end_position):
-    if self.mode == AppLogFile.MODE_WRITE:
-      self._handle.flush()
-      handle = open(self._filename, 'rb')
-    else:
-      handle = self._handle
-    try:
-      handle.seek(start_position)
-      if end_position != -1:
-        buf = handle.read(end_position - start_position)
-      else:
-        buf = handle.read()
-    finally:
-      if self.mode == AppLogFile.MODE_WRITE:
-        handle.close()
-    pos = 0
-    while pos < len(buf):
-      buf2 = buf[pos:pos+_I_SIZE]
+    data = self._map()
+    if data is None:
+      return
+    if end_position == -1:
+      end_position = len(data)
+    pos = start_position
+    while pos + _I_SIZE <= end_position:
+      length, = struct.unpack_from('I', data, pos)
       pos += _I_SIZE
-      if not buf2:
-        break
-      length, = struct.unpack('I', buf2)
-      buf2 = buf[pos:pos+length]
+      buf = data[pos:pos+length]
       pos += length
-      yield buf2, logging_capnp.RequestLog.from_bytes(buf2)
+      yield buf, logging_capnp.RequestLog.from_bytes(buf)
 
 class AppRegistry(object):
 
@@ -206,8 +509,8 @@ class AppRegistry(object):
 
   def iterpages(self):
     for alf in self.iter():
-      for endTime, position in alf.iterpages():
-         yield endTime, position, alf
+      for endTime, position, summary in alf.iterpages():
+         yield endTime, position, alf, summary
 
   def registerFollower(self, protocol, query):
     self._followers[protocol] = query
@@ -296,7 +599,7 @@ class Protocol(protocol.Protocol):
     start = time.time()
     previousALF = None
     previousPosition = -1
-    for endTime, position, alf in self.app_registry.iterpages():
+    for endTime, position, alf, summary in self.app_registry.iterpages():
       if query.endTime and query.endTime < endTime:
         continue
       if query.offset:
@@ -304,6 +607,14 @@ class Protocol(protocol.Protocol):
           continue
         if alf.log_file_id == query_log_file_id and position > query_position:
           continue
+      if summary is not None:
+        # This page and the ones before it ended before the requested time.
+        if query.startTime and summary.maxEndTime < query.startTime:
+          break
+        if not summary.mayMatch(query, versionIds):
+          previousALF = alf
+          previousPosition = position
+          continue
       end_position = previousPosition if alf == previousALF else -1
       for buf, record in alf.iterrecords(position, end_position):
         if not oldestRecord or oldestRecord.startTime > record.startTime:
@@ -327,7 +638,8 @@ class Protocol(protocol.Protocol):
         if query.startTime and query.startTime > record.startTime:
           continue
         results.append((buf, record))
-      if query.startTime and oldestRecord.endTime < query.startTime:
+      if (query.startTime and oldestRecord and
+          oldestRecord.endTime < query.startTime):
         break
       if len(results) >= query.count:
         break
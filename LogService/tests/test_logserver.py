@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+from twisted.internet import defer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import logserver
+
+
+def requestId(number):
+  return '%010d' % number
+
+
+class DeferredThreads(object):
+  """Holds work passed to deferToThread until the test runs it."""
+
+  def __init__(self):
+    self.calls = []
+
+  def deferToThread(self, function, *args):
+    d = defer.Deferred()
+    self.calls.append((d, function, args))
+    return d
+
+  def runAll(self):
+    calls, self.calls = self.calls, []
+    for d, function, args in calls:
+      try:
+        result = function(*args)
+      except Exception:
+        d.errback()
+      else:
+        d.callback(result)
+
+
+class TestSortedRequestIdIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.filename = os.path.join(self.root, 'logservice_app.1.log.sridx')
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def addSegment(self, index, requestIds):
+    filename = index.reserveSegment()
+    logserver.writeRequestIdSegment(filename, requestIds)
+    index.addSegment(filename)
+
+  def test_find(self):
+    index = logserver.SortedRequestIdIndex(self.filename)
+    self.assertEqual(len(index), 0)
+    self.assertIsNone(index.find(requestId(1)))
+
+    self.addSegment(index, {requestId(i): i * 10 for i in xrange(0, 100, 2)})
+    self.assertEqual(len(index), 50)
+    self.assertEqual(index.find(requestId(0)), 0)
+    self.assertEqual(index.find(requestId(42)), 420)
+    self.assertEqual(index.find(requestId(98)), 980)
+    self.assertIsNone(index.find(requestId(41)))
+    self.assertIsNone(index.find(requestId(100)))
+    index.close()
+
+  def test_segments(self):
+    index = logserver.SortedRequestIdIndex(self.filename)
+    self.addSegment(index, {requestId(i): i for i in xrange(10)})
+    self.addSegment(index, {requestId(i): i for i in xrange(10, 20)})
+    self.assertEqual(len(index), 20)
+    self.assertEqual(index.find(requestId(5)), 5)
+    self.assertEqual(index.find(requestId(15)), 15)
+
+    # Adding a segment leaves the existing ones in place.
+    self.assertTrue(os.path.exists('%s.0' % self.filename))
+    self.assertTrue(os.path.exists('%s.1' % self.filename))
+    index.close()
+
+    index = logserver.SortedRequestIdIndex(self.filename)
+    self.assertEqual(len(index), 20)
+    self.assertEqual(index.find(requestId(15)), 15)
+    self.assertEqual(index.reserveSegment(), '%s.2' % self.filename)
+
+    index.delete()
+    self.assertEqual(os.listdir(self.root), [])
+
+  def test_rebuild(self):
+    index = logserver.SortedRequestIdIndex(self.filename)
+    self.addSegment(index, {requestId(1): 1})
+    self.addSegment(index, {requestId(2): 2})
+
+    unsortedFilename = os.path.join(self.root, 'logservice_app.1.log.ridx')
+    with open(unsortedFilename, 'wb') as handle:
+      for number, position in [(7, 70), (3, 30), (5, 50), (3, 31)]:
+        handle.write('%s%s' % (requestId(number), struct.pack('I', position)))
+
+    index.rebuild(unsortedFilename)
+    self.assertEqual(len(index), 3)
+    self.assertEqual(index.find(requestId(3)), 30)
+    self.assertEqual(index.find(requestId(5)), 50)
+    self.assertEqual(index.find(requestId(7)), 70)
+    self.assertIsNone(index.find(requestId(1)))
+    index.close()
+
+    segmentFiles = [f for f in os.listdir(self.root) if '.sridx.' in f]
+    self.assertEqual(len(segmentFiles), 1)
+
+
+class TestAppLogFile(unittest.TestCase):
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.threads = DeferredThreads()
+    self.originalDeferToThread = logserver.threads.deferToThread
+    logserver.threads.deferToThread = self.threads.deferToThread
+    self.originalFlushInterval = logserver._RIDX_FLUSH_INTERVAL
+    logserver._RIDX_FLUSH_INTERVAL = 3
+
+  def tearDown(self):
+    logserver.threads.deferToThread = self.originalDeferToThread
+    logserver._RIDX_FLUSH_INTERVAL = self.originalFlushInterval
+    shutil.rmtree(self.root)
+
+  def write(self, alf, number):
+    record = logserver.logging_capnp.RequestLog.new_message()
+    record.appId = 'app'
+    record.versionId = 'v1.1'
+    record.requestId = requestId(number)
+    record.startTime = number
+    record.endTime = number + 1
+    return alf.write(record.to_bytes())
+
+  def get(self, alf, numbers):
+    results = dict()
+    for foundId, buf in alf.get([requestId(number) for number in numbers]):
+      results[foundId] = logserver.logging_capnp.RequestLog.from_bytes(buf)
+    return results
+
+  def test_flushes_request_ids_in_another_thread(self):
+    alf = logserver.AppLogFile(self.root, 'app', 1,
+                               logserver.AppLogFile.MODE_WRITE)
+    for number in xrange(5):
+      self.write(alf, number)
+
+    # The first batch is handed to another thread instead of being written
+    # while the record is logged.
+    self.assertEqual(len(self.threads.calls), 1)
+    self.assertEqual(len(alf._sortedRequestIdIndex), 0)
+    results = self.get(alf, xrange(5))
+    self.assertEqual(sorted(results), [requestId(n) for n in xrange(5)])
+
+    self.threads.runAll()
+    self.assertEqual(len(alf._sortedRequestIdIndex), 3)
+    self.assertEqual(alf._flushingRequestIds, [])
+    results = self.get(alf, [1, 4])
+    self.assertEqual(results[requestId(1)].startTime, 1)
+    self.assertEqual(results[requestId(4)].startTime, 4)
+
+  def test_search_active_file(self):
+    alf = logserver.AppLogFile(self.root, 'app', 1,
+                               logserver.AppLogFile.MODE_WRITE)
+    for number in xrange(3):
+      self.write(alf, number)
+
+    pages = list(alf.iterpages())
+    self.assertEqual(len(pages), 1)
+    _, position, _ = pages[0]
+    records = [record for _, record in alf.iterrecords(position, -1)]
+    self.assertEqual([record.startTime for record in records], [0, 1, 2])
+
+    # Records written after the file was mapped are found as well.
+    self.write(alf, 3)
+    records = [record for _, record in alf.iterrecords(position, -1)]
+    self.assertEqual([record.startTime for record in records], [0, 1, 2, 3])
+    alf.close()
+
+  def test_close_writes_remaining_request_ids(self):
+    alf = logserver.AppLogFile(self.root, 'app', 1,
+                               logserver.AppLogFile.MODE_WRITE)
+    for number in xrange(5):
+      self.write(alf, number)
+    alf.close()
+    # A flush that finishes after the file was closed is not used again.
+    self.threads.runAll()
+
+    alf = logserver.AppLogFile(self.root, 'app', 1,
+                               logserver.AppLogFile.MODE_SEARCH)
+    self.assertEqual(len(alf._sortedRequestIdIndex), 5)
+    results = self.get(alf, xrange(6))
+    self.assertEqual(sorted(results), [requestId(n) for n in xrange(5)])
+    alf.close()
+
+  def test_rebuilds_index_after_unclean_shutdown(self):
+    alf = logserver.AppLogFile(self.root, 'app', 1,
+                               logserver.AppLogFile.MODE_WRITE)
+    for number in xrange(5):
+      self.write(alf, number)
+    self.threads.runAll()
+    # Simulate a writer that stopped without closing the file.
+    alf._handle.flush()
+    alf._pageIndexHandle.flush()
+    alf._requestIdIndexHandle.flush()
+
+    search = logserver.AppLogFile(self.root, 'app', 1,
+                                  logserver.AppLogFile.MODE_SEARCH)
+    self.assertEqual(len(search._sortedRequestIdIndex), 5)
+    results = self.get(search, xrange(5))
+    self.assertEqual(sorted(results), [requestId(n) for n in xrange(5)])
+    search.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -133,7 +133,8 @@ class IndexProperty(object):
 class DatastoreIndex(object):
   """ Represents a datastore index. """
 
-  __slots__ = ['project_id', 'kind', 'ancestor', 'properties', 'ready', 'id']
+  __slots__ = ['project_id', 'kind', 'ancestor', 'properties', 'ready', 'id',
+               'backfill']
 
   # Separates fields of an encoded index.
   ENCODING_DELIMITER = '|'
@@ -159,6 +160,9 @@ class DatastoreIndex(object):
     # The index ID is assigned by UpdateIndexes.
     self.id = None
 
+    # While the index is being populated, this describes the progress.
+    self.backfill = None
+
   @property
   def encoded_def(self):
     """ Returns a string representation of the datastore index definition.
@@ -219,6 +223,7 @@ class DatastoreIndex(object):
                           properties)
     datastore_index.ready = entry['ready']
     datastore_index.id = entry.get('id')
+    datastore_index.backfill = entry.get('backfill')
     return datastore_index
 
   @classmethod
@@ -254,6 +259,9 @@ class DatastoreIndex(object):
     if self.id is not None:
       output['id'] = self.id
 
+    if self.backfill is not None:
+      output['backfill'] = self.backfill
+
     return output
 
   def to_pb(self):
@@ -2,41 +2,130 @@ from appscale.common.service_stats import matchers
 
 
 class Metric(object):
+  """
+  An interface for metrics computed for recent requests.
+
+  Metrics which can be computed incrementally should set aggregatable
+  to True and implement new_state, add, merge and result. ServiceStats
+  then keeps per-second aggregates instead of rescanning requests.
+  """
+  aggregatable = False
+
   def compute(self, requests):
     raise NotImplementedError()
 
+  def new_state(self):
+    """
+    Returns:
+      an aggregation state for zero requests.
+    """
+    raise NotImplementedError()
+
+  def add(self, state, request_info):
+    """ Adds a request to aggregation state.
 
-class Avg(Metric):
+    Args:
+      state: an aggregation state (mutable state can be updated in place).
+      request_info: an object containing request info.
+    Returns:
+      a new aggregation state.
+    """
+    raise NotImplementedError()
+
+  def merge(self, state, other_state):
+    """ Combines two aggregation states.
+
+    Args:
+      state: an aggregation state.
+      other_state: an aggregation state.
+    Returns:
+      a new aggregation state.
+    """
+    raise NotImplementedError()
+
+  def result(self, state):
+    """ Computes the value of metric from aggregation state.
+
+    Args:
+      state: an aggregation state.
+    Returns:
+      a value of metric.
+    """
+    raise NotImplementedError()
+
+
+class _AggregatableMetric(Metric):
+  aggregatable = True
+
+  def compute(self, requests):
+    state = self.new_state()
+    for request in requests:
+      state = self.add(state, request)
+    return self.result(state)
+
+
+class Avg(_AggregatableMetric):
   def __init__(self, field):
     self._field_name = field
 
-  def compute(self, requests):
-    if not requests:
+  def new_state(self):
+    return 0, 0
+
+  def add(self, state, request_info):
+    return state[0] + getattr(request_info, self._field_name), state[1] + 1
+
+  def merge(self, state, other_state):
+    return state[0] + other_state[0], state[1] + other_state[1]
+
+  def result(self, state):
+    if not state[1]:
       return None
-    return sum(getattr(r, self._field_name) for r in requests) / len(requests)
+    return state[0] / state[1]
 
 
-class Max(Metric):
+class Max(_AggregatableMetric):
   def __init__(self, field):
     self._field_name = field
 
-  def compute(self, requests):
-    if not requests:
-      return None
-    return max(getattr(r, self._field_name) for r in requests)
+  def new_state(self):
+    return None
+
+  def add(self, state, request_info):
+    return self.merge(state, getattr(request_info, self._field_name))
+
+  def merge(self, state, other_state):
+    if state is None:
+      return other_state
+    if other_state is None:
+      return state
+    return max(state, other_state)
+
+  def result(self, state):
+    return state
 
 
-class Min(Metric):
+class Min(_AggregatableMetric):
   def __init__(self, field):
     self._field_name = field
 
-  def compute(self, requests):
-    if not requests:
-      return None
-    return min(getattr(r, self._field_name) for r in requests)
+  def new_state(self):
+    return None
+
+  def add(self, state, request_info):
+    return self.merge(state, getattr(request_info, self._field_name))
 
+  def merge(self, state, other_state):
+    if state is None:
+      return other_state
+    if other_state is None:
+      return state
+    return min(state, other_state)
 
-class CountOf(Metric):
+  def result(self, state):
+    return state
+
+
+class CountOf(_AggregatableMetric):
   def __init__(self, matcher):
     super(CountOf, self).__init__()
     self._matcher = matcher
@@ -46,4 +135,129 @@ class CountOf(Metric):
       return len(requests)
     return sum(1 for request in requests if self._matcher.matches(request))
 
+  def new_state(self):
+    return 0
+
+  def add(self, state, request_info):
+    if self._matcher.matches(request_info):
+      return state + 1
+    return state
+
+  def merge(self, state, other_state):
+    return state + other_state
+
+  def result(self, state):
+    return state
+
+
+class Histogram(_AggregatableMetric):
+  """
+  A fixed-memory histogram of a numeric field using HDR-style log buckets.
+  Values below LINEAR_LIMIT are counted exactly, larger values go to one of
+  SUB_BUCKETS linear buckets within their power of two. So a bucket
+  is never wider than 1/SUB_BUCKETS of its values.
+
+  Computed value is a dict mapping lower bound of bucket to number of
+  requests in it. Such dicts can be combined with merge_histograms and
+  queried with histogram_percentile, so histograms from different nodes
+  can be merged without raw samples.
+  """
+  SUB_BUCKETS = 8
+  LINEAR_LIMIT = 2 * SUB_BUCKETS
+
+  def __init__(self, field):
+    self._field_name = field
+
+  def new_state(self):
+    return {}
+
+  def add(self, state, request_info):
+    bucket = bucket_of(getattr(request_info, self._field_name))
+    state[bucket] = state.get(bucket, 0) + 1
+    return state
+
+  def merge(self, state, other_state):
+    return merge_histograms([state, other_state])
+
+  def result(self, state):
+    return dict(state)
+
+
+class Percentile(Histogram):
+  """
+  An estimate of percentile of a numeric field. It's computed from
+  a Histogram, so it's never off by more than a bucket width.
+  """
+  def __init__(self, field, percent):
+    super(Percentile, self).__init__(field)
+    self._percent = percent
+
+  def result(self, state):
+    return histogram_percentile(state, self._percent)
+
+
+def bucket_of(value):
+  """ Finds histogram bucket for a value.
+
+  Args:
+    value: a non-negative number.
+  Returns:
+    an integer lower bound of bucket.
+  """
+  value = int(value)
+  if value < Histogram.LINEAR_LIMIT:
+    return max(value, 0)
+  shift = value.bit_length() - Histogram.SUB_BUCKETS.bit_length()
+  return (value >> shift) << shift
+
+
+def _bucket_width(bucket):
+  """
+  Args:
+    bucket: an integer lower bound of bucket.
+  Returns:
+    a number of integer values which fall into the bucket.
+  """
+  if bucket < Histogram.LINEAR_LIMIT:
+    return 1
+  return 1 << (bucket.bit_length() - Histogram.SUB_BUCKETS.bit_length())
+
+
+def merge_histograms(histograms):
+  """ Combines histograms computed by Histogram metric.
+
+  Args:
+    histograms: a list of dicts mapping bucket to count. Keys can be strings
+      (e.g. after JSON round trip).
+  Returns:
+    a dict mapping integer bucket to count.
+  """
+  merged = {}
+  for histogram in histograms:
+    for bucket, count in histogram.items():
+      bucket = int(bucket)
+      merged[bucket] = merged.get(bucket, 0) + count
+  return merged
+
+
+def histogram_percentile(histogram, percent):
+  """ Estimates percentile of values counted in histogram.
 
+  Args:
+    histogram: a dict mapping bucket to count.
+    percent: a number between 0 and 100.
+  Returns:
+    the highest value of bucket where percentile falls
+    or None if histogram is empty.
+  """
+  buckets = sorted((int(bucket), count) for bucket, count in histogram.items())
+  total = sum(count for _, count in buckets)
+  if not total:
+    return None
+  threshold = total * percent / 100.0
+  seen = 0
+  for bucket, count in buckets:
+    seen += count
+    if seen >= threshold:
+      return bucket + _bucket_width(bucket) - 1
+  return buckets[-1][0] + _bucket_width(buckets[-1][0]) - 1
@@ -160,6 +160,7 @@ class ServiceStats(object):
     self._last_request_no = 0
     self._current_requests = {}  # {request_no: RequestInfo()}
     self._finished_requests = []  # circular list containing recent N requests
+    self._evicted_requests = 0  # number of requests removed from history
 
     # Configure parameters limiting memory usage
     self._history_size = history_size
@@ -174,6 +175,11 @@ class ServiceStats(object):
 
     # Configure metrics for recent requests
     self._metrics_for_recent_config = default_metrics_for_recent
+    # If default metrics can be computed incrementally, they are aggregated
+    # per second of request end_time, so rendering recent stats doesn't
+    # need to rescan whole history
+    self._aggregate_recent = _is_aggregatable(default_metrics_for_recent)
+    self._buckets = []  # [_Bucket()] in order of finalization
 
   @property
   def service_name(self):
@@ -277,12 +283,38 @@ class ServiceStats(object):
     request_info.latency = now - request_info.start_time
     # Add finished request to circular list of finished requests
     self._finished_requests.append(request_info)
+    if self._aggregate_recent:
+      self._add_to_bucket(request_info)
     if len(self._finished_requests) > self._history_size:
       self._finished_requests.pop(0)
+      self._evicted_requests += 1
+      self._drop_evicted_buckets()
     # Update cumulative counters
     self._increment_counters(self._cumulative_counters_config,
                              self._cumulative_counters, request_info)
 
+  def _add_to_bucket(self, request_info):
+    """ Adds the latest finished request to per-second aggregates.
+
+    Args:
+      request_info: an instance of self._request_info_class.
+    """
+    second = request_info.end_time // 1000
+    if not self._buckets or self._buckets[-1].second != second:
+      first_request = self._evicted_requests + len(self._finished_requests) - 1
+      self._buckets.append(_Bucket(first_request, second))
+    _add_to_state(self._metrics_for_recent_config, self._buckets[-1].state,
+                  request_info)
+
+  def _drop_evicted_buckets(self):
+    """ Removes buckets which don't contain requests from history anymore.
+    The oldest remaining bucket can be partially evicted, so it is never
+    used without rescanning its requests.
+    """
+    while (len(self._buckets) > 1 and
+           self._buckets[1].first_request <= self._evicted_requests):
+      self._buckets.pop(0)
+
   def _increment_counters(self, counters_config, counters_dict, request_info):
     for counter_pair in iteritems(counters_config):
       # Counters config can contain following types of items:
@@ -350,19 +382,61 @@ class ServiceStats(object):
     Returns:
       a dictionary containing value of metrics for recent requests.
     """
-    requests = self._get_requests(since=cursor)
+    first = self._first_request_index(since=cursor)
     if not metrics_map:
       metrics_map = self._metrics_for_recent_config
-    stats = self._render_recent(metrics_map, requests)
-    if not requests:
+    if first == len(self._finished_requests):
+      stats = self._render_recent(metrics_map, [])
       now = _now()
       stats["from"] = now
       stats["to"] = now
+      return stats
+
+    if metrics_map is self._metrics_for_recent_config and self._aggregate_recent:
+      stats = self._render_aggregated(first)
     else:
-      stats["from"] = requests[0].end_time
-      stats["to"] = requests[-1].end_time
+      stats = self._render_recent(metrics_map, self._finished_requests[first:])
+    stats["from"] = self._finished_requests[first].end_time
+    stats["to"] = self._finished_requests[-1].end_time
     return stats
 
+  def _render_aggregated(self, first):
+    """ Computes default metrics for requests finished after the request
+    at specified position using per-second aggregates. Only requests of the
+    first bucket are scanned, so it takes O(buckets) rather than O(requests).
+
+    Args:
+      first: an index of the first request in self._finished_requests.
+    Returns:
+      a dictionary containing computed metrics.
+    """
+    metrics_config = self._metrics_for_recent_config
+    first_request = self._evicted_requests + first
+
+    # Find the last bucket starting not later than the first request
+    left, right = 0, len(self._buckets)
+    while left < right:
+      middle = (left + right) // 2
+      if first_request < self._buckets[middle].first_request:
+        right = middle
+      else:
+        left = middle + 1
+    bucket_index = left - 1
+
+    # The first bucket may be covered partially, so its requests are rescanned
+    if bucket_index + 1 < len(self._buckets):
+      end = self._buckets[bucket_index + 1].first_request
+    else:
+      end = self._evicted_requests + len(self._finished_requests)
+    state = {}
+    for request_info in self._finished_requests[
+        first:end - self._evicted_requests]:
+      _add_to_state(metrics_config, state, request_info)
+
+    for bucket in self._buckets[bucket_index + 1:]:
+      _merge_states(metrics_config, state, bucket.state)
+    return _render_state(metrics_config, state)
+
   def _render_recent(self, metrics_config, requests):
     """ Computes configured metrics according to metrics_config for requests.
 
@@ -412,16 +486,18 @@ class ServiceStats(object):
           )
     return stats_dict
 
-  def _get_requests(self, since=None):
-    """ Selects requests which were finished since specified timestamp (in ms).
+  def _first_request_index(self, since=None):
+    """ Finds the first request which was finished since specified
+    timestamp (in ms).
 
     Args:
       since: a unix timestamp in ms.
     Returns:
-      a list of requests finished since specified timestamp.
+      an index of the first request in self._finished_requests finished since
+      specified timestamp (or len(self._finished_requests) if there is none).
     """
     if since is None:
-      return self._finished_requests
+      return 0
     # Find the first element newer than 'since' using bisect
     left, right = 0, len(self._finished_requests)
     while left < right:
@@ -430,8 +506,7 @@ class ServiceStats(object):
         right = middle
       else:
         left = middle + 1
-    result = self._finished_requests[left:]
-    return result
+    return left
 
   def _clean_outdated(self):
     """ Removes old requests which are unlikely to be finished ever as
@@ -451,6 +526,24 @@ class ServiceStats(object):
     self._last_autoclean_time = now
 
 
+class _Bucket(object):
+  """ Aggregation state of default metrics for requests
+  finished within the same second. """
+  __slots__ = ["first_request", "second", "state"]
+
+  def __init__(self, first_request, second):
+    """ Initialises an instance of _Bucket.
+
+    Args:
+      first_request: a number of requests finalized before the first request
+        of the bucket.
+      second: a unix timestamp in seconds.
+    """
+    self.first_request = first_request
+    self.second = second
+    self.state = {}
+
+
 def _now():
   """
   Returns:
@@ -503,3 +596,133 @@ def _fill_zero_counters_dict(counters_config, counters_dict):
       counters_dict[categorizer.name] = {}
   return counters_dict
 
+
+
+def _is_aggregatable(metrics_config):
+  """ A util function for checking if all metrics in config can be computed
+  incrementally.
+
+  Args:
+    metrics_config: a dict describing metrics config.
+  Returns:
+    True if every metric in config is aggregatable.
+  """
+  for metric_pair in iteritems(metrics_config):
+    if isinstance(metric_pair[1], metrics.Metric):
+      if not metric_pair[1].aggregatable:
+        return False
+    elif not _is_aggregatable(metric_pair[1]):
+      return False
+  return True
+
+
+def _add_to_state(metrics_config, state, request_info):
+  """ A util function for adding request to aggregation state of metrics.
+
+  Args:
+    metrics_config: a dict describing metrics config.
+    state: a dict containing aggregation state (it's updated in place).
+    request_info: an object containing request info.
+  """
+  for metric_pair in iteritems(metrics_config):
+    # Metrics config can contain following types of items:
+    #  - str->Metric
+    #  - Categorizer->Metric
+    #  - Categorizer->nested config with the same structure
+    if isinstance(metric_pair[0], str):
+      metric_name = metric_pair[0]
+      metric = metric_pair[1]
+      if metric_name in state:
+        metric_state = state[metric_name]
+      else:
+        metric_state = metric.new_state()
+      state[metric_name] = metric.add(metric_state, request_info)
+      continue
+
+    categorizer = metric_pair[0]
+    category = categorizer.category_of(request_info)
+    if category is categorizers.HIDDEN_CATEGORY:
+      continue
+    categories_state = state.setdefault(categorizer.name, {})
+    if isinstance(metric_pair[1], metrics.Metric):
+      metric = metric_pair[1]
+      if category in categories_state:
+        metric_state = categories_state[category]
+      else:
+        metric_state = metric.new_state()
+      categories_state[category] = metric.add(metric_state, request_info)
+    else:
+      nested_config = metric_pair[1]
+      nested_state = categories_state.setdefault(category, {})
+      _add_to_state(nested_config, nested_state, request_info)
+
+
+def _merge_states(metrics_config, state, other_state):
+  """ A util function for combining aggregation states of metrics.
+
+  Args:
+    metrics_config: a dict describing metrics config.
+    state: a dict containing aggregation state (it's updated in place).
+    other_state: a dict containing aggregation state to add to state.
+  """
+  for metric_pair in iteritems(metrics_config):
+    if isinstance(metric_pair[0], str):
+      metric_name = metric_pair[0]
+      metric = metric_pair[1]
+      if metric_name not in other_state:
+        continue
+      if metric_name in state:
+        state[metric_name] = metric.merge(state[metric_name],
+                                          other_state[metric_name])
+      else:
+        state[metric_name] = other_state[metric_name]
+      continue
+
+    categorizer = metric_pair[0]
+    other_categories = other_state.get(categorizer.name)
+    if not other_categories:
+      continue
+    categories_state = state.setdefault(categorizer.name, {})
+    for category, other_category_state in iteritems(other_categories):
+      if isinstance(metric_pair[1], metrics.Metric):
+        metric = metric_pair[1]
+        if category in categories_state:
+          categories_state[category] = metric.merge(
+            categories_state[category], other_category_state)
+        else:
+          categories_state[category] = other_category_state
+      else:
+        nested_config = metric_pair[1]
+        nested_state = categories_state.setdefault(category, {})
+        _merge_states(nested_config, nested_state, other_category_state)
+
+
+def _render_state(metrics_config, state):
+  """ A util function for computing metrics from aggregation state.
+
+  Args:
+    metrics_config: a dict describing metrics config.
+    state: a dict containing aggregation state.
+  Returns:
+    a dictionary containing computed metrics.
+  """
+  stats_dict = {}
+  for metric_pair in iteritems(metrics_config):
+    if isinstance(metric_pair[0], str):
+      metric_name = metric_pair[0]
+      metric = metric_pair[1]
+      if metric_name in state:
+        stats_dict[metric_name] = metric.result(state[metric_name])
+      else:
+        stats_dict[metric_name] = metric.result(metric.new_state())
+      continue
+
+    categorizer = metric_pair[0]
+    stats_dict[categorizer.name] = categories_stats = {}
+    for category, category_state in iteritems(state.get(categorizer.name, {})):
+      if isinstance(metric_pair[1], metrics.Metric):
+        categories_stats[category] = metric_pair[1].result(category_state)
+      else:
+        categories_stats[category] = _render_state(metric_pair[1],
+                                                   category_state)
+  return stats_dict
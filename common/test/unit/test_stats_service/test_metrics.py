@@ -85,3 +85,32 @@ class TestCustomMetric(unittest.TestCase):
     ]
     success_pct = self.SuccessPercentMetric()
     self.assertEqual(success_pct.compute(requests), 37.5)
+
+
+class TestHistogramMetrics(unittest.TestCase):
+  def test_histogram(self):
+    requests = [RequestInfo(), RequestInfo(), RequestInfo(), RequestInfo()]
+    for request, latency in zip(requests, [3, 3, 17, 1000]):
+      request.latency = latency
+    self.assertEqual(metrics.Histogram("latency").compute(requests),
+                     {3: 2, 16: 1, 960: 1})
+
+  def test_percentile(self):
+    requests = []
+    for latency in range(1, 1001):
+      request = RequestInfo()
+      request.latency = latency
+      requests.append(request)
+    # Percentile can be overestimated by less than 1/8 of the value
+    p50 = metrics.Percentile("latency", 50).compute(requests)
+    p99 = metrics.Percentile("latency", 99).compute(requests)
+    self.assertTrue(500 <= p50 < 500 * 9 / 8)
+    self.assertTrue(990 <= p99 < 990 * 9 / 8)
+    self.assertIsNone(metrics.Percentile("latency", 50).compute([]))
+
+  def test_merge_histograms(self):
+    # Keys can be strings after JSON round trip
+    merged = metrics.merge_histograms([{3: 2, 16: 1}, {"16": 4, "960": 1}])
+    self.assertEqual(merged, {3: 2, 16: 5, 960: 1})
+    self.assertEqual(metrics.histogram_percentile(merged, 50), 17)
+    self.assertEqual(metrics.histogram_percentile(merged, 100), 1023)
@@ -438,3 +438,42 @@ class TestProperties(unittest.TestCase):
     stats.start_request()
 
     self.assertEqual(stats.current_requests, 4)
+
+
+class TestAggregatedRecent(unittest.TestCase):
+
+  def setUp(self):
+    self.time_patcher = patch.object(stats_manager.time, 'time')
+    self.time_mock = self.time_patcher.start()
+    self.time_mock.return_value = 151550000
+    self.detailed_metrics = stats_manager.PER_APP_DETAILED_METRICS_MAP
+    self.stats = stats_manager.ServiceStats(
+      "my_service", history_size=50,
+      default_metrics_for_recent=self.detailed_metrics)
+
+    # Finish several requests per second, so history is evicted
+    # in the middle of a second
+    statuses = [200, 201, 404, 500, 200, 403, 200]
+    apps = ["guestbook", "other", "guestbook"]
+    resources = ["/", "/api", "/path", "/api"]
+    for number in range(137):
+      self.time_mock.return_value = 151550000 + number // 7 + 0.1
+      request_info = self.stats.start_request(
+        app=apps[number % 3], resource=resources[number % 4])
+      self.time_mock.return_value += float(number % 5) / 10
+      request_info.finalize(status=statuses[number % 7])
+
+  def tearDown(self):
+    self.time_patcher.stop()
+
+  def test_aggregated_matches_rescan(self):
+    # A copy of metrics config is not aggregated, so requests are rescanned
+    rescanned_metrics = dict(self.detailed_metrics)
+    for cursor in [None, 151550011000, 151550012300, 151550016500,
+                   151550019400, 151550030000]:
+      self.assertEqual(
+        self.stats.scroll_recent(cursor),
+        self.stats.scroll_recent(cursor, metrics_map=rescanned_metrics))
+
+  def test_history_size(self):
+    self.assertEqual(self.stats.get_recent()["all"], 50)